@@ -19,12 +19,17 @@ import json
 import base64
 import re
 import time
+import threading
 from datetime import datetime, timedelta
 import glob
 from dotenv import load_dotenv
 import requests
 import PyPDF2
 import pdfplumber
+from so_pdf_document import as_so_document
+import so_parse_cache
+import so_bulk_parser
+import so_file_index
 from docx import Document
 from enterprise_analytics import EnterpriseAnalytics
 import sys
@@ -335,6 +340,7 @@ def extract_addresses_from_layout(pdf_path):
     Extract Sold To and Ship To addresses using word positions.
     Uses x-coordinates to separate left column (Sold To) from right column (Ship To).
     Also extracts batch number and MO number from the far right.
+    pdf_path may be a path or an already extracted SODocument.
     """
     sold_to_lines = []
     ship_to_lines = []
@@ -342,119 +348,118 @@ def extract_addresses_from_layout(pdf_path):
     mo_number = ''
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                words = page.extract_words()
-                if not words:
+        for page in as_so_document(pdf_path).pages:
+            words = page.words
+            if not words:
+                continue
+            
+            # Find the "Sold To:" and "Ship To:" positions
+            sold_to_x = None
+            ship_to_x = None
+            address_start_y = None
+            
+            for w in words:
+                text_lower = w['text'].lower()
+                if text_lower == 'sold' or text_lower == 'sold:':
+                    sold_to_x = w['x0']
+                    address_start_y = w['top']
+                elif text_lower == 'ship' and ship_to_x is None:
+                    # Only set ship_to_x if it's after sold_to (the header, not "Ship Date")
+                    if sold_to_x and w['x0'] > sold_to_x + 100:
+                        ship_to_x = w['x0']
+            
+            if not sold_to_x or not ship_to_x or not address_start_y:
+                continue
+            
+            # Calculate column boundaries
+            # Left column (Sold To): x0 < midpoint
+            # Right column (Ship To): x0 >= midpoint but < far right
+            midpoint = (sold_to_x + ship_to_x) / 2 + 50  # A bit past the midpoint
+            far_right = 400  # MO/Batch area starts around x=400
+            
+            # Find address end (Business No line or Item No line)
+            address_end_y = address_start_y + 150  # Default: 150 pixels down
+            for w in words:
+                text_upper = w['text'].upper()
+                if text_upper in ['BUSINESS', 'ITEM'] and w['top'] > address_start_y:
+                    address_end_y = w['top']
+                    break
+            
+            # Group words by approximate Y position (same line)
+            left_lines = {}
+            right_lines = {}
+            
+            for w in words:
+                # Only process words in the address area
+                if w['top'] < address_start_y or w['top'] > address_end_y:
                     continue
                 
-                # Find the "Sold To:" and "Ship To:" positions
-                sold_to_x = None
-                ship_to_x = None
-                address_start_y = None
-                
-                for w in words:
-                    text_lower = w['text'].lower()
-                    if text_lower == 'sold' or text_lower == 'sold:':
-                        sold_to_x = w['x0']
-                        address_start_y = w['top']
-                    elif text_lower == 'ship' and ship_to_x is None:
-                        # Only set ship_to_x if it's after sold_to (the header, not "Ship Date")
-                        if sold_to_x and w['x0'] > sold_to_x + 100:
-                            ship_to_x = w['x0']
-                
-                if not sold_to_x or not ship_to_x or not address_start_y:
+                # Skip headers
+                text_lower = w['text'].lower()
+                if text_lower in ['sold', 'to:', 'ship', 'to']:
                     continue
                 
-                # Calculate column boundaries
-                # Left column (Sold To): x0 < midpoint
-                # Right column (Ship To): x0 >= midpoint but < far right
-                midpoint = (sold_to_x + ship_to_x) / 2 + 50  # A bit past the midpoint
-                far_right = 400  # MO/Batch area starts around x=400
-                
-                # Find address end (Business No line or Item No line)
-                address_end_y = address_start_y + 150  # Default: 150 pixels down
-                for w in words:
+                # Extract batch number and MO from far right
+                if w['x0'] > far_right:
                     text_upper = w['text'].upper()
-                    if text_upper in ['BUSINESS', 'ITEM'] and w['top'] > address_start_y:
-                        address_end_y = w['top']
-                        break
-                
-                # Group words by approximate Y position (same line)
-                left_lines = {}
-                right_lines = {}
-                
-                for w in words:
-                    # Only process words in the address area
-                    if w['top'] < address_start_y or w['top'] > address_end_y:
-                        continue
-                    
-                    # Skip headers
-                    text_lower = w['text'].lower()
-                    if text_lower in ['sold', 'to:', 'ship', 'to']:
-                        continue
-                    
-                    # Extract batch number and MO from far right
-                    if w['x0'] > far_right:
-                        text_upper = w['text'].upper()
-                        if 'BATCH' in text_upper or 'WH' in text_upper:
-                            # Look for batch number pattern
-                            import re
-                            if re.match(r'WH\d+[A-Z]\d+', text_upper):
-                                batch_number = w['text']
-                        elif text_upper == 'MO':
-                            # Next word should be the MO number
-                            pass
-                        elif re.match(r'^\d{4}$', w['text']):
-                            mo_number = w['text']
-                        continue
-                    
-                    # Round Y to group words on same line (within 3 pixels)
-                    y_key = round(w['top'] / 3) * 3
-                    
-                    if w['x0'] < midpoint:
-                        # Left column (Sold To)
-                        if y_key not in left_lines:
-                            left_lines[y_key] = []
-                        left_lines[y_key].append((w['x0'], w['text']))
-                    else:
-                        # Right column (Ship To)
-                        if y_key not in right_lines:
-                            right_lines[y_key] = []
-                        right_lines[y_key].append((w['x0'], w['text']))
-                
-                # Sort and join words on each line
-                for y in sorted(left_lines.keys()):
-                    line_words = sorted(left_lines[y], key=lambda x: x[0])
-                    line_text = ' '.join(w[1] for w in line_words).strip()
-                    if line_text and line_text.upper() not in ['SOLD TO:', 'SOLD TO', 'TO:']:
-                        sold_to_lines.append(line_text)
-                
-                for y in sorted(right_lines.keys()):
-                    line_words = sorted(right_lines[y], key=lambda x: x[0])
-                    line_text = ' '.join(w[1] for w in line_words).strip()
-                    if line_text and line_text.upper() not in ['SHIP TO:', 'SHIP TO', 'TO:']:
-                        # Skip MO references and batch numbers that might slip through
-                        if not line_text.startswith('MO ') and 'Batch' not in line_text:
-                            ship_to_lines.append(line_text)
+                    if 'BATCH' in text_upper or 'WH' in text_upper:
+                        # Look for batch number pattern
+                        import re
+                        if re.match(r'WH\d+[A-Z]\d+', text_upper):
+                            batch_number = w['text']
+                    elif text_upper == 'MO':
+                        # Next word should be the MO number
+                        pass
+                    elif re.match(r'^\d{4}$', w['text']):
+                        mo_number = w['text']
+                    continue
                 
-                # Also look for batch number in a different pattern
-                for w in words:
-                    if 'Batch' in w['text'] or 'batch' in w['text']:
-                        # Find the next word which should be "no:" or the batch number
-                        idx = words.index(w)
-                        for next_w in words[idx:idx+4]:
-                            import re
-                            if re.match(r'WH\d+[A-Z]\d+', next_w['text'].upper()):
-                                batch_number = next_w['text']
-                                break
-                    elif w['text'].upper() == 'MO' and not mo_number:
-                        idx = words.index(w)
-                        for next_w in words[idx+1:idx+3]:
-                            if re.match(r'^\d{4}$', next_w['text']):
-                                mo_number = next_w['text']
-                                break
+                # Round Y to group words on same line (within 3 pixels)
+                y_key = round(w['top'] / 3) * 3
                 
+                if w['x0'] < midpoint:
+                    # Left column (Sold To)
+                    if y_key not in left_lines:
+                        left_lines[y_key] = []
+                    left_lines[y_key].append((w['x0'], w['text']))
+                else:
+                    # Right column (Ship To)
+                    if y_key not in right_lines:
+                        right_lines[y_key] = []
+                    right_lines[y_key].append((w['x0'], w['text']))
+            
+            # Sort and join words on each line
+            for y in sorted(left_lines.keys()):
+                line_words = sorted(left_lines[y], key=lambda x: x[0])
+                line_text = ' '.join(w[1] for w in line_words).strip()
+                if line_text and line_text.upper() not in ['SOLD TO:', 'SOLD TO', 'TO:']:
+                    sold_to_lines.append(line_text)
+            
+            for y in sorted(right_lines.keys()):
+                line_words = sorted(right_lines[y], key=lambda x: x[0])
+                line_text = ' '.join(w[1] for w in line_words).strip()
+                if line_text and line_text.upper() not in ['SHIP TO:', 'SHIP TO', 'TO:']:
+                    # Skip MO references and batch numbers that might slip through
+                    if not line_text.startswith('MO ') and 'Batch' not in line_text:
+                        ship_to_lines.append(line_text)
+            
+            # Also look for batch number in a different pattern
+            for w in words:
+                if 'Batch' in w['text'] or 'batch' in w['text']:
+                    # Find the next word which should be "no:" or the batch number
+                    idx = words.index(w)
+                    for next_w in words[idx:idx+4]:
+                        import re
+                        if re.match(r'WH\d+[A-Z]\d+', next_w['text'].upper()):
+                            batch_number = next_w['text']
+                            break
+                elif w['text'].upper() == 'MO' and not mo_number:
+                    idx = words.index(w)
+                    for next_w in words[idx+1:idx+3]:
+                        if re.match(r'^\d{4}$', next_w['text']):
+                            mo_number = next_w['text']
+                            break
+            
     except Exception as e:
         print(f"⚠️ Layout address extraction failed: {e}")
         import traceback
@@ -479,54 +484,54 @@ def extract_addresses_from_pdf_tables(pdf_path):
     PRE-EXTRACT Sold To and Ship To addresses from PDF tables.
     The PDF has these in a two-column table - LEFT is Sold To, RIGHT is Ship To.
     This is MORE RELIABLE than trying to parse merged text.
+    pdf_path may be a path or an already extracted SODocument.
     """
     sold_to_lines = []
     ship_to_lines = []
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if not tables:
+        for page in as_so_document(pdf_path).pages:
+            tables = page.tables
+            if not tables:
+                continue
+                
+            found_address_header = False
+            
+            for table in tables:
+                if not table:
                     continue
                     
-                found_address_header = False
-                
-                for table in tables:
-                    if not table:
+                for row_idx, row in enumerate(table):
+                    if not row:
                         continue
+                    
+                    # Handle different row lengths
+                    left_cell = str(row[0] or '').strip() if len(row) > 0 else ''
+                    right_cell = str(row[1] or '').strip() if len(row) > 1 else ''
+                    
+                    left_upper = left_cell.upper()
+                    right_upper = right_cell.upper()
+                    
+                    # Detect "Sold To" / "Ship To" header row
+                    if 'SOLD TO' in left_upper or 'BILL TO' in left_upper:
+                        found_address_header = True
+                        continue
+                    
+                    # Stop when we hit item table or other sections
+                    if found_address_header:
+                        stop_keywords = ['ITEM', 'ORDERED', 'BUSINESS NO', 'QTY', 'UNIT PRICE', 'AMOUNT', 'DESCRIPTION']
+                        if any(kw in left_upper for kw in stop_keywords):
+                            break
+                    
+                    # Collect address lines - LEFT = Sold To, RIGHT = Ship To
+                    if found_address_header:
+                        skip_labels = ['SOLD TO:', 'SHIP TO:', 'BILL TO:', 'SOLD TO', 'SHIP TO', 'BILL TO']
                         
-                    for row_idx, row in enumerate(table):
-                        if not row:
-                            continue
-                        
-                        # Handle different row lengths
-                        left_cell = str(row[0] or '').strip() if len(row) > 0 else ''
-                        right_cell = str(row[1] or '').strip() if len(row) > 1 else ''
-                        
-                        left_upper = left_cell.upper()
-                        right_upper = right_cell.upper()
-                        
-                        # Detect "Sold To" / "Ship To" header row
-                        if 'SOLD TO' in left_upper or 'BILL TO' in left_upper:
-                            found_address_header = True
-                            continue
-                        
-                        # Stop when we hit item table or other sections
-                        if found_address_header:
-                            stop_keywords = ['ITEM', 'ORDERED', 'BUSINESS NO', 'QTY', 'UNIT PRICE', 'AMOUNT', 'DESCRIPTION']
-                            if any(kw in left_upper for kw in stop_keywords):
-                                break
+                        if left_cell and left_cell.upper() not in [s.upper() for s in skip_labels]:
+                            sold_to_lines.append(left_cell)
                         
-                        # Collect address lines - LEFT = Sold To, RIGHT = Ship To
-                        if found_address_header:
-                            skip_labels = ['SOLD TO:', 'SHIP TO:', 'BILL TO:', 'SOLD TO', 'SHIP TO', 'BILL TO']
-                            
-                            if left_cell and left_cell.upper() not in [s.upper() for s in skip_labels]:
-                                sold_to_lines.append(left_cell)
-                            
-                            if right_cell and right_cell.upper() not in [s.upper() for s in skip_labels]:
-                                ship_to_lines.append(right_cell)
+                        if right_cell and right_cell.upper() not in [s.upper() for s in skip_labels]:
+                            ship_to_lines.append(right_cell)
     except Exception as e:
         print(f"⚠️ Table address extraction failed: {e}")
     
@@ -545,11 +550,14 @@ def extract_so_data_from_pdf(pdf_path):
     try:
         print(f"PARSING: {os.path.basename(pdf_path)}")
         
+        # Open and extract the PDF once (words, text, layout text, tables); every pass below reads this
+        doc = as_so_document(pdf_path)
+        
         # FIRST: Try layout-based extraction (uses word positions - most reliable)
-        layout_addresses = extract_addresses_from_layout(pdf_path)
+        layout_addresses = extract_addresses_from_layout(doc)
         
         # SECOND: Try table-based extraction as fallback
-        table_addresses = extract_addresses_from_pdf_tables(pdf_path)
+        table_addresses = extract_addresses_from_pdf_tables(doc)
         
         # Use layout addresses if available, otherwise fall back to table addresses
         if layout_addresses.get('sold_to_raw') or layout_addresses.get('ship_to_raw'):
@@ -561,18 +569,9 @@ def extract_so_data_from_pdf(pdf_path):
         else:
             pre_extracted = {'sold_to_raw': '', 'ship_to_raw': '', 'batch_number': '', 'mo_number': ''}
         
-        # Extract text from PDF with layout preservation for better column handling
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            layout_text = ""  # Layout-preserved text for address parsing
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += page_text + "\n"
-                # Also get layout-preserved text
-                layout_page_text = page.extract_text(layout=True)
-                if layout_page_text:
-                    layout_text += layout_page_text + "\n"
+        # Plain text, plus layout-preserved text for better column handling
+        full_text = doc.full_text
+        layout_text = doc.layout_text  # Layout-preserved text for address parsing
         
         lines = full_text.split('\n')
         
@@ -606,8 +605,8 @@ def extract_so_data_from_pdf(pdf_path):
             'line_references': [],
             'special_instructions': '',
             'file_info': {
-                'filename': os.path.basename(pdf_path),
-                'size_bytes': os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+                'filename': doc.filename,
+                'size_bytes': doc.size_bytes
             },
             'sold_to': {
                 'company_name': '',
@@ -1493,9 +1492,9 @@ def load_real_so_data():
     
     print(f"SEARCH: OPTIMIZED SO SCAN: Starting efficient recursive scan from {base_directory}")
     
-    # Get all PDF files recursively
+    # Get all PDF files recursively (listed from the shared SO file index, not the drive)
     pdf_files = []
-    for root, dirs, files in os.walk(base_directory):
+    for root, dirs, files in so_file_index.get_index().walk(base_directory):
         for file in files:
             if file.lower().endswith('.pdf') and 'salesorder' in file.lower():
                 pdf_files.append(os.path.join(root, file))
@@ -1510,7 +1509,7 @@ def load_real_so_data():
         
         for pdf_path in batch:
             try:
-                so_data_item = extract_so_data_from_pdf(pdf_path)
+                so_data_item = so_parse_cache.parse(pdf_path, "app", extract_so_data_from_pdf)
                 if so_data_item:
                     so_data.append(so_data_item)
             except Exception as e:
@@ -1531,9 +1530,9 @@ def load_real_so_data():
         print(f"ERROR: Base SO directory not found: {base_directory}")
         return so_data
     
-    # Get all PDF files recursively
+    # Get all PDF files recursively (listed from the shared SO file index, not the drive)
     pdf_files = []
-    for root, dirs, files in os.walk(base_directory):
+    for root, dirs, files in so_file_index.get_index().walk(base_directory):
         for file in files:
             if file.lower().endswith('.pdf') and 'salesorder' in file.lower():
                 pdf_files.append(os.path.join(root, file))
@@ -1548,7 +1547,7 @@ def load_real_so_data():
         
         for pdf_path in batch:
             try:
-                so_data_item = extract_so_data_from_pdf(pdf_path)
+                so_data_item = so_parse_cache.parse(pdf_path, "app", extract_so_data_from_pdf)
                 if so_data_item:
                     so_data.append(so_data_item)
             except Exception as e:
@@ -1569,9 +1568,9 @@ def load_real_so_data():
         print(f"ERROR: Base SO directory not found: {base_directory}")
         return so_data
     
-    # Get all PDF files recursively
+    # Get all PDF files recursively (listed from the shared SO file index, not the drive)
     pdf_files = []
-    for root, dirs, files in os.walk(base_directory):
+    for root, dirs, files in so_file_index.get_index().walk(base_directory):
         for file in files:
             if file.lower().endswith('.pdf') and 'salesorder' in file.lower():
                 pdf_files.append(os.path.join(root, file))
@@ -1586,7 +1585,7 @@ def load_real_so_data():
         
         for pdf_path in batch:
             try:
-                so_data_item = extract_so_data_from_pdf(pdf_path)
+                so_data_item = so_parse_cache.parse(pdf_path, "app", extract_so_data_from_pdf)
                 if so_data_item:
                     so_data.append(so_data_item)
             except Exception as e:
@@ -1607,9 +1606,9 @@ def load_real_so_data():
         print(f"ERROR: Base SO directory not found: {base_directory}")
         return so_data
     
-    # Get all PDF files recursively
+    # Get all PDF files recursively (listed from the shared SO file index, not the drive)
     pdf_files = []
-    for root, dirs, files in os.walk(base_directory):
+    for root, dirs, files in so_file_index.get_index().walk(base_directory):
         for file in files:
             if file.lower().endswith('.pdf') and 'salesorder' in file.lower():
                 pdf_files.append(os.path.join(root, file))
@@ -1624,7 +1623,7 @@ def load_real_so_data():
         
         for pdf_path in batch:
             try:
-                so_data_item = extract_so_data_from_pdf(pdf_path)
+                so_data_item = so_parse_cache.parse(pdf_path, "app", extract_so_data_from_pdf)
                 if so_data_item:
                     so_data.append(so_data_item)
             except Exception as e:
@@ -1775,7 +1774,7 @@ CORS(app, resources={
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With"],
-        "expose_headers": ["Content-Type", "Content-Length"],
+        "expose_headers": ["Content-Type", "Content-Length", "ETag"],
         "supports_credentials": False,
         "max_age": 3600
     }
@@ -2140,7 +2139,6 @@ def load_json_file(file_path):
 
 # Global cache for data - store PRE-SERIALIZED JSON to avoid 35s serialization time
 _data_cache = None  # Stores raw data dict (for internal use)
-_response_cache = None  # Stores pre-serialized JSON bytes
 _cache_timestamp = None
 _cache_duration = 3600  # 1 hour cache (was 5 minutes - too short)
 # Portal store: persisted MOs, inventory adjustments, transfers, item overrides, BOM edits (see portal_store.py)
@@ -2155,6 +2153,143 @@ def _merge_portal_store(data):
         return data
     return portal_store.apply_to_data(data)
 
+# Company data store: hash indexes (item, item+location, PO, MO, BOM parent/revision, lot) over the loaded data dict
+import company_data_store
+import full_company_delta
+# BOM graph (current-revision adjacency, item master dict, memoized explosion) shared with PR, costing and MRP
+import bom_graph
+
+
+def _get_data_store(data):
+    """Return the indexed CompanyDataStore for data (built once per loaded dict)."""
+    return company_data_store.get_store(data)
+
+
+# /api/data payload: per-table serialization, version/ETag, streamed gzip/br body, per-table deltas and the
+# source-agnostic response cache shared by Full Company Data / live SQL / API Extractions (see data_payload.py)
+import data_payload
+
+
+_data_responses = data_payload.ResponseCache(_cache_duration, default=app.json.default)
+# Watches the requested sources for a new export and swaps in the rebuilt response (stale-while-revalidate)
+import data_background_refresh
+_data_refresher = data_background_refresh.DataBackgroundRefresh(_data_responses)
+
+
+def _full_company_data_identity():
+    """Cheap identity of the latest Full Company Data export: local folder + (file, mtime, size), else the Drive folder id."""
+    if not IS_CLOUD_ENVIRONMENT:
+        fcd_path, _ = get_latest_full_company_data_folder()
+        if fcd_path and os.path.isdir(fcd_path):
+            try:
+                files = tuple(sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in os.scandir(fcd_path) if e.is_file()))
+            except OSError:
+                files = None
+            return ("local", fcd_path, files)
+    gdrive_service = get_google_drive_service()
+    if gdrive_service and getattr(gdrive_service, "authenticated", False):
+        try:
+            folder_id, fcd_name, _ = gdrive_service.find_latest_full_company_data_folder()
+        except Exception as e:
+            print(f"[api/data] Drive folder lookup failed: {e}")
+            folder_id, fcd_name = None, None
+        if folder_id:
+            return ("drive", folder_id, fcd_name)
+    return None
+
+
+def _live_sql_identity():
+    """Bridge data version (GET <bridge>/api/version) when MISYS_LIVE_SQL_URL is set; otherwise TTL-only."""
+    bridge_url = os.environ.get('MISYS_LIVE_SQL_URL', '').strip()
+    if not bridge_url:
+        return ("misys_service", None)
+    try:
+        r = requests.get(f"{bridge_url.rstrip('/')}/api/version", timeout=5)
+        if r.ok:
+            return ("bridge", bridge_url, r.json().get("version"))
+    except Exception:
+        pass
+    return ("bridge", bridge_url, None)
+
+
+def _api_extractions_identity():
+    """Latest API Extractions folder on G: (or the Drive API fallback when G: is not mounted)."""
+    if not os.path.exists(GDRIVE_BASE):
+        return ("gdrive_api", None)
+    latest_folder, _ = get_latest_folder()
+    return ("gdrive", latest_folder)
+
+
+def _portal_overlay_token():
+    return portal_store.get_change_token() if portal_store is not None else None
+
+
+def _serve_data(source_key, identity_fn, loader, force_refresh=False):
+    """
+    Serve one /api/data source from the shared response cache. loader() -> (data, envelope) is cached (pre-serialized,
+    pre-compressed); any other return value (error/empty response, None) is passed through. Concurrent requests share one load.
+    A changed source (new export folder, bridge version, TTL expiry) keeps serving the previous snapshot while the background
+    refresher rebuilds it; a portal_store change reloads before responding, since cached responses include the overlay.
+    ?refresh=true re-checks the source now and reloads only if it changed (or its identity cannot tell).
+    """
+    global _data_cache, _cache_timestamp
+
+    def _load_in_app_context():
+        with app.app_context():
+            return loader()
+
+    _data_refresher.register(source_key, identity_fn, _load_in_app_context, _portal_overlay_token)
+    identity = _data_refresher.identity(source_key, identity_fn, max_age=0 if force_refresh else None)
+    force = force_refresh and (identity is None or None in identity)
+    result = _data_responses.get_or_load(source_key, identity, _load_in_app_context, force=force,
+                                         overlay=_portal_overlay_token(), stale_ok=not force_refresh)
+    if not isinstance(result, data_payload.CachedResponse):
+        return result
+    if _data_cache is not result.data:
+        _data_cache = result.data
+        _cache_timestamp = result.created
+        _get_data_store(result.data)
+        print(f"[api/data] {source_key} cached: version {result.version}, {result.payload.size/1024/1024:.1f}MB")
+    return _data_response(result)
+
+
+def _data_response(entry):
+    """
+    Send a cached /api/data entry: 304 when If-None-Match matches its version, the pre-compressed body for gzip/br,
+    or a table-by-table stream. On /api/data/delta?since=<version> only tables whose hash changed since that version
+    are sent ("delta": true, plus "removed"); unknown versions get the full payload.
+    """
+    from flask import request, Response
+    etag = f'"{entry.version}"'
+    if data_payload.etag_matches(request.headers.get('If-None-Match'), entry.version):
+        resp = Response(status=304)
+        resp.headers['ETag'] = etag
+        return resp
+    envelope = entry.envelope
+    tables = None
+    if request.path.rstrip('/').endswith('/delta'):
+        envelope = dict(envelope)
+        since = (request.args.get('since') or '').strip().strip('"')
+        old_hashes = data_payload.hashes_for_version(entry.source_key, since) if since else None
+        if old_hashes is not None:
+            tables, removed = entry.payload.changed_since(old_hashes)
+            envelope.update({"delta": True, "since": since, "removed": removed})
+            print(f"[api/data] delta since {since}: {len(tables)} of {len(entry.payload.tables)} tables changed")
+        else:
+            envelope["delta"] = False
+    encoding = data_payload.choose_encoding(request.headers.get('Accept-Encoding'))
+    if tables is None and encoding and envelope is entry.envelope:
+        resp = Response(entry.body(encoding), mimetype='application/json')
+    else:
+        body = data_payload.compress_stream(entry.payload.iter_json(envelope, tables=tables, default=app.json.default), encoding)
+        resp = Response(body, mimetype='application/json', direct_passthrough=True)
+    resp.headers['ETag'] = etag
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    return resp
+
 
 # Full Company Data: CSV stem -> (app keys, column map) - no pandas required. Used as PRIMARY source when pandas fails.
 _FULL_COMPANY_CSV_MAPPINGS = {
@@ -2233,6 +2368,18 @@ _FULL_COMPANY_CSV_MAPPINGS = {
 }
 
 
+def _full_company_csv_parts(folder_path, stem, delta_parts):
+    """Files making up one Full Company Data table: its delta chain (full_company_delta) or the plain <stem>.CSV; None if absent."""
+    parts = delta_parts.get(stem.upper())
+    if parts:
+        return parts
+    for ext in (".CSV", ".csv"):
+        fpath = os.path.join(folder_path, stem + ext)
+        if os.path.isfile(fpath):
+            return [{"path": fpath}]
+    return None
+
+
 def _load_full_company_data_csv_only(folder_path):
     """
     Load Full Company Data from CSV files using only built-in csv module (no pandas).
@@ -2244,27 +2391,23 @@ def _load_full_company_data_csv_only(folder_path):
     try:
         data = get_empty_app_data_structure()
         loaded = 0
+        delta_parts = full_company_delta.table_parts(folder_path)
         for stem, (app_keys, col_map) in _FULL_COMPANY_CSV_MAPPINGS.items():
-            for ext in (".CSV", ".csv"):
-                fpath = os.path.join(folder_path, stem + ext)
-                if os.path.isfile(fpath):
-                    break
-            else:
+            parts = _full_company_csv_parts(folder_path, stem, delta_parts)
+            if not parts:
                 continue
             try:
                 rows = []
-                with open(fpath, "r", encoding="utf-8", errors="replace") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        out = {}
-                        for k, v in row.items():
-                            key = (k or "").strip()
-                            app_key = col_map.get(key) or col_map.get(key.replace(" ", ""))
-                            if app_key:
-                                out[app_key] = v
-                            else:
-                                out[k] = v
-                        rows.append(out)
+                for row in full_company_delta.iter_csv_rows(parts):
+                    out = {}
+                    for k, v in row.items():
+                        key = (k or "").strip()
+                        app_key = col_map.get(key) or col_map.get(key.replace(" ", ""))
+                        if app_key:
+                            out[app_key] = v
+                        else:
+                            out[k] = v
+                    rows.append(out)
             except Exception as e:
                 print(f"📂 Full Company Data CSV skip {stem}.CSV: {e}")
                 continue
@@ -2301,29 +2444,23 @@ def _supplement_from_full_company_data(raw_data):
         if not fcd_path or not os.path.exists(fcd_path):
             return raw_data
         supplemented = 0
+        delta_parts = full_company_delta.table_parts(fcd_path)
         for stem, (app_keys, col_map) in _FULL_COMPANY_CSV_MAPPINGS.items():
-            fpath = None
-            for ext in (".CSV", ".csv"):
-                p = os.path.join(fcd_path, stem + ext)
-                if os.path.isfile(p):
-                    fpath = p
-                    break
-            if not fpath:
+            parts = _full_company_csv_parts(fcd_path, stem, delta_parts)
+            if not parts:
                 continue
             try:
                 rows = []
-                with open(fpath, "r", encoding="utf-8", errors="replace") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        out = {}
-                        for k, v in row.items():
-                            key = (k or "").strip()
-                            app_key = col_map.get(key) or col_map.get(key.replace(" ", ""))
-                            if app_key:
-                                out[app_key] = v
-                            else:
-                                out[k] = v
-                        rows.append(out)
+                for row in full_company_delta.iter_csv_rows(parts):
+                    out = {}
+                    for k, v in row.items():
+                        key = (k or "").strip()
+                        app_key = col_map.get(key) or col_map.get(key.replace(" ", ""))
+                        if app_key:
+                            out[app_key] = v
+                        else:
+                            out[k] = v
+                    rows.append(out)
             except Exception as e:
                 print(f"📂 Supplement skip {stem}.CSV: {e}")
                 continue
@@ -2368,151 +2505,154 @@ def get_empty_app_data_structure():
 @app.route('/api/data', methods=['GET'])
 def get_all_data():
     """Single source: MISys Full Company Data export (your CSV/Excel export folder). When that folder is available, we use it only. Use ?source=default to force legacy API Extractions instead."""
-    global _data_cache, _response_cache, _cache_timestamp
-    import time  # Import at function level for use throughout function
     from flask import request
 
     try:
         print("/api/data endpoint called")
         data_source_param = request.args.get('source')
+        # ?refresh=true bypasses cache — used when user explicitly clicks Sync to get latest data
+        force_refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        if force_refresh:
+            print("[api/data] Force refresh requested - reloading latest data")
 
         # Explicit Full Company Data requested
         if data_source_param == 'full_company_data':
-            full_data = None
-            err_msg = None
-            folder_name_used = "Full Company Data"
-            try:
-                from full_company_data_converter import load_from_folder, load_from_drive_api
-            except (ImportError, ValueError, OSError):
+            def _load_full_company_data():
+                full_data = None
+                err_msg = None
+                folder_name_used = "Full Company Data"
                 try:
-                    from .full_company_data_converter import load_from_folder, load_from_drive_api
+                    from full_company_data_converter import load_from_folder, load_from_drive_api
                 except (ImportError, ValueError, OSError):
-                    load_from_folder = load_from_drive_api = None
-            if load_from_folder and not IS_CLOUD_ENVIRONMENT:
-                fcd_path, fcd_name = get_latest_full_company_data_folder()
-                if fcd_path and os.path.exists(fcd_path):
                     try:
-                        full_data, err_msg = load_from_folder(fcd_path)
-                        folder_name_used = fcd_name or folder_name_used
-                    except Exception as e:
-                        full_data, err_msg = None, str(e)
-            if full_data is None and load_from_drive_api:
-                gdrive_service = get_google_drive_service()
-                drive_id = gdrive_service.find_shared_drive("IT_Automation") if gdrive_service else None
-                if drive_id and gdrive_service and getattr(gdrive_service, "authenticated", False):
-                    folder_id, fcd_name, _ = gdrive_service.find_latest_full_company_data_folder()
-                    if folder_id:
-                        full_data, err_msg = load_from_drive_api(gdrive_service, drive_id, folder_id=folder_id)
-                        folder_name_used = fcd_name or folder_name_used
-                    else:
-                        err_msg = "No Full Company Data subfolder found (check Full Company Data From Misys)"
-            if full_data is not None:
-                full_data = _merge_portal_store(full_data)
-                file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
+                        from .full_company_data_converter import load_from_folder, load_from_drive_api
+                    except (ImportError, ValueError, OSError):
+                        load_from_folder = load_from_drive_api = None
+                if load_from_folder and not IS_CLOUD_ENVIRONMENT:
+                    fcd_path, fcd_name = get_latest_full_company_data_folder()
+                    if fcd_path and os.path.exists(fcd_path):
+                        try:
+                            full_data, err_msg = load_from_folder(fcd_path)
+                            folder_name_used = fcd_name or folder_name_used
+                        except Exception as e:
+                            full_data, err_msg = None, str(e)
+                if full_data is None and load_from_drive_api:
+                    gdrive_service = get_google_drive_service()
+                    drive_id = gdrive_service.find_shared_drive("IT_Automation") if gdrive_service else None
+                    if drive_id and gdrive_service and getattr(gdrive_service, "authenticated", False):
+                        folder_id, fcd_name, _ = gdrive_service.find_latest_full_company_data_folder()
+                        if folder_id:
+                            full_data, err_msg = load_from_drive_api(gdrive_service, drive_id, folder_id=folder_id)
+                            folder_name_used = fcd_name or folder_name_used
+                        else:
+                            err_msg = "No Full Company Data subfolder found (check Full Company Data From Misys)"
+                if full_data is not None:
+                    full_data = _merge_portal_store(full_data)
+                    file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
+                    return full_data, {
+                        "folderInfo": {
+                            "folderName": folder_name_used,
+                            "syncDate": datetime.now().isoformat(),
+                            "lastModified": datetime.now().isoformat(),
+                            "folder": FULL_COMPANY_DATA_DRIVE_PATH,
+                            "created": datetime.now().isoformat(),
+                            "size": "N/A",
+                            "fileCount": file_count,
+                        },
+                        "LoadTimestamp": datetime.now().isoformat(),
+                        "source": "full_company_data",
+                        "fullCompanyDataReady": True,
+                    }
+                empty_data = get_empty_app_data_structure()
                 return jsonify({
-                    "data": full_data,
+                    "data": empty_data,
                     "folderInfo": {
-                        "folderName": folder_name_used,
+                        "folderName": "Full Company Data (framework)",
                         "syncDate": datetime.now().isoformat(),
                         "lastModified": datetime.now().isoformat(),
                         "folder": FULL_COMPANY_DATA_DRIVE_PATH,
                         "created": datetime.now().isoformat(),
-                        "size": "N/A",
-                        "fileCount": file_count,
+                        "size": "0",
+                        "fileCount": 0,
                     },
                     "LoadTimestamp": datetime.now().isoformat(),
-                    "source": "full_company_data",
-                    "fullCompanyDataReady": True,
+                    "source": "full_company_data (conversion failed or folder not available)",
+                    "fullCompanyDataReady": False,
+                    "message": err_msg or "Full Company Data folder not found or converter error",
                 })
-            empty_data = get_empty_app_data_structure()
-            return jsonify({
-                "data": empty_data,
-                "folderInfo": {
-                    "folderName": "Full Company Data (framework)",
-                    "syncDate": datetime.now().isoformat(),
-                    "lastModified": datetime.now().isoformat(),
-                    "folder": FULL_COMPANY_DATA_DRIVE_PATH,
-                    "created": datetime.now().isoformat(),
-                    "size": "0",
-                    "fileCount": 0,
-                },
-                "LoadTimestamp": datetime.now().isoformat(),
-                "source": "full_company_data (conversion failed or folder not available)",
-                "fullCompanyDataReady": False,
-                "message": err_msg or "Full Company Data folder not found or converter error",
-            })
+            return _serve_data('full_company_data', _full_company_data_identity, _load_full_company_data, force_refresh)
 
         # Explicit Live SQL requested - real-time MISys SQL Server (no manual export)
         # Cloud: fetch from MISYS_LIVE_SQL_URL (on-prem bridge). Local: use misys_service directly.
         if data_source_param == 'live_sql':
-            live_err = "Live SQL unavailable"
-            full_data = None
-            bridge_url = os.environ.get('MISYS_LIVE_SQL_URL', '').strip()
-            if bridge_url:
-                try:
-                    r = requests.get(f"{bridge_url.rstrip('/')}/api/data", timeout=120)
-                    if r.ok:
-                        j = r.json()
-                        full_data = j.get('data')
+            def _load_live_sql():
+                live_err = "Live SQL unavailable"
+                full_data = None
+                bridge_url = os.environ.get('MISYS_LIVE_SQL_URL', '').strip()
+                if bridge_url:
+                    try:
+                        r = requests.get(f"{bridge_url.rstrip('/')}/api/data", timeout=120)
+                        if r.ok:
+                            j = r.json()
+                            full_data = j.get('data')
+                            if full_data is not None:
+                                full_data = _merge_portal_store(full_data)
+                                file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
+                                return full_data, {
+                                    "folderInfo": j.get("folderInfo", {"folderName": "MISys Live SQL", "syncDate": datetime.now().isoformat(), "folder": "192.168.1.11/CANOILCA", "fileCount": file_count}),
+                                    "LoadTimestamp": datetime.now().isoformat(),
+                                    "source": "live_sql",
+                                    "fullCompanyDataReady": True,
+                                }
+                        else:
+                            live_err = f"Bridge returned {r.status_code}: {r.text[:200]}"
+                    except Exception as e:
+                        live_err = f"Bridge fetch failed: {e}"
+                if full_data is None:
+                    try:
+                        import misys_service
+                    except ImportError:
+                        try:
+                            from . import misys_service
+                        except ImportError:
+                            misys_service = None
+                    if misys_service and getattr(misys_service, 'PYMSSQL_AVAILABLE', False):
+                        full_data, live_err = misys_service.load_all_data()
                         if full_data is not None:
                             full_data = _merge_portal_store(full_data)
                             file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
-                            return jsonify({
-                                "data": full_data,
-                                "folderInfo": j.get("folderInfo", {"folderName": "MISys Live SQL", "syncDate": datetime.now().isoformat(), "folder": "192.168.1.11/CANOILCA", "fileCount": file_count}),
+                            return full_data, {
+                                "folderInfo": {
+                                    "folderName": "MISys Live SQL",
+                                    "syncDate": datetime.now().isoformat(),
+                                    "lastModified": datetime.now().isoformat(),
+                                    "folder": "192.168.1.11/CANOILCA",
+                                    "created": datetime.now().isoformat(),
+                                    "size": "N/A",
+                                    "fileCount": file_count,
+                                },
                                 "LoadTimestamp": datetime.now().isoformat(),
                                 "source": "live_sql",
                                 "fullCompanyDataReady": True,
-                            })
-                    else:
-                        live_err = f"Bridge returned {r.status_code}: {r.text[:200]}"
-                except Exception as e:
-                    live_err = f"Bridge fetch failed: {e}"
-            if full_data is None:
-                try:
-                    import misys_service
-                except ImportError:
-                    try:
-                        from . import misys_service
-                    except ImportError:
-                        misys_service = None
-                if misys_service and getattr(misys_service, 'PYMSSQL_AVAILABLE', False):
-                    full_data, live_err = misys_service.load_all_data()
-                    if full_data is not None:
-                        full_data = _merge_portal_store(full_data)
-                        file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
-                        return jsonify({
-                            "data": full_data,
-                            "folderInfo": {
-                                "folderName": "MISys Live SQL",
-                                "syncDate": datetime.now().isoformat(),
-                                "lastModified": datetime.now().isoformat(),
-                                "folder": "192.168.1.11/CANOILCA",
-                                "created": datetime.now().isoformat(),
-                                "size": "N/A",
-                                "fileCount": file_count,
-                            },
-                            "LoadTimestamp": datetime.now().isoformat(),
-                            "source": "live_sql",
-                            "fullCompanyDataReady": True,
-                        })
-            empty_data = get_empty_app_data_structure()
-            return jsonify({
-                "data": empty_data,
-                "folderInfo": {
-                    "folderName": "MISys Live SQL",
-                    "syncDate": datetime.now().isoformat(),
-                    "lastModified": datetime.now().isoformat(),
-                    "folder": "192.168.1.11/CANOILCA",
-                    "created": datetime.now().isoformat(),
-                    "size": "0",
-                    "fileCount": 0,
-                },
-                "LoadTimestamp": datetime.now().isoformat(),
-                "source": "live_sql (unavailable)",
-                "fullCompanyDataReady": False,
-                "message": live_err,
-            })
+                            }
+                empty_data = get_empty_app_data_structure()
+                return jsonify({
+                    "data": empty_data,
+                    "folderInfo": {
+                        "folderName": "MISys Live SQL",
+                        "syncDate": datetime.now().isoformat(),
+                        "lastModified": datetime.now().isoformat(),
+                        "folder": "192.168.1.11/CANOILCA",
+                        "created": datetime.now().isoformat(),
+                        "size": "0",
+                        "fileCount": 0,
+                    },
+                    "LoadTimestamp": datetime.now().isoformat(),
+                    "source": "live_sql (unavailable)",
+                    "fullCompanyDataReady": False,
+                    "message": live_err,
+                })
+            return _serve_data('live_sql', _live_sql_identity, _load_live_sql, force_refresh)
         
         # Default load (no ?source or any other value): prefer Full Company Data when available so MISys export "just works"
         if data_source_param != 'default':
@@ -2535,95 +2675,64 @@ def get_all_data():
                     "source": "empty (SKIP_GOOGLE_DRIVE=1)",
                     "fullCompanyDataReady": False,
                 })
-            full_data = None
-            err_msg = None
-            folder_name_used = "Full Company Data"
-            if IS_CLOUD_ENVIRONMENT:
-                print("📂 Full Company Data: loading via Google Drive API (cloud — no local path)")
-            else:
-                fcd_path, fcd_name = get_latest_full_company_data_folder()
-                print(f"📂 Full Company Data: trying local path first (resolved={fcd_path is not None})")
-            try:
-                from full_company_data_converter import load_from_folder, load_from_drive_api
-            except (ImportError, ValueError, OSError):
+            def _load_default_full_company_data():
+                full_data = None
+                err_msg = None
+                folder_name_used = "Full Company Data"
+                if IS_CLOUD_ENVIRONMENT:
+                    print("📂 Full Company Data: loading via Google Drive API (cloud — no local path)")
+                else:
+                    fcd_path, fcd_name = get_latest_full_company_data_folder()
+                    print(f"📂 Full Company Data: trying local path first (resolved={fcd_path is not None})")
                 try:
-                    from .full_company_data_converter import load_from_folder, load_from_drive_api
+                    from full_company_data_converter import load_from_folder, load_from_drive_api
                 except (ImportError, ValueError, OSError):
-                    load_from_folder = load_from_drive_api = None
-            if load_from_folder and not IS_CLOUD_ENVIRONMENT:
-                fcd_path, fcd_name = get_latest_full_company_data_folder()
-                if fcd_path and os.path.exists(fcd_path):
                     try:
-                        full_data, err_msg = load_from_folder(fcd_path)
-                        folder_name_used = fcd_name or folder_name_used
-                    except Exception as e:
-                        print(f"📂 Full Company Data load_from_folder exception: {e}")
-                        full_data, err_msg = None, str(e)
-                    print(f"📂 Full Company Data load_from_folder: full_data={'present' if full_data else None}, err_msg={err_msg!r}")
-                    if full_data:
-                        cnt = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
-                        print(f"📂 Full Company Data: {cnt} non-empty lists")
-            else:
-                if not load_from_folder:
-                    print("📂 Full Company Data: skipped (converter import failed)")
-                elif IS_CLOUD_ENVIRONMENT:
-                    print("📂 Full Company Data: using Drive API (cloud deployment)")
+                        from .full_company_data_converter import load_from_folder, load_from_drive_api
+                    except (ImportError, ValueError, OSError):
+                        load_from_folder = load_from_drive_api = None
+                if load_from_folder and not IS_CLOUD_ENVIRONMENT:
+                    fcd_path, fcd_name = get_latest_full_company_data_folder()
+                    if fcd_path and os.path.exists(fcd_path):
+                        try:
+                            full_data, err_msg = load_from_folder(fcd_path)
+                            folder_name_used = fcd_name or folder_name_used
+                        except Exception as e:
+                            print(f"📂 Full Company Data load_from_folder exception: {e}")
+                            full_data, err_msg = None, str(e)
+                        print(f"📂 Full Company Data load_from_folder: full_data={'present' if full_data else None}, err_msg={err_msg!r}")
+                        if full_data:
+                            cnt = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
+                            print(f"📂 Full Company Data: {cnt} non-empty lists")
                 else:
-                    fcd_path, _ = get_latest_full_company_data_folder()
-                    if not fcd_path or not os.path.exists(fcd_path):
-                        print(f"📂 Full Company Data: local folder not found, will try Drive API")
-            if full_data is None and load_from_drive_api:
-                gdrive_service = get_google_drive_service()
-                drive_id = gdrive_service.find_shared_drive("IT_Automation") if gdrive_service else None
-                if drive_id and gdrive_service and getattr(gdrive_service, "authenticated", False):
-                    folder_id, fcd_name, _ = gdrive_service.find_latest_full_company_data_folder()
-                    if folder_id:
-                        full_data, err_msg = load_from_drive_api(gdrive_service, drive_id, folder_id=folder_id)
-                        folder_name_used = fcd_name or folder_name_used
+                    if not load_from_folder:
+                        print("📂 Full Company Data: skipped (converter import failed)")
+                    elif IS_CLOUD_ENVIRONMENT:
+                        print("📂 Full Company Data: using Drive API (cloud deployment)")
                     else:
-                        err_msg = "No Full Company Data subfolder found"
-                    print(f"📂 Full Company Data load_from_drive_api: full_data={'present' if full_data else None}, err_msg={err_msg!r}")
-                else:
-                    print("📂 Full Company Data: Drive API not available or not authenticated")
-            if full_data is not None:
-                has_any = any(isinstance(v, list) and len(v) > 0 for v in full_data.values())
-                if has_any:
-                    full_data = _merge_portal_store(full_data)
-                    file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
-                    print(f"✅ Using Full Company Data (MISys export) – {file_count} files with data")
-                    return jsonify({
-                        "data": full_data,
-                        "folderInfo": {
-                            "folderName": folder_name_used,
-                            "syncDate": datetime.now().isoformat(),
-                            "lastModified": datetime.now().isoformat(),
-                            "folder": FULL_COMPANY_DATA_DRIVE_PATH,
-                            "created": datetime.now().isoformat(),
-                            "size": "N/A",
-                            "fileCount": file_count,
-                        },
-                        "LoadTimestamp": datetime.now().isoformat(),
-                        "cached": False,
-                        "source": "full_company_data",
-                        "fullCompanyDataReady": True,
-                    })
-                else:
-                    print("📂 Full Company Data: converter returned data but all lists empty (check file names: need MIITEM.csv, Item.csv, MIBOMD.csv, MIPOH.csv, etc.)")
-            if full_data is None and not IS_CLOUD_ENVIRONMENT:
-                fcd_path, fcd_name = get_latest_full_company_data_folder()
-                if fcd_path and os.path.exists(fcd_path):
-                    print("📂 Full Company Data: trying CSV-only loader (no pandas)...")
-                    full_data, err_msg = _load_full_company_data_csv_only(fcd_path)
-                    if full_data:
-                        folder_name_used = fcd_name or folder_name_used
-                if full_data:
+                        fcd_path, _ = get_latest_full_company_data_folder()
+                        if not fcd_path or not os.path.exists(fcd_path):
+                            print(f"📂 Full Company Data: local folder not found, will try Drive API")
+                if full_data is None and load_from_drive_api:
+                    gdrive_service = get_google_drive_service()
+                    drive_id = gdrive_service.find_shared_drive("IT_Automation") if gdrive_service else None
+                    if drive_id and gdrive_service and getattr(gdrive_service, "authenticated", False):
+                        folder_id, fcd_name, _ = gdrive_service.find_latest_full_company_data_folder()
+                        if folder_id:
+                            full_data, err_msg = load_from_drive_api(gdrive_service, drive_id, folder_id=folder_id)
+                            folder_name_used = fcd_name or folder_name_used
+                        else:
+                            err_msg = "No Full Company Data subfolder found"
+                        print(f"📂 Full Company Data load_from_drive_api: full_data={'present' if full_data else None}, err_msg={err_msg!r}")
+                    else:
+                        print("📂 Full Company Data: Drive API not available or not authenticated")
+                if full_data is not None:
                     has_any = any(isinstance(v, list) and len(v) > 0 for v in full_data.values())
                     if has_any:
                         full_data = _merge_portal_store(full_data)
                         file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
-                        print(f"✅ Using Full Company Data (CSV-only) – {file_count} files with data")
-                        return jsonify({
-                            "data": full_data,
+                        print(f"✅ Using Full Company Data (MISys export) – {file_count} files with data")
+                        return full_data, {
                             "folderInfo": {
                                 "folderName": folder_name_used,
                                 "syncDate": datetime.now().isoformat(),
@@ -2637,273 +2746,271 @@ def get_all_data():
                             "cached": False,
                             "source": "full_company_data",
                             "fullCompanyDataReady": True,
-                        })
-            if full_data is None:
-                print("📂 Full Company Data: not loaded. Falling back to API Extractions.")
-        
-        # Check if we have valid cached response (pre-serialized)
-        # ?refresh=true bypasses cache — used when user explicitly clicks Sync to get latest data
-        force_refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
-        if force_refresh:
-            print("🔄 Force refresh requested — clearing cache to load latest data from disk...")
-            _cache_timestamp = None
-            _response_cache = None
-            _data_cache = None
-        if _response_cache and _cache_timestamp:
-            cache_age = time.time() - _cache_timestamp
-            print(f"SEARCH: Cache check: age={cache_age:.1f}s, duration={_cache_duration}s, valid={cache_age < _cache_duration}")
-            if cache_age < _cache_duration:
-                print("SUCCESS: Returning PRE-SERIALIZED cached response (instant!)")
-                # Return pre-serialized response directly - no jsonify() overhead
-                from flask import Response
-                return Response(_response_cache, mimetype='application/json')
-        
-        print("RETRY: Cache expired or missing, loading fresh data...")
-        
-        # Check if G: Drive is accessible
-        if not os.path.exists(GDRIVE_BASE):
-            print(f"ERROR: G: Drive not accessible at: {GDRIVE_BASE}")
-            
-            # Try to use Google Drive API as fallback (lazy initialization)
-            gdrive_service = get_google_drive_service()
-            if gdrive_service and gdrive_service.authenticated:
-                print("🔄 G: Drive not accessible, falling back to Google Drive API...")
-                try:
-                    gdrive_data, gdrive_folder_info = gdrive_service.get_all_data()
-                    if gdrive_data and gdrive_folder_info:
-                        print(f"✅ Successfully loaded data from Google Drive API")
-                        gdrive_data = _merge_portal_store(gdrive_data)
-                        # Cache the data AND pre-serialize the response
-                        import json as json_module
-                        _data_cache = gdrive_data
-                        _cache_timestamp = time.time()
-                        
-                        # Pre-serialize the response to avoid 35s jsonify overhead on cache hits
-                        response_dict = {
-                            "data": gdrive_data,
-                            "folderInfo": gdrive_folder_info,
-                            "LoadTimestamp": datetime.now().isoformat(),
-                            "cached": False,
-                            "source": "Google Drive API"
                         }
-                        _response_cache = json_module.dumps(response_dict)
-                        print(f"💾 Data + Response cached for {_cache_duration} seconds (pre-serialized: {len(_response_cache)/1024/1024:.1f}MB)")
-                        
-                        from flask import Response
-                        return Response(_response_cache, mimetype='application/json')
                     else:
-                        print("⚠️ Google Drive API returned empty data")
-                except Exception as e:
-                    print(f"❌ Error loading data from Google Drive API: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-            # If Google Drive API also failed or not available, return empty data structure
-            print("⚠️ Both G: Drive and Google Drive API unavailable - returning empty data")
-            empty_data = get_empty_app_data_structure()
-            empty_data['ScanMethod'] = 'No G: Drive Access'
-            return jsonify({
-                "data": empty_data,
-                "folderInfo": {
-                    "folderName": "No G: Drive Access",
-                    "syncDate": datetime.now().isoformat(),
-                    "lastModified": datetime.now().isoformat(),
-                    "folder": "Not Connected",
-                    "created": datetime.now().isoformat(),
-                    "size": "0",
-                    "fileCount": 0
-                },
-                "LoadTimestamp": datetime.now().isoformat(),
-                "warning": "G: Drive not accessible - returning empty data",
-                "source": "None (G: Drive not accessible)"
-            })
-        
-        latest_folder, error = get_latest_folder()
-        if error:
-            print(f"ERROR: Error getting latest folder: {error}")
-            return jsonify({"error": error}), 500
+                        print("📂 Full Company Data: converter returned data but all lists empty (check file names: need MIITEM.csv, Item.csv, MIBOMD.csv, MIPOH.csv, etc.)")
+                if full_data is None and not IS_CLOUD_ENVIRONMENT:
+                    fcd_path, fcd_name = get_latest_full_company_data_folder()
+                    if fcd_path and os.path.exists(fcd_path):
+                        print("📂 Full Company Data: trying CSV-only loader (no pandas)...")
+                        full_data, err_msg = _load_full_company_data_csv_only(fcd_path)
+                        if full_data:
+                            folder_name_used = fcd_name or folder_name_used
+                    if full_data:
+                        has_any = any(isinstance(v, list) and len(v) > 0 for v in full_data.values())
+                        if has_any:
+                            full_data = _merge_portal_store(full_data)
+                            file_count = sum(1 for v in full_data.values() if isinstance(v, list) and len(v) > 0)
+                            print(f"✅ Using Full Company Data (CSV-only) – {file_count} files with data")
+                            return full_data, {
+                                "folderInfo": {
+                                    "folderName": folder_name_used,
+                                    "syncDate": datetime.now().isoformat(),
+                                    "lastModified": datetime.now().isoformat(),
+                                    "folder": FULL_COMPANY_DATA_DRIVE_PATH,
+                                    "created": datetime.now().isoformat(),
+                                    "size": "N/A",
+                                    "fileCount": file_count,
+                                },
+                                "LoadTimestamp": datetime.now().isoformat(),
+                                "cached": False,
+                                "source": "full_company_data",
+                                "fullCompanyDataReady": True,
+                            }
+                if full_data is None:
+                    print("📂 Full Company Data: not loaded. Falling back to API Extractions.")
+                return None
+            # Own source key: the explicit ?source=full_company_data loader has no CSV-only or API Extractions fallback
+            result = _serve_data('default_full_company_data', _full_company_data_identity, _load_default_full_company_data,
+                                 force_refresh)
+            if result is not None:
+                return result
         
-        folder_path = os.path.join(GDRIVE_BASE, latest_folder)
-        print(f"📂 Loading data from folder: {folder_path}")
+        def _load_api_extractions():
+            # Check if G: Drive is accessible
+            if not os.path.exists(GDRIVE_BASE):
+                print(f"ERROR: G: Drive not accessible at: {GDRIVE_BASE}")
+            
+                # Try to use Google Drive API as fallback (lazy initialization)
+                gdrive_service = get_google_drive_service()
+                if gdrive_service and gdrive_service.authenticated:
+                    print("🔄 G: Drive not accessible, falling back to Google Drive API...")
+                    try:
+                        gdrive_data, gdrive_folder_info = gdrive_service.get_all_data()
+                        if gdrive_data and gdrive_folder_info:
+                            print(f"✅ Successfully loaded data from Google Drive API")
+                            gdrive_data = _merge_portal_store(gdrive_data)
+                            # Cached, pre-serialized and pre-compressed by _serve_data
+                            return gdrive_data, {
+                                "folderInfo": gdrive_folder_info,
+                                "LoadTimestamp": datetime.now().isoformat(),
+                                "cached": False,
+                                "source": "Google Drive API"
+                            }
+                        else:
+                            print("⚠️ Google Drive API returned empty data")
+                    except Exception as e:
+                        print(f"❌ Error loading data from Google Drive API: {e}")
+                        import traceback
+                        traceback.print_exc()
+            
+                # If Google Drive API also failed or not available, return empty data structure
+                print("⚠️ Both G: Drive and Google Drive API unavailable - returning empty data")
+                empty_data = get_empty_app_data_structure()
+                empty_data['ScanMethod'] = 'No G: Drive Access'
+                return jsonify({
+                    "data": empty_data,
+                    "folderInfo": {
+                        "folderName": "No G: Drive Access",
+                        "syncDate": datetime.now().isoformat(),
+                        "lastModified": datetime.now().isoformat(),
+                        "folder": "Not Connected",
+                        "created": datetime.now().isoformat(),
+                        "size": "0",
+                        "fileCount": 0
+                    },
+                    "LoadTimestamp": datetime.now().isoformat(),
+                    "warning": "G: Drive not accessible - returning empty data",
+                    "source": "None (G: Drive not accessible)"
+                })
         
-        # FAST LOADING - Only load essential files first for speed
-        raw_data = {}
+            latest_folder, error = get_latest_folder()
+            if error:
+                print(f"ERROR: Error getting latest folder: {error}")
+                return jsonify({"error": error}), 500
         
-        # Essential files for proper data loading - 10 critical files
-        essential_files = [
-            "Items.json",  # Full Company Data: item master from MIITEM.CSV
-            "MIILOC.json",        # Inventory location data
-            "SalesOrderHeaders.json",  # Sales orders
-            "SalesOrderDetails.json",  # Sales order details
-            "ManufacturingOrderHeaders.json",  # Manufacturing orders
-            "ManufacturingOrderDetails.json",  # Manufacturing order details
-            "BillsOfMaterial.json",  # BOM data
-            "BillOfMaterialDetails.json",  # BOM details
-            "PurchaseOrders.json",  # Purchase orders
-            "PurchaseOrderDetails.json"  # Purchase order details
-        ]
+            folder_path = os.path.join(GDRIVE_BASE, latest_folder)
+            print(f"📂 Loading data from folder: {folder_path}")
+        
+            # FAST LOADING - Only load essential files first for speed
+            raw_data = {}
+        
+            # Essential files for proper data loading - 10 critical files
+            essential_files = [
+                "Items.json",  # Full Company Data: item master from MIITEM.CSV
+                "MIILOC.json",        # Inventory location data
+                "SalesOrderHeaders.json",  # Sales orders
+                "SalesOrderDetails.json",  # Sales order details
+                "ManufacturingOrderHeaders.json",  # Manufacturing orders
+                "ManufacturingOrderDetails.json",  # Manufacturing order details
+                "BillsOfMaterial.json",  # BOM data
+                "BillOfMaterialDetails.json",  # BOM details
+                "PurchaseOrders.json",  # Purchase orders
+                "PurchaseOrderDetails.json"  # Purchase order details
+            ]
         
-        print(f"⚡ LOADING: Loading G: Drive data...")
+            print(f"⚡ LOADING: Loading G: Drive data...")
         
-        # Load only essential files first (optimized - minimal logging for speed)
-        for file_name in essential_files:
-            file_path = os.path.join(folder_path, file_name)
-            file_data = load_json_file(file_path)
-            raw_data[file_name] = file_data
-            if file_data:
-                print(f"✅ {file_name}: {len(file_data) if isinstance(file_data, list) else 1} records")
-        
-        # Optional files: load from folder when present (so item modal, BOM Where Used, Work Orders, PO costs get real data for testing)
-        optional_files = [
-            'Items.json', 'MIITEM.json', 'MIBOMH.json', 'MIBOMD.json',
-            'ManufacturingOrderRoutings.json', 'MIMOH.json', 'MIMOMD.json', 'MIMORD.json',
-            'Jobs.json', 'JobDetails.json', 'MIJOBH.json', 'MIJOBD.json',
-            'MIPOH.json', 'MIPOD.json', 'MIPOHX.json', 'MIPOC.json', 'MIPOCV.json',
-            'MIPODC.json', 'MIWOH.json', 'MIWOD.json', 'MIBORD.json',
-            'PurchaseOrderExtensions.json', 'WorkOrders.json', 'WorkOrderDetails.json',
-            'PurchaseOrderAdditionalCosts.json', 'PurchaseOrderAdditionalCostsTaxes.json',
-            'PurchaseOrderDetailAdditionalCosts.json'
-        ]
-        for file_name in optional_files:
-            file_path = os.path.join(folder_path, file_name)
-            file_data = load_json_file(file_path)
-            raw_data[file_name] = file_data if isinstance(file_data, list) else ([] if file_data is None else [])
-            if file_data and isinstance(file_data, list) and len(file_data) > 0:
-                print(f"✅ {file_name}: {len(file_data)} records")
-        
-        loaded_count = len([k for k, v in raw_data.items() if isinstance(v, list) and len(v) > 0])
-        print(f"⚡ Loaded {loaded_count} files with data")
-        
-        # Use data AS-IS - no conversion needed!
-        
-        # Get folder info
-        folder_info = {
-            "folderName": latest_folder,
-            "syncDate": datetime.fromtimestamp(os.path.getmtime(folder_path)).isoformat(),
-            "lastModified": datetime.fromtimestamp(os.path.getmtime(folder_path)).isoformat(),
-            "folder": folder_path,
-            "created": datetime.fromtimestamp(os.path.getctime(folder_path)).isoformat(),
-            "size": "G: Drive",
-            "fileCount": len([f for f in raw_data.keys() if f.endswith('.json')])
-        }
+            # Load only essential files first (optimized - minimal logging for speed)
+            for file_name in essential_files:
+                file_path = os.path.join(folder_path, file_name)
+                file_data = load_json_file(file_path)
+                raw_data[file_name] = file_data
+                if file_data:
+                    print(f"✅ {file_name}: {len(file_data) if isinstance(file_data, list) else 1} records")
+        
+            # Optional files: load from folder when present (so item modal, BOM Where Used, Work Orders, PO costs get real data for testing)
+            optional_files = [
+                'Items.json', 'MIITEM.json', 'MIBOMH.json', 'MIBOMD.json',
+                'ManufacturingOrderRoutings.json', 'MIMOH.json', 'MIMOMD.json', 'MIMORD.json',
+                'Jobs.json', 'JobDetails.json', 'MIJOBH.json', 'MIJOBD.json',
+                'MIPOH.json', 'MIPOD.json', 'MIPOHX.json', 'MIPOC.json', 'MIPOCV.json',
+                'MIPODC.json', 'MIWOH.json', 'MIWOD.json', 'MIBORD.json',
+                'PurchaseOrderExtensions.json', 'WorkOrders.json', 'WorkOrderDetails.json',
+                'PurchaseOrderAdditionalCosts.json', 'PurchaseOrderAdditionalCostsTaxes.json',
+                'PurchaseOrderDetailAdditionalCosts.json'
+            ]
+            for file_name in optional_files:
+                file_path = os.path.join(folder_path, file_name)
+                file_data = load_json_file(file_path)
+                raw_data[file_name] = file_data if isinstance(file_data, list) else ([] if file_data is None else [])
+                if file_data and isinstance(file_data, list) and len(file_data) > 0:
+                    print(f"✅ {file_name}: {len(file_data)} records")
+        
+            loaded_count = len([k for k, v in raw_data.items() if isinstance(v, list) and len(v) > 0])
+            print(f"⚡ Loaded {loaded_count} files with data")
+        
+            # Use data AS-IS - no conversion needed!
+        
+            # Get folder info
+            folder_info = {
+                "folderName": latest_folder,
+                "syncDate": datetime.fromtimestamp(os.path.getmtime(folder_path)).isoformat(),
+                "lastModified": datetime.fromtimestamp(os.path.getmtime(folder_path)).isoformat(),
+                "folder": folder_path,
+                "created": datetime.fromtimestamp(os.path.getctime(folder_path)).isoformat(),
+                "size": "G: Drive",
+                "fileCount": len([f for f in raw_data.keys() if f.endswith('.json')])
+            }
         
-        # Load Sales Orders data - ULTRA-FAST OPTIMIZED
-        print("Loading Sales Orders - Performance Optimized...")
-        try:
-            from so_performance_optimizer import get_optimized_so_data, get_so_performance_stats
+            # Load Sales Orders data - ULTRA-FAST OPTIMIZED
+            print("Loading Sales Orders - Performance Optimized...")
             try:
-                from so_background_refresh import start_so_background_refresh, get_so_refresh_status
-                # Start background refresh service if not already running
+                from so_performance_optimizer import get_optimized_so_data, get_so_performance_stats
                 try:
-                    start_so_background_refresh()
+                    from so_background_refresh import start_so_background_refresh, get_so_refresh_status
+                    # Start background refresh service if not already running
+                    try:
+                        start_so_background_refresh()
+                    except Exception as bg_error:
+                        print(f"⚠️ Background refresh service not available: {bg_error}")
+                except ImportError as import_error:
+                    print(f"⚠️ so_background_refresh module not available: {import_error}")
                 except Exception as bg_error:
-                    print(f"⚠️ Background refresh service not available: {bg_error}")
-            except ImportError as import_error:
-                print(f"⚠️ so_background_refresh module not available: {import_error}")
-            except Exception as bg_error:
-                print(f"⚠️ Background refresh service error: {bg_error}")
+                    print(f"⚠️ Background refresh service error: {bg_error}")
             
             
-            sales_orders_data = get_optimized_so_data()
-            if sales_orders_data:
-                raw_data.update(sales_orders_data)
-                load_time = sales_orders_data.get('LoadTime', 0)
-                total_orders = sales_orders_data.get('TotalOrders', 0)
-                load_method = sales_orders_data.get('LoadMethod', 'Unknown')
-                print(f"⚡ SO LOAD: {total_orders} orders in {load_time:.3f}s ({load_method})")
+                sales_orders_data = get_optimized_so_data()
+                if sales_orders_data:
+                    raw_data.update(sales_orders_data)
+                    load_time = sales_orders_data.get('LoadTime', 0)
+                    total_orders = sales_orders_data.get('TotalOrders', 0)
+                    load_method = sales_orders_data.get('LoadMethod', 'Unknown')
+                    print(f"⚡ SO LOAD: {total_orders} orders in {load_time:.3f}s ({load_method})")
                 
-                # Add performance stats to response
-                perf_stats = get_so_performance_stats()
-                raw_data['SOPerformanceStats'] = perf_stats
+                    # Add performance stats to response
+                    perf_stats = get_so_performance_stats()
+                    raw_data['SOPerformanceStats'] = perf_stats
                 
-                # Add background refresh status
-                try:
-                    refresh_status = get_so_refresh_status()
-                    raw_data['SOBackgroundRefresh'] = refresh_status
-                except:
-                    pass
-        except Exception as e:
-            print(f"⚠️ SO Optimizer not available, falling back to standard loader: {e}")
-            # Fallback to original method
-            sales_orders_data = load_sales_orders()
-            if sales_orders_data:
-                raw_data.update(sales_orders_data)
-                print(f"SUCCESS: Added {sales_orders_data.get('TotalOrders', 0)} sales orders to data")
-        
-        # Load cached parsed SO data for instant lookups
-        print("RETRY: Loading cached parsed SO data...")
-        cached_so_data = load_cached_so_data()
-        if cached_so_data:
-            raw_data.update(cached_so_data)
-            print(f"SUCCESS: Added {len(cached_so_data.get('ParsedSalesOrders.json', []))} parsed SOs to data")
+                    # Add background refresh status
+                    try:
+                        refresh_status = get_so_refresh_status()
+                        raw_data['SOBackgroundRefresh'] = refresh_status
+                    except:
+                        pass
+            except Exception as e:
+                print(f"⚠️ SO Optimizer not available, falling back to standard loader: {e}")
+                # Fallback to original method
+                sales_orders_data = load_sales_orders()
+                if sales_orders_data:
+                    raw_data.update(sales_orders_data)
+                    print(f"SUCCESS: Added {sales_orders_data.get('TotalOrders', 0)} sales orders to data")
+        
+            # Load cached parsed SO data for instant lookups
+            print("RETRY: Loading cached parsed SO data...")
+            cached_so_data = load_cached_so_data()
+            if cached_so_data:
+                raw_data.update(cached_so_data)
+                print(f"SUCCESS: Added {len(cached_so_data.get('ParsedSalesOrders.json', []))} parsed SOs to data")
+        
+            # Enterprise SO Service integration (lazy import to avoid circular dependency)
+            try:
+                # Use importlib to avoid circular import issues
+                import importlib
+                enterprise_so_module = importlib.import_module('enterprise_so_service')
+                get_so_service_health = getattr(enterprise_so_module, 'get_so_service_health', None)
+                if get_so_service_health:
+                    so_health = get_so_service_health()
+                    raw_data['SOServiceHealth'] = so_health
+                    print(f"SUCCESS: SO Service Health: {so_health['status']} - {so_health['total_sos']} SOs cached")
+                else:
+                    print("⚠️ Enterprise SO Service function not found")
+            except ImportError as import_error:
+                print(f"⚠️ Enterprise SO Service module not available: {import_error}")
+            except Exception as e:
+                print(f"⚠️ Enterprise SO Service error: {e}")
         
-        # Enterprise SO Service integration (lazy import to avoid circular dependency)
-        try:
-            # Use importlib to avoid circular import issues
-            import importlib
-            enterprise_so_module = importlib.import_module('enterprise_so_service')
-            get_so_service_health = getattr(enterprise_so_module, 'get_so_service_health', None)
-            if get_so_service_health:
-                so_health = get_so_service_health()
-                raw_data['SOServiceHealth'] = so_health
-                print(f"SUCCESS: SO Service Health: {so_health['status']} - {so_health['total_sos']} SOs cached")
-            else:
-                print("⚠️ Enterprise SO Service function not found")
-        except ImportError as import_error:
-            print(f"⚠️ Enterprise SO Service module not available: {import_error}")
-        except Exception as e:
-            print(f"⚠️ Enterprise SO Service error: {e}")
-        
-        # Load MPS (Master Production Schedule) data
-        print("RETRY: Loading MPS data...")
-        mps_data = load_mps_data()
-        if mps_data and 'error' not in mps_data:
-            raw_data['MPS.json'] = mps_data
-            print(f"SUCCESS: Added MPS data with {len(mps_data.get('mps_orders', []))} production orders")
-        else:
-            print(f"MPS data not available: {mps_data.get('error', 'Unknown error')}")
-            raw_data['MPS.json'] = {"mps_orders": [], "summary": {"total_orders": 0}}
-        
-        print(f"SUCCESS: Successfully loaded data from {latest_folder}")
-        # Supplement empty keys (MIILOCQT, MILOGH, MIICST, MISUPL, etc.) from Full Company Data
-        raw_data = _supplement_from_full_company_data(raw_data)
-        raw_data = _merge_portal_store(raw_data)
-        
-        # SAFE DATA SUMMARY - Only process list data types
-        safe_summary = []
-        for k, v in raw_data.items():
-            if isinstance(v, list):
-                safe_summary.append(f'{k}: {len(v)} records')
-            elif isinstance(v, (str, int, float, bool)):
-                safe_summary.append(f'{k}: {type(v).__name__} value')
+            # Load MPS (Master Production Schedule) data
+            print("RETRY: Loading MPS data...")
+            mps_data = load_mps_data()
+            if mps_data and 'error' not in mps_data:
+                raw_data['MPS.json'] = mps_data
+                print(f"SUCCESS: Added MPS data with {len(mps_data.get('mps_orders', []))} production orders")
             else:
-                safe_summary.append(f'{k}: {type(v).__name__}')
-        
-        print(f"📊 Data summary: {safe_summary}")
-        
-        # Cache the data AND pre-serialize the response for future requests
-        _data_cache = raw_data
-        _cache_timestamp = time.time()
+                print(f"MPS data not available: {mps_data.get('error', 'Unknown error')}")
+                raw_data['MPS.json'] = {"mps_orders": [], "summary": {"total_orders": 0}}
+        
+            print(f"SUCCESS: Successfully loaded data from {latest_folder}")
+            # Supplement empty keys (MIILOCQT, MILOGH, MIICST, MISUPL, etc.) from Full Company Data
+            raw_data = _supplement_from_full_company_data(raw_data)
+            raw_data = _merge_portal_store(raw_data)
+        
+            # SAFE DATA SUMMARY - Only process list data types
+            safe_summary = []
+            for k, v in raw_data.items():
+                if isinstance(v, list):
+                    safe_summary.append(f'{k}: {len(v)} records')
+                elif isinstance(v, (str, int, float, bool)):
+                    safe_summary.append(f'{k}: {type(v).__name__} value')
+                else:
+                    safe_summary.append(f'{k}: {type(v).__name__}')
         
-        # Detect if running on Cloud Run (no G: Drive access) vs local (has G: Drive)
-        is_cloud_run = os.getenv('K_SERVICE') is not None
-        data_source = "Google Drive API" if is_cloud_run else "Local G: Drive"
+            print(f"📊 Data summary: {safe_summary}")
         
-        # Pre-serialize the response to avoid 35s jsonify overhead on cache hits
-        import json as json_module
-        response_dict = {
-            "data": raw_data,
-            "folderInfo": folder_info,
-            "LoadTimestamp": datetime.now().isoformat(),
-            "cached": False,
-            "source": data_source
-        }
-        _response_cache = json_module.dumps(response_dict)
-        print(f"💾 Data + Response cached for {_cache_duration} seconds (pre-serialized: {len(_response_cache)/1024/1024:.1f}MB)")
+            # Detect if running on Cloud Run (no G: Drive access) vs local (has G: Drive)
+            is_cloud_run = os.getenv('K_SERVICE') is not None
+            data_source = "Google Drive API" if is_cloud_run else "Local G: Drive"
         
-        from flask import Response
-        return Response(_response_cache, mimetype='application/json')
+            # Cached, pre-serialized and pre-compressed by _serve_data (avoids the 35s jsonify overhead on every hit)
+            return raw_data, {
+                "folderInfo": folder_info,
+                "LoadTimestamp": datetime.now().isoformat(),
+                "cached": False,
+                "source": data_source
+            }
         
+        return _serve_data('default', _api_extractions_identity, _load_api_extractions, force_refresh)
+
     except Exception as e:
         import traceback
         print(f"ERROR: Error in get_all_data: {e}")
@@ -2927,6 +3034,31 @@ def get_all_data():
             "message": str(e),
         })
 
+
+@app.route('/api/data/cache-stats', methods=['GET'])
+def get_data_cache_stats():
+    """Response cache hits / loads / shared (single-flight) loads and the cached version per source."""
+    return jsonify(_data_responses.stats())
+
+
+@app.route('/api/data/background-refresh/status', methods=['GET'])
+def get_data_background_refresh_status():
+    """Background refresh watcher: watched sources, last check/swap and cache stats."""
+    return jsonify(_data_refresher.get_status())
+
+
+@app.route('/api/data/background-refresh/check', methods=['POST'])
+def check_data_background_refresh():
+    """Ask the watcher to check all sources now (e.g. right after sync_to_gdrive wrote a new folder)."""
+    _data_refresher.check_now()
+    return jsonify({"status": "check_requested"})
+
+
+@app.route('/api/data/delta', methods=['GET'])
+def get_data_delta():
+    """Same sources/params as /api/data; with ?since=<version> returns only the tables changed since that version."""
+    return get_all_data()
+
 @app.route('/api/data-source', methods=['GET'])
 def get_data_source_status():
     """Framework: report which data source is in use and whether Full Company Data is available/ready."""
@@ -3863,16 +3995,15 @@ def report_sales():
         return jsonify({"error": str(e)}), 500
 
 
-# ── SO file index cache (avoids slow os.walk on every keystroke) ──────────────
+# ── SO file index cache (best revision per SO, rebuilt when so_file_index changes) ──
 _so_index_cache = {
     "entries": [],      # list of {so_number, file, status, full_path}
-    "built_at": 0,      # epoch seconds
-    "ttl": 300,         # refresh every 5 minutes
+    "version": None,    # so_file_index version the entries were built from
 }
 
 
 def _build_so_index():
-    """Scan the entire Sales Orders folder tree once and cache every SO PDF."""
+    """Best revision of every SO PDF in the shared Sales Orders file index."""
     entries = []
     best = {}
 
@@ -3880,40 +4011,17 @@ def _build_so_index():
         print(f"PROFORMA INDEX: Sales Orders path not found: {SALES_ORDERS_BASE}")
         return entries
 
-    print(f"PROFORMA INDEX: Building SO index from {SALES_ORDERS_BASE} ...")
     t0 = time.time()
+    for e in so_file_index.get_index().entries(extensions=('.pdf',)):
+        so_num = e["so_number"]
+        if not so_num:
+            continue
+        prev = best.get(so_num)
+        if prev is None or e["revision"] > prev["revision"]:
+            best[so_num] = e
 
-    for root, _dirs, files in os.walk(SALES_ORDERS_BASE):
-        for f in files:
-            if not f.lower().endswith('.pdf'):
-                continue
-            m = re.search(r'(?:salesorder|so)[_\s-]*(\d+)', f, re.IGNORECASE)
-            if not m:
-                continue
-
-            so_num = m.group(1)
-            rel = os.path.relpath(root, SALES_ORDERS_BASE).replace('\\', '/')
-            status = rel.split('/')[0] if rel != '.' else 'Root'
-
-            entry = {
-                "so_number": so_num,
-                "file": f,
-                "status": status,
-                "full_path": os.path.join(root, f),
-            }
-
-            prev = best.get(so_num)
-            if prev is None:
-                best[so_num] = entry
-            else:
-                rev_cur = re.search(r'_[Rr](\d+)', f)
-                rev_prev = re.search(r'_[Rr](\d+)', prev["file"])
-                cur_rev = int(rev_cur.group(1)) if rev_cur else 0
-                prev_rev = int(rev_prev.group(1)) if rev_prev else 0
-                if cur_rev > prev_rev:
-                    best[so_num] = entry
-
-    entries = sorted(best.values(),
+    entries = sorted(({"so_number": so_num, "file": e["name"], "status": e["status"], "full_path": e["path"]}
+                      for so_num, e in best.items()),
                      key=lambda e: int(e['so_number']) if e['so_number'].isdigit() else 0,
                      reverse=True)
 
@@ -3923,13 +4031,13 @@ def _build_so_index():
 
 
 def _get_so_index(force_refresh=False):
-    """Return the cached SO index, rebuilding if stale or empty."""
-    now = time.time()
-    if (force_refresh
-            or not _so_index_cache["entries"]
-            or (now - _so_index_cache["built_at"]) > _so_index_cache["ttl"]):
+    """Return the cached SO index, rebuilding when the file index changed (force_refresh re-checks the folders)."""
+    index = so_file_index.get_index()
+    if force_refresh:
+        index.refresh()
+    if not _so_index_cache["entries"] or _so_index_cache["version"] != index.version:
+        _so_index_cache["version"] = index.version
         _so_index_cache["entries"] = _build_so_index()
-        _so_index_cache["built_at"] = now
     return _so_index_cache["entries"]
 
 
@@ -3940,7 +4048,7 @@ def search_so_for_proforma():
     Query params:
       q       - search string (e.g. '312' or '3125')
       refresh - set to '1' to force re-scan of the folder
-    Works locally (cached os.walk) and on cloud (Google Drive API).
+    Works locally (shared SO file index) and on cloud (Google Drive API).
     """
     try:
         query = (request.args.get('q') or '').strip()
@@ -4010,6 +4118,96 @@ def search_so_for_proforma():
         return jsonify({"results": [], "error": str(e)})
 
 
+_so_parse_warmup = {"thread": None, "last": None}
+
+
+@app.route('/api/so-parse-cache', methods=['GET', 'POST'])
+def so_parse_cache_status():
+    """
+    GET: SO parse cache stats (entries per parser, current vs stale version, hits/misses).
+    POST: {"action": "warm", "directory": ..., "parser": "app"} parses a folder tree into the cache in the background
+    (default: the Sales Orders folder); {"action": "prune"} drops entries of old parser versions;
+    {"action": "invalidate", "so_number": ...} forces a re-parse of one SO.
+    """
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            action = (body.get('action') or 'warm').strip().lower()
+            if action == 'prune':
+                return jsonify({'ok': True, 'pruned': so_parse_cache.prune()})
+            if action == 'invalidate':
+                return jsonify({'ok': True, 'removed': so_parse_cache.invalidate(so_number=body.get('so_number'))})
+            directory = body.get('directory') or SALES_ORDERS_BASE
+            parser = body.get('parser') or 'app'
+            if parser not in so_parse_cache.PARSERS:
+                return jsonify({'error': f"Unknown parser '{parser}'"}), 400
+            if not os.path.isdir(directory):
+                return jsonify({'error': f'Directory not found: {directory}'}), 404
+            thread = _so_parse_warmup["thread"]
+            if thread is not None and thread.is_alive():
+                return jsonify({'ok': True, 'warm_up': 'already running'}), 202
+
+            def _warm():
+                _so_parse_warmup["last"] = so_parse_cache.warm_up(directory, parser)
+
+            thread = threading.Thread(target=_warm, daemon=True, name="so-parse-warmup")
+            _so_parse_warmup["thread"] = thread
+            thread.start()
+            return jsonify({'ok': True, 'warm_up': 'started', 'directory': directory, 'parser': parser}), 202
+        thread = _so_parse_warmup["thread"]
+        return jsonify({
+            **so_parse_cache.stats(),
+            'warm_up_running': bool(thread is not None and thread.is_alive()),
+            'last_warm_up': _so_parse_warmup["last"],
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/so-parse-cache/bulk', methods=['GET', 'POST'])
+def so_bulk_parse():
+    """
+    GET: progress of the current/last bulk SO parse (total, processed, parsed/cached/failed, failures).
+    POST: {"directory": ..., "parser": "app", "workers": N, "retry_failed": false} starts a bulk parse of every SO PDF
+    under directory (default: the Sales Orders folder) on a process pool; {"action": "stop"} stops it after the
+    files in flight. Resumes from the last checkpoint when the previous run did not finish.
+    """
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            if (body.get('action') or '').strip().lower() == 'stop':
+                return jsonify(so_bulk_parser.stop_background())
+            directory = body.get('directory') or SALES_ORDERS_BASE
+            parser = body.get('parser') or 'app'
+            if parser not in so_parse_cache.PARSERS:
+                return jsonify({'error': f"Unknown parser '{parser}'"}), 400
+            if not os.path.isdir(directory):
+                return jsonify({'error': f'Directory not found: {directory}'}), 404
+            status = so_bulk_parser.start_background(directory, parser, body.get('workers'),
+                                                     bool(body.get('retry_failed')))
+            return jsonify(status), 202
+        return jsonify(so_bulk_parser.get_status())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/so-file-index', methods=['GET', 'POST'])
+def so_file_index_status():
+    """
+    GET: state of the shared Sales Orders file index (folders, documents, last refresh, change feed).
+    POST: {"full": false} refreshes it now (full re-lists every folder instead of only changed ones).
+    """
+    try:
+        index = so_file_index.get_index()
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            refresh_stats = index.refresh(full=bool(body.get('full')))
+            return jsonify({**index.status(), 'refresh': refresh_stats})
+        return jsonify(index.status())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/proforma-invoice/parse-so/<so_number>', methods=['GET'])
 def parse_so_for_proforma(so_number):
     """Find an SO PDF by number, parse it, and return structured data for the Proforma Invoice form.
@@ -4047,12 +4245,10 @@ def parse_so_for_proforma(so_number):
                 so_file_path = cached_match["full_path"]
                 print(f"PROFORMA: Found in cache: {os.path.basename(so_file_path)}")
             else:
-                # Cache miss or file moved — do a targeted walk
-                matching_files = []
-                for root, dirs, files in os.walk(SALES_ORDERS_BASE):
-                    for f in files:
-                        if f.lower().endswith('.pdf') and (so_number in f):
-                            matching_files.append(os.path.join(root, f))
+                # Cache miss or file moved — re-check changed folders, then match by name in the file index
+                so_index = so_file_index.get_index()
+                so_index.refresh()
+                matching_files = [e["path"] for e in so_index.find(so_number, extensions=('.pdf',), substring=True)]
 
                 if matching_files:
                     matching_files.sort(key=_rev_priority_path, reverse=True)
@@ -4122,8 +4318,8 @@ def parse_so_for_proforma(so_number):
         if not so_file_path:
             return jsonify({"error": f"SO {so_number} PDF not found"}), 404
 
-        # Parse the PDF
-        so_data = parse_sales_order_pdf(so_file_path)
+        # Parse the PDF (cached by content: a previously parsed SO, even under another path, is not re-parsed)
+        so_data = so_parse_cache.parse(so_file_path, "app", parse_sales_order_pdf)
         if not so_data or (isinstance(so_data, dict) and so_data.get('status') == 'Error'):
             err_msg = so_data.get('error', 'Unknown parse error') if isinstance(so_data, dict) else 'Parser returned nothing'
             return jsonify({"error": f"Failed to parse SO {so_number}: {err_msg}"}), 500
@@ -4210,7 +4406,7 @@ def generate_proforma_invoice_endpoint():
 @app.route('/api/manufacturing-orders', methods=['POST'])
 def create_manufacturing_order():
     """Create a new manufacturing order. Persisted via portal_store (survives restart)."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         build_item_no = (body.get('build_item_no') or body.get('Build Item No.') or '').strip()
@@ -4263,7 +4459,7 @@ def create_manufacturing_order():
         if portal_store:
             portal_store.add_created_mo(mo_record)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         print(f"Created MO: {mo_no} Item={build_item_no} Qty={qty} Batch={batch_number or '(none)'} Lot={lot_number or '(none)'} SO={sales_order_no or '(none)'}")
         return jsonify(mo_record), 201
     except Exception as e:
@@ -4274,7 +4470,7 @@ def create_manufacturing_order():
 @app.route('/api/manufacturing-orders/<mo_no>/release', methods=['POST'])
 def release_manufacturing_order(mo_no):
     """D5: Release MO (status to released/in progress). Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         mo_no = (mo_no or '').strip()
         if not mo_no:
@@ -4290,34 +4486,21 @@ def release_manufacturing_order(mo_no):
             "ref": "manual",
         })
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "mo_no": mo_no, "status": 1, "release_date": now}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 def _get_bom_components_for_item(data, parent_item_no):
-    """Return list of (component_item_no, required_qty) for the given parent (build) item."""
-    out = []
-    for key in ("BillOfMaterialDetails.json", "MIBOMD.json"):
-        details = data.get(key) or []
-        for row in details:
-            if not isinstance(row, dict):
-                continue
-            parent = (row.get("Parent Item No.") or row.get("bomItem") or "").strip()
-            if parent != parent_item_no:
-                continue
-            comp = (row.get("Component Item No.") or row.get("partId") or "").strip()
-            qty = float(row.get("Required Quantity") or row.get("qty") or 0)
-            if comp:
-                out.append((comp, qty))
-    return out
+    """Return list of (component_item_no, required_qty) for the current BOM revision of the given parent (build) item."""
+    return bom_graph.get_graph(data).components(parent_item_no)
 
 
 @app.route('/api/manufacturing-orders/<mo_no>/issue', methods=['POST'])
 def issue_manufacturing_order(mo_no):
     """Tier 8: MO Issue Components – deduct BOM components when MO starts. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         mo_no = (mo_no or '').strip()
         if not mo_no:
@@ -4333,16 +4516,12 @@ def issue_manufacturing_order(mo_no):
         data = _data_cache
         if not data or not isinstance(data, dict):
             return jsonify({"error": "Load app data first"}), 503
-        all_mos = data.get("ManufacturingOrderHeaders.json") or []
         build_item_no = None
         ordered = 0
-        for mo in all_mos:
-            if not isinstance(mo, dict):
-                continue
-            if (mo.get("Mfg. Order No.") or mo.get("mohId")) == mo_no:
-                build_item_no = (mo.get("Build Item No.") or mo.get("buildItem") or "").strip()
-                ordered = float(mo.get("Ordered") or mo.get("ordQty") or 0)
-                break
+        mo = _get_data_store(data).get_mo(mo_no)
+        if mo is not None:
+            build_item_no = (mo.get("Build Item No.") or mo.get("buildItem") or "").strip()
+            ordered = float(mo.get("Ordered") or mo.get("ordQty") or 0)
         if not build_item_no:
             return jsonify({"error": f"MO {mo_no} not found"}), 404
         qty_to_issue = issue_qty if issue_qty is not None and issue_qty > 0 else ordered
@@ -4366,7 +4545,7 @@ def issue_manufacturing_order(mo_no):
                 "ref": "issue",
             })
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "mo_no": mo_no, "issue_qty": qty_to_issue, "components_issued": len(components)}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4375,7 +4554,7 @@ def issue_manufacturing_order(mo_no):
 @app.route('/api/manufacturing-orders/<mo_no>/complete', methods=['POST'])
 def complete_manufacturing_order(mo_no):
     """D6/D7: Complete MO (report completed qty, set status, backflush components). Persisted in portal_store."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         mo_no = (mo_no or '').strip()
         if not mo_no:
@@ -4393,14 +4572,10 @@ def complete_manufacturing_order(mo_no):
         data = _data_cache
         if not data or not isinstance(data, dict):
             return jsonify({"error": "Load app data first (open the app or call GET /api/data), then complete MO"}), 503
-        all_mos = data.get("ManufacturingOrderHeaders.json") or []
         build_item_no = None
-        for mo in all_mos:
-            if not isinstance(mo, dict):
-                continue
-            if (mo.get("Mfg. Order No.") or mo.get("mohId")) == mo_no:
-                build_item_no = (mo.get("Build Item No.") or mo.get("buildItem") or "").strip()
-                break
+        mo = _get_data_store(data).get_mo(mo_no)
+        if mo is not None:
+            build_item_no = (mo.get("Build Item No.") or mo.get("buildItem") or "").strip()
         if not build_item_no:
             return jsonify({"error": f"MO {mo_no} not found"}), 404
         components = _get_bom_components_for_item(data, build_item_no)
@@ -4439,7 +4614,7 @@ def complete_manufacturing_order(mo_no):
             "ref": "manual",
         })
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "mo_no": mo_no, "completed_qty": completed_qty, "backflushed": len(components), "lot": lot or None}), 200
     except Exception as e:
         import traceback
@@ -4450,7 +4625,7 @@ def complete_manufacturing_order(mo_no):
 @app.route('/api/work-orders/<wo_no>/release', methods=['POST'])
 def release_work_order(wo_no):
     """E2: Release WO (status to released). Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         wo_no = (wo_no or '').strip()
         if not wo_no:
@@ -4460,7 +4635,7 @@ def release_work_order(wo_no):
         now = datetime.now().strftime('%Y-%m-%d')
         portal_store.add_wo_update(wo_no, status=1, release_date=now)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "wo_no": wo_no, "status": 1, "release_date": now}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4469,7 +4644,7 @@ def release_work_order(wo_no):
 @app.route('/api/work-orders/<wo_no>/complete', methods=['POST'])
 def complete_work_order(wo_no):
     """E3: Report WO completion (qty, scrap). Persisted in portal_store."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         wo_no = (wo_no or '').strip()
         if not wo_no:
@@ -4502,7 +4677,7 @@ def complete_work_order(wo_no):
         now = datetime.now().strftime('%Y-%m-%d')
         portal_store.add_wo_update(wo_no, status=2, completed=new_total, completion_date=now, scrap=scrap if scrap else None)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "wo_no": wo_no, "completed_qty": completed_qty, "total_completed": new_total, "scrap": scrap}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4511,7 +4686,7 @@ def complete_work_order(wo_no):
 @app.route('/api/inventory/adjustment', methods=['POST'])
 def inventory_adjustment():
     """B5: Add or remove qty for an item (optionally by location). Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4528,7 +4703,7 @@ def inventory_adjustment():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_inventory_adjustment(item_no, location, delta, reason)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "delta": delta}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4537,7 +4712,7 @@ def inventory_adjustment():
 @app.route('/api/inventory/transfer', methods=['POST'])
 def inventory_transfer():
     """B6: Move qty of an item from one location to another. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         from_loc = (body.get('from_loc') or body.get('From Location') or '').strip()
@@ -4558,7 +4733,7 @@ def inventory_transfer():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_location_transfer(from_loc, to_loc, item_no, qty, from_bin=from_bin, to_bin=to_bin)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "from_loc": from_loc, "to_loc": to_loc, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4567,7 +4742,7 @@ def inventory_transfer():
 @app.route('/api/inventory/reserve', methods=['POST'])
 def inventory_reserve():
     """Tier 2: Reserve stock. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4586,7 +4761,7 @@ def inventory_reserve():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_reserve(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4595,7 +4770,7 @@ def inventory_reserve():
 @app.route('/api/inventory/relieve', methods=['POST'])
 def inventory_relieve():
     """Tier 2: Relieve (release) reserved stock. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4614,7 +4789,7 @@ def inventory_relieve():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_relieve_reserve(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4623,7 +4798,7 @@ def inventory_relieve():
 @app.route('/api/inventory/allocate', methods=['POST'])
 def inventory_allocate():
     """Tier 2: Allocate stock to MO/SO/Job. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4644,7 +4819,7 @@ def inventory_allocate():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_allocation(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty, "ref": ref}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4653,7 +4828,7 @@ def inventory_allocate():
 @app.route('/api/inventory/deallocate', methods=['POST'])
 def inventory_deallocate():
     """Tier 2: Deallocate stock from MO/SO/Job. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4674,7 +4849,7 @@ def inventory_deallocate():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_deallocation(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty, "ref": ref}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4683,7 +4858,7 @@ def inventory_deallocate():
 @app.route('/api/inventory/scrap', methods=['POST'])
 def inventory_scrap():
     """Tier 3: Scrap stock. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4702,7 +4877,7 @@ def inventory_scrap():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_scrap(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4711,7 +4886,7 @@ def inventory_scrap():
 @app.route('/api/inventory/recover', methods=['POST'])
 def inventory_recover():
     """Tier 3: Recover (unscrap) stock. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -4730,7 +4905,7 @@ def inventory_recover():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_recover(item_no, location, qty, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "location": location, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4738,55 +4913,12 @@ def inventory_recover():
 
 def _get_item_stock(data, item_no, location=""):
     """Get current stock for item from merged data. Returns (stock, reserved, allocated, scrapped)."""
-    stock = 0
-    reserved = 0
-    allocated = 0
-    scrapped = 0
-    if location:
-        for row in (data.get("MIILOC.json") or []):
-            if not isinstance(row, dict):
-                continue
-            ino = row.get("Item No.") or row.get("Item No") or row.get("itemId") or ""
-            loc = row.get("Location No.") or row.get("locId") or ""
-            if ino == item_no and loc == location:
-                stock = float(row.get("qStk") or row.get("Stock") or 0)
-                reserved = float(row.get("_reserved") or 0)
-                allocated = float(row.get("_allocated") or 0)
-                scrapped = float(row.get("_scrapped") or 0)
-                break
-    else:
-        for item in (data.get("Items.json") or []):
-            if not isinstance(item, dict):
-                continue
-            if (item.get("Item No.") or item.get("item_no")) == item_no:
-                stock = float(item.get("Stock") or 0)
-                reserved = float(item.get("_reserved") or 0)
-                allocated = float(item.get("_allocated") or 0)
-                scrapped = float(item.get("_scrapped") or 0)
-                break
-    return stock, reserved, allocated, scrapped
+    return _get_data_store(data).get_stock(item_no, location)
 
 
 def _get_item_wip(data, item_no, location=""):
     """Get current WIP for item from merged data."""
-    wip = 0
-    if location:
-        for row in (data.get("MIILOC.json") or []):
-            if not isinstance(row, dict):
-                continue
-            ino = row.get("Item No.") or row.get("Item No") or row.get("itemId") or ""
-            loc = row.get("Location No.") or row.get("locId") or ""
-            if ino == item_no and loc == location:
-                wip = float(row.get("qWip") or row.get("qWIP") or 0)
-                break
-    else:
-        for item in (data.get("Items.json") or []):
-            if not isinstance(item, dict):
-                continue
-            if (item.get("Item No.") or item.get("item_no")) == item_no:
-                wip = float(item.get("WIP") or item.get("totQWip") or 0)
-                break
-    return wip
+    return _get_data_store(data).get_wip(item_no, location)
 
 
 @app.route('/api/inventory/assemble-preview', methods=['GET'])
@@ -4838,7 +4970,7 @@ def inventory_assemble_preview():
 @app.route('/api/inventory/assemble', methods=['POST'])
 def inventory_assemble():
     """Tier 4: Assemble stock - consume BOM components, add finished good. Supports from_wip/to_wip (Tier 4.3)."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         body = request.get_json() or {}
         parent_item = (body.get('parent_item') or body.get('Parent Item No.') or body.get('parent_item_no') or '').strip()
@@ -4883,7 +5015,7 @@ def inventory_assemble():
             portal_store.add_inventory_adjustment(parent_item, location, qty, "Assembly")
         portal_store.add_assembly(parent_item, qty, location, components_consumed, from_wip=from_wip, to_wip=to_wip)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "parent_item": parent_item, "qty": qty, "location": location, "components": len(components_consumed), "from_wip": from_wip, "to_wip": to_wip}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4892,7 +5024,7 @@ def inventory_assemble():
 @app.route('/api/inventory/disassemble', methods=['POST'])
 def inventory_disassemble():
     """Tier 4: Disassemble stock - reduce finished good, add components per BOM. Supports from_wip/to_wip (Tier 4.3)."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         body = request.get_json() or {}
         parent_item = (body.get('parent_item') or body.get('Parent Item No.') or body.get('parent_item_no') or '').strip()
@@ -4937,7 +5069,7 @@ def inventory_disassemble():
             components_released.append((comp_item, release_qty))
         portal_store.add_disassembly(parent_item, qty, location, components_released, from_wip=from_wip, to_wip=to_wip)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "parent_item": parent_item, "qty": qty, "location": location, "components": len(components_released), "from_wip": from_wip, "to_wip": to_wip}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5008,7 +5140,7 @@ def inventory_stock_check():
 @app.route('/api/inventory/stock-check-post', methods=['POST'])
 def inventory_stock_check_post():
     """Tier 6: Post physical inventory adjustments. Accepts variances from stock check."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         variances = body.get('variances') or body.get('adjustments') or []
@@ -5040,7 +5172,7 @@ def inventory_stock_check_post():
             portal_store.add_inventory_adjustment(item_no, location, delta, "Physical count")
             posted += 1
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "posted": posted, "message": f"Posted {posted} adjustment(s)"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5049,7 +5181,7 @@ def inventory_stock_check_post():
 @app.route('/api/inventory/lot-edit', methods=['POST'])
 def inventory_lot_edit():
     """Tier 6.3: Edit lot/batch attributes (Description, Status, Expiration Date)."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -5066,7 +5198,7 @@ def inventory_lot_edit():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_lot_edit(item_no, lot_no, serial_no, description=description, status=status, expiration_date=expiration_date)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "lot_no": lot_no}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5075,7 +5207,7 @@ def inventory_lot_edit():
 @app.route('/api/inventory/supplier-receive', methods=['POST'])
 def inventory_supplier_receive():
     """Tier 5: Receive from supplier (no PO). Blind receive - adds stock."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -5096,7 +5228,7 @@ def inventory_supplier_receive():
         portal_store.add_inventory_adjustment(item_no, location, qty, f"Supplier receive{f' {ref}' if ref else ''}")
         portal_store.add_supplier_receive(item_no, qty, location, supplier, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "qty": qty, "location": location}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5105,7 +5237,7 @@ def inventory_supplier_receive():
 @app.route('/api/inventory/supplier-return', methods=['POST'])
 def inventory_supplier_return():
     """Tier 5: Return to supplier. Reduces stock."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -5126,7 +5258,7 @@ def inventory_supplier_return():
         portal_store.add_inventory_adjustment(item_no, location, -qty, f"Supplier return{f' {ref}' if ref else ''}")
         portal_store.add_supplier_return(item_no, qty, location, supplier, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "qty": qty, "location": location}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5135,7 +5267,7 @@ def inventory_supplier_return():
 @app.route('/api/inventory/sales-transfer', methods=['POST'])
 def inventory_sales_transfer():
     """Tier 5: Sales transfer - deduct stock, link to SO. items: [{item_no, qty}, ...]"""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         body = request.get_json() or {}
         so_no = (body.get('so_no') or body.get('SO No.') or body.get('so_no') or '').strip()
@@ -5173,7 +5305,7 @@ def inventory_sales_transfer():
             return jsonify({"error": "No valid items"}), 400
         portal_store.add_sales_transfer(so_no, normalized, line_ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "so_no": so_no, "items": normalized}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5182,7 +5314,7 @@ def inventory_sales_transfer():
 @app.route('/api/items/<item_no>/reorder', methods=['PATCH', 'PUT'])
 def item_reorder_update(item_no):
     """B4: Update min/max/reorder level/reorder qty for an item. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         item_no = (item_no or '').strip()
         if not item_no:
@@ -5196,7 +5328,7 @@ def item_reorder_update(item_no):
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.set_item_override(item_no, minimum=minimum, maximum=maximum, reorder_level=reorder_level, reorder_quantity=reorder_quantity)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5205,7 +5337,7 @@ def item_reorder_update(item_no):
 @app.route('/api/bom', methods=['POST'])
 def bom_create():
     """C5: Create BOM header and/or lines. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         parent = (body.get('parent_item_no') or body.get('Parent Item No.') or body.get('bomItem') or '').strip()
@@ -5242,7 +5374,8 @@ def bom_create():
             }
             portal_store.add_bom_detail(detail)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
+        bom_graph.invalidate()
         return jsonify({"ok": True, "parent_item_no": parent, "revision": revision, "lines": len(components)}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5251,7 +5384,7 @@ def bom_create():
 @app.route('/api/purchase-orders', methods=['POST'])
 def create_purchase_order():
     """F2: Create PO – full header (supplier, terms, ship, cost, etc.) + lines. Persisted via portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         supplier_no = (body.get('supplier_no') or body.get('Supplier No.') or '').strip()
@@ -5343,7 +5476,7 @@ def create_purchase_order():
             header['Description'] = description
         portal_store.add_created_po(header)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "po_no": po_no, "lines": len(valid_details), "total_amount": total_amount}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5352,7 +5485,7 @@ def create_purchase_order():
 @app.route('/api/purchase-orders/<po_no>/receive', methods=['POST'])
 def receive_against_po(po_no):
     """F4: Receive against PO – qty, location, optional lot. Updates PO line Received and inventory."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         po_no = (po_no or '').strip()
         if not po_no:
@@ -5376,7 +5509,7 @@ def receive_against_po(po_no):
         portal_store.add_po_receive(po_no, item_no, qty, location, lot, user)
         portal_store.add_inventory_adjustment(item_no, location, qty, f"PO receive {po_no}")
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "po_no": po_no, "item_no": item_no, "qty": qty}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5434,28 +5567,15 @@ def lot_history():
         return jsonify({"error": str(e)}), 500
 
 
-def _compute_shortage(data):
+def _compute_shortage(data, store=None):
     """J1/J2: Time-phased shortage – reorder_level - (stock + open_po). Returns list of { item_no, shortage_qty, on_hand, open_po, reorder_level }."""
     if not data or not isinstance(data, dict):
         return []
-    items = data.get("Items.json") or []
-    details = data.get("PurchaseOrderDetails.json") or []
-    open_po_by_item = {}
-    for line in details:
-        if not isinstance(line, dict):
-            continue
-        item_no = line.get("Item No.") or line.get("Item No") or ""
-        ordered = float(line.get("Ordered") or line.get("Ordered Qty") or 0)
-        received = float(line.get("Received") or line.get("Received Qty") or 0)
-        if item_no and ordered > received:
-            open_po_by_item[item_no] = open_po_by_item.get(item_no, 0) + (ordered - received)
+    if store is None:
+        store = _get_data_store(data)
+    open_po_by_item = store.open_po_qty_by_item()
     shortage_list = []
-    for item in items:
-        if not isinstance(item, dict):
-            continue
-        item_no = item.get("Item No.") or item.get("item_no") or ""
-        if not item_no:
-            continue
+    for item_no, item in store.items_by_no.items():
         reorder_level = float(item.get("Reorder Level") or item.get("reorder_level") or 0)
         if reorder_level <= 0:
             continue
@@ -5478,19 +5598,13 @@ def _compute_custom_alerts_triggered(data, custom_alerts):
     """For each custom alert, if stock < threshold, return triggered entry."""
     if not data or not custom_alerts:
         return []
-    items = data.get("Items.json") or []
-    stock_by_item = {}
-    for item in items:
-        if not isinstance(item, dict):
-            continue
-        ino = item.get("Item No.") or item.get("item_no") or ""
-        if ino:
-            stock_by_item[ino] = float(item.get("Stock") or item.get("stock") or 0)
+    store = _get_data_store(data)
     triggered = []
     for a in custom_alerts:
         ino = a.get("item_no") or ""
         threshold = float(a.get("threshold") or 0)
-        stock = stock_by_item.get(ino, 0)
+        item = store.get_item(ino)
+        stock = float(item.get("Stock") or item.get("stock") or 0) if item is not None else 0
         if stock < threshold:
             triggered.append({
                 "id": a.get("id"),
@@ -5581,7 +5695,7 @@ def remove_custom_alert_api(alert_id):
 @app.route('/api/mrp/buyers-advice', methods=['POST'])
 def mrp_buyers_advice():
     """Tier 7: Add buyer's advice (manual demand) for MRP. Persisted in portal_store."""
-    global _cache_timestamp, _response_cache
+    global _cache_timestamp
     try:
         body = request.get_json() or {}
         item_no = (body.get('item_no') or body.get('Item No.') or '').strip()
@@ -5600,7 +5714,7 @@ def mrp_buyers_advice():
             return jsonify({"error": "Portal store not available"}), 503
         portal_store.add_buyers_advice(item_no, qty, need_date, ref)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "item_no": item_no, "qty": qty, "need_date": need_date}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5618,16 +5732,17 @@ def mrp_what_if():
         body = request.get_json() or {}
         scenario = body.get("scenario") or {}
         data_copy = copy.deepcopy(data)
+        # Scenario store is local to this request so it does not replace the shared store for _data_cache
+        store_copy = company_data_store.CompanyDataStore(data_copy)
         adjustments = scenario.get("adjustments") or []
         for adj in adjustments:
             ino = adj.get("item_no") or ""
             delta = float(adj.get("delta") or 0)
             if not ino:
                 continue
-            for item in (data_copy.get("Items.json") or []):
-                if isinstance(item, dict) and (item.get("Item No.") or item.get("item_no")) == ino:
-                    item["Stock"] = float(item.get("Stock") or 0) + delta
-                    break
+            item = store_copy.get_item(ino)
+            if item is not None:
+                item["Stock"] = float(item.get("Stock") or 0) + delta
         transfers = scenario.get("transfers") or []
         for t in transfers:
             from_loc = t.get("from_loc") or ""
@@ -5636,17 +5751,13 @@ def mrp_what_if():
             qty = float(t.get("qty") or 0)
             if not ino or not qty:
                 continue
-            miloc = data_copy.get("MIILOC.json") or []
-            for r in miloc:
-                if not isinstance(r, dict):
-                    continue
-                it = r.get("Item No.") or r.get("Item No") or r.get("itemId")
+            for r in store_copy.locations_by_item.get(ino, []):
                 loc = r.get("Location No.") or r.get("locId") or ""
-                if it == ino and loc == from_loc:
+                if loc == from_loc:
                     r["qStk"] = max(0, float(r.get("qStk") or 0) - qty)
-                if it == ino and loc == to_loc:
+                if loc == to_loc:
                     r["qStk"] = float(r.get("qStk") or 0) + qty
-        shortage = _compute_shortage(data_copy)
+        shortage = _compute_shortage(data_copy, store=store_copy)
         return jsonify({"shortage": shortage, "scenario_applied": True}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5655,7 +5766,7 @@ def mrp_what_if():
 @app.route('/api/mrp/auto-create-po', methods=['POST'])
 def mrp_auto_create_po():
     """J3/N2: Auto-create PO from shortage. Body: optional item_nos[] and supplier_no (or use first shortage item's last supplier)."""
-    global _cache_timestamp, _response_cache, _data_cache
+    global _cache_timestamp, _data_cache
     try:
         data = _data_cache
         if not data:
@@ -5669,17 +5780,7 @@ def mrp_auto_create_po():
         if not item_nos:
             return jsonify({"ok": True, "message": "No shortage items to order", "po_no": None}), 200
         if not supplier_no:
-            for line in (data.get("PurchaseOrderDetails.json") or []):
-                if not isinstance(line, dict):
-                    continue
-                if (line.get("Item No.") or line.get("Item No")) in item_nos:
-                    po_no = line.get("PO No.")
-                    for po in (data.get("PurchaseOrders.json") or []):
-                        if isinstance(po, dict) and (po.get("PO No.") or po.get("Purchase Order No")) == po_no:
-                            supplier_no = (po.get("Supplier No.") or po.get("Name") or "").strip()
-                            break
-                    if supplier_no:
-                        break
+            supplier_no = _get_data_store(data).supplier_for_items(item_nos)
         if not supplier_no:
             supplier_no = "SUPPLIER"
         shortage_map = {s["item_no"]: s for s in shortage}
@@ -5700,7 +5801,7 @@ def mrp_auto_create_po():
             detail = {"PO No.": po_no, "Item No.": line["item_no"], "Ordered": line["qty"], "Received": 0, "Unit Cost": line.get("unit_cost", 0), "Line No.": idx + 1, "_source": "portal"}
             portal_store.add_created_po_detail(detail)
         _cache_timestamp = None
-        _response_cache = None
+        _data_responses.invalidate()
         return jsonify({"ok": True, "po_no": po_no, "lines": len(lines), "supplier_no": supplier_no}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5802,16 +5903,17 @@ def health_check():
         }), 200
 
 def scan_folder_recursively(folder_path, status, path_parts=[]):
-    """Recursively scan any folder structure and find all PDF files"""
+    """Recursively scan any folder structure and find all PDF files (listings and stats from the SO file index)"""
     orders = []
     
     try:
-        if not os.path.exists(folder_path):
+        so_index = so_file_index.get_index()
+        if not so_index.isdir(folder_path):
             return orders
             
-        items = os.listdir(folder_path)
+        items = so_index.listdir(folder_path)
         so_files = [item for item in items if item.lower().endswith(('.pdf', '.doc', '.docx'))]
-        subfolders = [item for item in items if os.path.isdir(os.path.join(folder_path, item)) and item.lower() not in ['desktop.ini', 'thumbs.db']]
+        subfolders = [item for item in so_index.subdirs(folder_path) if item.lower() not in ['desktop.ini', 'thumbs.db']]
         
         # Process ALL SO files in current folder (PDF, DOC, DOCX)
         for file in so_files:
@@ -5838,19 +5940,21 @@ def scan_folder_recursively(folder_path, status, path_parts=[]):
                             break
                     
                     file_path = os.path.join(folder_path, file)
-                    file_stat = os.stat(file_path)
+                    file_stat = so_index.entry(file_path)
+                    if file_stat is None:
+                        raise FileNotFoundError(file_path)
                     
                     # Build comprehensive path hierarchy
                     path_info = {
                         'Order No.': order_num,
                         'Customer': 'Customer Data',
-                        'Order Date': datetime.fromtimestamp(file_stat.st_ctime).strftime('%Y-%m-%d'),
-                        'Ship Date': datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d'),
+                        'Order Date': datetime.fromtimestamp(file_stat['ctime']).strftime('%Y-%m-%d'),
+                        'Ship Date': datetime.fromtimestamp(file_stat['mtime']).strftime('%Y-%m-%d'),
                         'Status': status,
                         'File': file,
                         'File Path': file_path,
                         'File Type': file.split('.')[-1].upper(),
-                        'Last Modified': datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
+                        'Last Modified': datetime.fromtimestamp(file_stat['mtime']).isoformat(),
                         'Folder Path': '/'.join(path_parts) if path_parts else 'Root',
                         'Full Path': '/'.join([status] + path_parts) if path_parts else status
                     }
@@ -5983,8 +6087,7 @@ def load_sales_orders():
             }
         
         # Discover all status folders dynamically
-        base_items = os.listdir(SALES_ORDERS_BASE)
-        status_folders = [item for item in base_items if os.path.isdir(os.path.join(SALES_ORDERS_BASE, item)) and item != 'desktop.ini']
+        status_folders = [item for item in so_file_index.get_index().status_folders() if item != 'desktop.ini']
         
         print(f"SEARCH: Discovered status folders: {status_folders}")
         
@@ -6265,10 +6368,12 @@ def warmup():
 @app.route('/api/data/clear-cache', methods=['POST'])
 def clear_data_cache():
     """Clear the data cache to force fresh reload"""
-    global _data_cache, _cache_timestamp, _response_cache
+    global _data_cache, _cache_timestamp
     _data_cache = None
     _cache_timestamp = None
-    _response_cache = None
+    _data_responses.invalidate()
+    company_data_store.invalidate()
+    bom_graph.invalidate()
     print("Data cache cleared - next request will load fresh data")
     return jsonify({"message": "Cache cleared successfully"})
 
@@ -6447,6 +6552,10 @@ def full_company_data_preview():
             fcd_path, _ = get_latest_full_company_data_folder()
             if fcd_path and os.path.exists(fcd_path):
                 file_path = os.path.join(fcd_path, file_name)
+                if not os.path.isfile(file_path):
+                    # Delta export: unchanged tables stay in the earlier folder that holds their full file
+                    parts = full_company_delta.table_parts(fcd_path).get(os.path.splitext(file_name)[0].upper())
+                    file_path = parts[0]["path"] if parts else file_path
                 if os.path.isfile(file_path):
                     if file_name.lower().endswith('.csv'):
                         df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', nrows=max_rows)
@@ -6790,11 +6899,13 @@ def get_sales_order_folder(folder_path):
 
         _MONTH_NAMES = {str(i).zfill(2): _cal.month_name[i] for i in range(1, 13)}
 
+        so_index = so_file_index.get_index()
+
         def _count_files_recursive(dir_path):
-            """Count all files recursively inside a directory."""
+            """Count all files recursively inside a directory (from the SO file index)."""
             total = 0
             try:
-                for _root, _dirs, _files in os.walk(dir_path):
+                for _root, _dirs, _files in so_index.walk(dir_path):
                     total += len([f for f in _files if not f.startswith('.')])
             except Exception:
                 pass
@@ -6806,11 +6917,10 @@ def get_sales_order_folder(folder_path):
 
         for item in items:
             item_path = os.path.join(full_path, item)
-            if os.path.isdir(item_path) and item != 'desktop.ini':
+            if so_index.isdir(item_path) and item != 'desktop.ini':
                 try:
-                    subfolder_items = os.listdir(item_path)
-                    direct_files = len([f for f in subfolder_items if os.path.isfile(os.path.join(item_path, f))])
-                    folder_count = len([f for f in subfolder_items if os.path.isdir(os.path.join(item_path, f))])
+                    folder_count = len(so_index.subdirs(item_path))
+                    direct_files = len(so_index.filenames(item_path))
                     total_files = _count_files_recursive(item_path) if folder_count > 0 and direct_files == 0 else direct_files
                     
                     folders.append({
@@ -6895,7 +7005,7 @@ def find_sales_order_file(so_number):
         # Search through all subfolders for the SO file - PRIORITIZE LATEST VERSION
         matching_files = []
         
-        for root, dirs, files in os.walk(base_path):
+        for root, dirs, files in so_file_index.get_index().walk(base_path):
             for file in files:
                 if file.lower().endswith('.pdf'):
                     # Check if SO number is in filename
@@ -6972,30 +7082,37 @@ def check_changes():
         
         # Check Sales Orders folder
         if os.path.exists(SALES_ORDERS_BASE):
-            for status_folder in os.listdir(SALES_ORDERS_BASE):
-                status_path = os.path.join(SALES_ORDERS_BASE, status_folder)
-                if os.path.isdir(status_path):
-                    # Check for new files or modifications
-                    for root, dirs, files in os.walk(status_path):
-                        for file in files:
-                            if file.endswith('.pdf'):
-                                file_path = os.path.join(root, file)
-                                file_stat = os.stat(file_path)
-                                
-                                file_key = f"{status_folder}_{file}"
-                                if not hasattr(check_changes, 'sales_last_check_time'):
-                                    check_changes.sales_last_check_time = {}
-                                
-                                if file_key not in check_changes.sales_last_check_time:
-                                    check_changes.sales_last_check_time[file_key] = file_stat.st_mtime
-                                elif check_changes.sales_last_check_time[file_key] < file_stat.st_mtime:
-                                    changes_detected.append({
-                                        'type': 'sales_order_modified',
-                                        'file': file,
-                                        'file_path': file_path,
-                                        'status': status_folder
-                                    })
-                                    check_changes.sales_last_check_time[file_key] = file_stat.st_mtime
+            # The SO file index lists the PDFs; their mtimes are stat'ed now, since the index only picks up a file
+            # overwritten in place on its next full rescan
+            from concurrent.futures import ThreadPoolExecutor
+            if not hasattr(check_changes, 'sales_last_check_time'):
+                check_changes.sales_last_check_time = {}
+            pdf_entries = [entry for entry in so_file_index.get_index().entries(extensions=('.pdf',))
+                           if entry['parts'] and entry['name'].endswith('.pdf')]  # only files inside a status folder
+
+            def _mtime(path):
+                try:
+                    return os.stat(path).st_mtime
+                except OSError:
+                    return None
+
+            with ThreadPoolExecutor(max_workers=16) as pool:  # network share: stat latency, not CPU
+                mtimes = list(pool.map(_mtime, [entry['path'] for entry in pdf_entries]))
+            for entry, mtime in zip(pdf_entries, mtimes):
+                if mtime is None:
+                    continue
+                status_folder = entry['status']
+                file_key = f"{status_folder}_{entry['name']}"
+                if file_key not in check_changes.sales_last_check_time:
+                    check_changes.sales_last_check_time[file_key] = mtime
+                elif check_changes.sales_last_check_time[file_key] < mtime:
+                    changes_detected.append({
+                        'type': 'sales_order_modified',
+                        'file': entry['name'],
+                        'file_path': entry['path'],
+                        'status': status_folder
+                    })
+                    check_changes.sales_last_check_time[file_key] = mtime
         
         return jsonify({
             'hasChanges': len(changes_detected) > 0,
@@ -9360,6 +9477,20 @@ def sage_status():
     except Exception as e:
         return jsonify({'connected': False, 'error': str(e)}), 500
 
+@app.route('/api/sage/cache', methods=['GET', 'POST'])
+def sage_cache():
+    """GET: Sage query cache / connection pool stats. POST: invalidate (optional JSON {"table": "tinvent"})."""
+    if not SAGE_AVAILABLE:
+        return jsonify({'error': 'Sage 50 module not loaded'}), 503
+    try:
+        if request.method == 'POST':
+            table = (request.get_json(silent=True) or {}).get('table')
+            dropped = sage_service.invalidate_cache(table)
+            return jsonify({'invalidated': dropped, 'table': table, 'stats': sage_service.cache_stats()})
+        return jsonify(sage_service.cache_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sage/dashboard')
 def sage_dashboard():
     """Get Sage 50 dashboard summary."""
@@ -10019,7 +10150,10 @@ def sage_item_mapping_get():
 
 @app.route('/api/sage/item-mapping/suggest', methods=['POST'])
 def sage_item_mapping_suggest():
-    """Run suggestion algorithm against all MiSys items and current Sage inventory."""
+    """
+    Run suggestion algorithm against all MiSys items and current Sage inventory.
+    ?async=1 runs it in the background and returns 202 with a job_id to poll at /api/sage/item-mapping/suggest/<job_id>.
+    """
     s = _sgds()
     if not s:
         return jsonify({"error": "Sage G Drive service not loaded"}), 503
@@ -10028,12 +10162,27 @@ def sage_item_mapping_suggest():
         misys_items = data.get("Items.json", [])
         if not misys_items:
             return jsonify({"error": "MiSys item data not loaded — load /api/data first"}), 400
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = s.start_item_mapping_suggestions(misys_items)
+            return jsonify({"ok": True, "job": job}), 202
         stats = s.suggest_item_mappings(misys_items)
         return jsonify({"ok": True, "stats": stats})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/sage/item-mapping/suggest/<job_id>', methods=['GET'])
+def sage_item_mapping_suggest_status(job_id):
+    """Progress of a background suggestion run started with POST /api/sage/item-mapping/suggest?async=1."""
+    s = _sgds()
+    if not s:
+        return jsonify({"error": "Sage G Drive service not loaded"}), 503
+    job = s.get_suggestion_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown suggestion job {job_id}"}), 404
+    return jsonify(job)
+
+
 @app.route('/api/sage/item-mapping/confirm', methods=['POST'])
 def sage_item_mapping_confirm():
     """Confirm a single item mapping (user explicitly approves)."""
@@ -10486,7 +10635,10 @@ def api_mrp_run():
         if SAGE_AVAILABLE:
             sage_sos = sage_service.get_sales_orders()
         user = auth_service.get_current_user() if auth_service else {}
-        result = mrp_engine.run_mrp(items_data, portal_so_lines, sage_sos, run_by=user.get("email", "system"))
+        body = request.get_json(silent=True) or {}
+        result = mrp_engine.run_mrp(items_data, portal_so_lines, sage_sos, run_by=user.get("email", "system"),
+                                    data=data, horizon_days=body.get("horizon_days"), bucket=body.get("bucket"),
+                                    mode=body.get("mode") or request.args.get("mode") or "full")
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,260 @@
+"""
+BOM graph: parent -> lines adjacency per revision, current-revision lookup, item master dict, low-level codes and a
+memoized raw-material explosion, built once per loaded company data dict (Full Company Data / API Extractions keys).
+Used by PR creation (purchase_requisition_service), costing_service, the MRP engine and the assemble/MO endpoints,
+so a multi-level explosion is a few dict lookups instead of repeated scans of BillOfMaterialDetails and the item master.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+RAW_MATERIAL = 0
+ASSEMBLED = 1
+FORMULA = 2
+
+
+def _num(val):
+    try:
+        return float(val or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _rev(row):
+    return str(row.get("Revision No.") if row.get("Revision No.") is not None else row.get("bomRev", "0")).strip()
+
+
+def latest_revision(revisions):
+    """Highest revision, numeric where possible ("10" > "9")."""
+    return max(revisions, key=lambda r: (1, int(r), "") if r.isdigit() else (0, -1, r))
+
+
+class BomGraph:
+    """Read-side BOM structure over one data dict. Rows are shared with the data dict (no copies)."""
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self.items = {}          # Item No. -> item master row (MIITEM.json or Items.json, first match)
+        self.lines = {}          # (Parent Item No., Revision No.) -> [BOM detail rows]
+        self.revisions = {}      # Parent Item No. -> [revisions in export order]
+        self.headers = {}        # (Parent Item No., Revision No.) -> BOM header row
+        self._current = {}
+        self._explosions = {}
+        self._levels = None
+        self._lock = Lock()
+        self.version = _version
+        self._build()
+
+    def _rows(self, *keys):
+        """Rows of the first non-empty key (the converter fills both names of a table with the same rows)."""
+        for key in keys:
+            rows = self.data.get(key)
+            if isinstance(rows, list) and rows:
+                return rows
+        return []
+
+    def _build(self):
+        for item in self._rows("MIITEM.json", "Items.json"):
+            if not isinstance(item, dict):
+                continue
+            ino = str(item.get("Item No.") or item.get("itemId") or "").strip()
+            if ino and ino not in self.items:
+                self.items[ino] = item
+        for row in self._rows("BillOfMaterialDetails.json", "MIBOMD.json"):
+            if not isinstance(row, dict):
+                continue
+            parent = str(row.get("Parent Item No.") or row.get("bomItem") or "").strip()
+            if not parent:
+                continue
+            rev = _rev(row)
+            lines = self.lines.get((parent, rev))
+            if lines is None:
+                lines = self.lines[(parent, rev)] = []
+                self.revisions.setdefault(parent, []).append(rev)
+            lines.append(row)
+        for row in self._rows("BillsOfMaterial.json", "MIBOMH.json"):
+            if not isinstance(row, dict):
+                continue
+            parent = str(row.get("Parent Item No.") or row.get("bomItem") or "").strip()
+            if parent:
+                self.headers.setdefault((parent, _rev(row)), row)
+
+    # --- Lookups -------------------------------------------------------------
+
+    def item(self, item_no):
+        return self.items.get(str(item_no or "").strip())
+
+    def item_type(self, item_no):
+        """MISys Item Type (0 raw/purchased, 1 assembled, 2 formula/blend), or None when not in the item master."""
+        item = self.item(item_no)
+        if item is None:
+            return None
+        return int(_num(item.get("Item Type") if item.get("Item Type") is not None else item.get("type")))
+
+    def current_revision(self, item_no):
+        """
+        Revision MISys builds with: Current BOM Revision (revId) from the item master, else the latest revision in the
+        BOM details. None when the item has neither.
+        """
+        item_no = str(item_no or "").strip()
+        if item_no in self._current:
+            return self._current[item_no]
+        rev = None
+        item = self.items.get(item_no)
+        if item is not None:
+            value = item.get("Current BOM Revision")
+            if value is None:
+                value = item.get("revId")
+            if value is not None and str(value).strip() != "":
+                rev = str(value).strip()
+        if rev is None and self.revisions.get(item_no):
+            rev = latest_revision(self.revisions[item_no])
+        self._current[item_no] = rev
+        return rev
+
+    def bom_lines(self, item_no, revision=None):
+        """Detail rows of the given (default: current) revision."""
+        item_no = str(item_no or "").strip()
+        rev = self.current_revision(item_no) if revision is None else str(revision).strip()
+        return self.lines.get((item_no, rev), [])
+
+    def has_bom(self, item_no):
+        return bool(self.bom_lines(item_no))
+
+    def build_quantity(self, item_no, revision=None):
+        item_no = str(item_no or "").strip()
+        rev = self.current_revision(item_no) if revision is None else str(revision).strip()
+        header = self.headers.get((item_no, rev))
+        return _num(header.get("Build Quantity") or header.get("mult")) if header else 0.0
+
+    def components(self, item_no, revision=None, per_unit=False):
+        """[(component item no, required qty)] for the current revision; per_unit divides by the header Build Quantity."""
+        build_qty = self.build_quantity(item_no, revision) if per_unit else 0.0
+        out = []
+        for row in self.bom_lines(item_no, revision):
+            comp = str(row.get("Component Item No.") or row.get("partId") or "").strip()
+            if not comp:
+                continue
+            qty = _num(row.get("Required Quantity") or row.get("qty"))
+            out.append((comp, qty / build_qty if build_qty > 0 else qty))
+        return out
+
+    def low_level_codes(self):
+        """Item No. -> deepest level at which it appears in any current-revision BOM (0 = top level). Computed once."""
+        with self._lock:
+            if self._levels is not None:
+                return self._levels
+            edges = {}
+            for parent in self.revisions:
+                edges[parent] = [comp for comp, _ in self.components(parent) if comp != parent]
+            levels = {}
+            for parent in edges:
+                levels.setdefault(parent, 0)
+            frontier = list(edges)
+            # Longest-path relaxation, bounded so a BOM cycle cannot loop forever
+            for _ in range(64):
+                changed = []
+                for parent in frontier:
+                    for comp in edges.get(parent, ()):
+                        if levels.get(comp, 0) < levels[parent] + 1:
+                            levels[comp] = levels[parent] + 1
+                            changed.append(comp)
+                if not changed:
+                    break
+                frontier = list(dict.fromkeys(changed))
+            self._levels = levels
+            return levels
+
+    def explode(self, item_no, qty=1.0, max_depth=5):
+        """
+        Flattened raw-material requirements for qty of item_no: [(item no, qty needed)] in first-seen order.
+        Assembled/formula components (Item Type 1/2) are exploded through their current revision; raw materials are
+        leaves; zero-qty (phantom) lines, LABOR items and components missing from the item master are skipped.
+        An item without a BOM is its own requirement when it is a raw material. Per-unit results are memoized.
+        """
+        unit = self._explode_unit(str(item_no or "").strip(), max_depth, frozenset())
+        return [(ino, q * qty) for ino, q in unit]
+
+    def _explode_unit(self, item_no, depth, stack):
+        key = (item_no, depth)
+        cached = self._explosions.get(key)
+        if cached is not None:
+            return cached
+        if item_no in stack:
+            print(f"[bom_graph] Circular BOM reference detected: {item_no}")
+            return []
+        if depth <= 0:
+            print(f"[bom_graph] Max BOM depth reached for: {item_no}")
+            return []
+        lines = self.bom_lines(item_no)
+        if not lines:
+            result = [(item_no, 1.0)] if self.item_type(item_no) == RAW_MATERIAL else []
+            self._explosions[key] = result
+            return result
+        totals = {}
+        stack = stack | {item_no}
+        for row in lines:
+            comp = str(row.get("Component Item No.") or row.get("partId") or "").strip()
+            required = _num(row.get("Required Quantity") or row.get("qty"))
+            if not comp or required == 0 or comp.upper().startswith("LABOR"):
+                continue
+            comp_type = self.item_type(comp)
+            if comp_type is None:
+                print(f"[bom_graph] Component not found in item master: {comp}")
+                continue
+            if comp_type in (ASSEMBLED, FORMULA):
+                for sub, q in self._explode_unit(comp, depth - 1, stack):
+                    totals[sub] = totals.get(sub, 0.0) + q * required
+            else:
+                totals[comp] = totals.get(comp, 0.0) + required
+        result = list(totals.items())
+        self._explosions[key] = result
+        return result
+
+    def summary(self):
+        return {
+            "items": len(self.items),
+            "bom_parents": len(self.revisions),
+            "bom_revisions": len(self.lines),
+        }
+
+
+MAX_GRAPHS = 3  # app data, PR's own Full Company Data load, API Extractions BOM data
+
+_graph_lock = Lock()
+_graphs = OrderedDict()  # id(data) -> BomGraph, least recently used first
+_version = 0  # bumped by invalidate(); graphs built under an older version are rebuilt
+
+
+def _cached(data):
+    graph = _graphs.get(id(data))
+    return graph if graph is not None and graph.data is data and graph.version == _version else None
+
+
+def get_graph(data):
+    """
+    Return the BomGraph for this data dict, built once per loaded dict and kept until invalidate() (called when BOMs
+    are edited in place). Graphs for the last MAX_GRAPHS dicts are kept, so callers on different sources don't evict
+    each other.
+    """
+    if not isinstance(data, dict):
+        return BomGraph({})
+    graph = _cached(data)
+    if graph is not None:
+        return graph
+    with _graph_lock:
+        graph = _cached(data)
+        if graph is None:
+            graph = BomGraph(data)
+            _graphs[id(data)] = graph
+        _graphs.move_to_end(id(data))
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)
+        return graph
+
+
+def invalidate():
+    """Drop every graph (next get_graph rebuilds)."""
+    global _version
+    with _graph_lock:
+        _version += 1
+        _graphs.clear()
@@ -0,0 +1,269 @@
+"""
+Company data store: hash indexes over the /api/data dict (Items, MIILOC, POs, MOs, BOMs, lots).
+Built once per load so inventory/MO/shortage endpoints do O(1) lookups instead of scanning the lists.
+The underlying lists and row dicts are shared with the data dict (no copies); only keys are indexed,
+so in-place value changes (portal_store overlay, Stock/qStk updates) are visible through the store.
+"""
+from threading import Lock
+
+
+def _item_no(row):
+    return row.get("Item No.") or row.get("item_no") or ""
+
+
+def _loc_item_no(row):
+    return row.get("Item No.") or row.get("Item No") or row.get("itemId") or ""
+
+
+def _loc_no(row):
+    return row.get("Location No.") or row.get("locId") or ""
+
+
+def _num(val):
+    try:
+        return float(val or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CompanyDataStore:
+    """Read-side indexes over one loaded company data dict. Lookups return the original row dicts."""
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self.items_by_no = {}           # Item No. -> Items.json row (first match, like the old scans)
+        self.location_rows = {}         # (Item No., Location No.) -> MIILOC.json row
+        self.locations_by_item = {}     # Item No. -> [MIILOC.json rows]
+        self.po_headers_by_no = {}      # PO No. -> PurchaseOrders.json row
+        self.po_lines_by_po = {}        # PO No. -> [PurchaseOrderDetails.json rows]
+        self.po_lines_by_item = {}      # Item No. -> [PurchaseOrderDetails.json rows]
+        self.mo_headers_by_no = {}      # Mfg. Order No. -> ManufacturingOrderHeaders.json row
+        self.bom_lines_by_parent = {}   # Parent Item No. -> [BOM detail rows]
+        self.bom_lines_by_parent_rev = {}  # (Parent Item No., Revision No.) -> [BOM detail rows]
+        self.bom_headers_by_parent = {}    # Parent Item No. -> [BOM header rows]
+        self.lot_rows = {}              # (Item No., Lot No.) -> [LotSerialDetail.json rows]
+        self.lots_by_item = {}          # Item No. -> [LotSerialDetail.json rows]
+        self._components_cache = {}
+        self._open_po_by_item = None
+        self._build()
+
+    def _rows(self, key):
+        rows = self.data.get(key)
+        if not isinstance(rows, list):
+            return []
+        return rows
+
+    def _build(self):
+        for item in self._rows("Items.json"):
+            if not isinstance(item, dict):
+                continue
+            ino = _item_no(item)
+            if ino and ino not in self.items_by_no:
+                self.items_by_no[ino] = item
+
+        for row in self._rows("MIILOC.json"):
+            if not isinstance(row, dict):
+                continue
+            ino = _loc_item_no(row)
+            if not ino:
+                continue
+            self.location_rows.setdefault((ino, _loc_no(row)), row)
+            self.locations_by_item.setdefault(ino, []).append(row)
+
+        for po in self._rows("PurchaseOrders.json"):
+            if not isinstance(po, dict):
+                continue
+            po_no = po.get("PO No.") or po.get("Purchase Order No") or ""
+            if po_no and po_no not in self.po_headers_by_no:
+                self.po_headers_by_no[po_no] = po
+        for line in self._rows("PurchaseOrderDetails.json"):
+            if not isinstance(line, dict):
+                continue
+            po_no = line.get("PO No.") or line.get("Purchase Order No") or ""
+            ino = line.get("Item No.") or line.get("Item No") or ""
+            if po_no:
+                self.po_lines_by_po.setdefault(po_no, []).append(line)
+            if ino:
+                self.po_lines_by_item.setdefault(ino, []).append(line)
+
+        for mo in self._rows("ManufacturingOrderHeaders.json"):
+            if not isinstance(mo, dict):
+                continue
+            mo_no = mo.get("Mfg. Order No.") or mo.get("mohId")
+            if mo_no and mo_no not in self.mo_headers_by_no:
+                self.mo_headers_by_no[mo_no] = mo
+
+        # Same key order as the old _get_bom_components_for_item scan so component lists are unchanged
+        for key in ("BillOfMaterialDetails.json", "MIBOMD.json"):
+            for row in self._rows(key):
+                if not isinstance(row, dict):
+                    continue
+                parent = (row.get("Parent Item No.") or row.get("bomItem") or "").strip()
+                if not parent:
+                    continue
+                rev = str(row.get("Revision No.") or row.get("bomRev") or "").strip()
+                self.bom_lines_by_parent.setdefault(parent, []).append(row)
+                self.bom_lines_by_parent_rev.setdefault((parent, rev), []).append(row)
+        for key in ("BillsOfMaterial.json", "MIBOMH.json"):
+            for row in self._rows(key):
+                if not isinstance(row, dict):
+                    continue
+                parent = (row.get("Parent Item No.") or row.get("bomItem") or "").strip()
+                if parent:
+                    self.bom_headers_by_parent.setdefault(parent, []).append(row)
+
+        for row in self._rows("LotSerialDetail.json"):
+            if not isinstance(row, dict):
+                continue
+            ino = (row.get("Item No.") or row.get("itemId") or row.get("Parent Item No.") or row.get("prntItemId") or "").strip()
+            lot = (row.get("Lot No.") or row.get("lotId") or row.get("prntLotId") or "").strip()
+            if not ino:
+                continue
+            self.lots_by_item.setdefault(ino, []).append(row)
+            if lot:
+                self.lot_rows.setdefault((ino, lot), []).append(row)
+
+    # --- Lookups -------------------------------------------------------------
+
+    def get_item(self, item_no):
+        return self.items_by_no.get(item_no)
+
+    def get_location_row(self, item_no, location):
+        return self.location_rows.get((item_no, location or ""))
+
+    def get_mo(self, mo_no):
+        return self.mo_headers_by_no.get(mo_no)
+
+    def get_po(self, po_no):
+        return self.po_headers_by_no.get(po_no)
+
+    def get_po_lines(self, po_no):
+        return self.po_lines_by_po.get(po_no, [])
+
+    def get_po_lines_for_item(self, item_no):
+        return self.po_lines_by_item.get(item_no, [])
+
+    def get_bom_lines(self, parent_item_no, revision=None):
+        if revision is None:
+            return self.bom_lines_by_parent.get(parent_item_no, [])
+        return self.bom_lines_by_parent_rev.get((parent_item_no, str(revision).strip()), [])
+
+    def get_bom_headers(self, parent_item_no):
+        return self.bom_headers_by_parent.get(parent_item_no, [])
+
+    def get_lot_rows(self, item_no, lot_no=None):
+        if lot_no is None:
+            return self.lots_by_item.get(item_no, [])
+        return self.lot_rows.get((item_no, lot_no), [])
+
+    def get_bom_components(self, parent_item_no):
+        """Return list of (component_item_no, required_qty) for the given parent (build) item."""
+        cached = self._components_cache.get(parent_item_no)
+        if cached is None:
+            cached = []
+            for row in self.bom_lines_by_parent.get(parent_item_no, []):
+                comp = (row.get("Component Item No.") or row.get("partId") or "").strip()
+                qty = float(row.get("Required Quantity") or row.get("qty") or 0)
+                if comp:
+                    cached.append((comp, qty))
+            self._components_cache[parent_item_no] = cached
+        return list(cached)
+
+    def get_stock(self, item_no, location=""):
+        """Return (stock, reserved, allocated, scrapped) from MIILOC (with location) or Items.json."""
+        if location:
+            row = self.location_rows.get((item_no, location))
+            if row is None:
+                return 0, 0, 0, 0
+            return (
+                float(row.get("qStk") or row.get("Stock") or 0),
+                float(row.get("_reserved") or 0),
+                float(row.get("_allocated") or 0),
+                float(row.get("_scrapped") or 0),
+            )
+        item = self.items_by_no.get(item_no)
+        if item is None:
+            return 0, 0, 0, 0
+        return (
+            float(item.get("Stock") or 0),
+            float(item.get("_reserved") or 0),
+            float(item.get("_allocated") or 0),
+            float(item.get("_scrapped") or 0),
+        )
+
+    def get_wip(self, item_no, location=""):
+        if location:
+            row = self.location_rows.get((item_no, location))
+            if row is None:
+                return 0
+            return float(row.get("qWip") or row.get("qWIP") or 0)
+        item = self.items_by_no.get(item_no)
+        if item is None:
+            return 0
+        return float(item.get("WIP") or item.get("totQWip") or 0)
+
+    def open_po_qty_by_item(self):
+        """Item No. -> open PO qty (Ordered - Received) over PurchaseOrderDetails.json. Computed once per store."""
+        if self._open_po_by_item is None:
+            open_po = {}
+            for ino, lines in self.po_lines_by_item.items():
+                for line in lines:
+                    ordered = float(line.get("Ordered") or line.get("Ordered Qty") or 0)
+                    received = float(line.get("Received") or line.get("Received Qty") or 0)
+                    if ordered > received:
+                        open_po[ino] = open_po.get(ino, 0) + (ordered - received)
+            self._open_po_by_item = open_po
+        return self._open_po_by_item
+
+    def supplier_for_items(self, item_nos):
+        """First supplier (Supplier No. or Name) from an existing PO containing any of item_nos, in PO detail order."""
+        wanted = set(item_nos or [])
+        for line in self._rows("PurchaseOrderDetails.json"):
+            if not isinstance(line, dict):
+                continue
+            if (line.get("Item No.") or line.get("Item No")) not in wanted:
+                continue
+            po = self.po_headers_by_no.get(line.get("PO No."))
+            if po is not None:
+                supplier_no = (po.get("Supplier No.") or po.get("Name") or "").strip()
+                if supplier_no:
+                    return supplier_no
+        return ""
+
+    def summary(self):
+        return {
+            "items": len(self.items_by_no),
+            "locations": len(self.location_rows),
+            "purchase_orders": len(self.po_headers_by_no),
+            "manufacturing_orders": len(self.mo_headers_by_no),
+            "bom_parents": len(self.bom_lines_by_parent),
+            "lots": len(self.lot_rows),
+        }
+
+
+_store_lock = Lock()
+_current_store = None
+
+
+def get_store(data):
+    """Return the CompanyDataStore for this data dict, building it once per loaded dict."""
+    global _current_store
+    if not isinstance(data, dict):
+        return CompanyDataStore({})
+    store = _current_store
+    if store is not None and store.data is data:
+        return store
+    with _store_lock:
+        store = _current_store
+        if store is not None and store.data is data:
+            return store
+        store = CompanyDataStore(data)
+        _current_store = store
+        return store
+
+
+def invalidate():
+    """Drop the current store (next get_store rebuilds)."""
+    global _current_store
+    with _store_lock:
+        _current_store = None
@@ -4,31 +4,68 @@ BOM cost rollup, COGS, landed cost, and margin analysis.
 SAGE 50 IS 100% READ-ONLY — NEVER WRITE TO SAGE.
 Uses Sage costs as read-only input (dLastCost, dCostOfStock).
 All calculations and results stored in portal PostgreSQL only.
+
+Sage costs are read once per COSTING_SAGE_TTL_SECONDS into a snapshot, and rolled-up unit costs for every item are
+computed in one bottom-up pass over the BOM graph (CostRollup), cached until the BOM, item list or Sage costs change.
 """
+import os
+import time
+import threading
+
 import db_service
+import bom_graph
+
+SAGE_COST_TTL_SECONDS = int(os.getenv("COSTING_SAGE_TTL_SECONDS") or 300)
+_SAGE_PAGE = 5000
+
+_cost_lock = threading.Lock()
+_sage_snapshot = {"costs": None, "version": 0, "loaded_at": 0.0}
+_current_rollup = None
 
 
 def _get_sage_costs():
-    """Load item costs from Sage (READ-ONLY)."""
+    """Load item costs from Sage (READ-ONLY), all inventory pages."""
     try:
         import sage_service
-        items = sage_service.get_inventory()
         costs = {}
-        for item in (items or []):
-            code = item.get("part_code") or item.get("sPartCode") or ""
-            last_cost = float(item.get("last_cost") or item.get("dLastCost") or 0)
-            stock_cost = float(item.get("cost_of_stock") or item.get("dCostOfStock") or 0)
-            if code:
-                costs[code.strip()] = {
-                    "last_cost": last_cost,
-                    "stock_cost": stock_cost,
-                    "cost": last_cost or stock_cost,
-                }
+        offset = 0
+        while True:
+            resp = sage_service.get_inventory(limit=_SAGE_PAGE, offset=offset) or {}
+            items = resp.get("inventory") or []
+            for item in items:
+                code = item.get("part_code") or item.get("sPartCode") or ""
+                last_cost = float(item.get("last_cost") or item.get("dLastCost") or 0)
+                stock_cost = float(item.get("cost_of_stock") or item.get("dCostOfStock") or 0)
+                if code:
+                    costs[code.strip()] = {
+                        "last_cost": last_cost,
+                        "stock_cost": stock_cost,
+                        "cost": last_cost or stock_cost,
+                    }
+            offset += _SAGE_PAGE
+            if not items or offset >= int(resp.get("total") or 0):
+                break
         return costs
-    except Exception:
+    except Exception as e:
+        print(f"[costing] Sage cost load failed: {e}")
         return {}
 
 
+def _sage_cost_snapshot():
+    """(version, costs) from one Sage read per SAGE_COST_TTL_SECONDS; the version only moves when the costs changed."""
+    with _cost_lock:
+        snap = _sage_snapshot
+        if snap["costs"] is not None and time.time() - snap["loaded_at"] < SAGE_COST_TTL_SECONDS:
+            return snap["version"], snap["costs"]
+    costs = _get_sage_costs()
+    with _cost_lock:
+        if costs != snap["costs"]:
+            snap["costs"] = costs
+            snap["version"] += 1
+        snap["loaded_at"] = time.time()
+        return snap["version"], snap["costs"]
+
+
 def _get_misys_costs(items_data):
     """Load item costs from MISys data."""
     costs = {}
@@ -40,81 +77,116 @@ def _get_misys_costs(items_data):
     return costs
 
 
-def bom_cost_rollup(item_no, bom_data=None, items_data=None, visited=None):
-    """Multi-level BOM cost rollup.
-    Traverses BOM hierarchy, summing component costs from MISys + Sage (READ-ONLY)."""
-    if visited is None:
-        visited = set()
-    if item_no in visited:
-        return {"item_no": item_no, "cost": 0, "error": "circular_reference"}
-    visited.add(item_no)
-
-    sage_costs = _get_sage_costs()
-    misys_costs = _get_misys_costs(items_data)
-
-    bom_headers = bom_data.get("MIBOMH.json", []) if bom_data else []
-    bom_details = bom_data.get("MIBOMD.json", []) if bom_data else []
-
-    bom_for_item = None
-    for bh in bom_headers:
-        parent = bh.get("Parent Item No.") or bh.get("parentItemId") or ""
-        if parent.strip() == item_no:
-            bom_for_item = bh.get("BOM No.") or bh.get("bomId")
-            break
-
-    if not bom_for_item:
-        cost = sage_costs.get(item_no, {}).get("cost", 0) or misys_costs.get(item_no, {}).get("cost", 0)
-        return {"item_no": item_no, "cost": cost, "components": [], "is_leaf": True}
-
-    components = []
-    total_cost = 0
-
-    for bd in bom_details:
-        bom_id = bd.get("BOM No.") or bd.get("bomId")
-        if bom_id != bom_for_item:
-            continue
-
-        part = (bd.get("Part No.") or bd.get("partId") or "").strip()
-        qty_per = float(bd.get("Quantity") or bd.get("qtyPer") or 0)
-        scrap = float(bd.get("Scrap Factor") or bd.get("scrapFactor") or 0)
+class CostRollup:
+    """
+    Rolled-up unit cost of every item, computed in one bottom-up pass over the current-revision BOM DAG
+    (deepest low-level code first). Leaves cost Sage cost, else MISys cost; an assembly costs the sum of its
+    components' unit cost x qty per unit (with scrap). A line that closes a BOM cycle costs 0.
+    """
+
+    def __init__(self, graph, sage_costs, misys_costs):
+        self.graph = graph
+        self.sage_costs = sage_costs
+        self.misys_costs = misys_costs
+        self.unit_cost = {}
+        self.lines = {}  # assembly item no -> [(part, qty_per, scrap, effective_qty, cost_counts)]
+        levels = graph.low_level_codes()
+        for item_no in sorted(levels, key=lambda i: -levels[i]):
+            bom_lines = graph.bom_lines(item_no)
+            if not bom_lines:
+                self.unit_cost[item_no] = self._leaf_cost(item_no)
+                continue
+            build_qty = graph.build_quantity(item_no)
+            lines = []
+            total = 0.0
+            for bd in bom_lines:
+                part = (bd.get("Component Item No.") or bd.get("partId") or "").strip()
+                if not part:
+                    continue
+                qty_per = float(bd.get("Required Quantity") or bd.get("qty") or 0)
+                if build_qty > 0:
+                    qty_per = qty_per / build_qty
+                scrap = float(bd.get("Scrap Factor") or bd.get("scrapFactor") or 0)
+                effective_qty = qty_per * (1 + scrap / 100) if scrap else qty_per
+                # Components sit on a deeper level and are already costed; anything else closes a cycle
+                acyclic = levels.get(part, 0) > levels[item_no]
+                if acyclic:
+                    total += self.cost(part) * effective_qty
+                lines.append((part, qty_per, scrap, effective_qty, acyclic))
+            self.lines[item_no] = lines
+            self.unit_cost[item_no] = round(total, 4)
+
+    def _leaf_cost(self, item_no):
+        return self.sage_costs.get(item_no, {}).get("cost", 0) or self.misys_costs.get(item_no, {}).get("cost", 0)
+
+    def cost(self, item_no):
+        cost = self.unit_cost.get(item_no)
+        return self._leaf_cost(item_no) if cost is None else cost
+
+    def tree(self, item_no, visited=None):
+        """bom_cost_rollup result for item_no, assembled from the precomputed unit costs."""
+        visited = set() if visited is None else visited
+        if item_no in visited:
+            return {"item_no": item_no, "cost": 0, "error": "circular_reference"}
+        lines = self.lines.get(item_no)
+        if lines is None:
+            return {"item_no": item_no, "cost": self.cost(item_no), "components": [], "is_leaf": True}
+        visited = visited | {item_no}
+        components = []
+        for part, qty_per, scrap, effective_qty, acyclic in lines:
+            sub = self.tree(part, visited)
+            unit = sub["cost"] if acyclic else 0
+            components.append({
+                "part_no": part,
+                "qty_per": qty_per,
+                "scrap_factor": scrap,
+                "unit_cost": unit,
+                "ext_cost": round(unit * effective_qty, 4),
+                "sub_components": sub.get("components", []),
+            })
+        return {"item_no": item_no, "cost": self.unit_cost[item_no], "components": components, "is_leaf": False}
+
+
+def get_cost_rollup(bom_data=None, items_data=None):
+    """
+    CostRollup for this BOM snapshot, item list and Sage cost snapshot. Cached until the BOM graph, the MISys item
+    list or the Sage costs change, so per-SO margin reports are lookups.
+    """
+    global _current_rollup
+    graph = bom_graph.get_graph(bom_data)
+    sage_version, sage_costs = _sage_cost_snapshot()
+    key = (id(graph), graph.version, sage_version, id(items_data), len(items_data or []))
+    cached = _current_rollup
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    rollup = CostRollup(graph, sage_costs, _get_misys_costs(items_data))
+    _current_rollup = (key, rollup)
+    return rollup
+
+
+def invalidate():
+    """Drop the cached rollup and Sage cost snapshot (next call re-reads Sage)."""
+    global _current_rollup
+    with _cost_lock:
+        _sage_snapshot["loaded_at"] = 0.0
+    _current_rollup = None
 
-        effective_qty = qty_per * (1 + scrap / 100) if scrap else qty_per
 
-        sub_rollup = bom_cost_rollup(part, bom_data, items_data, visited.copy())
-        component_cost = sub_rollup["cost"] * effective_qty
+def bom_cost_rollup(item_no, bom_data=None, items_data=None, visited=None):
+    """Multi-level BOM cost rollup.
+    Reads the current-revision BOM hierarchy (bom_graph), with component costs from MISys + Sage (READ-ONLY)
+    rolled up once per snapshot (get_cost_rollup)."""
+    return get_cost_rollup(bom_data, items_data).tree(item_no, visited)
 
-        components.append({
-            "part_no": part,
-            "qty_per": qty_per,
-            "scrap_factor": scrap,
-            "unit_cost": sub_rollup["cost"],
-            "ext_cost": round(component_cost, 4),
-            "sub_components": sub_rollup.get("components", []),
-        })
-        total_cost += component_cost
 
-    return {
-        "item_no": item_no,
-        "cost": round(total_cost, 4),
-        "components": components,
-        "is_leaf": False,
-    }
+def _unit_cogs(item, rollup):
+    unit_cogs = rollup.cost(item)
+    if unit_cogs == 0:
+        unit_cogs = rollup.sage_costs.get(item, {}).get("cost", 0)
+    return unit_cogs
 
 
-def cogs_for_so(so_no, bom_data=None, items_data=None):
-    """Calculate Cost of Goods Sold for a Sales Order.
-    COGS = BOM rollup cost x shipped quantity."""
-    try:
-        lines = db_service.fetch_all(
-            """SELECT sol.* FROM core.sales_order_lines sol
-               JOIN core.sales_orders so ON so.id = sol.so_id
-               WHERE so.so_no = %s""",
-            (so_no,)
-        )
-    except Exception:
-        lines = []
-
-    sage_costs = _get_sage_costs()
+def _cogs_for_lines(so_no, lines, rollup):
     total_cogs = 0
     line_cogs = []
 
@@ -124,11 +196,7 @@ def cogs_for_so(so_no, bom_data=None, items_data=None):
         if shipped <= 0:
             continue
 
-        rollup = bom_cost_rollup(item, bom_data, items_data)
-        unit_cogs = rollup["cost"]
-        if unit_cogs == 0:
-            unit_cogs = sage_costs.get(item, {}).get("cost", 0)
-
+        unit_cogs = _unit_cogs(item, rollup)
         line_total = unit_cogs * shipped
         total_cogs += line_total
 
@@ -142,6 +210,21 @@ def cogs_for_so(so_no, bom_data=None, items_data=None):
     return {"so_no": so_no, "total_cogs": round(total_cogs, 2), "lines": line_cogs}
 
 
+def cogs_for_so(so_no, bom_data=None, items_data=None):
+    """Calculate Cost of Goods Sold for a Sales Order.
+    COGS = BOM rollup cost x shipped quantity."""
+    try:
+        lines = db_service.fetch_all(
+            """SELECT sol.* FROM core.sales_order_lines sol
+               JOIN core.sales_orders so ON so.id = sol.so_id
+               WHERE so.so_no = %s""",
+            (so_no,)
+        )
+    except Exception:
+        lines = []
+    return _cogs_for_lines(so_no, lines, get_cost_rollup(bom_data, items_data))
+
+
 def margin_for_so(so_no, bom_data=None, items_data=None):
     """Margin = SO revenue - COGS."""
     try:
@@ -167,7 +250,7 @@ def margin_for_so(so_no, bom_data=None, items_data=None):
 
 def cost_variance_report(items_data=None):
     """Standard cost vs actual (Sage last cost) per item."""
-    sage_costs = _get_sage_costs()
+    _, sage_costs = _sage_cost_snapshot()
     misys_costs = _get_misys_costs(items_data)
 
     report = []
@@ -209,7 +292,7 @@ def margin_by_customer():
 
 
 def margin_by_order(bom_data=None, items_data=None):
-    """Margin per order: SO revenue - COGS for each SO."""
+    """Margin per order: SO revenue - COGS for each SO (one line query, costs from the cached rollup)."""
     try:
         orders = db_service.fetch_all(
             """SELECT so_no, customer_name, total, status
@@ -217,10 +300,20 @@ def margin_by_order(bom_data=None, items_data=None):
                WHERE source = 'portal' AND status NOT IN ('draft', 'cancelled')
                ORDER BY created_at DESC"""
         )
+        lines = db_service.fetch_all(
+            """SELECT so.so_no, sol.item_no, sol.qty_shipped
+               FROM core.sales_order_lines sol
+               JOIN core.sales_orders so ON so.id = sol.so_id
+               WHERE so.source = 'portal' AND so.status NOT IN ('draft', 'cancelled')"""
+        )
+        lines_by_so = {}
+        for line in lines:
+            lines_by_so.setdefault(line["so_no"], []).append(line)
+        rollup = get_cost_rollup(bom_data, items_data)
         results = []
         for so in orders:
             revenue = float(so.get("total") or 0)
-            cogs_data = cogs_for_so(so["so_no"], bom_data, items_data)
+            cogs_data = _cogs_for_lines(so["so_no"], lines_by_so.get(so["so_no"], []), rollup)
             cogs_val = cogs_data.get("total_cogs", 0)
             margin = revenue - cogs_val
             margin_pct = round((margin / revenue * 100), 2) if revenue > 0 else 0
@@ -251,14 +344,13 @@ def margin_by_product(bom_data=None, items_data=None):
                GROUP BY sol.item_no
                ORDER BY total_revenue DESC"""
         )
-        sage_costs = _get_sage_costs()
-        misys_costs = _get_misys_costs(items_data)
+        rollup = get_cost_rollup(bom_data, items_data)
         results = []
         for line in lines:
             item = line["item_no"]
             revenue = float(line.get("total_revenue") or 0)
             shipped = float(line.get("total_shipped") or 0)
-            unit_cost = sage_costs.get(item, {}).get("cost", 0) or misys_costs.get(item, {}).get("cost", 0)
+            unit_cost = _unit_cogs(item, rollup)
             cogs_val = unit_cost * shipped
             margin = revenue - cogs_val
             margin_pct = round((margin / revenue * 100), 2) if revenue > 0 else 0
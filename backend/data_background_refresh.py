@@ -0,0 +1,130 @@
+"""
+Data Background Refresh Service
+Watches the /api/data sources (latest Full Company Data folder on G: or Drive, live SQL bridge version, API Extractions
+folder) and rebuilds the cached response in a worker thread when a new export appears. Requests keep getting the
+previous snapshot until the new one is swapped in, so no user waits for a full load after sync_to_gdrive writes a folder.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+
+class DataBackgroundRefresh:
+    """Background watcher for the shared /api/data ResponseCache (data_payload.ResponseCache)."""
+
+    def __init__(self, cache, interval_seconds=None):
+        self.cache = cache
+        self.interval_seconds = interval_seconds or int(os.getenv("DATA_REFRESH_INTERVAL_SECONDS") or 120)
+        self.is_running = False
+        self.refresh_thread = None
+        self.last_check = None
+        self.refresh_count = 0
+        self.last_refresh = None
+        self.last_error = None
+        self._sources = {}  # source_key -> {"identity_fn", "loader", "overlay_fn", "identity", "checked_at"}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def register(self, source_key, identity_fn, loader, overlay_fn=None):
+        """Watch source_key from now on (called on every request, so the latest loader is used)."""
+        with self._lock:
+            src = self._sources.setdefault(source_key, {"identity": None, "checked_at": 0})
+            src["identity_fn"] = identity_fn
+            src["loader"] = loader
+            src["overlay_fn"] = overlay_fn
+        if not self.is_running:
+            self.start_background_refresh()
+
+    def identity(self, source_key, identity_fn, max_age=None):
+        """Identity last seen by the watcher when recent enough, else computed now (and remembered)."""
+        max_age = self.interval_seconds * 2 if max_age is None else max_age
+        with self._lock:
+            src = self._sources.get(source_key)
+            if src is not None and src["checked_at"] and time.time() - src["checked_at"] < max_age:
+                return src["identity"]
+        identity = identity_fn()
+        with self._lock:
+            src = self._sources.setdefault(source_key, {"identity": None, "checked_at": 0})
+            src["identity"] = identity
+            src["checked_at"] = time.time()
+        return identity
+
+    def start_background_refresh(self):
+        """Start the watcher thread (idempotent)."""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self.refresh_thread = threading.Thread(target=self._background_worker, name="data-background-refresh", daemon=True)
+            self.refresh_thread.start()
+        print(f"[data_refresh] Background refresh started (checks every {self.interval_seconds}s)")
+
+    def stop_background_refresh(self):
+        self.is_running = False
+        self._wake.set()
+        if self.refresh_thread:
+            self.refresh_thread.join(timeout=5)
+        print("[data_refresh] Background refresh stopped")
+
+    def check_now(self):
+        """Wake the watcher for an immediate check (e.g. after sync_to_gdrive finished)."""
+        self._wake.set()
+
+    def _background_worker(self):
+        while self.is_running:
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            if not self.is_running:
+                break
+            try:
+                self._check_sources()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[data_refresh] Background worker error: {e}")
+
+    def _check_sources(self):
+        self.last_check = datetime.now()
+        with self._lock:
+            sources = {k: dict(v) for k, v in self._sources.items() if v.get("identity_fn")}
+        for source_key, src in sources.items():
+            try:
+                identity = src["identity_fn"]()
+            except Exception as e:
+                self.last_error = f"{source_key}: {e}"
+                print(f"[data_refresh] {source_key}: identity check failed: {e}")
+                continue
+            with self._lock:
+                self._sources[source_key]["identity"] = identity
+                self._sources[source_key]["checked_at"] = time.time()
+            entry = self.cache.peek(source_key)
+            if entry is None or entry.identity == identity or self.cache.loading(source_key):
+                continue
+            overlay = src["overlay_fn"]() if src.get("overlay_fn") else None
+            print(f"[data_refresh] {source_key}: new data detected, rebuilding in background...")
+            start = time.time()
+            result = self.cache.refresh(source_key, identity, src["loader"], overlay=overlay)
+            if result is self.cache.peek(source_key) and result is not None:
+                self.refresh_count += 1
+                self.last_refresh = datetime.now()
+                print(f"[data_refresh] {source_key}: swapped in version {result.version} ({time.time() - start:.1f}s)")
+            else:
+                self.last_error = f"{source_key}: reload did not return data"
+                print(f"[data_refresh] {source_key}: reload did not return data - keeping previous snapshot")
+
+    def get_status(self):
+        with self._lock:
+            watched = {k: {"identity": repr(v.get("identity")),
+                           "checked_seconds_ago": round(time.time() - v["checked_at"], 1) if v.get("checked_at") else None}
+                       for k, v in self._sources.items()}
+        return {
+            "is_running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "refresh_count": self.refresh_count,
+            "last_error": self.last_error,
+            "sources": watched,
+            "cache": self.cache.stats(),
+        }
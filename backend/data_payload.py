@@ -0,0 +1,297 @@
+"""
+/api/data payload: per-table serialization, versioning and streamed (gzip/br) responses.
+
+The data dict is serialized one table at a time (each table once per load). Each table gets a content hash;
+the payload version (also used as the ETag) is a hash over the table hashes. Recent versions are remembered per
+source so /api/data/delta?since=<version> can send only the tables that changed since the client's copy.
+Responses are written table by table and compressed on the fly, so the full JSON string is never built.
+
+ResponseCache holds one CachedResponse per source (Full Company Data, live SQL, legacy API Extractions) keyed by an
+identity (folder + file stats, Drive folder id, bridge version) and the portal_store change token. Compressed bodies are
+built once per entry, concurrent requests for the same source share a single load (single-flight), and a changed source
+can be rebuilt in the background while the previous entry keeps being served (stale-while-revalidate).
+"""
+import json
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_STREAM_SLICE = 256 * 1024  # compress/yield large tables in slices so the first bytes go out early
+_HISTORY_SIZE = 16  # versions remembered per source for delta requests
+
+_history_lock = threading.Lock()
+_history = {}  # source key -> OrderedDict(version -> {table: hash})
+
+
+class DataPayload:
+    """Serialized tables of one loaded data dict. tables: key -> JSON bytes; hashes: key -> hex digest."""
+
+    def __init__(self, data, default=None):
+        self.tables = OrderedDict()
+        self.hashes = {}
+        for key, value in (data or {}).items():
+            raw = json.dumps(value, default=default).encode("utf-8")
+            self.tables[key] = raw
+            self.hashes[key] = hashlib.blake2b(raw, digest_size=12).hexdigest()
+        digest = hashlib.blake2b(digest_size=12)
+        for key in self.tables:
+            digest.update(key.encode("utf-8"))
+            digest.update(self.hashes[key].encode("ascii"))
+        self.version = digest.hexdigest()
+        self.size = sum(len(v) for v in self.tables.values())
+
+    def changed_since(self, old_hashes):
+        """(changed table keys, removed table keys) relative to an older {table: hash} map."""
+        changed = [k for k, h in self.hashes.items() if old_hashes.get(k) != h]
+        removed = [k for k in old_hashes if k not in self.hashes]
+        return changed, removed
+
+    def iter_json(self, envelope, tables=None, default=None):
+        """Yield the response JSON as bytes: {"data": {<tables>}, <envelope keys>}; tables=None means all."""
+        yield b'{"data": {'
+        first = True
+        for key in (self.tables if tables is None else tables):
+            raw = self.tables.get(key)
+            if raw is None:
+                continue
+            yield (b"" if first else b", ") + json.dumps(key).encode("utf-8") + b": "
+            first = False
+            for i in range(0, len(raw), _STREAM_SLICE):
+                yield raw[i:i + _STREAM_SLICE]
+        yield b"}"
+        for key, value in (envelope or {}).items():
+            yield b", " + json.dumps(key).encode("utf-8") + b": " + json.dumps(value, default=default).encode("utf-8")
+        yield b"}"
+
+
+class CachedResponse:
+    """One loaded source: data dict, envelope (with "version"), serialized payload and compressed bodies built on first use."""
+
+    def __init__(self, source_key, identity, data, envelope, default=None, overlay=None):
+        self.source_key = source_key
+        self.identity = identity
+        self.overlay = overlay
+        self.data = data
+        self.default = default
+        self.payload = DataPayload(data, default=default)
+        self.envelope = dict(envelope)
+        self.envelope["version"] = self.payload.version
+        self.created = time.time()
+        self._bodies = {}
+        self._lock = threading.Lock()
+        remember(source_key, self.payload)
+
+    @property
+    def version(self):
+        return self.payload.version
+
+    def body(self, encoding):
+        """Full compressed response body for encoding ('gzip'/'br'); built once, then served as-is."""
+        with self._lock:
+            body = self._bodies.get(encoding)
+            if body is None:
+                body = b"".join(compress_stream(self.payload.iter_json(self.envelope, default=self.default), encoding))
+                self._bodies[encoding] = body
+            return body
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class ResponseCache:
+    """
+    Source key -> CachedResponse. An entry is fresh while its identity and overlay token match and it is younger than
+    ttl_seconds. With stale_ok, an entry whose overlay token still matches is served even when its identity changed or it
+    expired, and the new one is built in a background thread and swapped in when ready (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl_seconds, default=None):
+        self.ttl_seconds = ttl_seconds
+        self.default = default
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.loads = 0
+        self.background_loads = 0
+        self.shared = 0
+
+    def _fresh(self, entry, identity, overlay):
+        return (entry is not None and entry.identity == identity and entry.overlay == overlay
+                and time.time() - entry.created < self.ttl_seconds)
+
+    def peek(self, source_key):
+        with self._lock:
+            return self._entries.get(source_key)
+
+    def loading(self, source_key):
+        with self._lock:
+            return source_key in self._flights
+
+    def get_or_load(self, source_key, identity, loader, force=False, overlay=None, stale_ok=False):
+        """
+        Return the CachedResponse for source_key, loading it with loader() when missing, stale or force=True.
+        loader() returns (data, envelope) dicts to cache, or anything else (e.g. an error response, a (response, status)
+        tuple or None) which is passed through uncached. Requests arriving while a load is running wait for it instead
+        of starting their own (unless stale_ok lets them keep using the previous entry).
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(source_key)
+                if not force and self._fresh(entry, identity, overlay):
+                    self.hits += 1
+                    return entry
+                if stale_ok and not force and entry is not None and entry.overlay == overlay:
+                    self.stale_hits += 1
+                    if source_key not in self._flights:
+                        self._start_background(source_key, identity, loader, overlay)
+                    return entry
+                flight = self._flights.get(source_key)
+                owner = flight is None
+                if owner:
+                    flight = _Flight()
+                    self._flights[source_key] = flight
+            if not owner:
+                flight.done.wait()
+                if flight.entry is not None:
+                    with self._lock:
+                        self.shared += 1
+                    return flight.entry
+                force = False  # the shared load did not produce data: load (or fail) on our own
+                continue
+            return self._run_flight(source_key, flight, identity, loader, overlay)
+
+    def refresh(self, source_key, identity, loader, overlay=None):
+        """Load source_key now (joining a running load if any) and swap the new entry in; returns the entry or the loader's result."""
+        with self._lock:
+            flight = self._flights.get(source_key)
+            owner = flight is None
+            if owner:
+                flight = _Flight()
+                self._flights[source_key] = flight
+        if not owner:
+            flight.done.wait()
+            return flight.entry
+        return self._run_flight(source_key, flight, identity, loader, overlay)
+
+    def _start_background(self, source_key, identity, loader, overlay):
+        """Caller holds self._lock and has checked no load is running for source_key."""
+        flight = _Flight()
+        self._flights[source_key] = flight
+        self.background_loads += 1
+
+        def _run():
+            try:
+                self._run_flight(source_key, flight, identity, loader, overlay)
+            except Exception as e:
+                print(f"[data_payload] background load of {source_key} failed: {e}")
+
+        threading.Thread(target=_run, name=f"data-refresh-{source_key}", daemon=True).start()
+
+    def _run_flight(self, source_key, flight, identity, loader, overlay):
+        try:
+            result = loader()
+            if isinstance(result, tuple) and len(result) == 2 and all(isinstance(r, dict) for r in result):
+                data, envelope = result
+                flight.entry = CachedResponse(source_key, identity, data, envelope, default=self.default, overlay=overlay)
+                with self._lock:
+                    self._entries[source_key] = flight.entry  # atomic swap: readers see the old or the new entry
+                    self.loads += 1
+                return flight.entry
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(source_key, None)
+            flight.done.set()
+
+    def invalidate(self, source_key=None):
+        with self._lock:
+            if source_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(source_key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "loads": self.loads,
+                "background_loads": self.background_loads,
+                "shared": self.shared,
+                "sources": {k: {"version": e.version, "age_seconds": round(time.time() - e.created, 1), "bytes": e.payload.size,
+                                "loading": k in self._flights}
+                            for k, e in self._entries.items()},
+            }
+
+
+def remember(source_key, payload):
+    """Record payload's table hashes so later delta requests against this version can be answered."""
+    with _history_lock:
+        versions = _history.setdefault(source_key, OrderedDict())
+        versions[payload.version] = dict(payload.hashes)
+        versions.move_to_end(payload.version)
+        while len(versions) > _HISTORY_SIZE:
+            versions.popitem(last=False)
+
+
+def hashes_for_version(source_key, version):
+    """Table hashes recorded for an earlier version of this source, or None if unknown/evicted."""
+    with _history_lock:
+        return (_history.get(source_key) or {}).get(version)
+
+
+def choose_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (br only when the brotli module is installed)."""
+    accepted = {p.split(";")[0].strip().lower() for p in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks incrementally with gzip or br; encoding=None passes through."""
+    if encoding is None:
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+        return
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=4)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        out = compress(chunk)
+        if out:
+            yield out
+    out = finish()
+    if out:
+        yield out
+
+
+def etag_matches(if_none_match, version):
+    """True when an If-None-Match header names this version (quoted, weak or '*')."""
+    if not if_none_match or not version:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag.strip('"') == version:
+            return True
+    return False
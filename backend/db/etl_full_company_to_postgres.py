@@ -18,7 +18,11 @@ Requires: psycopg2 or psycopg2-binary.
 import json
 import os
 import sys
+import time
+import hashlib
+import tempfile
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from datetime import datetime
 
@@ -80,266 +84,204 @@ def _d(val):
     return None
 
 
-def load_staging(conn, data: dict, source_file_default: str = "export") -> None:
-    """Insert all sections into staging.*_raw. data = app data dict (e.g. from load_from_folder)."""
-    cur = conn.cursor()
+def _col(*keys):
+    """Staging key column: first non-empty value for keys, else NULL."""
+    return lambda row, i: _v(row, *keys) or None
 
-    # MIITEM / Items
-    for key in ("Items.json", "MIITEM.json"):
-        rows = data.get(key) or []
-        if not rows:
-            continue
-        for i, row in enumerate(rows):
-            item_id = _v(row, "Item No.", "itemId", "Item Number") or ""
-            cur.execute(
-                """INSERT INTO staging.miitem_raw (source_file, row_num, item_id, data) VALUES (%s,%s,%s,%s)""",
-                (source_file_default, i + 1, item_id or None, Json(_to_jsonb(row))),
-            )
-        if rows:
-            break
 
-    # MIITEMX
-    for i, row in enumerate(data.get("MIITEMX.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        cur.execute(
-            """INSERT INTO staging.miitemx_raw (source_file, row_num, item_id, data) VALUES (%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, Json(_to_jsonb(row))),
-        )
+def _rev(*keys):
+    """PO revision column: text, defaulting to '0'."""
+    return lambda row, i: str(_v(row, *keys) or "0")
 
-    # MIITEMA
-    for i, row in enumerate(data.get("MIITEMA.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        alt = _v(row, "Alternate Item No.", "altItemId") or ""
-        cur.execute(
-            """INSERT INTO staging.miitema_raw (source_file, row_num, item_id, alt_item_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, alt or None, Json(_to_jsonb(row))),
-        )
 
-    # MIILOCQT
-    for i, row in enumerate(data.get("MIILOCQT.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        cur.execute(
-            """INSERT INTO staging.miilocqt_raw (source_file, row_num, item_id, loc_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, loc_id or None, Json(_to_jsonb(row))),
-        )
+def _bom_id(row, i):
+    return _v(row, "BOM Item", "bomItem", "Parent Item No.") or _v(row, "Revision No.", "bomRev") or str(i)
 
-    # MIBINQ
-    for i, row in enumerate(data.get("MIBINQ.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        bin_id = _v(row, "Bin No.", "binId") or ""
-        cur.execute(
-            """INSERT INTO staging.mibinq_raw (source_file, row_num, item_id, loc_id, bin_id, data) VALUES (%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, loc_id or None, bin_id or None, Json(_to_jsonb(row))),
-        )
 
+# staging table -> (app data keys, first non-empty one is loaded; [(column, extractor(row, index))])
+STAGING_TABLES = [
+    ("miitem_raw", ("Items.json", "MIITEM.json"), [("item_id", _col("Item No.", "itemId", "Item Number"))]),
+    ("miitemx_raw", ("MIITEMX.json",), [("item_id", _col("Item No.", "itemId"))]),
+    ("miitema_raw", ("MIITEMA.json",), [("item_id", _col("Item No.", "itemId")),
+                                        ("alt_item_id", _col("Alternate Item No.", "altItemId"))]),
+    ("miilocqt_raw", ("MIILOCQT.json",), [("item_id", _col("Item No.", "itemId")), ("loc_id", _col("Location No.", "locId"))]),
+    ("mibinq_raw", ("MIBINQ.json",), [("item_id", _col("Item No.", "itemId")), ("loc_id", _col("Location No.", "locId")),
+                                      ("bin_id", _col("Bin No.", "binId"))]),
     # MISLBINQ (lot qty by bin)
-    for i, row in enumerate(data.get("MISLBINQ.json") or []):
-        prnt_item_id = _v(row, "Item No.", "itemId", "Parent Item No.", "prntItemId") or ""
-        lot_id = _v(row, "Lot No.", "lotId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        bin_id = _v(row, "Bin No.", "binId") or ""
-        cur.execute(
-            """INSERT INTO staging.mislbinq_raw (source_file, row_num, prnt_item_id, lot_id, loc_id, bin_id, data) VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt_item_id or None, lot_id or None, loc_id or None, bin_id or None, Json(_to_jsonb(row))),
-        )
-
+    ("mislbinq_raw", ("MISLBINQ.json",), [("prnt_item_id", _col("Item No.", "itemId", "Parent Item No.", "prntItemId")),
+                                          ("lot_id", _col("Lot No.", "lotId")), ("loc_id", _col("Location No.", "locId")),
+                                          ("bin_id", _col("Bin No.", "binId"))]),
     # MIBINH (bin movement history)
-    for i, row in enumerate(data.get("MIBINH.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        bin_id = _v(row, "Bin No.", "binId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry") or ""
-        cur.execute(
-            """INSERT INTO staging.mibinh_raw (source_file, row_num, item_id, loc_id, bin_id, tran_date, entry, data) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, loc_id or None, bin_id or None, tran_date or None, entry or None, Json(_to_jsonb(row))),
-        )
-
-    # MILOGH
-    for i, row in enumerate(data.get("MILOGH.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        user_id = _v(row, "User", "userId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry") or ""
-        cur.execute(
-            """INSERT INTO staging.milogh_raw (source_file, row_num, item_id, loc_id, user_id, tran_date, entry, data) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, loc_id or None, user_id or None, tran_date or None, entry or None, Json(_to_jsonb(row))),
-        )
-
-    # MILOGD (log detail)
-    for i, row in enumerate(data.get("MILOGD.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry") or ""
-        detail = _v(row, "Detail", "detail") or ""
-        cur.execute(
-            """INSERT INTO staging.milogd_raw (source_file, row_num, item_id, tran_date, entry, detail, data) VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, tran_date or None, entry or None, detail or None, Json(_to_jsonb(row))),
-        )
-
-    # MILOGB (log bin breakdown)
-    for i, row in enumerate(data.get("MILOGB.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry") or ""
-        detail = _v(row, "Detail", "detail") or ""
-        cur.execute(
-            """INSERT INTO staging.milogb_raw (source_file, row_num, item_id, tran_date, entry, detail, data) VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, tran_date or None, entry or None, detail or None, Json(_to_jsonb(row))),
-        )
-
+    ("mibinh_raw", ("MIBINH.json",), [("item_id", _col("Item No.", "itemId")), ("loc_id", _col("Location No.", "locId")),
+                                      ("bin_id", _col("Bin No.", "binId")),
+                                      ("tran_date", _col("Transaction Date", "tranDate", "tranDt")), ("entry", _col("Entry", "entry"))]),
+    ("milogh_raw", ("MILOGH.json",), [("item_id", _col("Item No.", "itemId")), ("loc_id", _col("Location No.", "locId")),
+                                      ("user_id", _col("User", "userId")),
+                                      ("tran_date", _col("Transaction Date", "tranDate", "tranDt")), ("entry", _col("Entry", "entry"))]),
+    # MILOGD (log detail), MILOGB (log bin breakdown)
+    ("milogd_raw", ("MILOGD.json",), [("item_id", _col("Item No.", "itemId")),
+                                      ("tran_date", _col("Transaction Date", "tranDate", "tranDt")),
+                                      ("entry", _col("Entry", "entry")), ("detail", _col("Detail", "detail"))]),
+    ("milogb_raw", ("MILOGB.json",), [("item_id", _col("Item No.", "itemId")),
+                                      ("tran_date", _col("Transaction Date", "tranDate", "tranDt")),
+                                      ("entry", _col("Entry", "entry")), ("detail", _col("Detail", "detail"))]),
     # LotSerialHistory / MISLTH-style
-    lot_hist = data.get("LotSerialHistory.json") or data.get("MISLHIST.json") or []
-    for i, row in enumerate(lot_hist):
-        prnt = _v(row, "Parent Item No.", "prntItemId", "Item No.", "itemId") or ""
-        lot_id = _v(row, "Lot No.", "lotId", "SL No.") or ""
-        user_id = _v(row, "User", "userId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry") or ""
-        detail = _v(row, "Detail", "detail") or ""
-        cur.execute(
-            """INSERT INTO staging.mislth_raw (source_file, row_num, prnt_item_id, lot_id, user_id, tran_date, entry, detail, data) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt or None, lot_id or None, user_id or None, tran_date or None, entry or None, detail or None, Json(_to_jsonb(row))),
-        )
-    for i, row in enumerate(data.get("MISLHIST.json") or []):
-        prnt = _v(row, "Parent Item No.", "prntItemId", "Item No.", "itemId") or ""
-        lot_id = _v(row, "Lot No.", "lotId") or ""
-        cur.execute(
-            """INSERT INTO staging.mislhist_raw (source_file, row_num, prnt_item_id, lot_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt or None, lot_id or None, Json(_to_jsonb(row))),
-        )
-
+    ("mislth_raw", ("LotSerialHistory.json", "MISLHIST.json"),
+     [("prnt_item_id", _col("Parent Item No.", "prntItemId", "Item No.", "itemId")), ("lot_id", _col("Lot No.", "lotId", "SL No.")),
+      ("user_id", _col("User", "userId")), ("tran_date", _col("Transaction Date", "tranDate", "tranDt")),
+      ("entry", _col("Entry", "entry")), ("detail", _col("Detail", "detail"))]),
+    ("mislhist_raw", ("MISLHIST.json",), [("prnt_item_id", _col("Parent Item No.", "prntItemId", "Item No.", "itemId")),
+                                          ("lot_id", _col("Lot No.", "lotId"))]),
     # MISLTD (LotSerialDetail)
-    for i, row in enumerate(data.get("LotSerialDetail.json") or data.get("MISLTD.json") or []):
-        prnt_item_id = _v(row, "Parent Item No.", "prntItemId", "Item No.", "itemId") or ""
-        prnt_lot_id = _v(row, "Lot No.", "prntLotId", "lotId", "SL No.") or ""
-        user_id = _v(row, "User", "userId") or ""
-        tran_date = _v(row, "Transaction Date", "tranDate", "tranDt") or ""
-        entry = _v(row, "Entry", "entry", "Serial No.") or ""
-        detail = _v(row, "Detail", "detail") or ""
-        cur.execute(
-            """INSERT INTO staging.misltd_raw (source_file, row_num, prnt_item_id, prnt_lot_id, user_id, tran_date, entry, detail, data) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt_item_id or None, prnt_lot_id or None, user_id or None, tran_date or None, entry or None, detail or None, Json(_to_jsonb(row))),
-        )
-
-    # MISLNH, MISLND
-    for i, row in enumerate(data.get("MISLNH.json") or []):
-        prnt = _v(row, "Parent Item No.", "prntItemId", "Item No.", "itemId") or ""
-        lot_id = _v(row, "Lot No.", "lotId") or ""
-        cur.execute(
-            """INSERT INTO staging.mislnh_raw (source_file, row_num, prnt_item_id, lot_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt or None, lot_id or None, Json(_to_jsonb(row))),
-        )
-    for i, row in enumerate(data.get("MISLND.json") or []):
-        prnt = _v(row, "Parent Item No.", "prntItemId", "Item No.", "itemId") or ""
-        lot_id = _v(row, "Lot No.", "lotId") or ""
-        cur.execute(
-            """INSERT INTO staging.mislnd_raw (source_file, row_num, prnt_item_id, lot_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, prnt or None, lot_id or None, Json(_to_jsonb(row))),
-        )
+    ("misltd_raw", ("LotSerialDetail.json", "MISLTD.json"),
+     [("prnt_item_id", _col("Parent Item No.", "prntItemId", "Item No.", "itemId")),
+      ("prnt_lot_id", _col("Lot No.", "prntLotId", "lotId", "SL No.")), ("user_id", _col("User", "userId")),
+      ("tran_date", _col("Transaction Date", "tranDate", "tranDt")), ("entry", _col("Entry", "entry", "Serial No.")),
+      ("detail", _col("Detail", "detail"))]),
+    ("mislnh_raw", ("MISLNH.json",), [("prnt_item_id", _col("Parent Item No.", "prntItemId", "Item No.", "itemId")),
+                                      ("lot_id", _col("Lot No.", "lotId"))]),
+    ("mislnd_raw", ("MISLND.json",), [("prnt_item_id", _col("Parent Item No.", "prntItemId", "Item No.", "itemId")),
+                                      ("lot_id", _col("Lot No.", "lotId"))]),
+    ("mibomh_raw", ("MIBOMH.json", "BillsOfMaterial.json"), [("bom_id", _bom_id),
+                                                             ("parent_item_id", _col("Parent Item No.", "BOM Item", "bomItem"))]),
+    ("mibomd_raw", ("MIBOMD.json", "BillOfMaterialDetails.json"), [("bom_id", _col("Parent Item No.", "BOM Item", "bomItem")),
+                                                                   ("part_id", _col("Component Item No.", "partId", "Part Id"))]),
+    ("mimoh_raw", ("MIMOH.json", "ManufacturingOrderHeaders.json"),
+     [("moh_id", _col("Mfg. Order No.", "mohId")), ("build_item_id", _col("Build Item No.", "buildItem", "Item No.")),
+      ("loc_id", _col("Location No.", "locId"))]),
+    ("mimomd_raw", ("MIMOMD.json", "ManufacturingOrderDetails.json"),
+     [("moh_id", _col("Mfg. Order No.", "mohId")), ("part_id", _col("Component Item No.", "partId", "Item No."))]),
+    ("mipoh_raw", ("MIPOH.json", "PurchaseOrders.json"),
+     [("poh_id", _col("PO No.", "pohId", "poNo")), ("poh_rev", _rev("Revision", "poRev", "PO Rev")),
+      ("supl_id", _col("Supplier No.", "suplId", "Name", "Vendor"))]),
+    ("mipod_raw", ("MIPOD.json", "PurchaseOrderDetails.json"),
+     [("poh_id", _col("PO No.", "pohId")), ("poh_rev", _rev("Revision", "poRev")), ("pod_id", _col("Line", "podId", "Line No.")),
+      ("item_id", _col("Item No.", "itemId", "Component Item No."))]),
+    # MIPOHX (PO extensions)
+    ("mipohx_raw", ("MIPOHX.json", "PurchaseOrderExtensions.json"),
+     [("poh_id", _col("PO No.", "pohId", "poNo")), ("poh_rev", _rev("Revision", "poRev", "PO Rev"))]),
+    ("misupl_raw", ("MISUPL.json",), [("supl_id", _col("Supplier No.", "suplId"))]),
+    # MIQSUP (supplier–item links)
+    ("miqsup_raw", ("MIQSUP.json",), [("supl_id", _col("Supplier No.", "suplId")), ("item_id", _col("Item No.", "itemId"))]),
+    ("miicst_raw", ("MIICST.json",), [("item_id", _col("Item No.", "itemId")), ("loc_id", _col("Location No.", "locId")),
+                                      ("trans_date", _col("Transaction Date", "transDate", "transDt")),
+                                      ("seq_no", _col("Seq No.", "seqNo"))]),
+    ("miuser_raw", ("MIUSER.json",), [("user_id", _col("User", "userId"))]),
+]
 
-    # MIBOMH, MIBOMD
-    for i, row in enumerate(data.get("MIBOMH.json") or data.get("BillsOfMaterial.json") or []):
-        bom_id = _v(row, "BOM Item", "bomItem", "Parent Item No.") or _v(row, "Revision No.", "bomRev") or str(i)
-        parent = _v(row, "Parent Item No.", "BOM Item", "bomItem") or ""
-        cur.execute(
-            """INSERT INTO staging.mibomh_raw (source_file, row_num, bom_id, parent_item_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, bom_id or None, parent or None, Json(_to_jsonb(row))),
-        )
-    for i, row in enumerate(data.get("MIBOMD.json") or data.get("BillOfMaterialDetails.json") or []):
-        bom_id = _v(row, "Parent Item No.", "BOM Item", "bomItem") or ""
-        part_id = _v(row, "Component Item No.", "partId", "Part Id") or ""
-        cur.execute(
-            """INSERT INTO staging.mibomd_raw (source_file, row_num, bom_id, part_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, bom_id or None, part_id or None, Json(_to_jsonb(row))),
-        )
+# Staging tables loaded concurrently (each on its own short-lived connection when a DSN is given)
+STAGING_WORKERS = max(1, int(os.environ.get("ETL_STAGING_WORKERS", "4")))
+_COPY_SPOOL_BYTES = 64 * 1024 * 1024  # COPY payloads above this spill from memory to a temp file
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
 
-    # MIMOH, MIMOMD
-    for i, row in enumerate(data.get("MIMOH.json") or data.get("ManufacturingOrderHeaders.json") or []):
-        moh_id = _v(row, "Mfg. Order No.", "mohId") or ""
-        build = _v(row, "Build Item No.", "buildItem", "Item No.") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        cur.execute(
-            """INSERT INTO staging.mimoh_raw (source_file, row_num, moh_id, build_item_id, loc_id, data) VALUES (%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, moh_id or None, build or None, loc_id or None, Json(_to_jsonb(row))),
-        )
-    for i, row in enumerate(data.get("MIMOMD.json") or data.get("ManufacturingOrderDetails.json") or []):
-        moh_id = _v(row, "Mfg. Order No.", "mohId") or ""
-        part_id = _v(row, "Component Item No.", "partId", "Item No.") or ""
-        cur.execute(
-            """INSERT INTO staging.mimomd_raw (source_file, row_num, moh_id, part_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, moh_id or None, part_id or None, Json(_to_jsonb(row))),
-        )
 
-    # MIPOH, MIPOD
-    for i, row in enumerate(data.get("MIPOH.json") or data.get("PurchaseOrders.json") or []):
-        poh_id = _v(row, "PO No.", "pohId", "poNo") or ""
-        poh_rev = str(_v(row, "Revision", "poRev", "PO Rev") or "0")
-        supl_id = _v(row, "Supplier No.", "suplId", "Name", "Vendor") or ""
-        cur.execute(
-            """INSERT INTO staging.mipoh_raw (source_file, row_num, poh_id, poh_rev, supl_id, data) VALUES (%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, poh_id or None, poh_rev or None, supl_id or None, Json(_to_jsonb(row))),
-        )
-    for i, row in enumerate(data.get("MIPOD.json") or data.get("PurchaseOrderDetails.json") or []):
-        poh_id = _v(row, "PO No.", "pohId") or ""
-        poh_rev = str(_v(row, "Revision", "poRev") or "0")
-        pod_id = _v(row, "Line", "podId", "Line No.") or ""
-        item_id = _v(row, "Item No.", "itemId", "Component Item No.") or ""
-        cur.execute(
-            """INSERT INTO staging.mipod_raw (source_file, row_num, poh_id, poh_rev, pod_id, item_id, data) VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, poh_id or None, poh_rev or None, pod_id or None, item_id or None, Json(_to_jsonb(row))),
-        )
+def _copy_field(value):
+    """One value in COPY text format (NULL = \\N)."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
 
-    # MIPOHX (PO extensions)
-    for i, row in enumerate(data.get("MIPOHX.json") or data.get("PurchaseOrderExtensions.json") or []):
-        poh_id = _v(row, "PO No.", "pohId", "poNo") or ""
-        poh_rev = str(_v(row, "Revision", "poRev", "PO Rev") or "0")
-        cur.execute(
-            """INSERT INTO staging.mipohx_raw (source_file, row_num, poh_id, poh_rev, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, poh_id or None, poh_rev or None, Json(_to_jsonb(row))),
-        )
 
-    # MISUPL
-    for i, row in enumerate(data.get("MISUPL.json") or []):
-        supl_id = _v(row, "Supplier No.", "suplId") or ""
-        cur.execute(
-            """INSERT INTO staging.misupl_raw (source_file, row_num, supl_id, data) VALUES (%s,%s,%s,%s)""",
-            (source_file_default, i + 1, supl_id or None, Json(_to_jsonb(row))),
-        )
-
-    # MIQSUP (supplier–item links)
-    for i, row in enumerate(data.get("MIQSUP.json") or []):
-        supl_id = _v(row, "Supplier No.", "suplId") or ""
-        item_id = _v(row, "Item No.", "itemId") or ""
+def _staging_rows(data, sources):
+    for key in sources:
+        rows = data.get(key) or []
+        if rows:
+            return rows
+    return []
+
+
+def _spool_staging(table, columns, rows, source_file):
+    """Serialize rows as COPY text into a spooled file; returns (file rewound to 0, content hash)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=_COPY_SPOOL_BYTES, mode="w+b")
+    digest = hashlib.blake2b(digest_size=16)
+    batch = []
+    for i, row in enumerate(rows):
+        fields = [_copy_field(source_file), str(i + 1)]
+        fields.extend(_copy_field(extract(row, i)) for _, extract in columns)
+        fields.append(_copy_field(json.dumps(_to_jsonb(row))))
+        batch.append("\t".join(fields))
+        if len(batch) >= 5000:
+            chunk = ("\n".join(batch) + "\n").encode("utf-8")
+            digest.update(chunk)
+            spool.write(chunk)
+            batch = []
+    if batch:
+        chunk = ("\n".join(batch) + "\n").encode("utf-8")
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+def _load_staging_table(conn, table, columns, rows, source_file):
+    """
+    Replace staging.<table> with rows via COPY FROM STDIN in one transaction. Skipped when the serialized content
+    hash matches the last load (recorded in core.app_config as etl.staging.<table>). Returns rows copied (0 if skipped).
+    """
+    spool, content_hash = _spool_staging(table, columns, rows, source_file)
+    try:
+        cur = conn.cursor()
+        config_key = f"etl.staging.{table}"
+        cur.execute("SELECT value->>'hash' FROM core.app_config WHERE key = %s", (config_key,))
+        prev = cur.fetchone()
+        if prev and prev[0] == content_hash:
+            conn.rollback()
+            cur.close()
+            return 0
+        col_list = ", ".join(["source_file", "row_num"] + [c for c, _ in columns] + ["data"])
+        cur.execute(f"TRUNCATE staging.{table}")
+        cur.copy_expert(f"COPY staging.{table} ({col_list}) FROM STDIN", spool)
         cur.execute(
-            """INSERT INTO staging.miqsup_raw (source_file, row_num, supl_id, item_id, data) VALUES (%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, supl_id or None, item_id or None, Json(_to_jsonb(row))),
+            """INSERT INTO core.app_config (key, value) VALUES (%s, %s)
+               ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value""",
+            (config_key, Json({"hash": content_hash, "rows": len(rows)})),
         )
+        conn.commit()
+        cur.close()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        spool.close()
 
-    # MIICST
-    for i, row in enumerate(data.get("MIICST.json") or []):
-        item_id = _v(row, "Item No.", "itemId") or ""
-        loc_id = _v(row, "Location No.", "locId") or ""
-        trans_date = _v(row, "Transaction Date", "transDate", "transDt") or ""
-        seq_no = _v(row, "Seq No.", "seqNo") or ""
-        cur.execute(
-            """INSERT INTO staging.miicst_raw (source_file, row_num, item_id, loc_id, trans_date, seq_no, data) VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-            (source_file_default, i + 1, item_id or None, loc_id or None, trans_date or None, seq_no or None, Json(_to_jsonb(row))),
-        )
 
-    # MIUSER
-    for i, row in enumerate(data.get("MIUSER.json") or []):
-        user_id = _v(row, "User", "userId") or ""
-        cur.execute(
-            """INSERT INTO staging.miuser_raw (source_file, row_num, user_id, data) VALUES (%s,%s,%s,%s)""",
-            (source_file_default, i + 1, user_id or None, Json(_to_jsonb(row))),
-        )
+def load_staging(conn, data: dict, source_file_default: str = "export", dsn: str = None, workers: int = None) -> dict:
+    """
+    Load all sections into staging.*_raw. data = app data dict (e.g. from load_from_folder).
+    Each staging table is replaced by the current export (TRUNCATE + COPY FROM STDIN) unless its content is unchanged
+    since the last run. With dsn, tables load in parallel on their own connections (conn may then be None).
+    Returns {table: rows copied}.
+    """
+    jobs = [(table, columns, _staging_rows(data, sources)) for table, sources, columns in STAGING_TABLES]
+    jobs = [job for job in jobs if job[2]]
+    copied = {}
+    workers = workers or STAGING_WORKERS
+    if not dsn or workers <= 1:
+        own_conn = conn is None
+        conn = conn or psycopg2.connect(dsn)
+        try:
+            for table, columns, rows in jobs:
+                copied[table] = _load_staging_table(conn, table, columns, rows, source_file_default)
+        finally:
+            if own_conn:
+                conn.close()
+        return copied
+
+    def _run(job):
+        table, columns, rows = job
+        worker_conn = psycopg2.connect(dsn)
+        try:
+            return table, _load_staging_table(worker_conn, table, columns, rows, source_file_default)
+        finally:
+            worker_conn.close()
 
-    conn.commit()
-    cur.close()
+    # Largest tables first so they overlap with the many small ones
+    jobs.sort(key=lambda job: len(job[2]), reverse=True)
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs) or 1)) as ex:
+        for table, count in ex.map(_run, jobs):
+            copied[table] = count
+    return copied
 
 
 def _to_jsonb(obj):
@@ -372,6 +314,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE user_id IS NOT NULL AND user_id <> ''
         ON CONFLICT (user_id) DO UPDATE SET display_name = EXCLUDED.display_name, email = EXCLUDED.email,
             is_active = EXCLUDED.is_active, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.users.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 2) Items
@@ -387,6 +330,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE item_id IS NOT NULL AND item_id <> ''
         ON CONFLICT (item_id) DO UPDATE SET descr = EXCLUDED.descr, uom = EXCLUDED.uom, status = EXCLUDED.status,
             item_cost = EXCLUDED.item_cost, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.items.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 3) Item notes, alternates
@@ -397,6 +341,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE item_id IS NOT NULL AND item_id <> ''
         ON CONFLICT (item_id) DO UPDATE SET notes = EXCLUDED.notes, doc_path = EXCLUDED.doc_path,
             pic_path = EXCLUDED.pic_path, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.item_notes.raw IS DISTINCT FROM EXCLUDED.raw
     """)
     cur.execute("""
         INSERT INTO core.item_alternates (item_id, alt_item_id, relation, raw)
@@ -404,6 +349,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.miitema_raw
         WHERE item_id IS NOT NULL AND item_id <> '' AND alt_item_id IS NOT NULL AND alt_item_id <> ''
         ON CONFLICT (item_id, alt_item_id) DO UPDATE SET relation = EXCLUDED.relation, raw = EXCLUDED.raw
+        WHERE core.item_alternates.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 4) Inventory by location (only for items that exist in core.items)
@@ -418,6 +364,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE r.item_id IS NOT NULL AND r.item_id <> '' AND EXISTS (SELECT 1 FROM core.items i WHERE i.item_id = r.item_id)
         ON CONFLICT (item_id, loc_id) DO UPDATE SET qty_on_hand = EXCLUDED.qty_on_hand, qty_reserved = EXCLUDED.qty_reserved,
             qty_on_order = EXCLUDED.qty_on_order, raw = EXCLUDED.raw
+        WHERE core.inventory_by_location.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 5) Inventory by bin
@@ -430,6 +377,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE r.item_id IS NOT NULL AND r.item_id <> '' AND r.loc_id IS NOT NULL AND r.bin_id IS NOT NULL
           AND EXISTS (SELECT 1 FROM core.items i WHERE i.item_id = r.item_id)
         ON CONFLICT (item_id, loc_id, bin_id) DO UPDATE SET qty_on_hand = EXCLUDED.qty_on_hand, raw = EXCLUDED.raw
+        WHERE core.inventory_by_bin.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 6) Inventory txn header/lines from MILOGH (simplified: one header per row)
@@ -440,6 +388,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.milogh_raw r
         WHERE r.tran_date IS NOT NULL AND r.entry IS NOT NULL
         ON CONFLICT (tran_date, entry) DO UPDATE SET loc_id = EXCLUDED.loc_id, user_id = EXCLUDED.user_id, txn_type = EXCLUDED.txn_type, comment = EXCLUDED.comment, raw = EXCLUDED.raw
+        WHERE core.inventory_txn_header.raw IS DISTINCT FROM EXCLUDED.raw
     """)
     # 6b) Inventory txn lines from MILOGD
     cur.execute("""
@@ -450,6 +399,10 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
                r.data->>'UOM', r.data->>'Location No.', r.data
         FROM staging.milogd_raw r
         WHERE r.tran_date IS NOT NULL AND r.entry IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM core.inventory_txn_line l
+              WHERE l.tran_date = (NULLIF(TRIM(COALESCE(r.data->>'Transaction Date', r.data->>'tranDate', r.data->>'tranDt', r.tran_date, '')), '')::date)
+                AND l.entry = r.entry AND l.detail IS NOT DISTINCT FROM r.detail AND l.raw = r.data)
     """)
     # 6c) Inventory txn breakdown from MILOGB
     cur.execute("""
@@ -459,6 +412,10 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
                (NULLIF(TRIM(COALESCE(r.data->>'Quantity', r.data->>'qty', '')), '')::numeric), r.data
         FROM staging.milogb_raw r
         WHERE r.tran_date IS NOT NULL AND r.entry IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM core.inventory_txn_breakdown b
+              WHERE b.tran_date = (NULLIF(TRIM(COALESCE(r.data->>'Transaction Date', r.data->>'tranDate', r.data->>'tranDt', r.tran_date, '')), '')::date)
+                AND b.entry = r.entry AND b.detail IS NOT DISTINCT FROM r.detail AND b.raw = r.data)
     """)
 
     # 7) Lots from MISLHIST (minimal: lot_id, prnt_item_id)
@@ -468,6 +425,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.mislhist_raw
         WHERE lot_id IS NOT NULL AND lot_id <> ''
         ON CONFLICT (lot_id) DO UPDATE SET prnt_item_id = EXCLUDED.prnt_item_id, raw_master = EXCLUDED.raw_master, updated_at = NOW()
+        WHERE core.lots.raw_master IS DISTINCT FROM EXCLUDED.raw_master
     """)
 
     # 8) Lot movements from MISLTH
@@ -478,8 +436,13 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
                user_id, entry, detail, data->>'Location No.',
                (NULLIF(TRIM(COALESCE(data->>'Quantity', data->>'qty', '')), '')::numeric),
                NULL, data
-        FROM staging.mislth_raw
+        FROM staging.mislth_raw r
         WHERE lot_id IS NOT NULL AND lot_id <> ''
+          AND NOT EXISTS (
+              SELECT 1 FROM core.lot_movements m
+              WHERE m.tran_date IS NOT DISTINCT FROM (NULLIF(TRIM(COALESCE(r.data->>'Transaction Date', r.data->>'tranDate', '')), '')::date)
+                AND m.user_id IS NOT DISTINCT FROM r.user_id AND m.entry IS NOT DISTINCT FROM r.entry
+                AND m.detail IS NOT DISTINCT FROM r.detail AND m.prnt_lot_id = r.lot_id AND m.raw_header = r.data)
     """)
     # 8b) Lots: set created_date, created_by from earliest lot_movement; balance_qty from sum(qty_in) - sum(qty_out)
     cur.execute("""
@@ -499,6 +462,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM first_move fm
         JOIN balances b ON b.prnt_lot_id = l.lot_id
         WHERE l.lot_id = fm.prnt_lot_id
+          AND (l.created_date, l.created_by, l.balance_qty) IS DISTINCT FROM (fm.first_date, fm.first_user, b.bal)
     """)
 
     # 9) BOMs
@@ -508,6 +472,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.mibomh_raw
         WHERE bom_id IS NOT NULL AND bom_id <> ''
         ON CONFLICT (bom_id) DO UPDATE SET parent_item_id = EXCLUDED.parent_item_id, revision = EXCLUDED.revision, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.boms.raw IS DISTINCT FROM EXCLUDED.raw
     """)
     cur.execute("""
         INSERT INTO core.bom_components (bom_id, line_no, part_id, qty_per, uom, raw)
@@ -518,6 +483,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE bom_id IS NOT NULL AND part_id IS NOT NULL AND part_id <> ''
           AND EXISTS (SELECT 1 FROM core.boms b WHERE b.bom_id = staging.mibomd_raw.bom_id)
         ON CONFLICT (bom_id, part_id, line_no) DO UPDATE SET qty_per = EXCLUDED.qty_per, raw = EXCLUDED.raw
+        WHERE core.bom_components.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 10) Manufacturing orders
@@ -533,6 +499,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE moh_id IS NOT NULL AND moh_id <> ''
         ON CONFLICT (moh_id) DO UPDATE SET build_item_id = EXCLUDED.build_item_id, loc_id = EXCLUDED.loc_id, status = EXCLUDED.status,
             qty_planned = EXCLUDED.qty_planned, qty_completed = EXCLUDED.qty_completed, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.manufacturing_orders.raw IS DISTINCT FROM EXCLUDED.raw
     """)
     cur.execute("""
         INSERT INTO core.mo_materials (moh_id, line_no, part_id, qty_required, qty_issued, uom, raw)
@@ -544,6 +511,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE moh_id IS NOT NULL AND part_id IS NOT NULL AND part_id <> ''
           AND EXISTS (SELECT 1 FROM core.manufacturing_orders m WHERE m.moh_id = staging.mimomd_raw.moh_id)
         ON CONFLICT (moh_id, part_id, line_no) DO UPDATE SET qty_required = EXCLUDED.qty_required, raw = EXCLUDED.raw
+        WHERE core.mo_materials.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 11) Suppliers
@@ -555,6 +523,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.misupl_raw
         WHERE supl_id IS NOT NULL AND supl_id <> ''
         ON CONFLICT (supl_id) DO UPDATE SET name = EXCLUDED.name, phone = EXCLUDED.phone, email = EXCLUDED.email, raw = EXCLUDED.raw, updated_at = NOW()
+        WHERE core.suppliers.raw IS DISTINCT FROM EXCLUDED.raw
     """)
     # 11b) Supplier–item links from MIQSUP
     cur.execute("""
@@ -565,6 +534,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
           AND EXISTS (SELECT 1 FROM core.suppliers s WHERE s.supl_id = staging.miqsup_raw.supl_id)
           AND EXISTS (SELECT 1 FROM core.items i WHERE i.item_id = staging.miqsup_raw.item_id)
         ON CONFLICT (supl_id, item_id) DO UPDATE SET status = EXCLUDED.status, raw = EXCLUDED.raw
+        WHERE core.supplier_items.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 12) Purchase orders
@@ -578,12 +548,13 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM staging.mipoh_raw
         WHERE poh_id IS NOT NULL AND poh_id <> ''
         ON CONFLICT (poh_id, poh_rev) DO UPDATE SET supl_id = EXCLUDED.supl_id, status = EXCLUDED.status, order_date = EXCLUDED.order_date, raw_header = EXCLUDED.raw_header, updated_at = NOW()
+        WHERE core.purchase_orders.raw_header IS DISTINCT FROM EXCLUDED.raw_header
     """, (base_currency,))
     # 12b) PO extensions (raw_ext) from MIPOHX
     cur.execute("""
         UPDATE core.purchase_orders po SET raw_ext = x.data, updated_at = NOW()
         FROM staging.mipohx_raw x
-        WHERE po.poh_id = x.poh_id AND po.poh_rev = x.poh_rev
+        WHERE po.poh_id = x.poh_id AND po.poh_rev = x.poh_rev AND po.raw_ext IS DISTINCT FROM x.data
     """)
     cur.execute("""
         WITH numbered AS (
@@ -601,6 +572,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         FROM numbered n
         WHERE EXISTS (SELECT 1 FROM core.purchase_orders p WHERE p.poh_id = n.poh_id AND p.poh_rev = n.poh_rev)
         ON CONFLICT (poh_id, poh_rev, line_no) DO UPDATE SET item_id = EXCLUDED.item_id, qty_ordered = EXCLUDED.qty_ordered, qty_received = EXCLUDED.qty_received, unit_cost = EXCLUDED.unit_cost, raw = EXCLUDED.raw
+        WHERE core.purchase_order_lines.raw IS DISTINCT FROM EXCLUDED.raw
     """)
 
     # 13) Item cost history
@@ -616,6 +588,7 @@ def upsert_core(conn, base_currency: str = "CAD") -> None:
         WHERE item_id IS NOT NULL AND item_id <> ''
           AND EXISTS (SELECT 1 FROM core.items i WHERE i.item_id = staging.miicst_raw.item_id)
         ON CONFLICT (item_id, loc_id, trans_date, seq_no) DO UPDATE SET qty_received = EXCLUDED.qty_received, unit_cost = EXCLUDED.unit_cost, raw = EXCLUDED.raw
+        WHERE core.item_cost_history.raw IS DISTINCT FROM EXCLUDED.raw
     """, (base_currency,))
 
     conn.commit()
@@ -647,8 +620,12 @@ def main():
 
     conn = psycopg2.connect(url)
     try:
-        load_staging(conn, data, source_file_default="full_company_export")
+        t0 = time.time()
+        copied = load_staging(conn, data, source_file_default="full_company_export", dsn=url)
+        t1 = time.time()
         upsert_core(conn)
+        print(f"Staging: {sum(copied.values()):,} rows copied into {sum(1 for c in copied.values() if c)} tables "
+              f"({len(copied) - sum(1 for c in copied.values() if c)} unchanged) in {t1 - t0:.1f}s; core upsert {time.time() - t1:.1f}s")
         print("ETL done: staging + core updated for all sections.")
     finally:
         conn.close()
@@ -12,6 +12,7 @@ import shutil
 from datetime import datetime, timedelta
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+import so_file_index
 # Lazy import to avoid circular dependency with app.py
 # from app import extract_so_data_from_pdf
 
@@ -108,12 +109,14 @@ class EnterpriseSO:
         
         files_to_parse = []
         
-        # Scan for SO files
-        for root, dirs, files in os.walk(self.sales_orders_base):
+        # Scan for SO files (listings and mtimes from the shared SO file index)
+        so_index = so_file_index.get_index()
+        for root, dirs, files in so_index.walk(self.sales_orders_base):
             for file in files:
                 if file.lower().endswith('.pdf') and 'salesorder_' in file.lower():
                     file_path = os.path.join(root, file)
-                    file_modified = datetime.fromtimestamp(os.path.getmtime(file_path))
+                    entry = so_index.entry(file_path)
+                    file_modified = datetime.fromtimestamp(entry['mtime'] if entry else os.path.getmtime(file_path))
                     
                     # Only parse if file is newer than last cache update
                     if file_modified > last_update_time:
@@ -145,29 +148,31 @@ class EnterpriseSO:
             print("✅ Cache is up to date - no parsing needed")
             return
         
-        # Parse new files
-        # Lazy import to avoid circular dependency
-        from app import extract_so_data_from_pdf
+        # Parse new files on the bulk process pool (results stream into the content-addressed parse cache,
+        # a moved/re-filed PDF is not parsed again, a corrupt PDF only fails itself)
+        import so_bulk_parser
         
+        files_by_path = {f['file_path']: f for f in files_to_parse}
         parsed_count = 0
-        for file_info in files_to_parse:
-            try:
-                print(f"📄 Parsing {file_info['so_number']}...")
-                parsed_data = extract_so_data_from_pdf(file_info['file_path'])
-                
-                if parsed_data and parsed_data.get('items'):
-                    parsed_data.update({
-                        'folder': file_info['folder'],
-                        'file_name': file_info['file_name'],
-                        'cached_at': datetime.now().isoformat()
-                    })
-                    
-                    existing_cache[file_info['so_number']] = parsed_data
-                    parsed_count += 1
-                    print(f"    ✅ {len(parsed_data.get('items', []))} items")
+        
+        def _on_result(path, parsed_data, error):
+            nonlocal parsed_count
+            file_info = files_by_path[path]
+            if error:
+                print(f"    [FAIL] {file_info['so_number']}: {error}")
+                return
+            if parsed_data and parsed_data.get('items'):
+                parsed_data.update({
+                    'folder': file_info['folder'],
+                    'file_name': file_info['file_name'],
+                    'cached_at': datetime.now().isoformat()
+                })
                 
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
+                existing_cache[file_info['so_number']] = parsed_data
+                parsed_count += 1
+                print(f"    [OK] {file_info['so_number']}: {len(parsed_data.get('items', []))} items")
+        
+        so_bulk_parser.parse_files(list(files_by_path), "app", on_result=_on_result)
         
         # Save updated cache
         self.save_cache(existing_cache)
@@ -4,6 +4,7 @@ or on a schedule from the portal backend.
 """
 import os
 import sys
+import time
 import threading
 from datetime import datetime
 from pathlib import Path
@@ -85,13 +86,20 @@ def run_etl(triggered_by="manual"):
             _last_status = {"status": "error", "error": error_msg}
             return _last_status
 
+        # Staging tables are COPYed in parallel, each on its own short-lived connection;
+        # unchanged tables are skipped and core is only touched for rows that differ.
         db_url = os.environ.get("DATABASE_URL", "")
+        t0 = time.time()
+        copied = load_staging(None, data, source_file_default="auto_etl", dsn=db_url)
+        t1 = time.time()
         conn = psycopg2.connect(db_url)
         try:
-            load_staging(conn, data, source_file_default="auto_etl")
             upsert_core(conn)
         finally:
             conn.close()
+        timings = {"staging_seconds": round(t1 - t0, 2), "core_seconds": round(time.time() - t1, 2),
+                   "rows_copied": sum(copied.values()),
+                   "tables_unchanged": sorted(t for t, c in copied.items() if not c)}
 
         now = datetime.utcnow().isoformat() + "Z"
         _last_run = now
@@ -106,6 +114,7 @@ def run_etl(triggered_by="manual"):
             "folder": folder,
             "finished_at": now,
             "triggered_by": triggered_by,
+            **timings,
         }
         return _last_status
 
@@ -8,10 +8,14 @@ is applied here. GZIP on /api/data and HTTP/2 (no 32MB response cap) handle larg
 Uses parallel file loading (ThreadPoolExecutor) to reduce load time from 1-2 min to ~10-30 sec.
 """
 import os
+import threading
 import pandas as pd
 from io import StringIO, BytesIO
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import full_company_snapshot
+import full_company_delta
+
 # File stem -> (app keys to fill, column rename map export_name -> app_name)
 FULL_COMPANY_MAPPINGS = {
     # MIITEM: exact columns from MISys Full Company Data export (MIITEM.CSV) – all export columns that map to app fields
@@ -396,37 +400,125 @@ def _apply_column_map(rows, column_map):
     return out
 
 
-def _load_single_file_local(folder_path, fname):
-    """Load one file from local folder. Returns (mapping_key, keys, rows) or None on skip/error."""
+def _map_column_names(names, column_map):
+    """Export column names -> app keys, same rules as _apply_column_map (applied once per table, not per row)."""
+    if not column_map:
+        return list(names)
+    export_to_app = {}
+    for export_key, app_key in column_map.items():
+        norm = _normalize_col(export_key)
+        if norm and norm not in export_to_app:
+            export_to_app[norm] = app_key
+    mapped = []
+    for k in names:
+        app_key = column_map.get(k) or column_map.get(k.strip())
+        if not app_key and k:
+            app_key = export_to_app.get(_normalize_col(k))
+        mapped.append(app_key or k)
+    return mapped
+
+
+def _read_frame_local(path, fname):
+    """Read one local CSV/Excel export file into a DataFrame (no fillna; empty cells stay NaN)."""
+    if fname.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", errors="replace") as fp:
+            raw = fp.read()
+        return pd.read_csv(StringIO(raw), encoding="utf-8", on_bad_lines="skip")
+    return pd.read_excel(path, engine="openpyxl" if fname.lower().endswith(".xlsx") else None)
+
+
+def _local_table(folder_path, fname, snapshot=None):
+    """ColumnarTable for one local export file; memory-mapped from snapshot=(snap_dir, manifest) when its mtime/size match."""
+    path = os.path.join(folder_path, fname)
+    signature = None
+    table = None
+    if snapshot is not None:
+        signature = full_company_snapshot.file_signature(path)
+        table = full_company_snapshot.read_cached_table(snapshot[0], snapshot[1], fname, signature)
+    if table is None:
+        table = full_company_snapshot.ColumnarTable.from_dataframe(_read_frame_local(path, fname))
+        if snapshot is not None and table.n_rows:
+            try:
+                full_company_snapshot.write_cached_table(snapshot[0], snapshot[1], fname, signature, table)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"[full_company_data_converter] snapshot not written for {fname}: {e}")
+    return table
+
+
+def _table_result(mapping_key, fname, table):
+    """(mapping_key, keys, rows, fname) for a loaded table, or None when it is empty."""
+    if not table.n_rows:
+        return None
+    # Capture REAL column names before mapping (for debugging / correct mapping)
+    if mapping_key in ("MIITEM", "MIILOCQT", "MIILOC", "Item", "Items"):
+        _RAW_CSV_HEADERS[mapping_key] = list(table.names)
+    keys, column_map = FULL_COMPANY_MAPPINGS[mapping_key]
+    rows = table.to_records(_map_column_names(table.names, column_map))
+    return (mapping_key, keys, rows, fname)
+
+
+def _mapping_key_for(fname):
+    """FULL_COMPANY_MAPPINGS key for an export file name, or None if the file is not a mapped table."""
     if not fname.lower().endswith((".csv", ".xlsx", ".xls")):
         return None
     stem = os.path.splitext(fname)[0]
     mapping_key = _STEM_TO_KEY.get(stem.upper(), stem)
-    if mapping_key not in FULL_COMPANY_MAPPINGS:
+    return mapping_key if mapping_key in FULL_COMPANY_MAPPINGS else None
+
+
+def _load_single_file_local(folder_path, fname, snapshot=None):
+    """
+    Load one file from local folder. Returns (mapping_key, keys, rows, fname, table) or None on skip/error.
+    The table is parsed into typed columns (full_company_snapshot.ColumnarTable). When snapshot=(snap_dir, manifest)
+    is given, an unchanged file (same mtime/size) is memory-mapped from the snapshot instead of re-parsed.
+    """
+    mapping_key = _mapping_key_for(fname)
+    if mapping_key is None:
         return None
-    path = os.path.join(folder_path, fname)
     try:
-        if fname.lower().endswith(".csv"):
-            with open(path, "r", encoding="utf-8", errors="replace") as fp:
-                raw = fp.read()
-            rows = _read_table(raw, fname, is_bytes=False)
-        elif fname.lower().endswith((".xlsx", ".xls")):
-            df = pd.read_excel(path, engine="openpyxl" if fname.lower().endswith(".xlsx") else None)
-            df = df.fillna("")
-            rows = df.to_dict(orient="records")
-        else:
-            return None
+        table = _local_table(folder_path, fname, snapshot)
     except Exception as e:
         print(f"[full_company_data_converter] skip {fname}: {e}")
         return None
-    if not rows:
+    return _table_result(mapping_key, fname, table)
+
+
+def _load_delta_table_local(folder_path, parts, snapshot, snapshot_for):
+    """
+    Load one table of a delta export (full_company_delta): the base part comes from its own folder's snapshot, later
+    parts are parsed and appended. The combined table is cached in this folder's snapshot keyed by all part stats.
+    snapshot_for(folder) -> (snap_dir, manifest) or None. Same return shape as _load_single_file_local.
+    """
+    base = parts[0]
+    mapping_key = _mapping_key_for(base["file"])
+    if mapping_key is None:
+        return None
+    fname = parts[-1]["file"]
+    try:
+        base_folder = os.path.dirname(base["path"])
+        if len(parts) == 1:
+            # Unchanged since an earlier sync: reuse that export's snapshot
+            return _table_result(mapping_key, base["file"], _local_table(base_folder, base["file"], snapshot_for(base_folder)))
+        signature = [full_company_snapshot.file_signature(p["path"]) for p in parts]
+        table = full_company_snapshot.read_cached_table(snapshot[0], snapshot[1], fname, signature) if snapshot else None
+        if table is None:
+            table = _local_table(base_folder, base["file"], snapshot_for(base_folder))
+            for part in parts[1:]:
+                delta = full_company_snapshot.ColumnarTable.from_dataframe(_read_frame_local(part["path"], part["file"]))
+                rf = part.get("replace_from")
+                if rf and rf["column"] in table.names:
+                    table = table.filter_rows(table.rows_below(rf["column"], str(rf["value"])))
+                table = full_company_snapshot.ColumnarTable.concat([table, delta]) if delta.n_rows else table
+            if snapshot is not None and table.n_rows:
+                try:
+                    full_company_snapshot.write_cached_table(snapshot[0], snapshot[1], fname, signature, table)
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"[full_company_data_converter] snapshot not written for {fname}: {e}")
+        print(f"[full_company_data_converter] {mapping_key}: applied {len(parts) - 1} delta file(s) on top of {base['folder']}")
+        return _table_result(mapping_key, fname, table)
+    except Exception as e:
+        print(f"[full_company_data_converter] skip {fname} (delta chain): {e}")
         return None
-    # Capture REAL column names before mapping (for debugging / correct mapping)
-    if mapping_key in ("MIITEM", "MIILOCQT", "MIILOC", "Item", "Items"):
-        _RAW_CSV_HEADERS[mapping_key] = list(rows[0].keys())
-    keys, column_map = FULL_COMPANY_MAPPINGS[mapping_key]
-    rows = _apply_column_map(rows, column_map)
-    return (mapping_key, keys, rows, fname)
 
 
 def _safe_str(v):
@@ -510,6 +602,8 @@ def load_from_folder(folder_path):
     """
     Load Full Company Data from a local folder. Returns (data_dict, None) or (None, error_message).
     Uses parallel file loading to reduce load time (1-2 min -> ~10-30 sec).
+    Tables are cached as a typed columnar snapshot keyed by file mtime/size (see full_company_snapshot);
+    a warm restart only re-parses files that changed.
     """
     if not folder_path or not os.path.isdir(folder_path):
         return None, "Folder not found or not a directory"
@@ -517,10 +611,32 @@ def load_from_folder(folder_path):
         skeleton = _get_skeleton()
         files = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
         to_load = [f for f in files if f.lower().endswith((".csv", ".xlsx", ".xls"))]
+        snapshot = None
+        if full_company_snapshot.snapshot_enabled():
+            snap_dir = full_company_snapshot.snapshot_dir_for(folder_path)
+            snapshot = (snap_dir, full_company_snapshot.load_manifest(snap_dir))
+        # Delta export: tables kept in earlier folders or built from appended delta files (full_company_delta)
+        delta_tables = {stem: parts for stem, parts in full_company_delta.table_parts(folder_path).items()
+                        if not full_company_delta.is_own_file(folder_path, parts)}
+        to_load = [f for f in to_load if os.path.splitext(f)[0].upper() not in delta_tables]
+        other_snapshots = {}
+        other_lock = threading.Lock()
+
+        def _snapshot_for(folder):
+            if snapshot is None:
+                return None
+            with other_lock:
+                if folder not in other_snapshots:
+                    other_dir = full_company_snapshot.snapshot_dir_for(folder)
+                    other_snapshots[folder] = (other_dir, full_company_snapshot.load_manifest(other_dir))
+                return other_snapshots[folder]
+
         loaded_stems = []
-        max_workers = min(8, max(1, len(to_load)))
+        max_workers = min(8, max(1, len(to_load) + len(delta_tables)))
         with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futures = {ex.submit(_load_single_file_local, folder_path, fname): fname for fname in to_load}
+            futures = {ex.submit(_load_single_file_local, folder_path, fname, snapshot): fname for fname in to_load}
+            futures.update({ex.submit(_load_delta_table_local, folder_path, parts, snapshot, _snapshot_for): parts[-1]["file"]
+                            for parts in delta_tables.values()})
             for future in as_completed(futures):
                 result = future.result()
                 if result is None:
@@ -531,6 +647,17 @@ def load_from_folder(folder_path):
                         skeleton[key] = list(rows)
                 loaded_stems.append(mapping_key)
                 print(f"[full_company_data_converter] loaded {fname} -> {len(rows)} rows -> {keys}")
+        if snapshot is not None:
+            snap_dir, manifest = snapshot
+            keep = set(to_load) | {parts[-1]["file"] for parts in delta_tables.values()}
+            manifest["tables"] = {f: e for f, e in manifest.get("tables", {}).items() if f in keep}
+            for other_dir, other_manifest in [(snap_dir, manifest)] + list(other_snapshots.values()):
+                try:
+                    if other_manifest.get("tables"):
+                        os.makedirs(other_dir, exist_ok=True)
+                        full_company_snapshot.save_manifest(other_dir, other_manifest)
+                except OSError as e:
+                    print(f"[full_company_data_converter] snapshot manifest not saved: {e}")
         if loaded_stems:
             print(f"[full_company_data_converter] Loaded export files: {', '.join(sorted(set(loaded_stems)))}")
         _enrich_items_from_miilocqt(skeleton)
@@ -601,6 +728,66 @@ def _load_single_file_drive(drive_service, drive_id, finfo):
     return (mapping_key, keys, rows, fname)
 
 
+def _drive_delta_tables(drive_service, drive_id, files):
+    """
+    For a Drive delta export folder (has _delta_manifest.json): table stem -> parts, each part with the Drive file info
+    ("finfo") resolved in its sibling folder. Tables that are a single file in this folder are left to the normal path.
+    """
+    mfile = next((f for f in files if (f.get("name") or f.get("fileName")) == full_company_delta.DELTA_MANIFEST), None)
+    if not mfile:
+        return {}
+    manifest = drive_service.download_file(mfile.get("id") or mfile.get("fileId"), full_company_delta.DELTA_MANIFEST)
+    if not isinstance(manifest, dict) or manifest.get("version") != full_company_delta.MANIFEST_VERSION:
+        return {}
+    own_folder = manifest.get("folder")
+    try:
+        from google_drive_service import FULL_COMPANY_DATA_DRIVE_PATH as parent_path
+    except ImportError:
+        parent_path = os.getenv("FULL_COMPANY_DATA_DRIVE_PATH", "MiSys/Misys Extracted Data/Full Company Data From Misys")
+    listings = {own_folder: files}
+    out = {}
+    for table, entry in (manifest.get("tables") or {}).items():
+        parts = [dict(p) for p in entry.get("parts") or []]
+        if not parts or (len(parts) == 1 and parts[0]["folder"] == own_folder):
+            continue
+        for part in parts:
+            folder = part["folder"]
+            if folder not in listings:
+                folder_id = drive_service.find_folder_by_path(drive_id, f"{parent_path}/{folder}")
+                listings[folder] = drive_service.list_all_files_in_folder(folder_id, drive_id) if folder_id else []
+            part["finfo"] = next((f for f in listings[folder] if (f.get("name") or f.get("fileName")) == part["file"]), None)
+        if all(p["finfo"] for p in parts):
+            out[table.upper()] = parts
+        else:
+            print(f"[full_company_data_converter] delta chain for {table} incomplete on Drive - skipped")
+    return out
+
+
+def _load_delta_table_drive(drive_service, drive_id, parts):
+    """Download every part of a delta chain and combine the rows. Same return shape as _load_single_file_drive."""
+    mapping_key = _mapping_key_for(parts[0]["file"])
+    if mapping_key is None:
+        return None
+    part_rows = []
+    for part in parts:
+        finfo = part["finfo"]
+        content = drive_service.download_file(finfo.get("id") or finfo.get("fileId"), part["file"])
+        if content is None:
+            print(f"[full_company_data_converter] skip (download failed): {part['folder']}/{part['file']}")
+            return None
+        rows = _read_table(content, part["file"], is_bytes=isinstance(content, bytes))
+        if rows is None:
+            return None
+        part_rows.append(rows)
+    rows = full_company_delta.combine_rows(part_rows, parts)
+    if not rows:
+        return None
+    if mapping_key in ("MIITEM", "MIILOCQT", "MIILOC", "Item", "Items"):
+        _RAW_CSV_HEADERS[mapping_key] = list(rows[0].keys())
+    keys, column_map = FULL_COMPANY_MAPPINGS[mapping_key]
+    return (mapping_key, keys, _apply_column_map(rows, column_map), parts[-1]["file"])
+
+
 def load_from_drive_api(drive_service, drive_id, folder_path=None, folder_id=None):
     """
     Load Full Company Data via Google Drive API.
@@ -626,9 +813,12 @@ def load_from_drive_api(drive_service, drive_id, folder_path=None, folder_id=Non
         skeleton = _get_skeleton()
         loaded_stems = []
         to_load = [f for f in files if (f.get("name") or f.get("fileName") or "").lower().endswith((".csv", ".xlsx", ".xls")) and (f.get("id") or f.get("fileId"))]
-        max_workers = min(8, max(1, len(to_load)))
+        delta_tables = _drive_delta_tables(drive_service, drive_id, files)
+        to_load = [f for f in to_load if os.path.splitext(f.get("name") or f.get("fileName") or "")[0].upper() not in delta_tables]
+        max_workers = min(8, max(1, len(to_load) + len(delta_tables)))
         with ThreadPoolExecutor(max_workers=max_workers) as ex:
             futures = {ex.submit(_load_single_file_drive, drive_service, drive_id, finfo): finfo for finfo in to_load}
+            futures.update({ex.submit(_load_delta_table_drive, drive_service, drive_id, parts): parts for parts in delta_tables.values()})
             for future in as_completed(futures):
                 result = future.result()
                 if result is None:
@@ -0,0 +1,99 @@
+"""
+Delta exports of Full Company Data (written by misys_bridge_onprem/sync_to_gdrive.py --delta).
+
+A delta export folder only contains the tables that changed since the previous sync. Its _delta_manifest.json lists
+every table as an ordered chain of parts living in sibling export folders:
+
+  {"version": 1, "folder": "March 3, 2026_11-00 PM",
+   "tables": {"MIITEM": {"parts": [{"folder": "March 1, 2026_11-00 PM", "file": "MIITEM.CSV"}]},
+              "MILOGH": {"parts": [{"folder": "March 1, 2026_11-00 PM", "file": "MILOGH.CSV"},
+                                   {"folder": "March 3, 2026_11-00 PM", "file": "MILOGH.delta.CSV",
+                                    "replace_from": {"column": "tranDate", "value": "2026-03-02 00:00:00"}}]}}}
+
+The first part is a full table. Each later part appends rows; when it has replace_from, rows of the earlier parts whose
+column value (as exported text) is >= value are dropped first, because the delta re-exported them. Folders without a
+manifest are plain full exports and load exactly as before.
+"""
+import os
+import csv
+import json
+
+DELTA_MANIFEST = "_delta_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def load_manifest(folder_path):
+    """The folder's delta manifest, or None for a plain full export (or an unreadable/unknown manifest)."""
+    path = os.path.join(folder_path, DELTA_MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[full_company_delta] unreadable {DELTA_MANIFEST} in {folder_path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def table_parts(folder_path, manifest=None):
+    """
+    Table stem (upper case) -> list of parts for a delta export folder ({} for a full export). Each part is the
+    manifest entry plus "path" (absolute file path, resolved against the sibling folders).
+    """
+    manifest = manifest if manifest is not None else load_manifest(folder_path)
+    if not manifest:
+        return {}
+    base = os.path.dirname(os.path.normpath(folder_path))
+    out = {}
+    for table, entry in (manifest.get("tables") or {}).items():
+        parts = []
+        for part in entry.get("parts") or []:
+            part = dict(part)
+            part["path"] = os.path.join(base, part["folder"], part["file"])
+            parts.append(part)
+        if parts:
+            out[table.upper()] = parts
+    return out
+
+
+def is_own_file(folder_path, parts):
+    """True when a table is just one full file inside folder_path itself (loads like a plain export)."""
+    return len(parts) == 1 and os.path.normcase(os.path.dirname(parts[0]["path"])) == os.path.normcase(os.path.normpath(folder_path))
+
+
+def cutoffs(parts, index):
+    """[(column, value)] that rows of parts[index] must stay below: one per later part that re-exported from a boundary."""
+    return [(p["replace_from"]["column"], str(p["replace_from"]["value"])) for p in parts[index + 1:] if p.get("replace_from")]
+
+
+def keep_row(row, limits):
+    """Row survives every later replace_from (empty/missing values are never re-exported, so they are kept)."""
+    for column, value in limits:
+        v = row.get(column)
+        if v is not None and v != "" and str(v) >= value:
+            return False
+    return True
+
+
+def combine_rows(part_rows, parts):
+    """Apply a part chain to already-loaded row lists (one list of dicts per part, raw export column names)."""
+    out = []
+    for i, rows in enumerate(part_rows):
+        limits = cutoffs(parts, i)
+        out.extend(rows if not limits else [r for r in rows if keep_row(r, limits)])
+    return out
+
+
+def iter_csv_rows(parts):
+    """Stream the combined rows of a part chain with csv.DictReader (BOM and header whitespace stripped)."""
+    for i, part in enumerate(parts):
+        limits = cutoffs(parts, i)
+        with open(part["path"], "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [(k or "").strip() for k in (reader.fieldnames or [])]
+            for row in reader:
+                if not limits or keep_row(row, limits):
+                    yield row
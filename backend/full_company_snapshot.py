@@ -0,0 +1,254 @@
+"""
+Columnar snapshot cache for Full Company Data (MISys export CSV/Excel).
+
+Each export table is kept as typed columns instead of per-row dicts:
+  - numeric columns: float64 / int64 / bool NumPy arrays (NaN = empty cell)
+  - text columns: dictionary-encoded (int32 codes + UTF-8 category blob/offsets), so item and location
+    strings are stored once per distinct value
+Tables are persisted as one binary file per table plus a manifest keyed by source file (mtime_ns, size).
+A warm restart memory-maps the .bin files instead of re-parsing the CSVs; only files whose stat changed
+are parsed again. Snapshots live in a local cache, backend/cache/full_company_snapshot/<export folder name>, so
+they are never synced back through Drive. FULL_COMPANY_SNAPSHOT_DIR overrides the base directory; the value "export"
+keeps them in <export folder>/.portal_snapshot instead. Disable with FULL_COMPANY_SNAPSHOT=0.
+"""
+import os
+import json
+import threading
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+_MANIFEST = "manifest.json"
+_ALIGN = 8
+_LOCAL_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "full_company_snapshot")
+_manifest_lock = threading.Lock()
+
+
+def snapshot_enabled():
+    return (os.getenv("FULL_COMPANY_SNAPSHOT") or "1").strip().lower() not in ("0", "false", "no")
+
+
+def snapshot_dir_for(folder_path):
+    base = (os.getenv("FULL_COMPANY_SNAPSHOT_DIR") or "").strip()
+    if base.lower() == "export":
+        return os.path.join(folder_path, ".portal_snapshot")
+    return os.path.join(base or _LOCAL_BASE, os.path.basename(os.path.normpath(folder_path)))
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class ColumnarTable:
+    """One export table as typed columns. names are the raw export column names (BOM/whitespace stripped)."""
+
+    def __init__(self, names, columns, n_rows):
+        self.names = list(names)
+        self.columns = columns  # list aligned with names: ("num", array) | ("str", codes, categories) | ("json", values)
+        self.n_rows = int(n_rows)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        import pandas as pd
+        names = [str(c).strip().lstrip('\ufeff') for c in df.columns]
+        columns = []
+        for i in range(len(df.columns)):
+            series = df.iloc[:, i]
+            kind = series.dtype.kind
+            if kind in "iufb":
+                columns.append(("num", series.to_numpy()))
+                continue
+            filled = series.fillna("")
+            if all(isinstance(v, str) for v in filled.to_numpy()):
+                codes, uniques = pd.factorize(filled, sort=False)
+                columns.append(("str", codes.astype(np.int32), [str(u) for u in uniques]))
+            else:
+                # Mixed-type object column (e.g. chunked dtype inference): keep the exact Python values
+                columns.append(("json", [v.item() if isinstance(v, np.generic) else v for v in filled.to_numpy()]))
+        return cls(names, columns, len(df))
+
+    def column_values(self, i):
+        """Python values for column i, identical to DataFrame.fillna('').to_dict(orient='records')."""
+        col = self.columns[i]
+        if col[0] == "num":
+            arr = col[1]
+            values = arr.tolist()
+            if arr.dtype.kind == "f" and np.isnan(arr).any():
+                values = ["" if v != v else v for v in values]
+            return values
+        if col[0] == "str":
+            cats = col[2]
+            return [cats[c] for c in col[1].tolist()]
+        return list(col[1])
+
+    def to_records(self, mapped_names=None):
+        """Materialize list of row dicts. mapped_names (same length as names) renames columns; a later column wins on collisions."""
+        names = mapped_names or self.names
+        if self.n_rows == 0:
+            return []
+        value_columns = [self.column_values(i) for i in range(len(self.names))]
+        return [dict(zip(names, vals)) for vals in zip(*value_columns)]
+
+    def rows_below(self, name, value):
+        """Bool mask of rows whose value in column name is empty or sorts below value (text compare, numeric for number columns)."""
+        col = self.columns[self.names.index(name)]
+        if col[0] == "num":
+            arr = np.asarray(col[1], dtype=np.float64)
+            return np.isnan(arr) | (arr < _to_float(value))
+        if col[0] == "str":
+            below = np.array([c == "" or c < value for c in col[2]], dtype=bool)
+            return below[col[1]] if len(below) else np.ones(self.n_rows, dtype=bool)
+        return np.array([v is None or v == "" or str(v) < value for v in col[1]], dtype=bool)
+
+    def filter_rows(self, keep):
+        """New table with the rows where the bool mask keep is True."""
+        keep = np.asarray(keep, dtype=bool)
+        columns = []
+        for col in self.columns:
+            if col[0] == "num":
+                columns.append(("num", np.asarray(col[1])[keep]))
+            elif col[0] == "str":
+                columns.append(("str", np.asarray(col[1])[keep], col[2]))
+            else:
+                columns.append(("json", [v for v, k in zip(col[1], keep.tolist()) if k]))
+        return ColumnarTable(self.names, columns, int(keep.sum()))
+
+    @classmethod
+    def concat(cls, tables):
+        """Append tables with the same column names (delta exports). Text categories are merged; mixed kinds fall back to values."""
+        first = tables[0]
+        for t in tables[1:]:
+            if t.names != first.names:
+                raise ValueError("cannot append tables with different columns")
+        columns = []
+        for i in range(len(first.names)):
+            kinds = {t.columns[i][0] for t in tables}
+            if kinds == {"num"}:
+                columns.append(("num", np.concatenate([np.asarray(t.columns[i][1]) for t in tables])))
+            elif kinds == {"str"}:
+                index = {}
+                codes = []
+                for t in tables:
+                    remap = np.array([index.setdefault(c, len(index)) for c in t.columns[i][2]], dtype=np.int32)
+                    codes.append(remap[t.columns[i][1]] if len(remap) else np.zeros(0, dtype=np.int32))
+                columns.append(("str", np.concatenate(codes).astype(np.int32), list(index)))
+            else:
+                values = []
+                for t in tables:
+                    values.extend(t.column_values(i))
+                columns.append(("json", values))
+        return cls(first.names, columns, sum(t.n_rows for t in tables))
+
+    # --- Binary persistence ---------------------------------------------------
+
+    def write(self, path):
+        """Write all column buffers into one file; returns the column layout for the manifest."""
+        layout = []
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            def _put(arr):
+                arr = np.ascontiguousarray(arr)
+                pad = (-f.tell()) % _ALIGN
+                if pad:
+                    f.write(b"\0" * pad)
+                off = f.tell()
+                f.write(arr.tobytes())
+                return {"offset": off, "dtype": arr.dtype.str, "count": int(arr.size)}
+
+            for col in self.columns:
+                if col[0] == "num":
+                    layout.append({"kind": "num", "values": _put(col[1])})
+                elif col[0] == "str":
+                    encoded = [c.encode("utf-8") for c in col[2]]
+                    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                    if encoded:
+                        offsets[1:] = np.cumsum([len(b) for b in encoded])
+                    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+                    layout.append({"kind": "str", "codes": _put(col[1]), "offsets": _put(offsets), "blob": _put(blob)})
+                else:
+                    blob = np.frombuffer(json.dumps(col[1]).encode("utf-8"), dtype=np.uint8)
+                    layout.append({"kind": "json", "blob": _put(blob)})
+        os.replace(tmp, path)
+        return layout
+
+    @classmethod
+    def read(cls, path, names, layout, n_rows):
+        """Memory-map the table file and rebuild the column views (no CSV parsing)."""
+        mm = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+        def _get(spec):
+            dtype = np.dtype(spec["dtype"])
+            start = spec["offset"]
+            return mm[start:start + spec["count"] * dtype.itemsize].view(dtype)
+
+        columns = []
+        for spec in layout:
+            if spec["kind"] == "num":
+                columns.append(("num", _get(spec["values"])))
+            elif spec["kind"] == "str":
+                offsets = _get(spec["offsets"]).tolist()
+                blob = _get(spec["blob"]).tobytes()
+                cats = [blob[offsets[j]:offsets[j + 1]].decode("utf-8") for j in range(len(offsets) - 1)]
+                columns.append(("str", _get(spec["codes"]), cats))
+            else:
+                columns.append(("json", json.loads(_get(spec["blob"]).tobytes().decode("utf-8"))))
+        return cls(names, columns, n_rows)
+
+
+def _to_float(v):
+    try:
+        return float(v) if v is not None and str(v).strip() != "" else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_manifest(snap_dir):
+    path = os.path.join(snap_dir, _MANIFEST)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == SNAPSHOT_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": SNAPSHOT_VERSION, "tables": {}}
+
+
+def save_manifest(snap_dir, manifest):
+    path = os.path.join(snap_dir, _MANIFEST)
+    tmp = path + ".tmp"
+    with _manifest_lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+
+
+def read_cached_table(snap_dir, manifest, fname, signature):
+    """Return the snapshot ColumnarTable for fname if its recorded (mtime_ns, size) matches, else None."""
+    entry = (manifest.get("tables") or {}).get(fname)
+    if not entry or entry.get("stat") != signature:
+        return None
+    path = os.path.join(snap_dir, entry["bin"])
+    if not os.path.isfile(path):
+        return None
+    try:
+        return ColumnarTable.read(path, entry["names"], entry["layout"], entry["rows"])
+    except Exception as e:
+        print(f"[full_company_snapshot] stale/corrupt snapshot for {fname}: {e}")
+        return None
+
+
+def write_cached_table(snap_dir, manifest, fname, signature, table):
+    """Persist table and record it in manifest (caller saves the manifest once after all tables)."""
+    os.makedirs(snap_dir, exist_ok=True)
+    bin_name = os.path.splitext(fname)[0] + "." + os.path.splitext(fname)[1].lstrip(".").lower() + ".bin"
+    layout = table.write(os.path.join(snap_dir, bin_name))
+    with _manifest_lock:
+        manifest.setdefault("tables", {})[fname] = {
+            "stat": signature,
+            "bin": bin_name,
+            "names": table.names,
+            "rows": table.n_rows,
+            "layout": layout,
+        }
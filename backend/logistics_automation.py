@@ -14,6 +14,8 @@ import json
 import shutil
 from datetime import datetime
 import traceback
+import so_parse_cache
+import so_file_index
 
 # ── POD / Shipped folder on the shared G: Drive ───────────────────────────────
 # Structure: POD_SHIPPED_BASE / {year} / {month} / {order_folder} /
@@ -928,11 +930,8 @@ def handle_options(path):
 # Lazy OpenAI client initialization (only when needed)
 client = None
 
-# SO data cache to avoid re-parsing same PDFs (10 minute TTL)
-# NOTE: Cache stores parsed SO data; bad parses (missing items) expire after TTL
-_so_data_cache = {}
-_so_cache_timestamps = {}
-_SO_CACHE_TTL = 600  # 10 minutes
+# Parsed SO PDFs are cached persistently by file content + parser version (so_parse_cache);
+# bad parses (missing items / errors) are never stored, so they are retried on the next lookup
 
 def get_openai_client():
     """Initialize OpenAI client only when needed and API key is available"""
@@ -2377,18 +2376,6 @@ def get_so_data_from_system(so_number):
     import os
     import time
     
-    # Check cache first (avoid re-parsing same PDFs)
-    global _so_data_cache, _so_cache_timestamps
-    if so_number in _so_data_cache:
-        cache_age = time.time() - _so_cache_timestamps.get(so_number, 0)
-        if cache_age < _SO_CACHE_TTL:
-            print(f"⚡ OPTIMIZATION: Using cached SO data for {so_number} (age: {cache_age:.1f}s)")
-            return _so_data_cache[so_number]
-        else:
-            # Cache expired, remove it
-            del _so_data_cache[so_number]
-            del _so_cache_timestamps[so_number]
-    
     try:
         print(f"SEARCH: LOGISTICS: Looking up SO {so_number} by parsing PDF...")
         
@@ -2603,7 +2590,7 @@ def get_so_data_from_system(so_number):
                 }
             
             if os.path.exists(sales_orders_base):
-                for root, dirs, files in os.walk(sales_orders_base):
+                for root, dirs, files in so_file_index.get_index().walk(sales_orders_base):
                     for file in files:
                         if file.lower().endswith('.pdf'):
                             if so_number in file or f"SO_{so_number}" in file or f"salesorder_{so_number}" in file:
@@ -2638,9 +2625,11 @@ def get_so_data_from_system(so_number):
             # FALLBACK: Use app.py parser if raw_so_extractor fails
             try:
                 from raw_so_extractor import parse_sales_order_pdf
+                so_parser = "raw"
                 print(f"[OK] Using raw_so_extractor (GPT-4o) for better address parsing")
             except ImportError as import_err:
                 print(f"[WARN] Could not import raw_so_extractor: {import_err} - falling back to app.py parser")
+                so_parser = "app"
                 try:
                     from app import parse_sales_order_pdf
                 except ImportError as app_import_err:
@@ -2657,7 +2646,8 @@ def get_so_data_from_system(so_number):
             print(f"DEBUG: Calling parse_sales_order_pdf with file: {so_file_path}")
             print(f"DEBUG: File exists: {os.path.exists(so_file_path) if so_file_path else 'N/A'}")
             
-            so_data = parse_sales_order_pdf(so_file_path)
+            # Same PDF content already parsed by this parser version -> cached result, no PDF/GPT work
+            so_data = so_parse_cache.parse(so_file_path, so_parser, parse_sales_order_pdf)
             
             print(f"DEBUG: parse_sales_order_pdf returned: {type(so_data).__name__}")
             if so_data:
@@ -2727,12 +2717,6 @@ def get_so_data_from_system(so_number):
                 except:
                     pass
             
-            # Cache successful result (only cache valid SO data, not errors)
-            if isinstance(so_data, dict) and so_data.get('status') not in ['Error', 'Not found']:
-                _so_data_cache[so_number] = so_data
-                _so_cache_timestamps[so_number] = time.time()
-                print(f"[OK] Cached SO data for {so_number} (TTL: {_SO_CACHE_TTL}s)")
-            
             return so_data
         except Exception as e:
             # Clean up temp file if it was created from Google Drive
@@ -2862,13 +2846,9 @@ def test_logistics_endpoint():
 
 @logistics_bp.route('/api/logistics/clear-so-cache/<so_number>', methods=['POST'])
 def clear_so_cache(so_number):
-    """Clear cached SO data for a specific SO - use when SO PDF was updated and cache has stale data."""
-    global _so_data_cache, _so_cache_timestamps
+    """Clear cached parses of a specific SO - forces a re-parse (an updated PDF is re-parsed anyway: new content)."""
     try:
-        if so_number in _so_data_cache:
-            del _so_data_cache[so_number]
-        if so_number in _so_cache_timestamps:
-            del _so_cache_timestamps[so_number]
+        so_parse_cache.invalidate(so_number=so_number)
         return jsonify({'ok': True, 'message': f'SO {so_number} cache cleared. Next request will re-parse the PDF.'}), 200
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
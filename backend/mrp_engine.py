@@ -1,15 +1,47 @@
 """
-Full MRP engine. Time-phased planning with lead times, safety stock, lot sizing.
+Full MRP engine. Time-phased, multi-level planning with lead times, safety stock, lot sizing.
 Reads demand from portal SOs + Sage SOs. Writes planned orders to portal PostgreSQL only.
 
+Planning runs on daily or weekly buckets over a horizon (MRP_BUCKET=day|week, MRP_HORIZON_DAYS). Items are
+planned level by level in low-level-code order from the BOM graph (BillOfMaterialDetails), so a component is
+netted only after every parent that uses it has released its planned orders. Each level is one set of NumPy
+operations over (items x buckets) arrays: gross requirements are netted against on hand, scheduled receipts
+(open PO lines by Required Date, open MO completions by Completion Date) and safety stock, lot-sized, offset by
+lead time, and the releases are exploded into the components' gross requirements through a precomputed edge list.
+
+Net-change runs (mode="net_change") compare a fingerprint of every item's planning inputs (independent demand and
+scheduled receipts per bucket, stock/lot/lead parameters, BOM edges in and out) with the one stored for the previous
+core.mrp_runs row in core.app_config, so portal_store transactions, new SOs and PO receipts are picked up from the data
+itself. Only changed items and their BOM descendants are replanned; every other item keeps its previous planned orders,
+and only orders that differ are inserted (unchanged ones are copied into the new run). A new day, bucket or horizon
+falls back to a full regeneration.
+
+Preferred suppliers are read once per run into a dict, and the run row, its planned orders and the net-change state are
+written in one transaction (bulk insert). The run summary carries per-phase timings in seconds.
+
 SAGE 50 IS 100% READ-ONLY — NEVER WRITE TO SAGE.
 """
+import os
 import math
-from datetime import date, timedelta
+import re
+import time
+import hashlib
+from datetime import date, datetime, timedelta
 from collections import defaultdict
 
+import numpy as np
+
 import db_service
 import audit_service
+import company_data_store
+import bom_graph
+
+DEFAULT_LEAD_DAYS = 7
+HORIZON_DAYS = int(os.getenv("MRP_HORIZON_DAYS") or 182)
+BUCKET = (os.getenv("MRP_BUCKET") or "day").strip().lower()
+_BUCKET_DAYS = {"day": 1, "week": 7}
+STATE_KEY = "mrp.state"
+_CLOSED_STATUSES = {"2", "closed", "cancelled", "canceled", "complete", "completed"}
 
 
 def _get_item_params(items_data):
@@ -74,113 +106,485 @@ def _get_so_demand(portal_sos=None, sage_sos=None):
 
 
 def _apply_lot_sizing(net_qty, lot_size):
-    """Apply lot sizing rule. Returns order quantity."""
-    if lot_size <= 0:
-        return net_qty
-    return math.ceil(net_qty / lot_size) * lot_size
+    """Apply lot sizing rule. Returns order quantity (works on scalars and NumPy arrays)."""
+    if np.ndim(net_qty) == 0 and np.ndim(lot_size) == 0:
+        if lot_size <= 0:
+            return net_qty
+        return math.ceil(net_qty / lot_size) * lot_size
+    lot_size = np.asarray(lot_size, dtype=np.float64)
+    safe = np.where(lot_size > 0, lot_size, 1.0)
+    return np.where(lot_size > 0, np.ceil(np.asarray(net_qty) / safe - 1e-9) * safe, net_qty)
+
+
+def _parse_date(val):
+    """date from a date/datetime, ISO string, MM/DD/YYYY string or MISys /Date(ms)/ value; None when empty/unparseable."""
+    if val is None or val == "":
+        return None
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    s = str(val).strip()
+    m = re.search(r"/Date\((-?\d+)", s)
+    if m:
+        return datetime.fromtimestamp(int(m.group(1)) / 1000).date()
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        pass
+    for fmt in ("%m/%d/%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(s.split(" ")[0], fmt).date()
+        except ValueError:
+            continue
+    return None
 
 
-def run_mrp(items_data, portal_so_lines=None, sage_sos=None, run_by="system"):
-    """Execute a full MRP run. Returns the run record and planned orders."""
-    item_params = _get_item_params(items_data)
-    demand = _get_so_demand(portal_so_lines, sage_sos)
+def _is_open(row):
+    status = str(row.get("Status") if row.get("Status") is not None else row.get("moStat") or "").strip().lower()
+    return status not in _CLOSED_STATUSES
 
-    today = date.today()
-    planned_orders = []
 
-    all_items = set(list(item_params.keys()) + list(demand.keys()))
+class _ItemIndex:
+    """Item No. <-> row number of the planning arrays (items are added as BOMs, demand and receipts reference them)."""
+
+    def __init__(self, item_nos=()):
+        self.pos = {}
+        self.names = []
+        for ino in item_nos:
+            self.add(ino)
+
+    def add(self, item_no):
+        i = self.pos.get(item_no)
+        if i is None:
+            i = self.pos[item_no] = len(self.names)
+            self.names.append(item_no)
+        return i
+
+    def __len__(self):
+        return len(self.names)
 
-    for item_no in sorted(all_items):
-        ip = item_params.get(item_no, {})
-        on_hand = ip.get("on_hand", 0)
-        on_order = ip.get("on_order", 0)
-        safety_stock = ip.get("safety_stock", 0)
-        lead_days = int(ip.get("lead_days", 0)) or 7
-        lot_size = ip.get("lot_size", 0)
-        reorder_qty = ip.get("reorder_qty", 0)
 
-        item_demand = demand.get(item_no, [])
-        total_demand = sum(d["qty"] for d in item_demand)
+def _bom_edges(graph, index):
+    """
+    (parent rows, component rows, qty per parent unit) over the items in index from the BOM graph: the current
+    revision of every parent, with Required Quantity divided by the header's Build Quantity.
+    """
+    parents, children, qty_per = [], [], []
+    for parent in graph.revisions:
+        lines = [(comp, qty) for comp, qty in graph.components(parent, per_unit=True) if comp != parent and qty > 0]
+        if not lines:
+            continue
+        p = index.add(parent)
+        for comp, qty in lines:
+            parents.append(p)
+            children.append(index.add(comp))
+            qty_per.append(qty)
+    return (np.array(parents, dtype=np.int64), np.array(children, dtype=np.int64),
+            np.array(qty_per, dtype=np.float64))
+
+
+def _low_level_codes(n, parents, children, max_depth=64):
+    """
+    Low-level code per item: the deepest level at which it appears in any BOM (0 = never a component).
+    Returns (codes, mask of edges to keep); edges closing a BOM cycle are dropped so every kept edge goes down a level.
+    """
+    llc = np.zeros(n, dtype=np.int64)
+    for _ in range(max_depth):
+        new = llc.copy()
+        if len(parents):
+            np.maximum.at(new, children, llc[parents] + 1)
+        if np.array_equal(new, llc):
+            break
+        llc = new
+    keep = llc[children] > llc[parents] if len(parents) else np.zeros(0, dtype=bool)
+    return llc, keep
+
+
+def _scheduled_receipts(store, index, bucket_of):
+    """
+    Open supply by item and bucket: PO lines (Ordered - Received) on their Required Date and MO headers
+    (Ordered - Completed) on their Completion Date. Returns (rows, buckets, qty) arrays and the set of item rows covered.
+    """
+    rows, dates, qtys = [], [], []
+    for item_no, lines in store.po_lines_by_item.items():
+        for line in lines:
+            open_qty = _num(line.get("Ordered") or line.get("Ordered Qty")) - _num(line.get("Received") or line.get("Received Qty"))
+            if open_qty <= 0:
+                continue
+            header = store.get_po(line.get("PO No.") or "")
+            if header is not None and not _is_open(header):
+                continue
+            rows.append(index.add(item_no))
+            dates.append(_parse_date(line.get("Required Date") or line.get("realDueDt")))
+            qtys.append(open_qty)
+    for mo in store.mo_headers_by_no.values():
+        item_no = (mo.get("Build Item No.") or mo.get("buildItem") or "").strip()
+        open_qty = _num(mo.get("Ordered") or mo.get("ordQty")) - _num(mo.get("Completed") or mo.get("endQty"))
+        if not item_no or open_qty <= 0 or not _is_open(mo):
+            continue
+        rows.append(index.add(item_no))
+        dates.append(_parse_date(mo.get("Completion Date") or mo.get("endDt")))
+        qtys.append(open_qty)
+    return np.array(rows, dtype=np.int64), bucket_of(dates), np.array(qtys, dtype=np.float64)
 
-        available = on_hand + on_order
-        net_requirement = total_demand + safety_stock - available
 
-        if net_requirement <= 0:
+def _supplier_lead_days(data):
+    """Item No. -> shortest positive supplier lead time from MIQSUP (used when the item has no lead time of its own)."""
+    lead = {}
+    for row in (data or {}).get("MIQSUP.json") or []:
+        if not isinstance(row, dict):
             continue
+        ino = row.get("Item No.") or row.get("itemId")
+        days = _num(row.get("Lead Time") or row.get("leadTime"))
+        if ino and days > 0 and (ino not in lead or days < lead[ino]):
+            lead[ino] = days
+    return lead
+
+
+def run_mrp(items_data, portal_so_lines=None, sage_sos=None, run_by="system", data=None,
+            horizon_days=None, bucket=None, mode="full"):
+    """
+    Execute a time-phased MRP run. Returns the run record and planned orders.
+    data is the loaded company data dict (BOMs, open POs/MOs, MIQSUP); without it the run is single-level and
+    Items.json On Order is treated as available today. mode="net_change" replans only items whose inputs changed
+    since the previous run (plus their BOM descendants).
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    previous = _load_previous_state() if mode == "net_change" else None
+    suppliers = _load_preferred_suppliers()
+    timings["load_state"] = time.perf_counter() - t0
+    result = _plan(items_data, portal_so_lines, sage_sos, data, horizon_days, bucket, previous=previous,
+                   suppliers=suppliers, timings=timings)
+    return _save_run(result["planned_orders"], run_by, summary=result["summary"],
+                     parameters=result["parameters"], previous=result.get("previous"),
+                     fingerprints=result["fingerprints"], timings=timings)
+
+
+def _load_preferred_suppliers():
+    """Item No. -> preferred supplier from core.supplier_items (first supplier by id), in one query."""
+    try:
+        rows = db_service.fetch_all(
+            """SELECT DISTINCT ON (item_id) item_id, supl_id
+               FROM core.supplier_items ORDER BY item_id, supl_id"""
+        )
+        return {r["item_id"]: r["supl_id"] for r in rows}
+    except Exception:
+        return {}
 
-        order_qty = _apply_lot_sizing(net_requirement, lot_size)
-        if reorder_qty > 0:
-            order_qty = max(order_qty, reorder_qty)
 
-        earliest_need = today
-        for d in item_demand:
-            try:
-                nd = date.fromisoformat(str(d["need_date"])[:10])
-                if nd < earliest_need or earliest_need == today:
-                    earliest_need = nd
-            except (ValueError, TypeError):
-                pass
+def _load_previous_state():
+    """Fingerprints and planned orders of the latest run, or None when the stored state is not for that run."""
+    try:
+        state = db_service.fetch_one("SELECT value FROM core.app_config WHERE key = %s", (STATE_KEY,))
+        latest = db_service.fetch_one("SELECT id FROM core.mrp_runs ORDER BY id DESC LIMIT 1")
+        if not state or not latest or (state["value"] or {}).get("run_id") != latest["id"]:
+            return None
+        state = state["value"]
+        state["orders"] = db_service.fetch_all(
+            """SELECT id, item_no, qty, need_date, order_date, supplier_no, status
+               FROM core.mrp_planned_orders WHERE run_id = %s""",
+            (latest["id"],)
+        )
+        return state
+    except Exception as e:
+        print(f"[mrp_engine] previous run state unavailable, running full regeneration: {e}")
+        return None
 
-        order_date = earliest_need - timedelta(days=lead_days)
-        if order_date < today:
-            order_date = today
 
-        supplier_no = _get_preferred_supplier(item_no)
+def _fingerprints(names, gross, receipts, params, parents, children, qty_per):
+    """Item No. -> short hash of the item's planning inputs (call before dependent demand is exploded into gross)."""
+    edges = defaultdict(list)
+    for p, c, q in zip(parents.tolist(), children.tolist(), qty_per.tolist()):
+        edges[p].append(f">{names[c]}:{q!r}")
+        edges[c].append(f"<{names[p]}:{q!r}")
+    out = {}
+    for i, ino in enumerate(names):
+        h = hashlib.blake2b(digest_size=8)
+        h.update(gross[i].tobytes())
+        h.update(receipts[i].tobytes())
+        h.update(params[i].tobytes())
+        h.update("|".join(sorted(edges.get(i, ()))).encode("utf-8"))
+        out[ino] = h.hexdigest()
+    return out
+
+
+def _plan(items_data, portal_so_lines, sage_sos, data, horizon_days=None, bucket=None, previous=None,
+          suppliers=None, timings=None):
+    """
+    Plan items over the bucket grid; writes nothing. Returns {"planned_orders", "summary", "parameters",
+    "fingerprints"} and, for a net-change run, "previous": the earlier orders of the items that were replanned
+    (to diff against) and the orders of unchanged items (carried over as-is). suppliers maps Item No. -> supplier;
+    phase durations are added to timings when given.
+    """
+    timings = {} if timings is None else timings
+    suppliers = suppliers or {}
+    t0 = time.perf_counter()
+    if items_data is None and isinstance(data, dict):
+        items_data = data.get("Items.json")
+    item_params = _get_item_params(items_data)
+    demand = _get_so_demand(portal_so_lines, sage_sos)
+    store = company_data_store.get_store(data) if isinstance(data, dict) else None
 
+    today = date.today()
+    bucket = (bucket or BUCKET) if (bucket or BUCKET) in _BUCKET_DAYS else "day"
+    size = _BUCKET_DAYS[bucket]
+    horizon_days = int(horizon_days or HORIZON_DAYS)
+    nb = max(1, -(-horizon_days // size))
+
+    def bucket_of(dates):
+        """Bucket per date: past due and undated go to bucket 0, dates past the horizon to the last bucket."""
+        offsets = np.array([(d - today).days if d else 0 for d in dates], dtype=np.int64)
+        return np.clip(offsets // size, 0, nb - 1)
+
+    index = _ItemIndex(sorted(set(item_params) | set(demand)))
+    parents = children = qty_per = np.zeros(0, dtype=np.int64)
+    rec_rows = rec_buckets = np.zeros(0, dtype=np.int64)
+    rec_qty = np.zeros(0, dtype=np.float64)
+    if store is not None:
+        parents, children, qty_per = _bom_edges(bom_graph.get_graph(data), index)
+        rec_rows, rec_buckets, rec_qty = _scheduled_receipts(store, index, bucket_of)
+    n = len(index)
+
+    # Item parameter vectors (items only known from BOMs/receipts plan with zero stock and defaults)
+    supplier_lead = _supplier_lead_days(data)
+    on_hand = np.zeros(n)
+    on_order = np.zeros(n)
+    safety = np.zeros(n)
+    lot = np.zeros(n)
+    reorder = np.zeros(n)
+    lead = np.full(n, float(DEFAULT_LEAD_DAYS))
+    for i, ino in enumerate(index.names):
+        ip = item_params.get(ino)
+        days = (ip or {}).get("lead_days") or supplier_lead.get(ino) or DEFAULT_LEAD_DAYS
+        lead[i] = int(days)
+        if ip is None:
+            continue
+        on_hand[i] = ip["on_hand"]
+        on_order[i] = ip["on_order"]
+        safety[i] = ip["safety_stock"]
+        lot[i] = ip["lot_size"]
+        reorder[i] = ip["reorder_qty"]
+
+    gross = np.zeros((n, nb))
+    receipts = np.zeros((n, nb))
+    dem_rows, dem_dates, dem_qty = [], [], []
+    for ino, lines in demand.items():
+        for d in lines:
+            dem_rows.append(index.pos[ino])
+            dem_dates.append(_parse_date(d["need_date"]))
+            dem_qty.append(d["qty"])
+    if dem_rows:
+        np.add.at(gross, (np.array(dem_rows, dtype=np.int64), bucket_of(dem_dates)), np.array(dem_qty))
+    if len(rec_rows):
+        np.add.at(receipts, (rec_rows, rec_buckets), rec_qty)
+    # Items without open PO/MO lines fall back to their On Order total, available today (the single-level behaviour)
+    covered = np.zeros(n, dtype=bool)
+    covered[rec_rows] = True
+    receipts[:, 0] += np.where(covered, 0.0, on_order)
+
+    timings["inputs"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    llc, keep = _low_level_codes(n, parents, children)
+    bom_cycles = int(len(keep) - keep.sum())
+    parents, children, qty_per = parents[keep], children[keep], qty_per[keep]
+    has_bom = np.zeros(n, dtype=bool)
+    has_bom[parents] = True
+
+    params = np.column_stack([on_hand, on_order, safety, lot, reorder, lead])
+    fingerprints = _fingerprints(index.names, gross, receipts, params, parents, children, qty_per)
+    parameters = {"bucket": bucket, "bucket_days": size, "horizon_days": horizon_days, "buckets": nb,
+                  "start_date": today.isoformat(), "mode": "full"}
+    planned = np.zeros((n, nb))
+    replan = np.ones(n, dtype=bool)
+    changed_count = n
+    if previous and all(previous.get(k) == parameters[k] for k in ("bucket", "horizon_days", "start_date")):
+        old = previous.get("fingerprints") or {}
+        replan = np.array([old.get(ino) != fp for ino, fp in zip(index.names, fingerprints.values())], dtype=bool)
+        changed_count = int(replan.sum())
+        # Downstream closure: every component (at any depth) of a changed item
+        while len(parents):
+            grown = replan.copy()
+            grown[children[replan[parents]]] = True
+            if np.array_equal(grown, replan):
+                break
+            replan = grown
+        # Unchanged items keep their previous plan; it still drives their components' dependent demand
+        kept = [o for o in previous.get("orders") or [] if o["item_no"] in index.pos and not replan[index.pos[o["item_no"]]]]
+        if kept:
+            np.add.at(planned, (np.array([index.pos[o["item_no"]] for o in kept], dtype=np.int64),
+                                bucket_of([_parse_date(o["need_date"]) for o in kept])),
+                      np.array([_num(o["qty"]) for o in kept]))
+        parameters["mode"] = "net_change"
+        previous = {"carried": kept,
+                    "replaced": [o for o in previous.get("orders") or []
+                                 if o["item_no"] in index.pos and replan[index.pos[o["item_no"]]]]}
+    else:
+        previous = None
+
+    # Release bucket per (item, need bucket): need day minus lead days, floored to a bucket, never before today
+    start_day = np.arange(nb, dtype=np.int64) * size
+    release_bucket = np.clip((start_day[None, :] - lead.astype(np.int64)[:, None]) // size, 0, nb - 1)
+
+    net_req = np.zeros((n, nb))
+    max_level = int(llc.max()) if n else -1
+    edge_level = llc[parents]
+    timings["graph"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for level in range(max_level + 1):
+        rows = np.nonzero((llc == level) & replan)[0]
+        # Only items with requirements, supply or a safety-stock shortfall need the bucket walk
+        active = gross[rows].any(axis=1) | receipts[rows].any(axis=1) | (on_hand[rows] < safety[rows])
+        rows = rows[active]
+        if len(rows):
+            g, r = gross[rows], receipts[rows]
+            lot_r, reorder_r = lot[rows], reorder[rows]
+            avail = on_hand[rows] - safety[rows]
+            p = np.zeros((len(rows), nb))
+            net = np.zeros((len(rows), nb))
+            for b in range(nb):
+                avail = avail + r[:, b] - g[:, b]
+                short = avail < -1e-9
+                if not short.any():
+                    continue
+                net[:, b] = np.where(short, -avail, 0.0)
+                qty = np.maximum(_apply_lot_sizing(net[:, b], lot_r), np.where(reorder_r > 0, reorder_r, 0.0))
+                p[:, b] = np.where(short, qty, 0.0)
+                avail = avail + p[:, b]
+            planned[rows] = p
+            net_req[rows] = net
+        # Explode this level's releases into the components' gross requirements
+        sel = edge_level == level
+        if sel.any():
+            e_par, e_child, e_qty = parents[sel], children[sel], qty_per[sel]
+            releases = np.zeros((n, nb))
+            src = np.unique(e_par)
+            np.add.at(releases, (np.repeat(src, nb), release_bucket[src].ravel()), planned[src].ravel())
+            np.add.at(gross, e_child, releases[e_par] * e_qty[:, None])
+
+    timings["netting"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    planned_orders = []
+    for i, b in zip(*np.nonzero((planned > 0) & replan[:, None])):
+        item_no = index.names[i]
+        need = today + timedelta(days=int(start_day[b]))
+        order_date = max(today, need - timedelta(days=int(lead[i])))
+        make = bool(has_bom[i])
         planned_orders.append({
             "item_no": item_no,
-            "qty": order_qty,
-            "need_date": earliest_need.isoformat(),
+            "qty": round(float(planned[i, b]), 6),
+            "need_date": need.isoformat(),
             "order_date": order_date.isoformat(),
-            "supplier_no": supplier_no,
-            "net_requirement": net_requirement,
-            "demand_qty": total_demand,
-            "on_hand": on_hand,
-            "on_order": on_order,
-            "safety_stock": safety_stock,
+            "supplier_no": None if make else suppliers.get(item_no),
+            "order_type": "make" if make else "buy",
+            "level": int(llc[i]),
+            "net_requirement": round(float(net_req[i, b]), 6),
+            "demand_qty": round(float(gross[i, b]), 6),
+            "on_hand": float(on_hand[i]),
+            "on_order": float(on_order[i]),
+            "safety_stock": float(safety[i]),
         })
 
-    run_record = _save_run(planned_orders, run_by)
-    return run_record
-
-
-def _get_preferred_supplier(item_no):
-    """Find preferred supplier from core.supplier_items."""
-    try:
-        row = db_service.fetch_one(
-            "SELECT supl_id FROM core.supplier_items WHERE item_id = %s LIMIT 1",
-            (item_no,)
-        )
-        return row["supl_id"] if row else None
-    except Exception:
-        return None
-
-
-def _save_run(planned_orders, run_by):
-    """Persist MRP run and planned orders to DB."""
+    planned_orders.sort(key=lambda po: (po["item_no"], po["need_date"]))
+    timings["orders"] = time.perf_counter() - t0
+    summary = {
+        "items_analyzed": n,
+        "levels": max_level + 1,
+        "bom_edges": int(len(parents)),
+        "bom_cycles_dropped": bom_cycles,
+        "scheduled_receipts": int(len(rec_rows)),
+        "demand_lines": len(dem_rows),
+        "changed_items": changed_count,
+        "replanned_items": int(replan.sum()),
+        "planned_orders": len(planned_orders),
+    }
+    return {"planned_orders": planned_orders, "summary": summary, "parameters": parameters,
+            "fingerprints": fingerprints, "previous": previous}
+
+
+def _order_key(po):
+    return (po["item_no"], str(po["need_date"])[:10])
+
+
+def _same_order(old, new):
+    return (abs(_num(old["qty"]) - _num(new["qty"])) < 1e-6
+            and str(old["order_date"])[:10] == str(new["order_date"])[:10]
+            and (old.get("supplier_no") or None) == (new.get("supplier_no") or None))
+
+
+def _diff_orders(planned_orders, previous):
+    """(orders to insert, ids of previous orders carried over unchanged) for a net-change run."""
+    if not previous:
+        return planned_orders, []
+    carried = [o["id"] for o in previous["carried"]]
+    replaced = {_order_key(o): o for o in previous["replaced"] if o.get("status") == "planned"}
+    inserts = []
+    for po in planned_orders:
+        old = replaced.get(_order_key(po))
+        if old is not None and _same_order(old, po):
+            carried.append(old["id"])
+        else:
+            inserts.append(po)
+    return inserts, carried
+
+
+def _save_run(planned_orders, run_by, summary=None, parameters=None, previous=None, fingerprints=None,
+              timings=None):
+    """
+    Persist the MRP run, its planned orders (bulk insert; net-change runs insert only orders that differ and copy the
+    rest, leaving the previous run intact) and the net-change state in one transaction.
+    """
+    summary = summary or {"items_analyzed": len(planned_orders)}
+    timings = {} if timings is None else timings
+    inserts, carried = _diff_orders(planned_orders, previous)
+    summary["inserted_orders"] = len(inserts)
+    summary["carried_orders"] = len(carried)
+    summary["timings"] = {k: round(v, 3) for k, v in timings.items()}  # planning phases; persist is added to the result
+    t0 = time.perf_counter()
     try:
-        from psycopg2.extras import Json
-        run = db_service.insert_returning(
-            """INSERT INTO core.mrp_runs (run_by, planned_order_count, summary)
-               VALUES (%s, %s, %s) RETURNING *""",
-            (run_by, len(planned_orders), Json({"items_analyzed": len(planned_orders)}))
-        )
-
-        for po in planned_orders:
-            db_service.execute(
-                """INSERT INTO core.mrp_planned_orders
-                   (run_id, item_no, qty, need_date, order_date, supplier_no)
-                   VALUES (%s,%s,%s,%s,%s,%s)""",
-                (run["id"], po["item_no"], po["qty"],
-                 po["need_date"], po["order_date"], po.get("supplier_no"))
+        from psycopg2.extras import Json, execute_values
+        with db_service.get_cursor() as cur:
+            cur.execute(
+                """INSERT INTO core.mrp_runs (run_by, planned_order_count, summary, parameters)
+                   VALUES (%s, %s, %s, %s) RETURNING *""",
+                (run_by, len(inserts) + len(carried), Json(summary), Json(parameters or {}))
             )
-
-        run["planned_orders"] = planned_orders
+            run = db_service.row_to_dict(cur.fetchone())
+            if inserts:
+                execute_values(
+                    cur,
+                    """INSERT INTO core.mrp_planned_orders
+                       (run_id, item_no, qty, need_date, order_date, supplier_no) VALUES %s""",
+                    [(run["id"], po["item_no"], po["qty"], po["need_date"], po["order_date"], po.get("supplier_no"))
+                     for po in inserts],
+                    page_size=1000,
+                )
+            if carried:
+                # Copy, don't move: the previous run keeps its planned orders
+                cur.execute(
+                    """INSERT INTO core.mrp_planned_orders
+                       (run_id, item_no, qty, need_date, order_date, supplier_no)
+                       SELECT %s, item_no, qty, need_date, order_date, supplier_no
+                       FROM core.mrp_planned_orders WHERE id = ANY(%s)""",
+                    (run["id"], carried)
+                )
+            if fingerprints is not None:
+                state = {"run_id": run["id"], "fingerprints": fingerprints}
+                state.update({k: (parameters or {}).get(k) for k in ("bucket", "horizon_days", "start_date")})
+                cur.execute(
+                    """INSERT INTO core.app_config (key, value) VALUES (%s, %s)
+                       ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value""",
+                    (STATE_KEY, Json(state))
+                )
+        run["summary"] = dict(summary, timings=dict(summary["timings"], persist=round(time.perf_counter() - t0, 3)))
+        run["planned_orders"] = planned_orders + (previous["carried"] if previous else [])
         audit_service.log_from_request("MRP_RUN", "MRP", run["id"],
-                                       after={"planned_count": len(planned_orders)})
+                                       after={"planned_count": len(inserts) + len(carried),
+                                              "inserted": len(inserts)})
         return run
     except Exception as e:
-        return {"status": "error", "error": str(e), "planned_orders": planned_orders}
+        return {"status": "error", "error": str(e), "planned_orders": planned_orders, "summary": summary}
 
 
 def get_run(run_id):
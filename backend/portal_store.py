@@ -1,14 +1,35 @@
 """
 Portal store: persisted mutations (MOs, inventory adjustments, transfers, item overrides, BOM edits).
 Merged into get_all_data so the app sees portal-originated data. File-based JSON; safe for Render (ephemeral) and local.
+Event lists (adjustments, transfers, reserves, ...) are append-only; apply_to_data folds them incrementally into
+per-(item, location) aggregates (_Overlay) instead of replaying every event against the full datasets.
+
+Storage modes (PORTAL_STORE_BACKEND):
+  json    (default) - whole store in data/portal_store.json, rewritten on every add_*.
+  sqlite  - journaled: each add_* appends one row to data/portal_store.db (SQLite, WAL mode); records that are
+            updated in place (MO/WO updates, item overrides, lot edits, custom alerts) are stored per key.
+            On first open the existing portal_store.json is migrated into the journal. Same get_*/add_* API.
 """
 import os
 import json
+import sqlite3
+import threading
+from collections import defaultdict
 from datetime import datetime
 from threading import Lock
 
+import company_data_store
+
 _lock = Lock()
 _store_path = os.path.join(os.path.dirname(__file__), "data", "portal_store.json")
+_journal_path = os.getenv("PORTAL_STORE_DB") or os.path.join(os.path.dirname(__file__), "data", "portal_store.db")
+_backend = (os.getenv("PORTAL_STORE_BACKEND") or "json").strip().lower()
+
+# Store keys updated in place (read-modify-write); everything else is an append-only event list
+_STATE_KEYS = ("mo_updates", "item_overrides", "lot_edits", "wo_updates", "custom_alerts")
+# bom_edits is a dict of lists; the journal keeps headers/details as two streams and rebuilds the four keys
+_BOM_HEADER_STREAM = "bom_headers"
+_BOM_DETAIL_STREAM = "bom_details"
 
 def _ensure_dir():
     d = os.path.dirname(_store_path)
@@ -42,7 +63,183 @@ def _default_store():
         "custom_alerts": [],  # [{ id, item_no, threshold, at }] - alert when stock < threshold
     }
 
+
+class _Journal:
+    """SQLite (WAL) journal: one row per appended event, one row per in-place state key.
+    snapshot() keeps the rebuilt store dict in memory and only reads events with id > last seen id."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._snapshot_lock = Lock()
+        self._snapshot = None
+        self._last_id = 0
+        d = os.path.dirname(path)
+        if d and not os.path.isdir(d):
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, stream TEXT NOT NULL, payload TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def append(self, stream, record):
+        self._conn().execute("INSERT INTO events (stream, payload) VALUES (?, ?)", (stream, json.dumps(record)))
+
+    def append_many(self, rows):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT INTO events (stream, payload) VALUES (?, ?)", [(stream, json.dumps(rec)) for stream, rec in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update_state(self, key, default, fn):
+        """Read-modify-write one state key in a single IMMEDIATE transaction (serialized across workers)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT payload FROM state WHERE key = ?", (key,)).fetchone()
+            value = json.loads(row[0]) if row else default
+            result = fn(value)
+            conn.execute("INSERT OR REPLACE INTO state (key, payload) VALUES (?, ?)", (key, json.dumps(value)))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('state_seq', '1') "
+                         "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def change_token(self):
+        """(last event id, state update count): changes on every append/update from any process."""
+        row = self._conn().execute(
+            "SELECT (SELECT IFNULL(MAX(id), 0) FROM events), (SELECT IFNULL(value, '0') FROM meta WHERE key = 'state_seq')"
+        ).fetchone()
+        return (row[0], row[1] or "0")
+
+    def get_meta(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self._conn().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def snapshot(self, copy=False):
+        """Full store dict (shared, treat as read-only unless copy=True). Folds in only events appended since the previous call."""
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                self._snapshot = _default_store()
+                self._last_id = 0
+            store = self._snapshot
+            conn = self._conn()
+            for ev_id, stream, payload in conn.execute("SELECT id, stream, payload FROM events WHERE id > ? ORDER BY id", (self._last_id,)):
+                record = json.loads(payload)
+                if stream == _BOM_HEADER_STREAM:
+                    store["bom_edits"]["MIBOMH.json"].append(record)
+                    store["bom_edits"]["BillsOfMaterial.json"].append(record)
+                elif stream == _BOM_DETAIL_STREAM:
+                    store["bom_edits"]["MIBOMD.json"].append(record)
+                    store["bom_edits"]["BillOfMaterialDetails.json"].append(record)
+                else:
+                    store.setdefault(stream, []).append(record)
+                self._last_id = ev_id
+            for key, payload in conn.execute("SELECT key, payload FROM state"):
+                store[key] = json.loads(payload)
+            if copy:
+                return json.loads(json.dumps(store))
+            return store
+
+    def checkpoint(self):
+        """Fold the WAL back into the main database file and truncate it."""
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def migrate_from_json(self, json_path):
+        """Import an existing portal_store.json once (no-op when already migrated). Returns number of events imported."""
+        if self.get_meta("migrated_from_json"):
+            return 0
+        store = None
+        if os.path.isfile(json_path):
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    store = json.load(f)
+            except Exception as e:
+                print(f"[portal_store] journal migration: could not read {json_path}: {e}")
+                return 0
+        rows = []
+        if store:
+            for key, value in store.items():
+                if key in _STATE_KEYS or key == "bom_edits" or not isinstance(value, list):
+                    continue
+                rows.extend((key, rec) for rec in value)
+            bom = store.get("bom_edits") or {}
+            rows.extend((_BOM_HEADER_STREAM, rec) for rec in bom.get("MIBOMH.json") or [])
+            rows.extend((_BOM_DETAIL_STREAM, rec) for rec in bom.get("MIBOMD.json") or [])
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.get_meta("migrated_from_json"):
+                conn.execute("ROLLBACK")
+                return 0
+            conn.executemany("INSERT INTO events (stream, payload) VALUES (?, ?)", [(stream, json.dumps(rec)) for stream, rec in rows])
+            for key in _STATE_KEYS:
+                if store and key in store:
+                    conn.execute("INSERT OR REPLACE INTO state (key, payload) VALUES (?, ?)", (key, json.dumps(store[key])))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ("migrated_from_json", datetime.utcnow().isoformat() + "Z"))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if rows:
+            print(f"[portal_store] Migrated {len(rows)} events from {json_path} into journal {self.path}")
+        return len(rows)
+
+
+_journal = None
+_journal_init_lock = Lock()
+
+
+def _use_journal():
+    return _backend == "sqlite"
+
+
+def _get_journal():
+    global _journal
+    if _journal is None:
+        with _journal_init_lock:
+            if _journal is None:
+                j = _Journal(_journal_path)
+                j.migrate_from_json(_store_path)
+                _journal = j
+    return _journal
+
+
+def migrate_json_to_journal(json_path=None):
+    """Import portal_store.json into the SQLite journal (normally done automatically on first open). Returns events imported."""
+    return _get_journal().migrate_from_json(json_path or _store_path)
+
+
+def compact():
+    """Journal mode: checkpoint and truncate the WAL file. No-op for the JSON backend."""
+    if _use_journal():
+        _get_journal().checkpoint()
+
+
 def load():
+    if _use_journal():
+        return _get_journal().snapshot(copy=True)
     with _lock:
         _ensure_dir()
         if not os.path.isfile(_store_path):
@@ -66,439 +263,441 @@ def save(store):
                 json.dump(store, f, indent=2)
         except Exception as e:
             print(f"[portal_store] save error: {e}")
+            return
+        _cached_store["sig"] = _store_signature()
+        _cached_store["store"] = store
+    # Fold the appended event(s) into the running aggregates now, so the next apply_to_data has nothing to replay
+    _sync_overlay(store)
+
+
+def _append(stream, record):
+    """Append one event record: a single journal INSERT, or load/append/save for the JSON backend."""
+    if _use_journal():
+        _get_journal().append(stream, record)
+        return
+    s = load()
+    s.setdefault(stream, []).append(record)
+    save(s)
 
-def get_created_mos():
-    return load().get("created_mos", [])
 
-def add_created_mo(mo_record):
+def _update_state(key, fn):
+    """Read-modify-write an in-place store key (list or dict). fn mutates the value and may return a result."""
+    default = _default_store()[key]
+    if _use_journal():
+        return _get_journal().update_state(key, default, fn)
     s = load()
-    s.setdefault("created_mos", []).append(mo_record)
+    value = s.get(key, default)
+    result = fn(value)
+    s[key] = value
     save(s)
+    return result
+
+
+def _get(key, default=None):
+    """
+    Current value of a store key. In journal mode the containers are copied off the shared snapshot (lists, and the
+    lists inside bom_edits) so callers can sort/append freely; the records in them are shared and must not be mutated.
+    """
+    if default is None:
+        default = _default_store()[key]
+    if _use_journal():
+        value = _get_journal().snapshot().get(key, default)
+        if isinstance(value, dict):
+            return {k: list(v) if isinstance(v, list) else v for k, v in value.items()}
+        return list(value) if isinstance(value, list) else value
+    return load().get(key, default)
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+def get_created_mos():
+    return _get("created_mos")
+
+def add_created_mo(mo_record):
+    _append("created_mos", mo_record)
 
 def get_mo_updates():
-    return load().get("mo_updates", [])
+    return _get("mo_updates")
 
 def add_mo_update(mo_no, status=None, completed=None, release_date=None, completion_date=None):
-    s = load()
-    updates = s.get("mo_updates", [])
-    existing = next((u for u in updates if u.get("mo_no") == mo_no), None)
-    if existing:
-        if status is not None:
-            existing["status"] = status
-        if completed is not None:
-            existing["Completed"] = completed
-        if release_date is not None:
-            existing["Release Date"] = release_date
-        if completion_date is not None:
-            existing["Completion Date"] = completion_date
-    else:
-        updates.append({
-            "mo_no": mo_no,
-            "status": status,
-            "Completed": completed,
-            "Release Date": release_date or "",
-            "Completion Date": completion_date or "",
-        })
-    s["mo_updates"] = updates
-    save(s)
+    def _apply(updates):
+        existing = next((u for u in updates if u.get("mo_no") == mo_no), None)
+        if existing:
+            if status is not None:
+                existing["status"] = status
+            if completed is not None:
+                existing["Completed"] = completed
+            if release_date is not None:
+                existing["Release Date"] = release_date
+            if completion_date is not None:
+                existing["Completion Date"] = completion_date
+        else:
+            updates.append({
+                "mo_no": mo_no,
+                "status": status,
+                "Completed": completed,
+                "Release Date": release_date or "",
+                "Completion Date": completion_date or "",
+            })
+    _update_state("mo_updates", _apply)
 
 def get_inventory_adjustments():
-    return load().get("inventory_adjustments", [])
+    return _get("inventory_adjustments")
 
 def add_inventory_adjustment(item_no, location, delta, reason=""):
-    s = load()
-    s.setdefault("inventory_adjustments", []).append({
+    _append("inventory_adjustments", {
         "item_no": item_no,
         "location": location or "",
         "delta": float(delta),
         "reason": reason or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 def get_wip_adjustments():
-    return load().get("wip_adjustments", [])
+    return _get("wip_adjustments")
 
 
 def add_wip_adjustment(item_no, location, delta, reason=""):
     """Adjust WIP (work in progress) qty. Used for Assemble/Disassemble from/to WIP."""
-    s = load()
-    s.setdefault("wip_adjustments", []).append({
+    _append("wip_adjustments", {
         "item_no": item_no,
         "location": location or "",
         "delta": float(delta),
         "reason": reason or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_location_transfers():
-    return load().get("location_transfers", [])
+    return _get("location_transfers")
 
 def add_location_transfer(from_loc, to_loc, item_no, qty, from_bin="", to_bin=""):
-    s = load()
     rec = {
         "from_loc": from_loc,
         "to_loc": to_loc,
         "item_no": item_no,
         "qty": float(qty),
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     }
     if from_bin:
         rec["from_bin"] = from_bin
     if to_bin:
         rec["to_bin"] = to_bin
-    s.setdefault("location_transfers", []).append(rec)
-    save(s)
+    _append("location_transfers", rec)
 
 
 def get_reserve_transactions():
-    return load().get("reserve_transactions", [])
+    return _get("reserve_transactions")
 
 
 def add_reserve(item_no, location, qty, ref=""):
-    s = load()
-    s.setdefault("reserve_transactions", []).append({
+    _append("reserve_transactions", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "type": "reserve",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def add_relieve_reserve(item_no, location, qty, ref=""):
-    s = load()
-    s.setdefault("reserve_transactions", []).append({
+    _append("reserve_transactions", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "type": "relieve",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_allocations():
-    return load().get("allocations", [])
+    return _get("allocations")
 
 
 def add_allocation(item_no, location, qty, ref):
-    s = load()
-    s.setdefault("allocations", []).append({
+    _append("allocations", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "ref": ref or "",
         "type": "allocate",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def add_deallocation(item_no, location, qty, ref):
-    s = load()
-    s.setdefault("allocations", []).append({
+    _append("allocations", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "ref": ref or "",
         "type": "deallocate",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_scrap_transactions():
-    return load().get("scrap_transactions", [])
+    return _get("scrap_transactions")
 
 
 def add_scrap(item_no, location, qty, ref=""):
-    s = load()
-    s.setdefault("scrap_transactions", []).append({
+    _append("scrap_transactions", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "type": "scrap",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def add_recover(item_no, location, qty, ref=""):
-    s = load()
-    s.setdefault("scrap_transactions", []).append({
+    _append("scrap_transactions", {
         "item_no": item_no,
         "location": location or "",
         "qty": float(qty),
         "type": "recover",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_assembly_transactions():
-    return load().get("assembly_transactions", [])
+    return _get("assembly_transactions")
 
 
 def add_assembly(parent_item, qty, location, components_consumed=None, from_wip=False, to_wip=False):
     """Record assembly: consume components, add finished good. components_consumed: [(item_no, qty), ...]."""
-    s = load()
     rec = {
         "parent_item": parent_item,
         "qty": float(qty),
         "location": location or "",
         "type": "assemble",
         "components_consumed": components_consumed or [],
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     }
     if from_wip:
         rec["from_wip"] = True
     if to_wip:
         rec["to_wip"] = True
-    s.setdefault("assembly_transactions", []).append(rec)
-    save(s)
+    _append("assembly_transactions", rec)
 
 
 def add_disassembly(parent_item, qty, location, components_released=None, from_wip=False, to_wip=False):
     """Record disassembly: reduce finished good, add components. components_released: [(item_no, qty), ...]."""
-    s = load()
     rec = {
         "parent_item": parent_item,
         "qty": float(qty),
         "location": location or "",
         "type": "disassemble",
         "components_released": components_released or [],
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     }
     if from_wip:
         rec["from_wip"] = True
     if to_wip:
         rec["to_wip"] = True
-    s.setdefault("assembly_transactions", []).append(rec)
-    save(s)
+    _append("assembly_transactions", rec)
 
 
 def add_supplier_receive(item_no, qty, location, supplier="", ref=""):
-    s = load()
-    s.setdefault("supplier_receives", []).append({
+    _append("supplier_receives", {
         "item_no": item_no,
         "qty": float(qty),
         "location": location or "",
         "supplier": supplier or "",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def add_supplier_return(item_no, qty, location, supplier="", ref=""):
-    s = load()
-    s.setdefault("supplier_returns", []).append({
+    _append("supplier_returns", {
         "item_no": item_no,
         "qty": float(qty),
         "location": location or "",
         "supplier": supplier or "",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def add_sales_transfer(so_no, items, line_ref=""):
     """items: [{item_no, qty}, ...]"""
-    s = load()
-    s.setdefault("sales_transfers", []).append({
+    _append("sales_transfers", {
         "so_no": so_no,
         "line_ref": line_ref or "",
         "items": items,
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_buyers_advice():
-    return load().get("buyers_advice", [])
+    return _get("buyers_advice")
 
 
 def add_buyers_advice(item_no, qty, need_date="", ref=""):
-    s = load()
-    s.setdefault("buyers_advice", []).append({
+    _append("buyers_advice", {
         "item_no": item_no,
         "qty": float(qty),
         "need_date": need_date or "",
         "ref": ref or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 
 def get_item_overrides():
-    return load().get("item_overrides", {})
+    return _get("item_overrides")
 
 def set_item_override(item_no, minimum=None, maximum=None, reorder_level=None, reorder_quantity=None):
-    s = load()
-    ov = s.setdefault("item_overrides", {}).setdefault(item_no, {})
-    if minimum is not None:
-        ov["Minimum"] = minimum
-    if maximum is not None:
-        ov["Maximum"] = maximum
-    if reorder_level is not None:
-        ov["Reorder Level"] = reorder_level
-    if reorder_quantity is not None:
-        ov["Reorder Quantity"] = reorder_quantity
-    save(s)
+    def _apply(overrides):
+        ov = overrides.setdefault(item_no, {})
+        if minimum is not None:
+            ov["Minimum"] = minimum
+        if maximum is not None:
+            ov["Maximum"] = maximum
+        if reorder_level is not None:
+            ov["Reorder Level"] = reorder_level
+        if reorder_quantity is not None:
+            ov["Reorder Quantity"] = reorder_quantity
+    _update_state("item_overrides", _apply)
 
 def get_bom_edits():
-    return load().get("bom_edits", _default_store()["bom_edits"])
+    return _get("bom_edits")
 
 def add_bom_header(header_record):
+    if _use_journal():
+        _get_journal().append(_BOM_HEADER_STREAM, header_record)
+        return
     s = load()
     s.setdefault("bom_edits", _default_store()["bom_edits"])["MIBOMH.json"].append(header_record)
     s["bom_edits"]["BillsOfMaterial.json"].append(header_record)
     save(s)
 
 def add_bom_detail(detail_record):
+    if _use_journal():
+        _get_journal().append(_BOM_DETAIL_STREAM, detail_record)
+        return
     s = load()
     s.setdefault("bom_edits", _default_store()["bom_edits"])["MIBOMD.json"].append(detail_record)
     s["bom_edits"]["BillOfMaterialDetails.json"].append(detail_record)
     save(s)
 
 def get_created_pos():
-    return load().get("created_pos", [])
+    return _get("created_pos")
 
 def add_created_po(header_record):
-    s = load()
-    s.setdefault("created_pos", []).append(header_record)
-    save(s)
+    _append("created_pos", header_record)
 
 def get_created_po_details():
-    return load().get("created_po_details", [])
+    return _get("created_po_details")
 
 def add_created_po_detail(detail_record):
-    s = load()
-    s.setdefault("created_po_details", []).append(detail_record)
-    save(s)
+    _append("created_po_details", detail_record)
 
 def get_po_receives():
-    return load().get("po_receives", [])
+    return _get("po_receives")
 
 def add_po_receive(po_no, item_no, qty, location="", lot="", user=""):
-    s = load()
-    s.setdefault("po_receives", []).append({
+    _append("po_receives", {
         "po_no": po_no,
         "item_no": item_no,
         "qty": float(qty),
         "location": location or "",
         "lot": lot or "",
         "user": user or "portal",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 def get_mo_completion_lots():
-    return load().get("mo_completion_lots", [])
+    return _get("mo_completion_lots")
 
 def add_mo_completion_lot(mo_no, item_no, qty, lot=""):
-    s = load()
-    s.setdefault("mo_completion_lots", []).append({
+    _append("mo_completion_lots", {
         "mo_no": mo_no,
         "item_no": item_no,
         "qty": float(qty),
         "lot": lot or "",
-        "at": datetime.utcnow().isoformat() + "Z",
+        "at": _now(),
     })
-    save(s)
 
 def get_lot_edits():
-    return load().get("lot_edits", [])
+    return _get("lot_edits")
 
 def add_lot_edit(item_no, lot_no, serial_no="", description=None, status=None, expiration_date=None):
     """Add or update a lot attribute edit. Matches by (item_no, lot_no, serial_no). Only stores fields explicitly provided."""
-    s = load()
-    edits = s.get("lot_edits", [])
     key = (str(item_no or "").strip(), str(lot_no or "").strip(), str(serial_no or "").strip())
-    existing = next((e for e in edits if (e.get("item_no") or "").strip() == key[0] and (e.get("lot_no") or "").strip() == key[1] and (e.get("serial_no") or "").strip() == key[2]), None)
-    if existing:
-        if description is not None:
-            existing["description"] = description
-        if status is not None:
-            existing["status"] = status
-        if expiration_date is not None:
-            existing["expiration_date"] = expiration_date
-        existing["at"] = datetime.utcnow().isoformat() + "Z"
-    else:
-        rec = {"item_no": key[0], "lot_no": key[1], "serial_no": key[2], "at": datetime.utcnow().isoformat() + "Z"}
-        if description is not None:
-            rec["description"] = description
-        if status is not None:
-            rec["status"] = status
-        if expiration_date is not None:
-            rec["expiration_date"] = expiration_date
-        edits.append(rec)
-    s["lot_edits"] = edits
-    save(s)
+
+    def _apply(edits):
+        existing = next((e for e in edits if (e.get("item_no") or "").strip() == key[0] and (e.get("lot_no") or "").strip() == key[1] and (e.get("serial_no") or "").strip() == key[2]), None)
+        if existing:
+            if description is not None:
+                existing["description"] = description
+            if status is not None:
+                existing["status"] = status
+            if expiration_date is not None:
+                existing["expiration_date"] = expiration_date
+            existing["at"] = _now()
+        else:
+            rec = {"item_no": key[0], "lot_no": key[1], "serial_no": key[2], "at": _now()}
+            if description is not None:
+                rec["description"] = description
+            if status is not None:
+                rec["status"] = status
+            if expiration_date is not None:
+                rec["expiration_date"] = expiration_date
+            edits.append(rec)
+    _update_state("lot_edits", _apply)
 
 def get_wo_updates():
-    return load().get("wo_updates", [])
+    return _get("wo_updates")
 
 
 def get_mo_events():
-    return load().get("mo_events", [])
+    return _get("mo_events")
 
 
 def add_mo_event(event):
     """Add an MO transaction event (issue, complete, adjust, unissue)."""
-    s = load()
-    events = s.get("mo_events", [])
-    event.setdefault("ts", datetime.utcnow().isoformat() + "Z")
-    events.append(event)
-    s["mo_events"] = events
-    save(s)
+    event.setdefault("ts", _now())
+    _append("mo_events", event)
 
 def add_wo_update(wo_no, status=None, release_date=None, completed=None, completion_date=None, scrap=None):
-    s = load()
-    updates = s.get("wo_updates", [])
-    existing = next((u for u in updates if u.get("wo_no") == wo_no), None)
-    if existing:
-        if status is not None:
-            existing["status"] = status
-        if release_date is not None:
-            existing["Release Date"] = release_date
-        if completed is not None:
-            existing["Completed"] = completed
-        if completion_date is not None:
-            existing["Completion Date"] = completion_date
-        if scrap is not None:
-            existing["Scrap"] = scrap
-    else:
-        updates.append({
-            "wo_no": wo_no,
-            "status": status,
-            "Release Date": release_date or "",
-            "Completed": completed,
-            "Completion Date": completion_date or "",
-            "Scrap": scrap,
-        })
-    s["wo_updates"] = updates
-    save(s)
+    def _apply(updates):
+        existing = next((u for u in updates if u.get("wo_no") == wo_no), None)
+        if existing:
+            if status is not None:
+                existing["status"] = status
+            if release_date is not None:
+                existing["Release Date"] = release_date
+            if completed is not None:
+                existing["Completed"] = completed
+            if completion_date is not None:
+                existing["Completion Date"] = completion_date
+            if scrap is not None:
+                existing["Scrap"] = scrap
+        else:
+            updates.append({
+                "wo_no": wo_no,
+                "status": status,
+                "Release Date": release_date or "",
+                "Completed": completed,
+                "Completion Date": completion_date or "",
+                "Scrap": scrap,
+            })
+    _update_state("wo_updates", _apply)
 
 
 def get_custom_alerts():
-    return load().get("custom_alerts", [])
+    return _get("custom_alerts")
 
 
 def add_custom_alert(item_no, threshold):
     """Add a custom alert: notify when stock < threshold. Returns the new alert."""
     import uuid
-    s = load()
-    alerts = s.get("custom_alerts", [])
     item_no = (item_no or "").strip()
     try:
         threshold = float(threshold)
@@ -506,216 +705,318 @@ def add_custom_alert(item_no, threshold):
         threshold = 0
     if not item_no:
         return None
-    alert = {"id": str(uuid.uuid4()), "item_no": item_no, "threshold": threshold, "at": datetime.utcnow().isoformat() + "Z"}
-    alerts.append(alert)
-    s["custom_alerts"] = alerts
-    save(s)
+    alert = {"id": str(uuid.uuid4()), "item_no": item_no, "threshold": threshold, "at": _now()}
+    _update_state("custom_alerts", lambda alerts: alerts.append(alert))
     return alert
 
 
 def remove_custom_alert(alert_id):
-    s = load()
-    alerts = [a for a in s.get("custom_alerts", []) if a.get("id") != alert_id]
-    s["custom_alerts"] = alerts
-    save(s)
+    def _apply(alerts):
+        alerts[:] = [a for a in alerts if a.get("id") != alert_id]
+    _update_state("custom_alerts", _apply)
+
+
+class _Overlay:
+    """Running per-(item, location) aggregates of the append-only portal event lists.
+    sync() folds only events appended since the last sync; a shrunk or rewritten list triggers a full rebuild."""
+
+    STREAMS = (
+        "inventory_adjustments", "wip_adjustments", "location_transfers",
+        "reserve_transactions", "allocations", "scrap_transactions",
+        "assembly_transactions", "supplier_receives", "supplier_returns",
+        "sales_transfers", "mo_events", "po_receives",
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.consumed = {}        # stream -> number of events folded
+        self.last_event = {}      # stream -> copy of last folded event (detects a replaced store file)
+        self.stock_by_item = defaultdict(float)
+        self.stock_by_key = defaultdict(float)    # (item_no, location) -> net stock delta
+        self.wip_by_item = defaultdict(float)
+        self.wip_by_key = defaultdict(float)
+        self.transfer_ops = defaultdict(list)     # (item_no, location) -> [signed qty], applied in order (outbound clamps at 0)
+        self.reserve_by_key = defaultdict(float)
+        self.alloc_by_key = defaultdict(float)
+        self.scrap_by_key = defaultdict(float)
+        self.ledger = {name: [] for name in self.STREAMS}
+        self.version = 0
+
+    def sync(self, store):
+        for name in self.STREAMS:
+            events = store.get(name) or []
+            n = self.consumed.get(name, 0)
+            if n > len(events) or (n and events[n - 1] != self.last_event.get(name)):
+                self.reset()
+                break
+        for name in self.STREAMS:
+            events = store.get(name) or []
+            n = self.consumed.get(name, 0)
+            if len(events) <= n:
+                continue
+            for ev in events[n:]:
+                self._fold(name, ev)
+            self.consumed[name] = len(events)
+            self.last_event[name] = dict(events[-1])
+            self.version += 1
+
+    def _fold(self, name, ev):
+        if name in ("inventory_adjustments", "wip_adjustments"):
+            ino = ev.get("item_no")
+            loc = ev.get("location") or ""
+            delta = float(ev.get("delta", 0))
+            if ino:
+                if name == "inventory_adjustments":
+                    self.stock_by_item[ino] += delta
+                    self.stock_by_key[(ino, loc)] += delta
+                else:
+                    self.wip_by_item[ino] += delta
+                    self.wip_by_key[(ino, loc)] += delta
+            self.ledger[name].append({"_type": "ADJUST" if name == "inventory_adjustments" else "WIP_ADJUST", "ts": ev.get("at", ""), "itemNo": ev.get("item_no", ""), "location": ev.get("location", ""), "qty": ev.get("delta", 0), "reason": ev.get("reason", ""), "user": "portal"})
+        elif name == "location_transfers":
+            ino = ev.get("item_no")
+            qty = float(ev.get("qty", 0))
+            if ino and qty:
+                self.transfer_ops[(ino, ev.get("from_loc") or "")].append(-qty)
+                self.transfer_ops[(ino, ev.get("to_loc") or "")].append(qty)
+            self.ledger[name].append({"_type": "TRANSFER", "ts": ev.get("at", ""), "itemNo": ev.get("item_no", ""), "fromLoc": ev.get("from_loc", ""), "toLoc": ev.get("to_loc", ""), "qty": ev.get("qty", 0), "user": "portal"})
+        elif name in ("reserve_transactions", "allocations", "scrap_transactions"):
+            key = (ev.get("item_no") or "", ev.get("location") or "")
+            qty = float(ev.get("qty", 0))
+            if name == "reserve_transactions":
+                self.reserve_by_key[key] += qty if ev.get("type") == "reserve" else -qty
+                default_type = "RESERVE"
+            elif name == "allocations":
+                self.alloc_by_key[key] += qty if ev.get("type") == "allocate" else -qty
+                default_type = "ALLOCATE"
+            else:
+                self.scrap_by_key[key] += qty if ev.get("type") == "scrap" else -qty
+                default_type = "SCRAP"
+            self.ledger[name].append({"_type": ev.get("type", default_type).upper(), "ts": ev.get("at", ""), "itemNo": ev.get("item_no", ""), "location": ev.get("location", ""), "qty": ev.get("qty", 0), "ref": ev.get("ref", ""), "user": "portal"})
+        elif name == "assembly_transactions":
+            self.ledger[name].append({"_type": ev.get("type", "ASSEMBLE").upper(), "ts": ev.get("at", ""), "itemNo": ev.get("parent_item", ""), "location": ev.get("location", ""), "qty": ev.get("qty", 0), "user": "portal"})
+        elif name in ("supplier_receives", "supplier_returns"):
+            self.ledger[name].append({"_type": "SUPPLIER_RECEIVE" if name == "supplier_receives" else "SUPPLIER_RETURN", "ts": ev.get("at", ""), "itemNo": ev.get("item_no", ""), "location": ev.get("location", ""), "qty": ev.get("qty", 0), "ref": ev.get("ref", ""), "user": "portal"})
+        elif name == "sales_transfers":
+            self.ledger[name].append({"_type": "SALES_TRANSFER", "ts": ev.get("at", ""), "soNo": ev.get("so_no", ""), "items": ev.get("items", []), "user": "portal"})
+        elif name == "mo_events":
+            self.ledger[name].append({"_type": ev.get("type", "MO_EVENT"), "ts": ev.get("ts", ""), "itemNo": ev.get("itemNo", ""), "moNo": ev.get("moNo", ""), "qty": ev.get("qty", 0), "location": ev.get("location", ""), "user": ev.get("user", ""), "ref": ev.get("ref", "")})
+        elif name == "po_receives":
+            self.ledger[name].append({"_type": "PO_RECEIVE", "ts": ev.get("at", ""), "itemNo": ev.get("item_no", ""), "poNo": ev.get("po_no", ""), "qty": ev.get("qty", 0), "location": ev.get("location", ""), "lot": ev.get("lot", ""), "user": ev.get("user", "portal")})
+
+    @staticmethod
+    def positive(by_key):
+        """Keys with net qty > 0 (netted-out reserves/allocations/scrap drop out)."""
+        return {k: v for k, v in by_key.items() if v > 0}
+
+    @staticmethod
+    def totals_by_item(by_key):
+        out = defaultdict(float)
+        for (ino, _loc), qty in by_key.items():
+            out[ino] += qty
+        return out
+
+    def portal_events(self):
+        out = []
+        for name in self.STREAMS:
+            out.extend(self.ledger[name])
+        return out
+
+
+_overlay = _Overlay()
+_overlay_lock = Lock()
+_cached_store = {"sig": None, "store": None}
+
+
+def _store_signature():
+    try:
+        st = os.stat(_store_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_for_overlay():
+    """Store as last read or written by this process; re-reads the file only when its mtime/size changed (e.g. another worker wrote).
+    Journal backend: the in-memory snapshot with only new journal rows folded in."""
+    if _use_journal():
+        return _get_journal().snapshot()
+    sig = _store_signature()
+    if sig is None:
+        return _default_store()
+    if _cached_store["sig"] == sig and _cached_store["store"] is not None:
+        return _cached_store["store"]
+    store = load()
+    _cached_store["sig"] = sig
+    _cached_store["store"] = store
+    return store
+
+
+def _sync_overlay(store):
+    with _overlay_lock:
+        _overlay.sync(store)
+
+
+def get_change_token():
+    """Token that changes whenever the store is written (by any worker): JSON file (mtime_ns, size) or journal (last event id, state seq).
+    Used as part of the /api/data cache identity, since cached responses include the overlay."""
+    if _use_journal():
+        return ("journal",) + _get_journal().change_token()
+    return ("json",) + (_store_signature() or (0, 0))
+
+
+def get_overlay_version():
+    """Number of event batches folded into the overlay so far (changes whenever portal events are appended)."""
+    with _overlay_lock:
+        return _overlay.version
 
 
 def apply_to_data(data):
-    """Apply portal store to raw data dict. Mutates data in place."""
+    """Apply portal store to raw data dict. Mutates data in place.
+    Event lists are folded into running aggregates (see _Overlay) and applied in one pass through company_data_store indexes."""
     if not data:
         return data
-    store = load()
+    store = _load_for_overlay()
 
-    # Item overrides (B4: min/max/reorder)
-    overrides = store.get("item_overrides") or {}
-    for item in (data.get("Items.json") or []):
-        if not isinstance(item, dict):
-            continue
-        ino = item.get("Item No.") or item.get("item_no")
-        if ino and ino in overrides:
-            for k, v in overrides[ino].items():
+    # BOM edits (C5): append portal-created BOMs
+    bom_edits = store.get("bom_edits") or _default_store()["bom_edits"]
+    for key in ["MIBOMH.json", "MIBOMD.json", "BillsOfMaterial.json", "BillOfMaterialDetails.json"]:
+        existing = data.get(key)
+        if not isinstance(existing, list):
+            existing = []
+        extra = bom_edits.get(key, [])
+        data[key] = list(existing) + list(extra)
+
+    # Created MOs (D3): merge portal-created MOs (copies: MO updates below must not touch the cached store)
+    created = store.get("created_mos") or []
+    existing_mo = data.get("ManufacturingOrderHeaders.json") or []
+    if not isinstance(existing_mo, list):
+        existing_mo = []
+    data["ManufacturingOrderHeaders.json"] = list(existing_mo) + [dict(m) for m in created]
+
+    # Created POs (F2): merge into PurchaseOrders.json and PurchaseOrderDetails.json
+    created_pos = store.get("created_pos") or []
+    existing_po_h = data.get("PurchaseOrders.json") or []
+    if not isinstance(existing_po_h, list):
+        existing_po_h = []
+    data["PurchaseOrders.json"] = list(existing_po_h) + list(created_pos)
+
+    created_po_d = store.get("created_po_details") or []
+    existing_po_d = data.get("PurchaseOrderDetails.json") or []
+    if not isinstance(existing_po_d, list):
+        existing_po_d = []
+    data["PurchaseOrderDetails.json"] = list(existing_po_d) + [dict(d) for d in created_po_d]
+
+    # Indexes over the merged lists (registered as the current store, so app lookups reuse them)
+    idx = company_data_store.get_store(data)
+
+    with _overlay_lock:
+        _overlay.sync(store)
+
+        # Item overrides (B4: min/max/reorder)
+        overrides = store.get("item_overrides") or {}
+        for ino, ov in overrides.items():
+            item = idx.get_item(ino)
+            if item is None:
+                continue
+            for k, v in ov.items():
                 item[k] = v
 
-    # Inventory adjustments (B5): apply deltas to Stock
-    adjustments = store.get("inventory_adjustments") or []
-    for adj in adjustments:
-        ino = adj.get("item_no")
-        loc = adj.get("location") or ""
-        delta = float(adj.get("delta", 0))
-        if not ino:
-            continue
-        # Apply to Items (aggregate Stock)
-        for item in (data.get("Items.json") or []):
-            if not isinstance(item, dict):
+        # Inventory adjustments (B5): net deltas to Items Stock and MIILOC qStk (by location)
+        for ino, delta in _overlay.stock_by_item.items():
+            item = idx.get_item(ino)
+            if item is None:
                 continue
-            if (item.get("Item No.") or item.get("item_no")) == ino:
-                try:
-                    item["Stock"] = float(item.get("Stock") or 0) + delta
-                except (TypeError, ValueError):
-                    item["Stock"] = delta
-                break
-        # Apply to MIILOC if present (by location)
-        for row in (data.get("MIILOC.json") or []):
-            if not isinstance(row, dict):
+            try:
+                item["Stock"] = float(item.get("Stock") or 0) + delta
+            except (TypeError, ValueError):
+                item["Stock"] = delta
+        for key, delta in _overlay.stock_by_key.items():
+            row = idx.get_location_row(*key)
+            if row is None:
                 continue
-            if (row.get("Item No.") or row.get("Item No") or row.get("itemId")) == ino and (row.get("Location No.") or row.get("locId") or "") == loc:
-                try:
-                    row["qStk"] = float(row.get("qStk") or row.get("Stock") or 0) + delta
-                except (TypeError, ValueError):
-                    row["qStk"] = delta
-                if "Stock" in row:
-                    row["Stock"] = row["qStk"]
-                break
-
-    # WIP adjustments (Assemble/Disassemble from/to WIP)
-    wip_adj = store.get("wip_adjustments") or []
-    for adj in wip_adj:
-        ino = adj.get("item_no")
-        loc = adj.get("location") or ""
-        delta = float(adj.get("delta", 0))
-        if not ino:
-            continue
-        for item in (data.get("Items.json") or []):
-            if not isinstance(item, dict):
+            try:
+                row["qStk"] = float(row.get("qStk") or row.get("Stock") or 0) + delta
+            except (TypeError, ValueError):
+                row["qStk"] = delta
+            if "Stock" in row:
+                row["Stock"] = row["qStk"]
+
+        # WIP adjustments (Assemble/Disassemble from/to WIP)
+        for ino, delta in _overlay.wip_by_item.items():
+            item = idx.get_item(ino)
+            if item is None:
                 continue
-            if (item.get("Item No.") or item.get("item_no")) == ino:
-                try:
-                    item["WIP"] = float(item.get("WIP") or item.get("totQWip") or 0) + delta
-                except (TypeError, ValueError):
-                    item["WIP"] = max(0, delta)
-                if "totQWip" in item:
-                    item["totQWip"] = item["WIP"]
-                break
-        for row in (data.get("MIILOC.json") or []):
-            if not isinstance(row, dict):
+            try:
+                item["WIP"] = float(item.get("WIP") or item.get("totQWip") or 0) + delta
+            except (TypeError, ValueError):
+                item["WIP"] = max(0, delta)
+            if "totQWip" in item:
+                item["totQWip"] = item["WIP"]
+        for key, delta in _overlay.wip_by_key.items():
+            row = idx.get_location_row(*key)
+            if row is None:
                 continue
-            if (row.get("Item No.") or row.get("Item No") or row.get("itemId")) == ino and (row.get("Location No.") or row.get("locId") or "") == loc:
-                try:
-                    row["qWip"] = float(row.get("qWip") or row.get("qWIP") or 0) + delta
-                except (TypeError, ValueError):
-                    row["qWip"] = max(0, delta)
-                if "qWIP" in row:
-                    row["qWIP"] = row["qWip"]
-                break
-
-    # Location transfers (B6): move qty from one loc to another in MIILOC
-    transfers = store.get("location_transfers") or []
-    for t in transfers:
-        from_loc = t.get("from_loc") or ""
-        to_loc = t.get("to_loc") or ""
-        ino = t.get("item_no")
-        qty = float(t.get("qty", 0))
-        if not ino or not qty:
-            continue
-        miloc = data.get("MIILOC.json") or []
-        from_row = to_row = None
-        for r in miloc:
-            if not isinstance(r, dict):
+            try:
+                row["qWip"] = float(row.get("qWip") or row.get("qWIP") or 0) + delta
+            except (TypeError, ValueError):
+                row["qWip"] = max(0, delta)
+            if "qWIP" in row:
+                row["qWIP"] = row["qWip"]
+
+        # Location transfers (B6): replay per (item, location) in order; outbound never goes below 0
+        for key, ops in _overlay.transfer_ops.items():
+            row = idx.get_location_row(*key)
+            if row is None:
                 continue
-            it = r.get("Item No.") or r.get("Item No") or r.get("itemId")
-            loc = r.get("Location No.") or r.get("locId") or ""
-            if it == ino and loc == from_loc:
-                from_row = r
-            if it == ino and loc == to_loc:
-                to_row = r
-        if from_row is not None:
-            cur = float(from_row.get("qStk") or from_row.get("Stock") or 0)
-            from_row["qStk"] = max(0, cur - qty)
-            if "Stock" in from_row:
-                from_row["Stock"] = from_row["qStk"]
-        if to_row is not None:
-            cur = float(to_row.get("qStk") or to_row.get("Stock") or 0)
-            to_row["qStk"] = cur + qty
-            if "Stock" in to_row:
-                to_row["Stock"] = to_row["qStk"]
-
-    # Reserve/Allocation overlays: compute net reserved and allocated per (item_no, location)
-    reserve_tx = store.get("reserve_transactions") or []
-    alloc_tx = store.get("allocations") or []
-    reserve_by_key = {}  # (item_no, loc) -> net qty
-    alloc_by_key = {}
-    for r in reserve_tx:
-        ino = r.get("item_no") or ""
-        loc = r.get("location") or ""
-        qty = float(r.get("qty", 0))
-        key = (ino, loc)
-        if r.get("type") == "reserve":
-            reserve_by_key[key] = reserve_by_key.get(key, 0) + qty
-        else:
-            reserve_by_key[key] = reserve_by_key.get(key, 0) - qty
-    for a in alloc_tx:
-        ino = a.get("item_no") or ""
-        loc = a.get("location") or ""
-        qty = float(a.get("qty", 0))
-        key = (ino, loc)
-        if a.get("type") == "allocate":
-            alloc_by_key[key] = alloc_by_key.get(key, 0) + qty
-        else:
-            alloc_by_key[key] = alloc_by_key.get(key, 0) - qty
-    for key, qty in list(reserve_by_key.items()):
-        if qty <= 0:
-            del reserve_by_key[key]
-    for key, qty in list(alloc_by_key.items()):
-        if qty <= 0:
-            del alloc_by_key[key]
-    scrap_tx = store.get("scrap_transactions") or []
-    scrap_by_key = {}
-    for s in scrap_tx:
-        ino = s.get("item_no") or ""
-        loc = s.get("location") or ""
-        qty = float(s.get("qty", 0))
-        key = (ino, loc)
-        if s.get("type") == "scrap":
-            scrap_by_key[key] = scrap_by_key.get(key, 0) + qty
-        else:
-            scrap_by_key[key] = scrap_by_key.get(key, 0) - qty
-    for key, qty in list(scrap_by_key.items()):
-        if qty <= 0:
-            del scrap_by_key[key]
+            cur = float(row.get("qStk") or row.get("Stock") or 0)
+            for qty in ops:
+                cur = max(0, cur + qty) if qty < 0 else cur + qty
+            row["qStk"] = cur
+            if "Stock" in row:
+                row["Stock"] = cur
+
+        # Reserve/Allocation/Scrap overlays: net qty per (item_no, location), one pass over the rows
+        reserve_by_key = _overlay.positive(_overlay.reserve_by_key)
+        alloc_by_key = _overlay.positive(_overlay.alloc_by_key)
+        scrap_by_key = _overlay.positive(_overlay.scrap_by_key)
+        reserve_by_item = _overlay.totals_by_item(reserve_by_key)
+        alloc_by_item = _overlay.totals_by_item(alloc_by_key)
+        scrap_by_item = _overlay.totals_by_item(scrap_by_key)
+        portal_events = _overlay.portal_events()
+
     for row in (data.get("MIILOC.json") or []):
         if not isinstance(row, dict):
             continue
-        ino = row.get("Item No.") or row.get("Item No") or row.get("itemId") or ""
-        loc = row.get("Location No.") or row.get("locId") or ""
-        key = (ino, loc)
-        row["_reserved"] = max(0, reserve_by_key.get(key, 0))
-        row["_allocated"] = max(0, alloc_by_key.get(key, 0))
-        row["_scrapped"] = max(0, scrap_by_key.get(key, 0))
+        key = (row.get("Item No.") or row.get("Item No") or row.get("itemId") or "", row.get("Location No.") or row.get("locId") or "")
+        row["_reserved"] = reserve_by_key.get(key, 0)
+        row["_allocated"] = alloc_by_key.get(key, 0)
+        row["_scrapped"] = scrap_by_key.get(key, 0)
     for row in (data.get("MIILOCQT.json") or []):
         if not isinstance(row, dict):
             continue
-        ino = row.get("Item No.") or row.get("Item No") or row.get("itemId") or ""
-        loc = row.get("Location No.") or row.get("locId") or ""
-        key = (ino, loc)
-        row["_reserved"] = max(0, reserve_by_key.get(key, 0))
-        row["_allocated"] = max(0, alloc_by_key.get(key, 0))
+        key = (row.get("Item No.") or row.get("Item No") or row.get("itemId") or "", row.get("Location No.") or row.get("locId") or "")
+        row["_reserved"] = reserve_by_key.get(key, 0)
+        row["_allocated"] = alloc_by_key.get(key, 0)
     for item in (data.get("Items.json") or []):
         if not isinstance(item, dict):
             continue
         ino = item.get("Item No.") or item.get("item_no") or ""
-        total_res = sum(v for k, v in reserve_by_key.items() if k[0] == ino)
-        total_alloc = sum(v for k, v in alloc_by_key.items() if k[0] == ino)
-        total_scrap = sum(v for k, v in scrap_by_key.items() if k[0] == ino)
-        item["_reserved"] = max(0, total_res)
-        item["_allocated"] = max(0, total_alloc)
-        item["_scrapped"] = max(0, total_scrap)
+        item["_reserved"] = reserve_by_item.get(ino, 0)
+        item["_allocated"] = alloc_by_item.get(ino, 0)
+        item["_scrapped"] = scrap_by_item.get(ino, 0)
 
     # Lot edits (6.3): overlay Description, Status, Expiration Date on LotSerialDetail
-    lot_edits = store.get("lot_edits") or []
-    for edit in lot_edits:
+    for edit in store.get("lot_edits") or []:
         ino = (edit.get("item_no") or "").strip()
         lot_no = (edit.get("lot_no") or "").strip()
         serial_no = (edit.get("serial_no") or "").strip()
         if not ino or not lot_no:
             continue
-        for row in (data.get("LotSerialDetail.json") or []):
-            if not isinstance(row, dict):
-                continue
-            r_item = (row.get("Item No.") or row.get("itemId") or row.get("Parent Item No.") or row.get("prntItemId") or "").strip()
-            r_lot = (row.get("Lot No.") or row.get("lotId") or row.get("prntLotId") or "").strip()
+        for row in idx.get_lot_rows(ino, lot_no):
             r_serial = (row.get("Serial No.") or row.get("entry") or row.get("detail") or "").strip()
-            if r_item != ino or r_lot != lot_no:
-                continue
             if serial_no and r_serial != serial_no:
                 continue
             if "description" in edit:
@@ -725,54 +1026,22 @@ def apply_to_data(data):
             if "expiration_date" in edit:
                 row["Expiration Date"] = edit.get("expiration_date") or ""
 
-    # BOM edits (C5): append portal-created BOMs
-    bom_edits = store.get("bom_edits") or _default_store()["bom_edits"]
-    for key in ["MIBOMH.json", "MIBOMD.json", "BillsOfMaterial.json", "BillOfMaterialDetails.json"]:
-        existing = data.get(key)
-        if not isinstance(existing, list):
-            existing = []
-        extra = bom_edits.get(key, [])
-        data[key] = list(existing) + list(extra)
-
-    # Created MOs (D3): merge portal-created MOs
-    created = store.get("created_mos") or []
-    existing_mo = data.get("ManufacturingOrderHeaders.json") or []
-    if not isinstance(existing_mo, list):
-        existing_mo = []
-    all_mos = list(existing_mo) + list(created)
     # Apply MO updates (release/complete status)
-    mo_updates = store.get("mo_updates") or []
-    for upd in mo_updates:
+    for upd in store.get("mo_updates") or []:
         mo_no = upd.get("mo_no")
         if not mo_no:
             continue
-        for mo in all_mos:
-            if not isinstance(mo, dict):
-                continue
-            if (mo.get("Mfg. Order No.") or mo.get("mohId")) == mo_no:
-                if "status" in upd and upd["status"] is not None:
-                    mo["Status"] = upd["status"]
-                if "Completed" in upd and upd["Completed"] is not None:
-                    mo["Completed"] = upd["Completed"]
-                if upd.get("Release Date") is not None:
-                    mo["Release Date"] = upd.get("Release Date") or ""
-                if upd.get("Completion Date") is not None:
-                    mo["Completion Date"] = upd.get("Completion Date") or ""
-                break
-    data["ManufacturingOrderHeaders.json"] = all_mos
-
-    # Created POs (F2): merge into PurchaseOrders.json and PurchaseOrderDetails.json
-    created_pos = store.get("created_pos") or []
-    existing_po_h = data.get("PurchaseOrders.json") or []
-    if not isinstance(existing_po_h, list):
-        existing_po_h = []
-    data["PurchaseOrders.json"] = list(existing_po_h) + list(created_pos)
-
-    created_po_d = store.get("created_po_details") or []
-    existing_po_d = data.get("PurchaseOrderDetails.json") or []
-    if not isinstance(existing_po_d, list):
-        existing_po_d = []
-    all_po_details = list(existing_po_d) + list(created_po_d)
+        mo = idx.get_mo(mo_no)
+        if mo is None:
+            continue
+        if "status" in upd and upd["status"] is not None:
+            mo["Status"] = upd["status"]
+        if "Completed" in upd and upd["Completed"] is not None:
+            mo["Completed"] = upd["Completed"]
+        if upd.get("Release Date") is not None:
+            mo["Release Date"] = upd.get("Release Date") or ""
+        if upd.get("Completion Date") is not None:
+            mo["Completion Date"] = upd.get("Completion Date") or ""
 
     # F4: Apply PO receives – add qty to Received on matching lines
     for rec in store.get("po_receives") or []:
@@ -781,50 +1050,21 @@ def apply_to_data(data):
         qty = float(rec.get("qty", 0))
         if not po_no or not item_no or qty <= 0:
             continue
-        for line in all_po_details:
-            if not isinstance(line, dict):
-                continue
-            ln_po = line.get("PO No.") or line.get("Purchase Order No")
-            ln_item = line.get("Item No.") or line.get("Item No")
-            if ln_po == po_no and ln_item == item_no:
+        for line in idx.get_po_lines(po_no):
+            if (line.get("Item No.") or line.get("Item No")) == item_no:
                 cur = float(line.get("Received") or 0)
                 line["Received"] = cur + qty
                 break
         # Inventory already updated via add_inventory_adjustment when receive was recorded
-    data["PurchaseOrderDetails.json"] = all_po_details
 
     # MO events: expose for Transactions tab (overlay events from portal actions)
-    data["moEvents"] = store.get("mo_events", [])
+    data["moEvents"] = list(store.get("mo_events", []))
 
     # PO receipts: expose for Receiving tab (receipt history per PO)
-    data["poReceipts"] = store.get("po_receives", [])
+    data["poReceipts"] = list(store.get("po_receives", []))
 
     # Portal events for Inventory Ledger (all overlay transactions)
-    adjustments = store.get("inventory_adjustments") or []
-    transfers = store.get("location_transfers") or []
-    reserve_tx = store.get("reserve_transactions") or []
-    alloc_tx = store.get("allocations") or []
-    scrap_tx = store.get("scrap_transactions") or []
-    asm_tx = store.get("assembly_transactions") or []
-    sup_rec = store.get("supplier_receives") or []
-    sup_ret = store.get("supplier_returns") or []
-    sales_tx = store.get("sales_transfers") or []
-    mo_evts = store.get("mo_events") or []
-    po_rec = store.get("po_receives") or []
-    adj_list = [{"_type": "ADJUST", "ts": a.get("at", ""), "itemNo": a.get("item_no", ""), "location": a.get("location", ""), "qty": a.get("delta", 0), "reason": a.get("reason", ""), "user": "portal"} for a in adjustments]
-    wip_adj = store.get("wip_adjustments") or []
-    wip_list = [{"_type": "WIP_ADJUST", "ts": a.get("at", ""), "itemNo": a.get("item_no", ""), "location": a.get("location", ""), "qty": a.get("delta", 0), "reason": a.get("reason", ""), "user": "portal"} for a in wip_adj]
-    xfr_list = [{"_type": "TRANSFER", "ts": t.get("at", ""), "itemNo": t.get("item_no", ""), "fromLoc": t.get("from_loc", ""), "toLoc": t.get("to_loc", ""), "qty": t.get("qty", 0), "user": "portal"} for t in transfers]
-    res_list = [{"_type": r.get("type", "RESERVE").upper(), "ts": r.get("at", ""), "itemNo": r.get("item_no", ""), "location": r.get("location", ""), "qty": r.get("qty", 0), "ref": r.get("ref", ""), "user": "portal"} for r in reserve_tx]
-    alloc_list = [{"_type": a.get("type", "ALLOCATE").upper(), "ts": a.get("at", ""), "itemNo": a.get("item_no", ""), "location": a.get("location", ""), "qty": a.get("qty", 0), "ref": a.get("ref", ""), "user": "portal"} for a in alloc_tx]
-    scrap_list = [{"_type": s.get("type", "SCRAP").upper(), "ts": s.get("at", ""), "itemNo": s.get("item_no", ""), "location": s.get("location", ""), "qty": s.get("qty", 0), "ref": s.get("ref", ""), "user": "portal"} for s in scrap_tx]
-    asm_list = [{"_type": a.get("type", "ASSEMBLE").upper(), "ts": a.get("at", ""), "itemNo": a.get("parent_item", ""), "location": a.get("location", ""), "qty": a.get("qty", 0), "user": "portal"} for a in asm_tx]
-    sup_rec_list = [{"_type": "SUPPLIER_RECEIVE", "ts": r.get("at", ""), "itemNo": r.get("item_no", ""), "location": r.get("location", ""), "qty": r.get("qty", 0), "ref": r.get("ref", ""), "user": "portal"} for r in sup_rec]
-    sup_ret_list = [{"_type": "SUPPLIER_RETURN", "ts": r.get("at", ""), "itemNo": r.get("item_no", ""), "location": r.get("location", ""), "qty": r.get("qty", 0), "ref": r.get("ref", ""), "user": "portal"} for r in sup_ret]
-    sales_list = [{"_type": "SALES_TRANSFER", "ts": t.get("at", ""), "soNo": t.get("so_no", ""), "items": t.get("items", []), "user": "portal"} for t in sales_tx]
-    mo_list = [{"_type": e.get("type", "MO_EVENT"), "ts": e.get("ts", ""), "itemNo": e.get("itemNo", ""), "moNo": e.get("moNo", ""), "qty": e.get("qty", 0), "location": e.get("location", ""), "user": e.get("user", ""), "ref": e.get("ref", "")} for e in mo_evts]
-    po_list = [{"_type": "PO_RECEIVE", "ts": r.get("at", ""), "itemNo": r.get("item_no", ""), "poNo": r.get("po_no", ""), "qty": r.get("qty", 0), "location": r.get("location", ""), "lot": r.get("lot", ""), "user": r.get("user", "portal")} for r in po_rec]
-    data["portalEvents"] = adj_list + wip_list + xfr_list + res_list + alloc_list + scrap_list + asm_list + sup_rec_list + sup_ret_list + sales_list + mo_list + po_list
+    data["portalEvents"] = portal_events
 
     # WO updates (E2/E3): apply release/complete to WorkOrders.json and WorkOrderDetails.json
     wo_updates = store.get("wo_updates") or []
@@ -22,6 +22,8 @@ import re
 from lxml import etree
 import openpyxl
 
+import bom_graph
+
 # Google Cloud Storage for persistent storage on Cloud Run
 try:
     from google.cloud import storage
@@ -1297,6 +1299,30 @@ def load_bom_details():
     return load_json_from_gdrive('BillOfMaterialDetails.json')
 
 
+_gdrive_bom_data = None
+_gdrive_bom_data_time = None
+
+
+def _get_bom_graph():
+    """
+    BOM graph (bom_graph.BomGraph) over the same data load_bom_details()/load_items() use: app cache (Full Company Data),
+    else Full Company Data loaded for PR, else API Extractions JSON. Built once per data snapshot.
+    """
+    global _gdrive_bom_data, _gdrive_bom_data_time
+    for source in (_get_app_data_cache, _load_full_company_data_for_pr):
+        data = source()
+        if data and (data.get('BillOfMaterialDetails.json') or data.get('MIBOMD.json')):
+            return bom_graph.get_graph(data)
+    if _gdrive_bom_data is None or not _gdrive_bom_data_time or \
+            (datetime.now() - _gdrive_bom_data_time).total_seconds() >= _GDRIVE_CACHE_DURATION:
+        _gdrive_bom_data = {
+            'BillOfMaterialDetails.json': load_json_from_gdrive('BillOfMaterialDetails.json') or [],
+            'Items.json': load_items() or [],
+        }
+        _gdrive_bom_data_time = datetime.now()
+    return bom_graph.get_graph(_gdrive_bom_data)
+
+
 def get_current_bom_revision(item_no):
     """
     Get the BOM revision MISys is using for an item.
@@ -1309,53 +1335,7 @@ def get_current_bom_revision(item_no):
     Returns: revision number as string (e.g., "0", "1") or None if not found
     """
     try:
-        # 1. Try item master from Full Company Data - Current BOM Revision (MISys "revision being used")
-        # Use MIITEM/Items from Full Company Data MISys
-        item_sources = []
-        cache = _get_app_data_cache()
-        if cache:
-            item_sources = cache.get('MIITEM.json') or cache.get('Items.json') or []
-        if not item_sources:
-            fcd = _load_full_company_data_for_pr()
-            if fcd:
-                item_sources = fcd.get('Items.json') or fcd.get('MIITEM.json') or []
-        if not item_sources:
-            item_sources = (
-                load_json_from_gdrive('MIITEM.json') or
-                load_json_from_gdrive('Items.json') or []
-            )
-        if not isinstance(item_sources, list):
-            item_sources = []
-        
-        for item in item_sources:
-            item_key = item.get('Item No.') or item.get('itemId') or ''
-            if str(item_key) != str(item_no):
-                continue
-            # Current BOM Revision (mapped from revId in MIITEM) - what MISys uses
-            revision = item.get('Current BOM Revision')
-            if revision is None:
-                revision = item.get('revId')  # Raw MIITEM key
-            if revision is not None and str(revision).strip() != '':
-                return str(revision)
-            break  # Item found but no revision - fall through to BOM-based latest
-        
-        # 2. Item not in master or no revision - use latest from BOM data (MISys "latest")
-        all_bom = load_bom_details()
-        if not all_bom:
-            return None
-        parent_lines = [b for b in all_bom if b.get('Parent Item No.') == item_no]
-        if not parent_lines:
-            return None
-        revisions = set(str(b.get('Revision No.', '0')) for b in parent_lines)
-        if not revisions:
-            return None
-        # Use numeric sort so "10" > "9" (string max would give wrong result)
-        try:
-            latest = max(revisions, key=lambda r: int(r) if str(r).isdigit() else -1)
-            print(f"    📋 No item revision for {item_no}, using latest from BOM: {latest}")
-            return latest
-        except (ValueError, TypeError):
-            return max(revisions)
+        return _get_bom_graph().current_revision(item_no)
     except Exception as e:
         print(f"Error getting current BOM revision for {item_no}: {e}")
         return None
@@ -1364,51 +1344,50 @@ def get_current_bom_revision(item_no):
 def get_item_master(item_no):
     """Get item master data including preferred supplier and item type"""
     try:
-        items = load_items()
-        for item in items:
-            if item.get('Item No.') == item_no:
-                # Parse conversion factor (can be string or number)
-                conv_factor = item.get('Units Conversion Factor', 1)
-                if isinstance(conv_factor, str):
-                    try:
-                        conv_factor = float(conv_factor.replace(',', '')) if conv_factor else 1
-                    except:
-                        conv_factor = 1
-                conv_factor = float(conv_factor) if conv_factor else 1
-                # Fallback: if 1 but stocking != purchasing (e.g. kg vs drum), get from inventory_data
-                if conv_factor <= 1 and (item.get('Stocking Units') or '').lower() != (item.get('Purchasing Units') or '').lower():
-                    inv = get_inventory_data(item_no)
-                    if inv:
-                        ucf = inv.get('units_conversion_factor', 1)
-                        if ucf and float(ucf) > 1:
-                            conv_factor = float(ucf)
-                
-                # Preferred supplier: 1) MIITEM (suplId→Supplier No. or Preferred Supplier Number) 2) MIQSUP
-                pref_supp = item.get('Preferred Supplier Number') or item.get('Supplier No.') or item.get('suplId') or ''
-                if not pref_supp:
-                    miqsup = _load_miqsup()
-                    for row in miqsup:
-                        if (row.get('Item No.') or row.get('itemId') or '') == item_no:
-                            pref_supp = row.get('Supplier No.') or row.get('suplId') or ''
-                            if pref_supp:
-                                break
-                return {
-                    'item_no': item_no,
-                    'description': item.get('Description', ''),
-                    'item_type': item.get('Item Type', 0),  # 0=Purchased/Raw, 1=Assembled
-                    'preferred_supplier': pref_supp,
-                    'purchasing_units': item.get('Purchasing Units', 'EA'),
-                    'stocking_units': item.get('Stocking Units', 'EA'),
-                    'units_conversion_factor': conv_factor,  # Stocking units per purchasing unit
-                    'recent_cost': item.get('Recent Cost', 0),
-                    'standard_cost': item.get('Standard Cost', 0),
-                    'average_cost': item.get('Average Cost', 0),
-                    'order_lead_days': item.get('Order Lead (Days)', 7),
-                    'reorder_quantity': item.get('Reorder Quantity', 0),
-                    'minimum': item.get('Minimum', 0),
-                    'reorder_level': item.get('Reorder Level', 0)
-                }
-        return None
+        item = _get_bom_graph().item(item_no)
+        if item is None:
+            return None
+        # Parse conversion factor (can be string or number)
+        conv_factor = item.get('Units Conversion Factor', 1)
+        if isinstance(conv_factor, str):
+            try:
+                conv_factor = float(conv_factor.replace(',', '')) if conv_factor else 1
+            except:
+                conv_factor = 1
+        conv_factor = float(conv_factor) if conv_factor else 1
+        # Fallback: if 1 but stocking != purchasing (e.g. kg vs drum), get from inventory_data
+        if conv_factor <= 1 and (item.get('Stocking Units') or '').lower() != (item.get('Purchasing Units') or '').lower():
+            inv = get_inventory_data(item_no)
+            if inv:
+                ucf = inv.get('units_conversion_factor', 1)
+                if ucf and float(ucf) > 1:
+                    conv_factor = float(ucf)
+        
+        # Preferred supplier: 1) MIITEM (suplId→Supplier No. or Preferred Supplier Number) 2) MIQSUP
+        pref_supp = item.get('Preferred Supplier Number') or item.get('Supplier No.') or item.get('suplId') or ''
+        if not pref_supp:
+            miqsup = _load_miqsup()
+            for row in miqsup:
+                if (row.get('Item No.') or row.get('itemId') or '') == item_no:
+                    pref_supp = row.get('Supplier No.') or row.get('suplId') or ''
+                    if pref_supp:
+                        break
+        return {
+            'item_no': item_no,
+            'description': item.get('Description', ''),
+            'item_type': item.get('Item Type', 0),  # 0=Purchased/Raw, 1=Assembled
+            'preferred_supplier': pref_supp,
+            'purchasing_units': item.get('Purchasing Units', 'EA'),
+            'stocking_units': item.get('Stocking Units', 'EA'),
+            'units_conversion_factor': conv_factor,  # Stocking units per purchasing unit
+            'recent_cost': item.get('Recent Cost', 0),
+            'standard_cost': item.get('Standard Cost', 0),
+            'average_cost': item.get('Average Cost', 0),
+            'order_lead_days': item.get('Order Lead (Days)', 7),
+            'reorder_quantity': item.get('Reorder Quantity', 0),
+            'minimum': item.get('Minimum', 0),
+            'reorder_level': item.get('Reorder Level', 0)
+        }
     except Exception as e:
         print(f"Error getting item master for {item_no}: {e}")
         return None
@@ -1494,7 +1473,7 @@ def get_stock_level(item_no, location='62TODD'):
 
 def explode_bom_recursive(parent_item_no, parent_qty, max_depth=5, _visited=None):
     """
-    Recursively explode BOM to get all purchasable raw materials.
+    Explode BOM to get all purchasable raw materials (memoized on the BOM graph of the current data snapshot).
     
     Handles:
     - Assembled items (Item Type = 1) → recursively explode
@@ -1505,118 +1484,29 @@ def explode_bom_recursive(parent_item_no, parent_qty, max_depth=5, _visited=None
     
     Returns: List of {item_no, description, qty_needed, item_type, preferred_supplier, ...}
     """
-    # Prevent infinite recursion
-    if _visited is None:
-        _visited = set()
-    if parent_item_no in _visited:
-        print(f"  ⚠️ Circular BOM reference detected: {parent_item_no}")
-        return []
-    _visited.add(parent_item_no)
-    
-    if max_depth <= 0:
-        print(f"  ⚠️ Max BOM depth reached for: {parent_item_no}")
-        return []
-    
-    # Load BOM data
-    all_bom = load_bom_details()
-    
-    # Get the CURRENT BOM revision for this item (items can have multiple revisions)
-    current_revision = get_current_bom_revision(parent_item_no)
-    
-    # Find BOM lines for this parent, filtered by current revision
-    if current_revision is not None:
-        # Filter by both parent item AND current revision
-        bom_lines = [b for b in all_bom 
-                     if b.get('Parent Item No.') == parent_item_no 
-                     and str(b.get('Revision No.', '0')) == current_revision]
-        print(f"    📋 Using BOM Revision {current_revision} for: {parent_item_no}")
-    else:
-        # No revision from get_current_bom_revision - use latest (numeric sort: 10 > 9)
-        all_parent_lines = [b for b in all_bom if b.get('Parent Item No.') == parent_item_no]
-        revisions = set(str(b.get('Revision No.', '0')) for b in all_parent_lines)
-        if len(revisions) > 1:
-            try:
-                max_rev = max(revisions, key=lambda r: int(r) if str(r).isdigit() else -1)
-            except (ValueError, TypeError):
-                max_rev = max(revisions)
-            bom_lines = [b for b in all_parent_lines if str(b.get('Revision No.', '0')) == max_rev]
-            print(f"    📋 Using latest BOM revision {max_rev} for: {parent_item_no}")
-        else:
-            bom_lines = all_parent_lines
-    
-    if not bom_lines:
-        # No BOM - check if this is a purchased item
-        item_data = get_item_master(parent_item_no)
-        if item_data:
-            item_type = item_data.get('item_type', 0)
-            # Item Type 0 = Raw Material/Purchased
-            if item_type == 0:
-                # NOTE: Do NOT skip TOTE/IBC containers - they are real components
-                # within formulas and need to be ordered like any other raw material
-                
-                print(f"    → Purchased item (no BOM): {parent_item_no}")
-                return [{
-                    'item_no': parent_item_no,
-                    'description': item_data.get('description', ''),
-                    'qty_needed': parent_qty,
-                    'item_type': 'Raw Material',
-                    'preferred_supplier': item_data.get('preferred_supplier', ''),
-                    'purchasing_units': item_data.get('purchasing_units', 'EA'),
-                    'stocking_units': item_data.get('stocking_units', 'EA'),
-                    'units_conversion_factor': item_data.get('units_conversion_factor', 1),
-                    'order_lead_days': item_data.get('order_lead_days', 7)
-                }]
-        return []
+    graph = _get_bom_graph()
+    revision = graph.current_revision(parent_item_no)
+    if revision is not None and graph.has_bom(parent_item_no):
+        print(f"    📋 Using BOM Revision {revision} for: {parent_item_no}")
     
     components = []
-    for line in bom_lines:
-        component_no = line.get('Component Item No.', '')
-        required_qty = float(line.get('Required Quantity', 0))
-        
-        # Skip phantom lines (qty = 0)
-        if required_qty == 0:
-            continue
-        
-        # Skip labor items
-        if component_no.upper().startswith('LABOR'):
-            continue
-        
-        qty_needed = required_qty * parent_qty
-        
-        # Get component item data
-        component_data = get_item_master(component_no)
+    for item_no, qty_needed in graph.explode(parent_item_no, parent_qty, max_depth=max_depth):
+        component_data = get_item_master(item_no)
         if not component_data:
-            print(f"    ⚠️ Component not found in item master: {component_no}")
             continue
-        
-        item_type = component_data.get('item_type', 0)
-        
-        # Item Type: 0 = Raw Material/Purchased, 1 = Assembled, 2 = Formula/Blend
-        if item_type in (1, 2):  # Assembled or Formula - recursively explode
-            type_name = "assembled" if item_type == 1 else "formula"
-            print(f"    📦 Exploding {type_name}: {component_no} (qty: {round(qty_needed, 4)})")
-            sub_components = explode_bom_recursive(
-                component_no, 
-                qty_needed, 
-                max_depth - 1,
-                _visited.copy()
-            )
-            components.extend(sub_components)
-        else:  # Raw Material (item_type == 0) - add to purchase list
-            # NOTE: Do NOT skip TOTE/IBC containers - they are real components
-            # within formulas and need to be ordered like any other raw material
-            
-            components.append({
-                'item_no': component_no,
-                'description': component_data.get('description', ''),
-                'qty_needed': qty_needed,  # In stocking units (kg, L, etc.)
-                'item_type': 'Raw Material',
-                'preferred_supplier': component_data.get('preferred_supplier', ''),
-                'purchasing_units': component_data.get('purchasing_units', 'EA'),
-                'stocking_units': component_data.get('stocking_units', 'EA'),
-                'units_conversion_factor': component_data.get('units_conversion_factor', 1),
-                'order_lead_days': component_data.get('order_lead_days', 7)
-            })
+        # NOTE: Do NOT skip TOTE/IBC containers - they are real components
+        # within formulas and need to be ordered like any other raw material
+        components.append({
+            'item_no': item_no,
+            'description': component_data.get('description', ''),
+            'qty_needed': qty_needed,  # In stocking units (kg, L, etc.)
+            'item_type': 'Raw Material',
+            'preferred_supplier': component_data.get('preferred_supplier', ''),
+            'purchasing_units': component_data.get('purchasing_units', 'EA'),
+            'stocking_units': component_data.get('stocking_units', 'EA'),
+            'units_conversion_factor': component_data.get('units_conversion_factor', 1),
+            'order_lead_days': component_data.get('order_lead_days', 7)
+        })
     
     return components
 
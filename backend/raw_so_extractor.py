@@ -11,9 +11,9 @@ CRITICAL - DO NOT REMOVE (merged table fallback):
 """
 import os
 import re
-import pdfplumber
 import json
 from openai import OpenAI
+from so_pdf_document import as_so_document
 
 # Load environment variables from .env file
 try:
@@ -78,49 +78,31 @@ def extract_raw_from_pdf(pdf_path):
     - No cleaning
     - No conversion
     Just raw text and raw table data exactly as pdfplumber sees it
+    pdf_path may be a path or an already extracted so_pdf_document.SODocument (one pass over the pages either way)
     """
     try:
+        doc = as_so_document(pdf_path)
         if DEBUG:
             print(f"\n{'='*80}")
-            print(f"RAW EXTRACTION: {os.path.basename(pdf_path)}")
+            print(f"RAW EXTRACTION: {doc.filename}")
             print(f"{'='*80}")
         
+        # Raw text with layout preservation for two-column handling; raw tables exactly as they appear
         raw_data = {
-            'filename': os.path.basename(pdf_path),
-            'filepath': pdf_path,
-            'raw_text': '',
-            'raw_tables': [],
-            'page_count': 0
+            'filename': doc.filename,
+            'filepath': doc.path,
+            'raw_text': doc.layout_text,
+            'raw_tables': doc.raw_tables(),
+            'page_count': doc.page_count
         }
         
-        with pdfplumber.open(pdf_path) as pdf:
-            raw_data['page_count'] = len(pdf.pages)
-            
-            # Extract raw text with layout preservation for two-column handling
-            full_text = ""
-            for page_num, page in enumerate(pdf.pages, 1):
-                # Use layout=True to preserve column structure better
-                page_text = page.extract_text(layout=True)
-                if page_text:
-                    full_text += page_text + "\n"
-                    if DEBUG:
-                        print(f"  Page {page_num}: Extracted {len(page_text)} characters (layout-preserved)")
-            
-            raw_data['raw_text'] = full_text
-            
-            # Extract raw tables - exactly as they appear
-            for page_num, page in enumerate(pdf.pages, 1):
-                tables = page.extract_tables()
-                if tables:
-                    for table_num, table ,in enumerate(tables, 1):
-                        if table and len(table) > 0:
-                            raw_data['raw_tables'].append({
-                                'page': page_num,
-                                'table_num': table_num,
-                                'data': table
-                            })
-                            if DEBUG:
-                                print(f"  Page {page_num}, Table {table_num}: {len(table)} rows x {len(table[0]) if table[0] else 0} cols")
+        if DEBUG:
+            for page in doc.pages:
+                if page.layout_text:
+                    print(f"  Page {page.number}: Extracted {len(page.layout_text)} characters (layout-preserved)")
+            for table in raw_data['raw_tables']:
+                data = table['data']
+                print(f"  Page {table['page']}, Table {table['table_num']}: {len(data)} rows x {len(data[0]) if data[0] else 0} cols")
         
         if DEBUG:
             print(f"\nRAW EXTRACTION COMPLETE:")
@@ -71,17 +71,34 @@ def load_raw_tables(folder_path, parallel: bool = True) -> tuple:
     if not folder.is_dir():
         return None, f"Not a directory: {folder}"
 
+    # Delta export (sync_to_gdrive.py --delta): some tables live in earlier folders and/or appended delta files
+    try:
+        import full_company_delta
+        delta_tables = {stem: parts for stem, parts in full_company_delta.table_parts(str(folder)).items()
+                        if not full_company_delta.is_own_file(str(folder), parts)}
+    except ImportError:
+        delta_tables = {}
+
     csv_files = [
         f for f in folder.iterdir()
         if f.suffix.upper() == ".CSV"
         and f.stem.upper() not in _SKIP_STEMS
+        and f.stem.upper() not in delta_tables
+        and not f.stem.upper().endswith(".DELTA")
     ]
 
-    if not csv_files:
+    if not csv_files and not delta_tables:
         return {}, None  # empty folder, not an error
 
     tables = {}
     errors = []
+    for stem, parts in delta_tables.items():
+        try:
+            tables[stem] = [{k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k is not None}
+                            for row in full_company_delta.iter_csv_rows(parts)]
+        except Exception as e:
+            print(f"[raw_tables_loader] Error reading delta chain for {stem}: {e}")
+            errors.append(stem)
 
     if parallel and len(csv_files) > 4:
         with ThreadPoolExecutor(max_workers=8) as pool:
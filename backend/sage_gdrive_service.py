@@ -33,9 +33,11 @@ import os
 import json
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from io import BytesIO
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 # ---------------------------------------------------------------------------
@@ -125,8 +127,21 @@ REQUIRED_TABLES = [
 _cache: dict = {}
 _cache_ts: float = 0.0
 _cache_folder: str = ""
-_cache_lock = threading.Lock()
+_cache_signatures: dict = {}  # table -> source signature (local path/mtime/size or Drive id/md5) of the cached frame
+_cache_lock = threading.Lock()  # guards the snapshot swap only; reading CSVs never holds it
 CACHE_TTL_SECONDS = 3600  # 1 hour — re-read from disk once per hour
+RELOAD_RETRY_SECONDS = 300  # after a failed background reload, try again in 5 minutes
+LOAD_WORKERS = int(os.environ.get("SAGE_GDRIVE_LOAD_WORKERS", "4"))
+_reload_lock = threading.Lock()  # one reload at a time
+_reload_thread = None
+_last_reload: dict = {}
+
+# Item mapping suggestions: candidates scored per MISys item, background jobs by id
+SUGGEST_CANDIDATES = 50
+SUGGEST_PROGRESS_EVERY = 200
+SUGGEST_JOBS_KEPT = 10
+_suggest_jobs: dict = {}
+_suggest_jobs_lock = threading.Lock()
 
 # Lazy-initialized Google Drive service for cloud use
 _gds_instance = None
@@ -199,87 +214,114 @@ def _find_latest_sage_folder_api():
         return None, None, None, str(e)
 
 
-def _load_csv_from_api(gds, folder_id, drive_id, table_name):
+def _csv_candidates(table_name: str) -> list:
+    return [f"{table_name}.CSV", f"{table_name}.csv", f"{table_name.upper()}.CSV"]
+
+
+def _parse_csv_bytes(content: bytes, filename: str) -> pd.DataFrame | None:
+    for encoding in ["utf-8-sig", "utf-8", "latin-1", "cp1252"]:
+        try:
+            return pd.read_csv(BytesIO(content), encoding=encoding, low_memory=False)
+        except UnicodeDecodeError:
+            continue
+        except Exception as e:
+            print(f"[sage_gdrive] Parse error for {filename}: {e}")
+            return None
+    return None
+
+
+def _list_folder_files_api(gds, folder_id, drive_id) -> dict:
+    """{file name: {id, name, modifiedTime, md5Checksum, size}} for every file directly in a Drive folder (one paged listing)."""
+    service = gds._get_fresh_service()
+    files = {}
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=f"'{folder_id}' in parents and trashed=false",
+            corpora="drive",
+            driveId=drive_id,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            fields="nextPageToken, files(id, name, modifiedTime, md5Checksum, size)",
+            pageSize=1000,
+            pageToken=page_token,
+        ).execute()
+        for f in results.get("files", []):
+            files.setdefault(f.get("name", ""), f)
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def _api_table_files(files: dict) -> dict:
+    """{table: file meta} for the REQUIRED_TABLES present in a folder listing."""
+    out = {}
+    for tbl in REQUIRED_TABLES:
+        for filename in _csv_candidates(tbl):
+            if filename in files:
+                out[tbl] = files[filename]
+                break
+    return out
+
+
+def _load_csv_from_api(gds, file_meta: dict) -> pd.DataFrame | None:
     """Download and parse one Sage CSV from Google Drive. Returns pd.DataFrame or None."""
+    filename = file_meta.get("name", "")
     try:
-        service = gds._get_fresh_service()
-        for filename in [f"{table_name}.CSV", f"{table_name}.csv", f"{table_name.upper()}.CSV"]:
-            query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
-            results = service.files().list(
-                q=query,
-                corpora="drive",
-                driveId=drive_id,
-                includeItemsFromAllDrives=True,
-                supportsAllDrives=True,
-                fields="files(id, name)",
-                pageSize=1,
-            ).execute()
-            files = results.get("files", [])
-            if not files:
-                continue
-            content = gds.download_file(files[0]["id"], filename)
-            if content is None:
-                continue
-            for encoding in ["utf-8-sig", "utf-8", "latin-1", "cp1252"]:
-                try:
-                    df = pd.read_csv(BytesIO(content), encoding=encoding, low_memory=False)
-                    return df
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"[sage_gdrive] Parse error for {filename}: {e}")
-                    return None
+        content = gds.download_file(file_meta["id"], filename)
+        if content is None:
+            return None
+        return _parse_csv_bytes(content, filename)
     except Exception as e:
-        print(f"[sage_gdrive] API CSV load error for {table_name}: {e}")
+        print(f"[sage_gdrive] API CSV load error for {filename}: {e}")
     return None
 
 
-def _load_via_api():
+def _load_via_api(previous: dict = None):
     """Load all required Sage tables via Google Drive API (cloud mode).
-    Returns (tables_dict, folder_name_or_error).
+    Tables whose Drive file (id + md5Checksum/modifiedTime) matches previous["signatures"] are reused.
+    Returns (tables_dict, folder_name_or_error, signatures).
     """
     gds, drive_id, folder_id, folder_name = _find_latest_sage_folder_api()
     if gds is None:
-        return {}, folder_name  # folder_name holds the error message here
+        return {}, folder_name, {}  # folder_name holds the error message here
 
     print(f"[sage_gdrive] Loading {len(REQUIRED_TABLES)} Sage tables via API from: {folder_name}")
     t0 = time.time()
-    tables = {}
     # Prefer latest date subfolder first (local structure: March 11, 2026_06-18 PM with CSVs inside)
-    sub_id, sub_name = _find_sage_subfolder_api(gds, drive_id, folder_id)
-    load_folder_id = sub_id if sub_id else folder_id
-    load_folder_name = sub_name if sub_id else "(base)"
-    if sub_id:
-        print(f"[sage_gdrive] Using latest subfolder: {sub_name}")
-    for tbl in REQUIRED_TABLES:
-        df = _load_csv_from_api(gds, load_folder_id, drive_id, tbl)
-        if df is not None:
-            tables[tbl] = df
-            print(f"[sage_gdrive]   {tbl}: {len(df)} rows (API)")
-        else:
-            print(f"[sage_gdrive]   {tbl}: NOT FOUND (API)")
-    # Fallback: if subfolder had no CSVs, try base folder
-    if not tables and sub_id:
-        print(f"[sage_gdrive] No CSVs in subfolder; trying base folder")
-        load_folder_id = folder_id
+    try:
+        sub_id, sub_name = _find_sage_subfolder_api(gds, drive_id, folder_id)
+        table_files = {}
         load_folder_name = "(base)"
-        for tbl in REQUIRED_TABLES:
-            df = _load_csv_from_api(gds, folder_id, drive_id, tbl)
-            if df is not None:
-                tables[tbl] = df
-                print(f"[sage_gdrive]   {tbl}: {len(df)} rows (API)")
-            else:
-                print(f"[sage_gdrive]   {tbl}: NOT FOUND (API)")
+        if sub_id:
+            print(f"[sage_gdrive] Using latest subfolder: {sub_name}")
+            table_files = _api_table_files(_list_folder_files_api(gds, sub_id, drive_id))
+            load_folder_name = sub_name
+        # Fallback: if subfolder had no CSVs, try base folder
+        if not table_files:
+            if sub_id:
+                print(f"[sage_gdrive] No CSVs in subfolder; trying base folder")
+            table_files = _api_table_files(_list_folder_files_api(gds, folder_id, drive_id))
+            load_folder_name = "(base)"
+    except Exception as e:
+        return {}, f"Drive listing failed: {e}", {}
     folder_name = load_folder_name
 
+    sources = {
+        tbl: (("api", meta["id"], meta.get("md5Checksum") or meta.get("modifiedTime"), meta.get("size")),
+              lambda meta=meta: _load_csv_from_api(gds, meta))
+        for tbl, meta in table_files.items()
+    }
+    tables, signatures = _load_tables(sources, previous, "API")
+
     print(f"[sage_gdrive] API load complete: {len(tables)} tables in {time.time() - t0:.1f}s")
     if not tables:
         return {}, (
             f"Found folder '{folder_name}' but no CSV files loaded. "
             f"Ensure tcustomr.CSV, tsalordr.CSV, tsoline.CSV, etc. exist in {SAGE_GDRIVE_DRIVE_PATH} or a date subfolder. "
             f"Service account must be a member of shared drive '{SAGE_SHARED_DRIVE_NAME}' with Content Viewer."
-        )
-    return tables, folder_name
+        ), {}
+    return tables, folder_name, signatures
 
 
 # ---------------------------------------------------------------------------
@@ -317,6 +359,8 @@ def get_status() -> dict:
         "cache_loaded": bool(_cache),
         "cache_folder": _cache_folder,
         "cache_age_seconds": round(time.time() - _cache_ts, 0) if _cache_ts else None,
+        "reload_in_progress": _reload_lock.locked(),
+        "last_reload": _last_reload or None,
         "row_counts": {},
     }
     if IS_CLOUD_ENVIRONMENT:
@@ -335,10 +379,19 @@ def get_status() -> dict:
 # CSV loading
 # ---------------------------------------------------------------------------
 
+def _local_csv_path(folder_path: str, table_name: str) -> str | None:
+    """Path of one Sage CSV in an export folder (common casing variants), or None."""
+    for candidate in _csv_candidates(table_name):
+        fp = os.path.join(folder_path, candidate)
+        if os.path.isfile(fp):
+            return fp
+    return None
+
+
 def _load_csv(folder_path: str, table_name: str) -> pd.DataFrame | None:
     """Load one Sage CSV (case-insensitive filename match)."""
     # Try common casing variants
-    for candidate in [f"{table_name}.CSV", f"{table_name}.csv", f"{table_name.upper()}.CSV"]:
+    for candidate in _csv_candidates(table_name):
         fp = os.path.join(folder_path, candidate)
         if os.path.isfile(fp):
             try:
@@ -358,6 +411,53 @@ def _load_csv(folder_path: str, table_name: str) -> pd.DataFrame | None:
     return None
 
 
+def _load_tables(sources: dict, previous: dict = None, label: str = "local"):
+    """
+    Load tables given {table: (signature, loader)}. A table whose signature equals the previous snapshot's is reused
+    as-is; the rest are parsed in parallel (LOAD_WORKERS threads). Returns (tables, signatures).
+    """
+    prev_tables = (previous or {}).get("tables") or {}
+    prev_sigs = (previous or {}).get("signatures") or {}
+    tables, signatures, todo = {}, {}, {}
+    for tbl, (sig, loader) in sources.items():
+        if tbl in prev_tables and prev_sigs.get(tbl) == sig:
+            tables[tbl] = prev_tables[tbl]
+            signatures[tbl] = sig
+        else:
+            todo[tbl] = (sig, loader)
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(LOAD_WORKERS, len(todo)))) as ex:
+            futures = {tbl: ex.submit(loader) for tbl, (_, loader) in todo.items()}
+        for tbl, fut in futures.items():
+            df = fut.result()
+            if df is not None:
+                tables[tbl] = df
+                signatures[tbl] = todo[tbl][0]
+                print(f"[sage_gdrive]   {tbl}: {len(df)} rows ({label})")
+    reused = len(sources) - len(todo)
+    if reused:
+        print(f"[sage_gdrive]   {reused} unchanged tables reused")
+    for tbl in REQUIRED_TABLES:
+        if tbl not in tables:
+            print(f"[sage_gdrive]   {tbl}: NOT FOUND ({label})")
+    return tables, signatures
+
+
+def _load_local(folder_path: str, previous: dict = None):
+    """Load the REQUIRED_TABLES from a local export folder; files with the same path, mtime and size are reused."""
+    sources = {}
+    for tbl in REQUIRED_TABLES:
+        fp = _local_csv_path(folder_path, tbl)
+        if fp is None:
+            continue
+        try:
+            st = os.stat(fp)
+        except OSError:
+            continue
+        sources[tbl] = (("file", fp, st.st_mtime_ns, st.st_size), lambda tbl=tbl: _load_csv(folder_path, tbl))
+    return _load_tables(sources, previous)
+
+
 def _safe_float(val, default=0.0) -> float:
     try:
         if val is None or (isinstance(val, float) and pd.isna(val)):
@@ -429,62 +529,392 @@ def _find_col(df: pd.DataFrame, candidates: list[str]) -> str | None:
     return None
 
 
-def load_data(force: bool = False):
-    """
-    Load (or return cached) Sage G Drive tables.
-    Returns (tables_dict, error_message).
-    tables_dict keys = table names (e.g. 'tcustomr'), values = pd.DataFrame.
+# ---------------------------------------------------------------------------
+# Vectorized column parsing (same rules as the scalar helpers above)
+# ---------------------------------------------------------------------------
 
-    On cloud environments (Render/Cloud Run) the Google Drive API is used.
-    On local environments the G: drive path is used, with API fallback.
+_DATE_PARTS_RE = r"^-*(\d+)-+(\d+)-+(\d+)(?:-|$)"
+
+
+def _num(series: pd.Series) -> pd.Series:
+    """Column as float (like _safe_float: "$" and "," stripped, unparseable/empty -> 0.0)."""
+    if series.dtype.kind in "iufb":
+        return series.astype(float).fillna(0.0)
+    text = series.astype(str).str.replace(r"[$,]", "", regex=True).str.strip()
+    out = pd.to_numeric(text, errors="coerce").fillna(0.0)
+    return out.where(series.notna(), 0.0)
+
+
+def _ints(series: pd.Series, default: int = 0) -> pd.Series:
+    """Column as int64 ids (unparseable/empty -> default)."""
+    return pd.to_numeric(series, errors="coerce").fillna(default).astype("int64")
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Column as stripped text ("" for empty), like _safe_str."""
+    return series.astype(str).str.strip().where(series.notna(), "")
+
+
+def _iso_dates(series: pd.Series) -> pd.Series:
+    """Vectorized _normalize_date_to_iso over a column: YYYY-MM-DD strings, None where unparseable/empty."""
+    raw = series.astype(str).str[:20].str.strip()
+    raw = raw.where(series.notna() & (raw != ""), "")
+    s = raw.str.split(" ", n=1).str[0].str.replace("/", "-", regex=False)
+    parts = s.str.extract(_DATE_PARTS_RE).apply(pd.to_numeric, errors="coerce")
+    a, b, c = (parts[i].to_numpy(dtype=float) for i in range(3))
+    ok = (raw.str.len() >= 8).to_numpy() & (s.str.len() >= 8).to_numpy()
+    ymd = ok & (a >= 1900) & (a <= 2100) & (b >= 1) & (b <= 12) & (c >= 1) & (c <= 31)
+    mdy = ok & ~ymd & (a >= 1) & (a <= 12) & (b >= 1) & (b <= 31) & (c >= 1900) & (c <= 2100)
+    dmy = ok & ~ymd & ~mdy & (a >= 1) & (a <= 31) & (b >= 1) & (b <= 12) & (c >= 1900) & (c <= 2100)
+    year = np.select([ymd, mdy, dmy], [a, c, c], 0).astype(np.int64)
+    month = np.select([ymd, mdy, dmy], [b, a, b], 0).astype(np.int64)
+    day = np.select([ymd, mdy, dmy], [c, b, a], 0).astype(np.int64)
+    valid = ymd | mdy | dmy
+    iso = (pd.Series(year, index=series.index).astype(str).str.zfill(4) + "-"
+           + pd.Series(month, index=series.index).astype(str).str.zfill(2) + "-"
+           + pd.Series(day, index=series.index).astype(str).str.zfill(2))
+    return iso.astype(object).where(valid, None)
+
+
+def _safe_dates(series: pd.Series) -> pd.Series:
+    """Vectorized _safe_date: ISO values cut to YYYY-MM-DD, other text kept, empty/"0"/"nan"/"NaT" -> None."""
+    s = series.astype(str).str.strip()
+    empty = series.isna() | s.isin(["", "0", "nan", "NaT"])
+    iso = (s.str.len() >= 10) & (s.str[4:5] == "-")
+    return s.where(~iso, s.str[:10]).astype(object).where(~empty, None)
+
+
+def _fiscal_years(iso: pd.Series) -> np.ndarray:
+    """Sage fiscal year per ISO date (Apr-Mar, FY2026 = Apr 2025 - Mar 2026); 0 where the date is None."""
+    year = pd.to_numeric(iso.str[:4], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    month = pd.to_numeric(iso.str[5:7], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    return np.where(year > 0, year + (month >= SAGE_FISCAL_YEAR_START_MONTH), 0)
+
+
+# ---------------------------------------------------------------------------
+# Typed columns, parsed once per load_data() snapshot
+# ---------------------------------------------------------------------------
+# Frames share the index of their source table:
+#   titrec   : dt (ISO str/None), fy, id, cid, amt (only when an amount column exists), reversed, customer
+#   titrline : inv, rev, qty, cogs, trans (when a titrec link column exists), dt/fy (when lines carry a date)
+#   tcustomr : id, name
+#   tinvent  : id, part, name, sell_unit
+_typed: dict = {}
+
+
+def _prepare_typed(tables: dict) -> dict:
+    typed = {}
+    cust = tables.get("tcustomr")
+    valid_cids = set()
+    if cust is not None and not cust.empty:
+        id_col = _find_col(cust, ["lId", "lid"])
+        name_col = _find_col(cust, ["sName", "sname"])
+        if id_col:
+            t = pd.DataFrame(index=cust.index)
+            t["id"] = _ints(cust[id_col])
+            t["name"] = _text(cust[name_col]) if name_col else ""
+            typed["tcustomr"] = t
+            valid_cids = set(t["id"].tolist())
+            valid_cids.discard(0)
+
+    inv = tables.get("tinvent")
+    if inv is not None and not inv.empty and "lId" in inv.columns:
+        t = pd.DataFrame(index=inv.index)
+        t["id"] = _ints(inv["lId"])
+        for key, col in (("part", "sPartCode"), ("name", "sName"), ("sell_unit", "sSellUnit")):
+            t[key] = _text(inv[col]) if col in inv.columns else ""
+        typed["tinvent"] = t
+
+    trec = tables.get("titrec")
+    if trec is not None and not trec.empty:
+        date_col = _find_col(trec, ["dtASDate", "dtDate"])
+        id_col = _find_col(trec, ["lId", "lid"])
+        cid_col = _find_col(trec, ["lVenCusId", "lCusId", "lCustomerId", "lCustId"])
+        amt_col = _find_col(trec, ["dInvAmt", "dAmt", "dTotalAmt"])
+        t = pd.DataFrame(index=trec.index)
+        t["dt"] = _iso_dates(trec[date_col]) if date_col else pd.Series(None, index=trec.index, dtype=object)
+        t["fy"] = _fiscal_years(t["dt"])
+        t["id"] = _ints(trec[id_col]) if id_col else 0
+        t["cid"] = _ints(trec[cid_col]) if cid_col else 0
+        if amt_col:
+            t["amt"] = pd.to_numeric(trec[amt_col], errors="coerce").fillna(0.0)
+        reversed_mask = np.zeros(len(trec), dtype=bool)
+        for rev_col_name in ["bReversal", "bReversed"]:
+            rev_col = _find_col(trec, [rev_col_name])
+            if rev_col:
+                reversed_mask |= (pd.to_numeric(trec[rev_col], errors="coerce").fillna(0) != 0).to_numpy()
+        t["reversed"] = reversed_mask
+        # lVenCusId holds vendor ids on PO transactions; customer = id present in tcustomr (all rows when unknown)
+        t["customer"] = t["cid"].isin(valid_cids) if valid_cids and cid_col else True
+        t.attrs.update(date_col=date_col, id_col=id_col, cid_col=cid_col, amt_col=amt_col)
+        typed["titrec"] = t
+
+    lines = tables.get("titrline")
+    if lines is not None and not lines.empty and "lInventId" in lines.columns:
+        t = pd.DataFrame(index=lines.index)
+        t["inv"] = _ints(lines["lInventId"])
+        for key, col in (("rev", "dAmt"), ("qty", "dQty"), ("cogs", "dCost")):
+            t[key] = pd.to_numeric(lines[col], errors="coerce").fillna(0.0).astype(float) if col in lines.columns else 0.0
+        trans_col = _find_col(lines, ["lITRecId", "lTransId", "lRecId", "lTitRecId", "lTransID"])
+        if trans_col:
+            t["trans"] = _ints(lines[trans_col])
+        line_date_col = _find_col(lines, ["dtASDate", "dtDate"])
+        if line_date_col:
+            t["dt"] = _iso_dates(lines[line_date_col])
+            t["fy"] = _fiscal_years(t["dt"])
+        typed["titrline"] = t
+    return typed
+
+
+def _snapshot():
     """
-    global _cache, _cache_ts, _cache_folder
+    (tables, typed, cube) of the current snapshot, read together under _cache_lock so a background reload cannot
+    pair one snapshot's tables with another's typed columns or sales cube (loads data when needed).
+    """
+    _tables()
+    with _cache_lock:
+        tables, typed, cube = _cache, _typed, _cube
+    return tables, typed, cube if cube is not None else _SalesCube({})
+
 
+def _set_cache(tables: dict, folder: str, signatures: dict = None):
+    """Install a freshly loaded snapshot with its typed columns and sales cube (parsed first, then swapped atomically)."""
+    global _cache, _cache_ts, _cache_folder, _cache_signatures, _typed, _cube
+    t0 = time.time()
+    try:
+        typed = _prepare_typed(tables)
+    except Exception as e:
+        print(f"[sage_gdrive] Typed column parse failed: {e}")
+        typed = {}
+    try:
+        cube = _SalesCube(typed)
+    except Exception as e:
+        print(f"[sage_gdrive] Sales cube build failed: {e}")
+        cube = None
     with _cache_lock:
-        now = time.time()
-        if _cache and not force and (now - _cache_ts) < CACHE_TTL_SECONDS:
-            return _cache, None
+        _cache = tables
+        _typed = typed
+        _cube = cube
+        _cache_signatures = dict(signatures or {})
+        _cache_ts = time.time()
+        _cache_folder = folder
+    print(f"[sage_gdrive] Parsed typed columns for {len(typed)} tables and built sales cube in {time.time() - t0:.1f}s")
+
+
+def _customer_names(typed: dict) -> dict:
+    t = typed.get("tcustomr")
+    return dict(zip(t["id"].tolist(), t["name"].tolist())) if t is not None else {}
+
+
+def _inventory_names(typed: dict) -> dict:
+    t = typed.get("tinvent")
+    if t is None:
+        return {}
+    return {
+        iid: {"sPartCode": part, "sName": name, "sSellUnit": unit}
+        for iid, part, name, unit in zip(t["id"].tolist(), t["part"].tolist(), t["name"].tolist(), t["sell_unit"].tolist())
+    }
+
+
+def _item_stats(lines: pd.DataFrame) -> dict:
+    """Per-item revenue/qty/cogs/txn_count over typed titrline rows (item id 0 dropped)."""
+    if lines.empty:
+        return {}
+    grouped = lines.groupby("inv").agg(
+        total_revenue=("rev", "sum"), total_qty=("qty", "sum"),
+        total_cogs=("cogs", "sum"), txn_count=("rev", "count"),
+    )
+    return {
+        iid: {
+            "total_revenue": round(rev, 2),
+            "total_qty": round(qty, 2),
+            "total_cogs": round(cogs, 2),
+            "txn_count": cnt,
+        }
+        for iid, rev, qty, cogs, cnt in zip(
+            grouped.index.tolist(), grouped["total_revenue"].tolist(), grouped["total_qty"].tolist(),
+            grouped["total_cogs"].tolist(), grouped["txn_count"].tolist(),
+        )
+        if iid != 0
+    }
 
-        # ── CLOUD: must use Google Drive API ──────────────────────────────
-        if IS_CLOUD_ENVIRONMENT:
-            tables, result = _load_via_api()
-            if not tables:
-                return {}, f"[Cloud] Sage API load failed: {result}"
-            _cache = tables
-            _cache_ts = time.time()
-            _cache_folder = result  # result is folder_name on success
-            return tables, None
 
+class _SalesCube:
+    """
+    Fiscal-year aggregates of one load_data() snapshot, built once so the dashboard endpoints are slices, not scans:
+      by_customer : (fy, cid) -> revenue, last sale     non-reversed titrec invoices (amount > 0) of tcustomr customers
+      by_month    : (fy, fiscal month) -> revenue, count  same invoices
+      by_item     : (fy, item) -> revenue/qty/cogs/txn   titrline, fiscal year through lITRecId -> titrec.lId
+    Per-year views are plain dicts/lists, read-only for callers.
+    """
+
+    def __init__(self, typed: dict):
+        self.years = []
+        self.date_range = None       # {"min", "max"} ISO dates of dated invoices
+        self.customer_revenue = {}   # fy -> {cid: revenue}
+        self.customer_last_sale = {} # fy -> {cid: "YYYY-MM-DD"}
+        self.monthly = {}            # fy -> ([revenue] * 12, [count] * 12), fiscal month 1 = Apr
+        self.item_stats_all = {}     # item -> stats over every titrline row
+        self._item_stats = {}        # fy -> {item: stats}
+        self._item_years = None      # fiscal years the by-year item stats cover (None = every year)
+        self._build_invoices(typed.get("titrec"))
+        self._build_items(typed.get("titrline"), typed.get("titrec"))
+
+    def _build_invoices(self, trec):
+        if trec is None or not trec.attrs.get("date_col"):
+            return
+        has_amt = "amt" in trec.columns
+        dated = trec[trec["dt"].notna() & (trec["amt"] > 0)] if has_amt else trec[trec["dt"].notna()]
+        self.years = sorted(set(dated["fy"].tolist()), reverse=True)
+        if not dated.empty:
+            self.date_range = {"min": dated["dt"].min(), "max": dated["dt"].max()}
+        if not has_amt:
+            return
+
+        rows = dated[~dated["reversed"] & dated["customer"]]
+        fiscal_month = (pd.to_numeric(rows["dt"].str[5:7], errors="coerce").fillna(0).astype(int) - 4) % 12 + 1
+        months = rows["amt"].groupby([rows["fy"], fiscal_month]).agg(["sum", "count"])
+        for (fy, m), rev, cnt in zip(months.index.tolist(), months["sum"].tolist(), months["count"].tolist()):
+            revenue, counts = self.monthly.setdefault(fy, ([0.0] * 12, [0] * 12))
+            revenue[m - 1] = rev
+            counts[m - 1] = cnt
+
+        if not trec.attrs.get("cid_col"):
+            return
+        rows = rows[rows["cid"] != 0]
+        by_customer = rows.groupby(["fy", "cid"]).agg(revenue=("amt", "sum"), last_sale=("dt", "max"))
+        for (fy, cid), rev, last in zip(by_customer.index.tolist(), by_customer["revenue"].tolist(), by_customer["last_sale"].tolist()):
+            self.customer_revenue.setdefault(fy, {})[cid] = rev
+            self.customer_last_sale.setdefault(fy, {})[cid] = last
+
+    def _build_items(self, lines, trec):
+        if lines is None:
+            return
+        self.item_stats_all = _item_stats(lines)
+        if trec is not None and trec.attrs.get("date_col") and trec.attrs.get("id_col"):
+            if "trans" not in lines.columns:
+                self._item_years = set()  # lines cannot be tied to a year: every year reports all lines
+                return
+            year_ids = trec.loc[trec["fy"] != 0, ["id", "fy"]].drop_duplicates()
+            self._item_years = set(year_ids["fy"].tolist())
+            dated = lines[["inv", "rev", "qty", "cogs", "trans"]].merge(year_ids, left_on="trans", right_on="id", how="inner")
+        elif "fy" in lines.columns:
+            dated = lines
+        else:
+            self._item_years = set()
+            return
+        for fy, group in dated.groupby("fy", sort=False):
+            self._item_stats[fy] = _item_stats(group)
+
+    def item_stats(self, fiscal_year: int) -> dict:
+        """Per-item stats for a fiscal year; when titrec has no transactions in that year every line counts."""
+        if self._item_years is not None and fiscal_year not in self._item_years:
+            return self.item_stats_all
+        return self._item_stats.get(fiscal_year, {})
+
+
+_cube = None
+
+
+def _reload(incremental: bool = True):
+    """
+    Read the latest export into a new snapshot and swap it in. With incremental=True tables whose source file is
+    unchanged (local mtime/size, Drive md5/modifiedTime) are carried over from the current snapshot.
+    Returns (tables_dict, error_message). Caller holds _reload_lock.
+    """
+    global _cache_ts, _last_reload
+    previous = {"tables": _cache, "signatures": _cache_signatures} if incremental and _cache else None
+    t0 = time.time()
+
+    # ── CLOUD: must use Google Drive API ──────────────────────────────
+    if IS_CLOUD_ENVIRONMENT:
+        tables, result, signatures = _load_via_api(previous)
+        if not tables:
+            return {}, f"[Cloud] Sage API load failed: {result}"
+        folder = result  # result is folder_name on success
+    else:
         # ── LOCAL: try G: drive, fall back to API ─────────────────────────
         folder_path, folder_name = get_latest_folder()
         if not folder_path:
             print(f"[sage_gdrive] G: drive unavailable ({folder_name}), trying Google Drive API…")
-            tables, result = _load_via_api()
+            tables, result, signatures = _load_via_api(previous)
             if not tables:
                 return {}, f"G: drive not found and API fallback failed: {result}"
-            _cache = tables
+            folder = result
+        else:
+            print(f"[sage_gdrive] Loading from local folder: {folder_name}")
+            tables, signatures = _load_local(folder_path, previous)
+            folder = folder_name
+
+    prev_tables = (previous or {}).get("tables") or {}
+    reloaded = sorted(tbl for tbl, df in tables.items() if prev_tables.get(tbl) is not df)
+    if previous and not reloaded and set(tables) == set(prev_tables) and folder == _cache_folder:
+        with _cache_lock:
             _cache_ts = time.time()
-            _cache_folder = result
-            return tables, None
+        print(f"[sage_gdrive] Sage export unchanged ({len(tables)} tables), checked in {time.time() - t0:.1f}s")
+    else:
+        _set_cache(tables, folder, signatures)
+        print(f"[sage_gdrive] Loaded {len(tables)} tables ({len(reloaded)} parsed) in {time.time() - t0:.1f}s")
+    _last_reload = {
+        "at": datetime.now().isoformat(),
+        "seconds": round(time.time() - t0, 2),
+        "folder": folder,
+        "reloaded": reloaded,
+        "reused": len(tables) - len(reloaded),
+    }
+    return tables, None
 
-        print(f"[sage_gdrive] Loading from local folder: {folder_name}")
-        t0 = time.time()
 
-        tables = {}
-        for tbl in REQUIRED_TABLES:
-            df = _load_csv(folder_path, tbl)
-            if df is not None:
-                tables[tbl] = df
-                print(f"[sage_gdrive]   {tbl}: {len(df)} rows")
-            else:
-                print(f"[sage_gdrive]   {tbl}: NOT FOUND")
+def _background_reload():
+    global _cache_ts
+    if not _reload_lock.acquire(blocking=False):
+        return  # a forced reload is already running
+    try:
+        tables, err = _reload(incremental=True)
+        if err and not tables:
+            print(f"[sage_gdrive] Background reload failed, keeping current snapshot: {err}")
+            with _cache_lock:
+                _cache_ts = time.time() - CACHE_TTL_SECONDS + RELOAD_RETRY_SECONDS
+    except Exception as e:
+        print(f"[sage_gdrive] Background reload error, keeping current snapshot: {e}")
+        with _cache_lock:
+            _cache_ts = time.time() - CACHE_TTL_SECONDS + RELOAD_RETRY_SECONDS
+    finally:
+        _reload_lock.release()
 
-        _cache = tables
-        _cache_ts = time.time()
-        _cache_folder = folder_name
-        print(f"[sage_gdrive] Loaded {len(tables)} tables in {time.time() - t0:.1f}s")
+
+def _start_background_reload():
+    global _reload_thread
+    with _cache_lock:
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return
+        _reload_thread = threading.Thread(target=_background_reload, name="sage-gdrive-reload", daemon=True)
+        _reload_thread.start()
+
+
+def load_data(force: bool = False):
+    """
+    Load (or return cached) Sage G Drive tables.
+    Returns (tables_dict, error_message).
+    tables_dict keys = table names (e.g. 'tcustomr'), values = pd.DataFrame.
+
+    On cloud environments (Render/Cloud Run) the Google Drive API is used.
+    On local environments the G: drive path is used, with API fallback.
+    Once a snapshot is loaded, an expired TTL starts a background reload (only changed tables are re-read) and the
+    current snapshot keeps being served until the new one is swapped in. force=True reloads every table synchronously.
+    """
+    tables = _cache
+    if tables and not force:
+        if time.time() - _cache_ts >= CACHE_TTL_SECONDS:
+            _start_background_reload()
         return tables, None
 
+    with _reload_lock:
+        # Another request may have finished the first load while this one waited
+        if _cache and not force:
+            return _cache, None
+        return _reload(incremental=not force)
+
 
 # ---------------------------------------------------------------------------
 # Helper: get tables (auto-load)
@@ -868,7 +1298,7 @@ def get_customer_item_sales(customer_search: str, item_code_search: str, limit:
     """
     import re
     import difflib
-    tables = _tables()
+    tables, typed, _ = _snapshot()
     so_df = tables.get("tsalordr")
     line_df = tables.get("tsoline")
     inv_df = tables.get("tinvent")
@@ -906,29 +1336,23 @@ def get_customer_item_sales(customer_search: str, item_code_search: str, limit:
             item_variants.append(re.sub(r"[^a-z0-9]", "", normalized))
             break
 
-    cust_name_map = {}
-    if cust_df is not None and not cust_df.empty and "lId" in cust_df.columns:
-        for _, cr in cust_df[["lId", "sName"]].iterrows():
-            cust_name_map[int(cr["lId"] or 0)] = _safe_str(cr["sName"])
+    cust_name_map = _customer_names(typed)
 
+    # Unit cost per Sage item: first positive of the known cost columns
     inv_map = {}
     cost_cols = ["cLast", "cStd", "cAvg", "itemCost", "Recent Cost", "Standard Cost"]
-    if "lId" in inv_df.columns and "sPartCode" in inv_df.columns and "sName" in inv_df.columns:
-        for _, ir in inv_df.iterrows():
-            iid = int(ir.get("lId", 0) or 0)
-            part = _safe_str(ir.get("sPartCode")).lower()
-            name = _safe_str(ir.get("sName")).lower()
-            cost = 0.0
-            for col in cost_cols:
-                if col in inv_df.columns:
-                    cost = _safe_float(ir.get(col))
-                    if cost > 0:
-                        break
-            inv_map[iid] = {
-                "sPartCode": _safe_str(ir.get("sPartCode")),
-                "sName": _safe_str(ir.get("sName")),
-                "unit_cost": cost,
-            }
+    inv_typed = typed.get("tinvent")
+    if inv_typed is not None and "sPartCode" in inv_df.columns and "sName" in inv_df.columns:
+        unit_cost = pd.Series(0.0, index=inv_df.index)
+        for col in cost_cols:
+            if col in inv_df.columns:
+                cost = _num(inv_df[col])
+                unit_cost = unit_cost.where(unit_cost > 0, cost.where(cost > 0, 0.0))
+        inv_map = {
+            iid: {"sPartCode": part, "sName": name, "unit_cost": cost}
+            for iid, part, name, cost in zip(inv_typed["id"].tolist(), inv_typed["part"].tolist(),
+                                             inv_typed["name"].tolist(), unit_cost.tolist())
+        }
 
     # MiSys cost fallback (Recent Cost / Standard Cost from Items.json) when Sage tinvent has no cost
     misys_cost_map = {}
@@ -953,32 +1377,25 @@ def get_customer_item_sales(customer_search: str, item_code_search: str, limit:
     if not cust_ids:
         return {"records": [], "total_count": 0, "count": 0, "customer_search": cust_search, "item_search": item_search, "source": "gdrive", "note": f"No customers found matching '{cust_search}'"}
 
-    so_ids = set()
-    if "lCusId" in so_df.columns and "lId" in so_df.columns:
-        for _, r in so_df.iterrows():
-            if int(r.get("lCusId", 0) or 0) in cust_ids:
-                so_ids.add(int(r.get("lId", 0) or 0))
     CURRENCY_MAP = {1: "CAD", 2: "USD"}
     so_id_to_header = {}
-    for _, r in so_df.iterrows():
-        sid = int(r.get("lId", 0) or 0)
-        if sid in so_ids:
-            cur_id = int(r.get("lCurrncyId", 1) or 1)
-            so_id_to_header[sid] = {
-                "sSONum": _safe_str(r.get("sSONum")),
-                "dtSODate": _safe_date(r.get("dtSODate")),
-                "lCusId": int(r.get("lCusId", 0) or 0),
-                "currency": CURRENCY_MAP.get(cur_id, "CAD"),
-            }
-
-    line_df = line_df[line_df["lSOId"].fillna(0).astype(int).isin(so_ids)].copy()
+    if "lCusId" in so_df.columns and "lId" in so_df.columns:
+        hdr = so_df[_ints(so_df["lCusId"]).isin(cust_ids)]
+        n = len(hdr)
+        so_nums = _text(hdr["sSONum"]).tolist() if "sSONum" in hdr.columns else [""] * n
+        so_dates = _safe_dates(hdr["dtSODate"]).tolist() if "dtSODate" in hdr.columns else [None] * n
+        cur_ids = _ints(hdr["lCurrncyId"], 1).replace(0, 1).tolist() if "lCurrncyId" in hdr.columns else [1] * n
+        for sid, num, dt, cid, cur_id in zip(_ints(hdr["lId"]).tolist(), so_nums, so_dates, _ints(hdr["lCusId"]).tolist(), cur_ids):
+            so_id_to_header[sid] = {"sSONum": num, "dtSODate": dt, "lCusId": cid, "currency": CURRENCY_MAP.get(cur_id, "CAD")}
+
+    line_df = line_df[line_df["lSOId"].fillna(0).astype(int).isin(so_id_to_header.keys())].copy()
     if line_df.empty:
         return {"records": [], "total_count": 0, "count": 0, "customer_search": cust_search, "item_search": item_search, "source": "gdrive", "note": f"No sales lines for customers matching '{cust_search}'"}
 
     line_df["_invId"] = pd.to_numeric(line_df["lInventId"], errors="coerce").fillna(0).astype(int)
     for qcol in ["dQuantity", "dOrdered", "dQty", "dOrdQty", "dQtyOrd", "nQty"]:
         if qcol in line_df.columns:
-            line_df["_qty"] = pd.to_numeric(line_df[qcol], errors="coerce").fillna(0.0)
+            line_df["_qty"] = pd.to_numeric(line_df[qcol], errors="coerce").fillna(0.0).astype(float)
             break
     else:
         line_df["_qty"] = 0.0
@@ -997,32 +1414,36 @@ def get_customer_item_sales(customer_search: str, item_code_search: str, limit:
     if mask.any():
         line_df.loc[mask, "_qty"] = line_df.loc[mask, "_amt"] / line_df.loc[mask, "_price"]
 
-    records = []
-    for _, row in line_df.iterrows():
-        iid = int(row.get("_invId", 0) or 0)
-        info = inv_map.get(iid, {"sPartCode": f"ID:{iid}", "sName": "", "unit_cost": 0})
+    # Item match is decided once per distinct Sage item, not per line
+    def _item_matches(info) -> bool:
         part = info["sPartCode"].lower()
         name = info["sName"].lower()
         part_clean = re.sub(r"[^a-z0-9]", "", part)
-        part_match = any(
-            v in part or v in name or (len(v) >= 2 and v in part_clean)
-            for v in item_variants
-        )
-        if not part_match and len(item_parts) >= 4:
+        if any(v in part or v in name or (len(v) >= 2 and v in part_clean) for v in item_variants):
+            return True
+        if len(item_parts) >= 4:
             for v in item_variants:
                 if len(v) >= 4 and (
                     difflib.SequenceMatcher(None, v, part).ratio() >= 0.75
                     or difflib.SequenceMatcher(None, v, part_clean).ratio() >= 0.75
                 ):
-                    part_match = True
-                    break
-        if not part_match:
-            continue
-        so_id = int(row.get("lSOId", 0) or 0)
+                    return True
+        return False
+
+    line_info = {}
+    for iid in line_df["_invId"].unique().tolist():
+        info = inv_map.get(iid, {"sPartCode": f"ID:{iid}", "sName": "", "unit_cost": 0})
+        if _item_matches(info):
+            line_info[iid] = info
+    line_df = line_df[line_df["_invId"].isin(line_info.keys())]
+
+    records = []
+    for iid, so_id, qty, amt, unit_price in zip(
+        line_df["_invId"].tolist(), _ints(line_df["lSOId"]).tolist(), line_df["_qty"].astype(float).tolist(),
+        line_df["_amt"].astype(float).tolist(), line_df["_price"].astype(float).tolist(),
+    ):
+        info = line_info[iid]
         hdr = so_id_to_header.get(so_id, {})
-        qty = float(row.get("_qty", 0) or 0)
-        amt = float(row.get("_amt", 0) or 0)
-        unit_price = float(row.get("_price", 0) or 0)
         if unit_price == 0 and qty > 0 and amt > 0:
             unit_price = amt / qty
         cost = info.get("unit_cost", 0) or 0
@@ -1153,7 +1574,7 @@ def get_sales_order_by_number(so_number: str) -> dict | None:
 
 def get_sage_data_flow_diagnostic() -> dict:
     """Diagnostic: compare tcustomr (Sage built-in) vs titrec (our aggregation). Use to verify we're not excluding data."""
-    tables = _tables()
+    tables, _, cube = _snapshot()
     current_fy = _current_fiscal_year()
     out = {
         "folder": _cache_folder,
@@ -1171,7 +1592,7 @@ def get_sage_data_flow_diagnostic() -> dict:
         rev2_col = _find_col(titrec, ["bReversed"])
         amt_col = _find_col(titrec, ["dInvAmt", "dAmt"])
         if amt_col:
-            pos = titrec[amt_col].apply(lambda x: _safe_float(x) > 0).sum()
+            pos = (_num(titrec[amt_col]) > 0).sum()
             out["titrec_rows_dInvAmt_gt_0"] = int(pos)
         if rev_col:
             out["titrec_bReversal_1_count"] = int((pd.to_numeric(titrec[rev_col], errors="coerce").fillna(0) == 1).sum())
@@ -1183,10 +1604,10 @@ def get_sage_data_flow_diagnostic() -> dict:
         active = cust[cust["bInactive"].fillna(0) == 0] if "bInactive" in cust.columns else cust
         ytd_col = _find_col(active, ["dAmtYtd"])
         ly_col = _find_col(active, ["dLastYrAmt"])
-        sage_ytd = float(active[ytd_col].apply(_safe_float).sum()) if ytd_col else 0
-        sage_ly = float(active[ly_col].apply(_safe_float).sum()) if ly_col else 0
-        txn_rev = _customer_revenue_from_titrec(current_fy)
-        txn_prev = _customer_revenue_from_titrec(current_fy - 1)
+        sage_ytd = float(_num(active[ytd_col]).sum()) if ytd_col else 0
+        sage_ly = float(_num(active[ly_col]).sum()) if ly_col else 0
+        txn_rev = _customer_revenue_from_titrec(current_fy, cube)
+        txn_prev = _customer_revenue_from_titrec(current_fy - 1, cube)
         titrec_ytd = sum(txn_rev.values())
         titrec_ly = sum(txn_prev.values())
         out["data_source"]["current_fy"] = "tcustomr (Sage built-in)"
@@ -1199,64 +1620,24 @@ def get_sage_data_flow_diagnostic() -> dict:
     return out
 
 
-def get_available_years() -> list:
+def get_available_years(cube=None) -> list:
     """Return fiscal years that have actual invoiced revenue in titrec (Sage fiscal year = Apr-Mar)."""
-    df = _tables().get("titrec")
-    date_col = _find_col(df, ["dtASDate", "dtDate"]) if df is not None and not df.empty else None
-    if df is None or df.empty or not date_col:
-        return [_current_fiscal_year()]
-
-    rows = df.copy()
-    rows["_dt"] = rows[date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-    rows = rows[rows["_dt"].notna()]
-
-    # Only include years that have positive invoice amounts (real revenue)
-    amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt"])
-    if amt_col:
-        rows["_amt"] = pd.to_numeric(rows[amt_col], errors="coerce").fillna(0)
-        rows = rows[rows["_amt"] > 0]
-
-    dates = rows["_dt"].astype(str)
-    fiscal_years = set()
-    for d in dates:
-        fy = _date_to_fiscal_year(d)  # d is already YYYY-MM-DD from _normalize_date_to_iso
-        if fy is not None:
-            fiscal_years.add(fy)
-    years = sorted(fiscal_years, reverse=True)
-    return years if years else [_current_fiscal_year()]
+    years = (cube or _snapshot()[2]).years
+    return list(years) if years else [_current_fiscal_year()]
 
 
 def get_available_years_with_meta() -> dict:
     """Return fiscal years plus date range info. Sage fiscal year = Apr 1 - Mar 31."""
-    df = _tables().get("titrec")
+    tables, _, cube = _snapshot()
+    df = tables.get("titrec")
     if df is None or df.empty:
         return {"years": [_current_fiscal_year()], "date_range": None, "row_count": 0, "note": "titrec not loaded", "fiscal_year_end": "March 31"}
     date_col = _find_col(df, ["dtASDate", "dtDate"])
     if not date_col:
         return {"years": [_current_fiscal_year()], "date_range": None, "row_count": len(df), "note": "dtASDate/dtDate column missing", "fiscal_year_end": "March 31"}
 
-    rows = df.copy()
-    rows["_dt"] = rows[date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-    rows = rows[rows["_dt"].notna()]
-
-    amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt"])
-    if amt_col:
-        rows["_amt"] = pd.to_numeric(rows[amt_col], errors="coerce").fillna(0)
-        rows = rows[rows["_amt"] > 0]
-
-    dates = rows["_dt"].astype(str)
-    fiscal_years = set()
-    for d in dates:
-        fy = _date_to_fiscal_year(d)
-        if fy is not None:
-            fiscal_years.add(fy)
-    years = sorted(fiscal_years, reverse=True)
-    years = years if years else [_current_fiscal_year()]
-
-    date_range = None
-    valid_dates = [d for d in dates if d and len(d) >= 10]
-    if valid_dates:
-        date_range = {"min": min(valid_dates)[:10], "max": max(valid_dates)[:10]}
+    years = get_available_years(cube)
+    date_range = cube.date_range
 
     # Sample raw date values from titrec (for debugging date format)
     raw_samples = []
@@ -1275,151 +1656,23 @@ def get_available_years_with_meta() -> dict:
     }
 
 
-def _customer_revenue_from_titrec(fiscal_year: int) -> dict:
-    """Aggregate per-customer revenue from titrec for a given Sage fiscal year (Apr-Mar).
+def _customer_revenue_from_titrec(fiscal_year: int, cube=None) -> dict:
+    """Per-customer revenue from titrec for a given Sage fiscal year (Apr-Mar), sliced from the sales cube.
     titrec contains both AR (customer) and AP (vendor) transactions; lVenCusId can be either.
     - Exclude reversals (bReversal, bReversed) to avoid double-counting
     - Only include lVenCusId that exist in tcustomr (excludes vendor IDs from PO transactions)"""
-    tables = _tables()
-    df = tables.get("titrec")
-    if df is None or df.empty:
-        return {}
-    date_col = _find_col(df, ["dtASDate", "dtDate"])
-    cid_col = _find_col(df, ["lVenCusId", "lCusId", "lCustomerId", "lCustId"])
-    amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt"])
-    if not date_col or not cid_col or not amt_col:
-        return {}
-    # Build set of valid customer IDs from tcustomr (excludes vendor IDs that might appear in titrec)
-    valid_cids = set()
-    cust_df = tables.get("tcustomr")
-    if cust_df is not None and not cust_df.empty:
-        id_col = _find_col(cust_df, ["lId", "lid"])
-        if id_col:
-            valid_cids = set(pd.to_numeric(cust_df[id_col], errors="coerce").fillna(0).astype(int).tolist())
-            valid_cids.discard(0)
-    start_dt, end_dt = _fiscal_year_date_range(fiscal_year)
-    rows = df.copy()
-    # Exclude reversals (bReversal=1 or bReversed=1) — reversed transactions skew revenue
-    for rev_col_name in ["bReversal", "bReversed"]:
-        rev_col = _find_col(df, [rev_col_name])
-        if rev_col:
-            rows = rows[pd.to_numeric(rows[rev_col], errors="coerce").fillna(0) == 0]
-    rows["_dt"] = rows[date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-    rows = rows[rows["_dt"].notna()]
-    rows = rows[(rows["_dt"] >= start_dt) & (rows["_dt"] <= end_dt)]
-    rows["_amt"] = pd.to_numeric(rows[amt_col], errors="coerce").fillna(0.0)
-    rows = rows[rows["_amt"] > 0]
-    if rows.empty:
-        return {}
-    rows["_cid"] = pd.to_numeric(rows[cid_col], errors="coerce").fillna(0).astype(int)
-    # Only include rows where lVenCusId is a valid customer (excludes vendor IDs from PO transactions)
-    if valid_cids:
-        rows = rows[rows["_cid"].isin(valid_cids)]
-    if rows.empty:
-        return {}
-    grouped = rows.groupby("_cid")["_amt"].sum()
-    return {int(cid): float(v) for cid, v in grouped.items() if int(cid) != 0}
+    return (cube or _snapshot()[2]).customer_revenue.get(fiscal_year, {})
 
 
-def _customer_last_sale_from_titrec(fiscal_year: int) -> dict:
+def _customer_last_sale_from_titrec(fiscal_year: int, cube=None) -> dict:
     """Per-customer last sale date within the given fiscal year, from titrec (transaction data).
     Returns {cid: "YYYY-MM-DD"}. Excludes reversals and vendor IDs (only valid tcustomr customers)."""
-    tables = _tables()
-    df = tables.get("titrec")
-    if df is None or df.empty:
-        return {}
-    date_col = _find_col(df, ["dtASDate", "dtDate"])
-    cid_col = _find_col(df, ["lVenCusId", "lCusId", "lCustomerId", "lCustId"])
-    amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt"])
-    if not date_col or not cid_col or not amt_col:
-        return {}
-    valid_cids = set()
-    cust_df = tables.get("tcustomr")
-    if cust_df is not None and not cust_df.empty:
-        id_col = _find_col(cust_df, ["lId", "lid"])
-        if id_col:
-            valid_cids = set(pd.to_numeric(cust_df[id_col], errors="coerce").fillna(0).astype(int).tolist())
-            valid_cids.discard(0)
-    start_dt, end_dt = _fiscal_year_date_range(fiscal_year)
-    rows = df.copy()
-    for rev_col_name in ["bReversal", "bReversed"]:
-        rev_col = _find_col(df, [rev_col_name])
-        if rev_col:
-            rows = rows[pd.to_numeric(rows[rev_col], errors="coerce").fillna(0) == 0]
-    rows["_dt"] = rows[date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-    rows = rows[rows["_dt"].notna()]
-    rows = rows[(rows["_dt"] >= start_dt) & (rows["_dt"] <= end_dt)]
-    rows["_amt"] = pd.to_numeric(rows[amt_col], errors="coerce").fillna(0.0)
-    rows = rows[rows["_amt"] > 0]
-    if rows.empty:
-        return {}
-    rows["_cid"] = pd.to_numeric(rows[cid_col], errors="coerce").fillna(0).astype(int)
-    rows = rows[rows["_cid"] != 0]
-    if valid_cids:
-        rows = rows[rows["_cid"].isin(valid_cids)]
-    if rows.empty:
-        return {}
-    last_sale = rows.groupby("_cid")["_dt"].max()
-    return {int(cid): str(d)[:10] for cid, d in last_sale.items()}
-
-
-def _item_stats_from_titrline(fiscal_year: int) -> dict:
-    """Aggregate per-item revenue/qty/cogs from titrline for a given Sage fiscal year (Apr-Mar)."""
-    tables = _tables()
-    lines = tables.get("titrline")
-    if lines is None or lines.empty or "lInventId" not in lines.columns:
-        return {}
-
-    trec = tables.get("titrec")
-    lines = lines.copy()
-    start_dt, end_dt = _fiscal_year_date_range(fiscal_year)
-
-    # Filter by fiscal year — join via lTransId → titrec.lId if possible, else use dtASDate on lines
-    trec_date_col = _find_col(trec, ["dtASDate", "dtDate"]) if trec is not None and not trec.empty else None
-    trec_id_col = _find_col(trec, ["lId", "lid"]) if trec is not None and not trec.empty else None
-    if trec is not None and not trec.empty and trec_date_col and trec_id_col:
-        trec_copy = trec.copy()
-        trec_copy["_dt"] = trec_copy[trec_date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-        mask = trec_copy["_dt"].notna() & (trec_copy["_dt"] >= start_dt) & (trec_copy["_dt"] <= end_dt)
-        year_ids = set(
-            pd.to_numeric(trec_copy.loc[mask, trec_id_col], errors="coerce").fillna(0).astype(int).tolist()
-        )
-        line_trans_col = _find_col(lines, ["lITRecId", "lTransId", "lRecId", "lTitRecId", "lTransID"])
-        if line_trans_col and year_ids:
-            lines = lines[
-                pd.to_numeric(lines[line_trans_col], errors="coerce").fillna(0).astype(int).isin(year_ids)
-            ]
-    else:
-        line_date_col = _find_col(lines, ["dtASDate", "dtDate"])
-        if line_date_col:
-            lines["_dt"] = lines[line_date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-            lines = lines[lines["_dt"].notna() & (lines["_dt"] >= start_dt) & (lines["_dt"] <= end_dt)]
+    return (cube or _snapshot()[2]).customer_last_sale.get(fiscal_year, {})
 
-    if lines.empty:
-        return {}
 
-    lines["_rev"] = pd.to_numeric(lines.get("dAmt", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-    lines["_qty"] = pd.to_numeric(lines.get("dQty", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-    lines["_cogs"] = pd.to_numeric(lines.get("dCost", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-    lines["_invId"] = pd.to_numeric(lines["lInventId"], errors="coerce").fillna(0).astype(int)
-
-    grouped = lines.groupby("_invId").agg(
-        total_revenue=("_rev", "sum"),
-        total_qty=("_qty", "sum"),
-        total_cogs=("_cogs", "sum"),
-        txn_count=("_rev", "count"),
-    ).reset_index()
-
-    return {
-        int(r["_invId"]): {
-            "total_revenue": round(float(r["total_revenue"]), 2),
-            "total_qty": round(float(r["total_qty"]), 2),
-            "total_cogs": round(float(r["total_cogs"]), 2),
-            "txn_count": int(r["txn_count"]),
-        }
-        for _, r in grouped.iterrows()
-        if int(r["_invId"]) != 0
-    }
+def _item_stats_from_titrline(fiscal_year: int, cube=None) -> dict:
+    """Per-item revenue/qty/cogs from titrline for a given Sage fiscal year (Apr-Mar), sliced from the sales cube."""
+    return (cube or _snapshot()[2]).item_stats(fiscal_year)
 
 
 def get_top_customers(limit: int = 25, year: int = None) -> dict:
@@ -1431,7 +1684,8 @@ def get_top_customers(limit: int = 25, year: int = None) -> dict:
     current_fy = _current_fiscal_year()
     resolved_year = year or current_fy
 
-    df = _tables().get("tcustomr")
+    tables, _, cube = _snapshot()
+    df = tables.get("tcustomr")
     if df is None or df.empty:
         return {"customers": [], "error": "tcustomr not loaded"}
 
@@ -1445,49 +1699,56 @@ def get_top_customers(limit: int = 25, year: int = None) -> dict:
         last_sale_in_fy = {}
         last_sale_prev_fy = {}
     else:
-        txn_rev = _customer_revenue_from_titrec(resolved_year)
-        prev_txn = _customer_revenue_from_titrec(resolved_year - 1)
-        last_sale_in_fy = _customer_last_sale_from_titrec(resolved_year)
-        last_sale_prev_fy = _customer_last_sale_from_titrec(resolved_year - 1)
+        txn_rev = _customer_revenue_from_titrec(resolved_year, cube)
+        prev_txn = _customer_revenue_from_titrec(resolved_year - 1, cube)
+        last_sale_in_fy = _customer_last_sale_from_titrec(resolved_year, cube)
+        last_sale_prev_fy = _customer_last_sale_from_titrec(resolved_year - 1, cube)
 
-    result = []
-    for _, r in rows.iterrows():
-        cid = int(r.get("lId", 0) or 0)
-        credit = _safe_float(r.get("dCrLimit"))
-        if use_sage_builtin:
-            ytd = _safe_float(r.get("dAmtYtd"))
-            ly = _safe_float(r.get("dLastYrAmt"))
-        else:
-            ytd = txn_rev.get(cid, 0.0)
-            ly = prev_txn.get(cid, 0.0)
-        if ytd <= 0 and ly <= 0:
-            continue
-        # Use last sale from titrec (transaction data) when available; else tcustomr.dtLastSal
-        last_sale = last_sale_in_fy.get(cid) or last_sale_prev_fy.get(cid) or _safe_date(r.get("dtLastSal"))
-        # Exclude customers whose last sale was >2 fiscal years ago (stale — only when using titrec)
-        if not use_sage_builtin and last_sale:
-            try:
-                last_dt = date.fromisoformat(str(last_sale)[:10])
-                cutoff = date(resolved_year - 2, 4, 1)  # Start of FY-2 (e.g. Apr 1 2024 for FY2026)
-                if last_dt < cutoff:
-                    continue  # Last sale before FY-2 — skip
-            except Exception:
-                pass
-        result.append({
-            "lId": cid,
-            "sName": _safe_str(r.get("sName")),
-            "sCity": _safe_str(r.get("sCity")),
-            "sProvState": _safe_str(r.get("sProvState")),
-            "dAmtYtd": round(ytd, 2),
-            "dLastYrAmt": round(ly, 2),
-            "dCrLimit": round(credit, 2),
-            "yoy_change_pct": round((ytd - ly) / ly * 100, 1) if ly > 0 else None,
-            "credit_utilization_pct": round(ytd / credit * 100, 1) if credit > 0 else None,
-            "currency": CURRENCY_NAMES.get(int(r.get("lCurrncyId", 1) or 1), "CAD"),
-            "price_list": PRICE_LIST_NAMES.get(int(r.get("lPrcListId", 1) or 1), "Regular"),
-            "dtLastSal": last_sale,
-            "nNetDay": int(r.get("nNetDay", 0) or 0),
-        })
+    def _col(name, default=None):
+        return rows[name] if name in rows.columns else pd.Series(default, index=rows.index, dtype=object)
+
+    cid = _ints(_col("lId"))
+    credit = _num(_col("dCrLimit"))
+    if use_sage_builtin:
+        ytd = _num(_col("dAmtYtd"))
+        ly = _num(_col("dLastYrAmt"))
+    else:
+        ytd = cid.map(txn_rev).fillna(0.0).astype(float)
+        ly = cid.map(prev_txn).fillna(0.0).astype(float)
+    keep = (ytd > 0) | (ly > 0)
+    # Use last sale from titrec (transaction data) when available; else tcustomr.dtLastSal
+    last_sale = cid.map(last_sale_in_fy).fillna(cid.map(last_sale_prev_fy)).fillna(_safe_dates(_col("dtLastSal")))
+    last_sale = last_sale.astype(object).where(last_sale.notna(), None)
+    if not use_sage_builtin:
+        # Exclude customers whose last sale was before the start of FY-2 (stale — only when using titrec)
+        last_dt = pd.to_datetime(last_sale.str[:10], format="%Y-%m-%d", errors="coerce")
+        keep &= ~(last_dt < pd.Timestamp(resolved_year - 2, 4, 1)).to_numpy()
+
+    currency = _ints(_col("lCurrncyId"), 1).replace(0, 1)
+    price_list = _ints(_col("lPrcListId"), 1).replace(0, 1)
+    net_days = _ints(_col("nNetDay"))
+    result = [
+        {
+            "lId": c,
+            "sName": name,
+            "sCity": city,
+            "sProvState": prov,
+            "dAmtYtd": round(y, 2),
+            "dLastYrAmt": round(l, 2),
+            "dCrLimit": round(cr, 2),
+            "yoy_change_pct": round((y - l) / l * 100, 1) if l > 0 else None,
+            "credit_utilization_pct": round(y / cr * 100, 1) if cr > 0 else None,
+            "currency": CURRENCY_NAMES.get(cur, "CAD"),
+            "price_list": PRICE_LIST_NAMES.get(pl, "Regular"),
+            "dtLastSal": last,
+            "nNetDay": nd,
+        }
+        for c, name, city, prov, y, l, cr, cur, pl, last, nd in zip(
+            cid[keep].tolist(), _text(_col("sName"))[keep].tolist(), _text(_col("sCity"))[keep].tolist(),
+            _text(_col("sProvState"))[keep].tolist(), ytd[keep].tolist(), ly[keep].tolist(), credit[keep].tolist(),
+            currency[keep].tolist(), price_list[keep].tolist(), last_sale[keep].tolist(), net_days[keep].tolist(),
+        )
+    ]
 
     result.sort(key=lambda x: x["dAmtYtd"], reverse=True)
     out = {"customers": result[:limit], "total": len(result), "year": resolved_year, "fiscal_year": True}
@@ -1504,21 +1765,11 @@ def get_best_movers(limit: int = 25, year: int = None) -> dict:
     current_fy = _current_fiscal_year()
     resolved_year = year or current_fy
 
-    tables = _tables()
-    inv = tables.get("tinvent")
-
-    name_map: dict[int, dict] = {}
-    if inv is not None and not inv.empty:
-        for _, r in inv.iterrows():
-            iid = int(r.get("lId", 0) or 0)
-            name_map[iid] = {
-                "sPartCode": _safe_str(r.get("sPartCode")),
-                "sName": _safe_str(r.get("sName")),
-                "sSellUnit": _safe_str(r.get("sSellUnit")),
-            }
+    _, typed, cube = _snapshot()
+    name_map = _inventory_names(typed)
 
-    stats = _item_stats_from_titrline(resolved_year)
-    prev_stats = _item_stats_from_titrline(resolved_year - 1)
+    stats = _item_stats_from_titrline(resolved_year, cube)
+    prev_stats = _item_stats_from_titrline(resolved_year - 1, cube)
 
     result = []
     for iid, s in stats.items():
@@ -1562,44 +1813,16 @@ def get_monthly_revenue(year: int = None) -> dict:
     if year is None:
         year = _current_fiscal_year()
 
-    tables = _tables()
+    tables, _, cube = _snapshot()
     df = tables.get("titrec")
     if df is None or df.empty:
         return {"year": year, "months": [], "error": "titrec not loaded", "fiscal_year": True}
 
-    date_col = _find_col(df, ["dtASDate", "dtDate"])
-    amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt"])
-    cid_col = _find_col(df, ["lVenCusId", "lCusId", "lCustomerId", "lCustId"])
-    if not date_col:
+    if not _find_col(df, ["dtASDate", "dtDate"]):
         return {"year": year, "months": [], "error": "dtASDate/dtDate column missing", "fiscal_year": True}
 
-    valid_cids = set()
-    cust_df = tables.get("tcustomr")
-    if cust_df is not None and not cust_df.empty and cid_col:
-        id_col = _find_col(cust_df, ["lId", "lid"])
-        if id_col:
-            valid_cids = set(pd.to_numeric(cust_df[id_col], errors="coerce").fillna(0).astype(int).tolist())
-            valid_cids.discard(0)
-
-    start_dt, end_dt = _fiscal_year_date_range(year)
-    rows = df.copy()
-    for rev_col_name in ["bReversal", "bReversed"]:
-        rev_col = _find_col(df, [rev_col_name])
-        if rev_col:
-            rows = rows[pd.to_numeric(rows[rev_col], errors="coerce").fillna(0) == 0]
-    rows["_dt"] = rows[date_col].apply(lambda x: _normalize_date_to_iso(str(x)[:20]) if pd.notna(x) and str(x).strip() else None)
-    rows = rows[rows["_dt"].notna()]
-    rows = rows[(rows["_dt"] >= start_dt) & (rows["_dt"] <= end_dt)]
-    if valid_cids and cid_col:
-        rows["_cid"] = pd.to_numeric(rows[cid_col], errors="coerce").fillna(0).astype(int)
-        rows = rows[rows["_cid"].isin(valid_cids)]
-    if amt_col:
-        rows["_amt"] = pd.to_numeric(rows[amt_col], errors="coerce").fillna(0.0)
-    else:
-        rows["_amt"] = 0.0
-    rows = rows[rows["_amt"] > 0]
-
-    if rows.empty:
+    monthly = cube.monthly.get(year)
+    if monthly is None:
         return {
             "year": year,
             "months": [_fiscal_month_entry(m) for m in range(1, 13)],
@@ -1608,21 +1831,9 @@ def get_monthly_revenue(year: int = None) -> dict:
             "_empty_reason": f"No invoices in titrec for FY{year} (Apr {year-1}–Mar {year}). Check titrec.CSV has dtASDate, dInvAmt>0.",
         }
 
-    # Fiscal month: Apr=1, May=2, ..., Mar=12. Calendar month 4->1, 5->2, ..., 3->12
-    def _cal_to_fiscal(cal_m: int) -> int:
-        return ((cal_m - 4) % 12) + 1
-
-    rows["_cal_month"] = pd.to_numeric(rows["_dt"].str[5:7], errors="coerce").fillna(0).astype(int)
-    rows["_fiscal_month"] = rows["_cal_month"].apply(_cal_to_fiscal)
-
-    monthly = rows.groupby("_fiscal_month").agg(revenue=("_amt", "sum"), order_count=("_amt", "count")).reset_index()
-
-    months_result = []
-    for m in range(1, 13):
-        row = monthly[monthly["_fiscal_month"] == m]
-        rev = float(row["revenue"].iloc[0]) if len(row) > 0 else 0.0
-        cnt = int(row["order_count"].iloc[0]) if len(row) > 0 else 0
-        months_result.append(_fiscal_month_entry(m, rev, cnt))
+    # Fiscal month: Apr=1, May=2, ..., Mar=12
+    revenue, counts = monthly
+    months_result = [_fiscal_month_entry(m, revenue[m - 1], counts[m - 1]) for m in range(1, 13)]
 
     total_rev = sum(m["revenue"] for m in months_result)
     return {"year": year, "months": months_result, "total_revenue": round(total_rev, 2), "fiscal_year": True}
@@ -1649,19 +1860,12 @@ def get_recent_invoices(limit: int = 100) -> dict:
     List recent invoice transactions from titrec (AR invoices, dInvAmt > 0).
     Joins with tcustomr for customer name. Uses case-insensitive column matching.
     """
-    tables = _tables()
+    tables, typed, _ = _snapshot()
     df = tables.get("titrec")
-    cname_df = tables.get("tcustomr")
     if df is None or df.empty:
         return {"invoices": [], "error": "titrec not loaded"}
 
-    cust_name_map: dict[int, str] = {}
-    if cname_df is not None and not cname_df.empty:
-        id_col = _find_col(cname_df, ["lId", "lid"])
-        name_col = _find_col(cname_df, ["sName", "sname"])
-        if id_col and name_col:
-            for _, r in cname_df[[id_col, name_col]].iterrows():
-                cust_name_map[int(r[id_col] or 0)] = _safe_str(r[name_col])
+    cust_name_map = _customer_names(typed)
 
     amt_col = _find_col(df, ["dInvAmt", "dAmt", "dTotalAmt", "dTotal"])
     date_col = _find_col(df, ["dtASDate", "dtDate"])
@@ -1697,18 +1901,11 @@ def get_ar_aging() -> dict:
     Groups outstanding balances into 0-30, 31-60, 61-90, 90+ day buckets.
     Uses case-insensitive column matching for Sage 50 CSV export variations.
     """
-    tables = _tables()
+    tables, typed, _ = _snapshot()
     cust_df = tables.get("tcustr")
-    cname_df = tables.get("tcustomr")
 
-    # Build customer name map (case-insensitive lId/sName lookup)
-    cust_name_map: dict[int, str] = {}
-    if cname_df is not None and not cname_df.empty:
-        id_col = _find_col(cname_df, ["lId", "lid"])
-        name_col = _find_col(cname_df, ["sName", "sname"])
-        if id_col and name_col:
-            for _, r in cname_df[[id_col, name_col]].iterrows():
-                cust_name_map[int(r[id_col] or 0)] = _safe_str(r[name_col])
+    # Customer name map (case-insensitive lId/sName lookup)
+    cust_name_map = _customer_names(typed)
 
     # ── Diagnostic logging ─────────────────────────────────────────────────────
     if cust_df is not None and not cust_df.empty:
@@ -1716,33 +1913,13 @@ def get_ar_aging() -> dict:
     else:
         print("[ar_aging] tcustr is None or empty — falling back to titrec")
 
-    today = date.today()
-    buckets: dict[int, dict] = {}
+    today = pd.Timestamp(date.today())
+    # Outstanding amounts as (cid, amt, date) frames; aggregated into buckets once at the end
+    parts = []
 
-    def _add_to_bucket(cid: int, amt: float, dt_str: str):
-        """Add outstanding amount to the correct aging bucket for a customer."""
-        if amt == 0:
-            return
-        age = 999
-        if dt_str and len(dt_str) >= 10:
-            try:
-                age = (today - date.fromisoformat(dt_str[:10].replace("/", "-"))).days
-            except Exception:
-                pass
-        if cid not in buckets:
-            buckets[cid] = {"lCusId": cid, "sName": cust_name_map.get(cid, f"ID:{cid}"),
-                            "current": 0.0, "d30": 0.0, "d60": 0.0, "d90": 0.0, "d90plus": 0.0, "total": 0.0}
-        buckets[cid]["total"] += amt
-        if age <= 30:
-            buckets[cid]["current"] += amt
-        elif age <= 60:
-            buckets[cid]["d30"] += amt
-        elif age <= 90:
-            buckets[cid]["d60"] += amt
-        elif age <= 120:
-            buckets[cid]["d90"] += amt
-        else:
-            buckets[cid]["d90plus"] += amt
+    def _open_amounts(cid: pd.Series, amt: pd.Series, dt: pd.Series):
+        part = pd.DataFrame({"cid": cid.to_numpy(), "amt": amt.to_numpy(dtype=float), "dt": dt.to_numpy()})
+        parts.append(part[part["amt"] != 0])
 
     # ── Primary: tcustr (case-insensitive column lookup) ─────────────────────
     if cust_df is not None and not cust_df.empty:
@@ -1752,12 +1929,10 @@ def get_ar_aging() -> dict:
 
         print(f"[ar_aging] tcustr columns detected → balance:{bal_col}, date:{date_col}, cid:{cid_col}")
 
+        no_date = pd.Series(None, index=cust_df.index, dtype=object)
         if bal_col and cid_col:
-            for _, r in cust_df.iterrows():
-                cid = int(r.get(cid_col, 0) or 0)
-                amt = _safe_float(r.get(bal_col, 0))
-                dt_str = _safe_date(r.get(date_col) if date_col else None)
-                _add_to_bucket(cid, amt, dt_str or "")
+            _open_amounts(_ints(cust_df[cid_col]), _num(cust_df[bal_col]),
+                          _safe_dates(cust_df[date_col]) if date_col else no_date)
         else:
             # No balance column — try dAmt - dApplied
             print("[ar_aging] No balance column in tcustr — trying dAmt-dApplied")
@@ -1766,16 +1941,13 @@ def get_ar_aging() -> dict:
             cid_col = cid_col or _find_col(cust_df, ["lCusId", "lCustomerId", "lCustId"])
             date_col = date_col or _find_col(cust_df, ["dtDueDate", "dtDate"])
             if amt_col and cid_col:
-                for _, r in cust_df.iterrows():
-                    cid = int(r.get(cid_col, 0) or 0)
-                    raw_amt = _safe_float(r.get(amt_col, 0))
-                    applied = _safe_float(r.get(applied_col, 0)) if applied_col else 0.0
-                    amt = raw_amt - applied
-                    dt_str = _safe_date(r.get(date_col) if date_col else None)
-                    _add_to_bucket(cid, amt, dt_str or "")
+                amt = _num(cust_df[amt_col])
+                if applied_col:
+                    amt = amt - _num(cust_df[applied_col])
+                _open_amounts(_ints(cust_df[cid_col]), amt, _safe_dates(cust_df[date_col]) if date_col else no_date)
 
     # ── Fallback: titrec (invoice headers, case-insensitive) ───────────────────
-    grand_total_check = sum(b["total"] for b in buckets.values())
+    grand_total_check = sum(float(p["amt"].sum()) for p in parts)
     if grand_total_check == 0:
         print("[ar_aging] tcustr gave $0 — falling back to titrec for open invoices")
         titrec_df = tables.get("titrec")
@@ -1788,26 +1960,35 @@ def get_ar_aging() -> dict:
             print(f"[ar_aging] titrec columns: inv={inv_col}, paid={paid_col}, bal={bal_due_col}, due={due_col}, cid={cid_col}")
 
             if inv_col and cid_col and (bal_due_col or paid_col):
-                rows = titrec_df.copy()
-                rows["_inv"] = pd.to_numeric(rows[inv_col], errors="coerce").fillna(0)
-                rows = rows[rows["_inv"] > 0]  # invoices only (not payments)
+                inv_amt = pd.to_numeric(titrec_df[inv_col], errors="coerce").fillna(0)
                 if bal_due_col:
-                    rows["_bal"] = pd.to_numeric(rows[bal_due_col], errors="coerce").fillna(0)
+                    bal = pd.to_numeric(titrec_df[bal_due_col], errors="coerce").fillna(0)
                 else:
-                    rows["_paid"] = pd.to_numeric(rows[paid_col], errors="coerce").fillna(0)
-                    rows["_bal"] = rows["_inv"] - rows["_paid"]
-                rows = rows[rows["_bal"] > 0]  # only open/partially-open
+                    bal = inv_amt - pd.to_numeric(titrec_df[paid_col], errors="coerce").fillna(0)
+                rows = titrec_df[(inv_amt > 0) & (bal > 0)]  # open/partially-open invoices (not payments)
                 print(f"[ar_aging] titrec: {len(rows)} open invoices found")
-                for _, r in rows.iterrows():
-                    cid = int(r.get(cid_col, 0) or 0)
-                    amt = _safe_float(r.get("_bal", 0))
-                    dt_str = _safe_date(r.get(due_col) if due_col else None)
-                    _add_to_bucket(cid, amt, dt_str or "")
+                _open_amounts(_ints(rows[cid_col]), bal[rows.index],
+                              _safe_dates(rows[due_col]) if due_col else pd.Series(None, index=rows.index, dtype=object))
 
-    result = sorted(buckets.values(), key=lambda x: abs(x["total"]), reverse=True)
-    for row in result:
-        for k in ["current", "d30", "d60", "d90", "d90plus", "total"]:
-            row[k] = round(row[k], 2)
+    result = []
+    open_amounts = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["cid", "amt", "dt"])
+    if not open_amounts.empty:
+        dt = open_amounts["dt"].fillna("").astype(str)
+        due = pd.to_datetime(dt.str[:10].str.replace("/", "-", regex=False), format="%Y-%m-%d", errors="coerce")
+        age = (today - due).dt.days.fillna(999).to_numpy()
+        amt = open_amounts["amt"].to_numpy()
+        for key, lo, hi in (("current", -np.inf, 30), ("d30", 30, 60), ("d60", 60, 90), ("d90", 90, 120), ("d90plus", 120, np.inf)):
+            open_amounts[key] = np.where((age > lo) & (age <= hi), amt, 0.0)
+        open_amounts["total"] = amt
+        grouped = open_amounts.groupby("cid", sort=False)[["current", "d30", "d60", "d90", "d90plus", "total"]].sum()
+        grouped = grouped.iloc[np.argsort(-grouped["total"].abs().to_numpy(), kind="stable")].round(2)
+        result = [
+            {"lCusId": cid, "sName": cust_name_map.get(cid, f"ID:{cid}"),
+             "current": cur, "d30": d30, "d60": d60, "d90": d90, "d90plus": d90p, "total": total}
+            for cid, cur, d30, d60, d90, d90p, total in zip(
+                grouped.index.tolist(), *(grouped[k].tolist() for k in ["current", "d30", "d60", "d90", "d90plus", "total"])
+            )
+        ]
 
     grand_total = sum(r["total"] for r in result)
     print(f"[ar_aging] Final AR aging: {len(result)} customers, total_ar=${grand_total:,.2f}")
@@ -1831,43 +2012,19 @@ def get_sales_by_product(limit: int = 25, year: int = None) -> dict:
     - year=None → all-time (all transaction lines)
     - year=YYYY → filter to that Sage fiscal year (Apr-Mar) via titrec join
     """
-    current_fy = _current_fiscal_year()
-    inv = _tables().get("tinvent")
-
-    name_map: dict[int, dict] = {}
-    if inv is not None and not inv.empty:
-        for _, r in inv.iterrows():
-            iid = int(r.get("lId", 0) or 0)
-            name_map[iid] = {"sPartCode": _safe_str(r.get("sPartCode")), "sName": _safe_str(r.get("sName"))}
+    tables, typed, cube = _snapshot()
+    name_map = _inventory_names(typed)
 
     if year is not None:
-        stats = _item_stats_from_titrline(year)
+        stats = _item_stats_from_titrline(year, cube)
     else:
         # All-time: use full titrline without year filter
-        tables = _tables()
         lines = tables.get("titrline")
         if lines is None or lines.empty:
             return {"products": [], "error": "titrline not loaded"}
         if "lInventId" not in lines.columns:
             return {"products": [], "error": "lInventId column missing from titrline"}
-        lines = lines.copy()
-        lines["_rev"] = pd.to_numeric(lines.get("dAmt", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-        lines["_qty"] = pd.to_numeric(lines.get("dQty", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-        lines["_cogs"] = pd.to_numeric(lines.get("dCost", pd.Series(0.0, index=lines.index)), errors="coerce").fillna(0.0)
-        lines["_invId"] = pd.to_numeric(lines["lInventId"], errors="coerce").fillna(0).astype(int)
-        grouped = lines.groupby("_invId").agg(
-            total_revenue=("_rev", "sum"), total_qty=("_qty", "sum"),
-            total_cogs=("_cogs", "sum"), txn_count=("_rev", "count"),
-        ).reset_index()
-        stats = {
-            int(r["_invId"]): {
-                "total_revenue": round(float(r["total_revenue"]), 2),
-                "total_qty": round(float(r["total_qty"]), 2),
-                "total_cogs": round(float(r["total_cogs"]), 2),
-                "txn_count": int(r["txn_count"]),
-            }
-            for _, r in grouped.iterrows() if int(r["_invId"]) != 0
-        }
+        stats = cube.item_stats_all
 
     result = []
     for iid, s in stats.items():
@@ -1902,7 +2059,7 @@ def get_dashboard_kpis(year: int = None) -> dict:
     current_fy = _current_fiscal_year()
     resolved_year = year or current_fy
 
-    tables = _tables()
+    tables, _, cube = _snapshot()
 
     cust = tables.get("tcustomr")
     total_ytd = 0.0
@@ -1915,11 +2072,11 @@ def get_dashboard_kpis(year: int = None) -> dict:
             # Current FY: use Sage built-in (tcustomr) — matches Sage exactly
             ytd_col = _find_col(active, ["dAmtYtd", "dAmtYTd"])
             ly_col = _find_col(active, ["dLastYrAmt", "dLastYRAmt"])
-            total_ytd = float(active[ytd_col].apply(_safe_float).sum()) if ytd_col else 0.0
-            total_ly = float(active[ly_col].apply(_safe_float).sum()) if ly_col else 0.0
+            total_ytd = float(_num(active[ytd_col]).sum()) if ytd_col else 0.0
+            total_ly = float(_num(active[ly_col]).sum()) if ly_col else 0.0
         else:
-            rev_map = _customer_revenue_from_titrec(resolved_year)
-            prev_map = _customer_revenue_from_titrec(resolved_year - 1)
+            rev_map = _customer_revenue_from_titrec(resolved_year, cube)
+            prev_map = _customer_revenue_from_titrec(resolved_year - 1, cube)
             total_ytd = sum(rev_map.values())
             total_ly = sum(prev_map.values())
 
@@ -2066,16 +2223,19 @@ def get_all_item_mappings() -> dict:
     }
 
 
-def suggest_item_mappings(misys_items: list) -> dict:
+def suggest_item_mappings(misys_items: list, progress=None) -> dict:
     """
     Generate item mapping suggestions using exact and fuzzy matching.
     Exact matches (itemId == sPartCode, case-insensitive) are flagged 'exact'.
     Fuzzy matches are flagged 'suggested' and require manual confirmation.
     Saves to sage_item_mapping.json. Does NOT auto-confirm anything.
+    Fuzzy scoring only looks at the Sage items a trigram index ranks closest by code or description.
+    progress, if given, is called as progress(processed, total) every SUGGEST_PROGRESS_EVERY items.
     """
     from difflib import SequenceMatcher
+    from sage_matching import TrigramIndex
 
-    tables = _tables()
+    tables, typed, _ = _snapshot()
     inv_df = tables.get("tinvent")
     if inv_df is None or inv_df.empty:
         return {"error": "Sage inventory not loaded — cannot generate suggestions"}
@@ -2085,14 +2245,20 @@ def suggest_item_mappings(misys_items: list) -> dict:
 
     # Build Sage lookup: normalised_code -> {sage_part_code, lId, sName}
     sage_lookup: dict[str, dict] = {}
-    for _, sr in inv_df.iterrows():
-        code = _safe_str(sr.get("sPartCode"))
-        if code:
-            sage_lookup[_norm(code)] = {
-                "sage_part_code": code,
-                "sage_item_id": int(sr.get("lId", 0) or 0),
-                "sage_name": _safe_str(sr.get("sName")),
-            }
+    inv_typed = typed.get("tinvent")
+    if inv_typed is not None:
+        for iid, code, name in zip(inv_typed["id"].tolist(), inv_typed["part"].tolist(), inv_typed["name"].tolist()):
+            if code:
+                sage_lookup[_norm(code)] = {"sage_part_code": code, "sage_item_id": iid, "sage_name": name}
+
+    # One matcher per Sage code/description: SequenceMatcher caches its analysis of the second sequence, and the
+    # cheap upper bounds (real_quick_ratio/quick_ratio) skip candidates that cannot beat the current best
+    candidates = [
+        (sinfo, SequenceMatcher(None, "", norm_s), SequenceMatcher(None, "", _norm(sinfo["sage_name"])))
+        for norm_s, sinfo in sage_lookup.items()
+    ]
+    code_index = TrigramIndex(sage_lookup)
+    desc_index = TrigramIndex(_norm(sinfo["sage_name"]) for sinfo in sage_lookup.values())
 
     # Load existing file (to preserve confirmed mappings)
     existing_data = _load_mapping_file()
@@ -2106,7 +2272,10 @@ def suggest_item_mappings(misys_items: list) -> dict:
     fuzzy_count = 0
     unmatched_count = 0
 
-    for item in misys_items:
+    total = len(misys_items)
+    for n, item in enumerate(misys_items):
+        if progress is not None and n % SUGGEST_PROGRESS_EVERY == 0:
+            progress(n, total)
         misys_id = _safe_str(item.get("Item No.") or item.get("itemId") or item.get("item_no") or "")
         misys_desc = _safe_str(item.get("Description") or item.get("descr") or "")
         if not misys_id:
@@ -2141,16 +2310,22 @@ def suggest_item_mappings(misys_items: list) -> dict:
             exact_count += 1
             continue
 
-        # Fuzzy match: score against all Sage codes AND descriptions
+        # Fuzzy match: score against the closest Sage codes AND descriptions
         best_score = 0.0
         best_match = None
 
-        for norm_s, sinfo in sage_lookup.items():
-            # Score against code
-            score_code = SequenceMatcher(None, norm_id, norm_s).ratio()
-            # Score against description
-            score_desc = SequenceMatcher(None, norm_desc, _norm(sinfo["sage_name"])).ratio()
-            score = max(score_code, score_desc * 0.9)  # Weight code slightly higher
+        nearest = set(code_index.candidates(norm_id, SUGGEST_CANDIDATES))
+        nearest.update(desc_index.candidates(norm_desc, SUGGEST_CANDIDATES))
+        for pos in sorted(nearest):
+            sinfo, code_matcher, desc_matcher = candidates[pos]
+            code_matcher.set_seq1(norm_id)
+            desc_matcher.set_seq1(norm_desc)
+            if max(code_matcher.real_quick_ratio(), desc_matcher.real_quick_ratio() * 0.9) <= best_score:
+                continue
+            if max(code_matcher.quick_ratio(), desc_matcher.quick_ratio() * 0.9) <= best_score:
+                continue
+            # Score against code and description; weight code slightly higher
+            score = max(code_matcher.ratio(), desc_matcher.ratio() * 0.9)
             if score > best_score:
                 best_score = score
                 best_match = sinfo
@@ -2200,9 +2375,62 @@ def suggest_item_mappings(misys_items: list) -> dict:
         "stats": stats,
     })
 
+    if progress is not None:
+        progress(total, total)
     return stats
 
 
+def _run_suggestion_job(job_id: str, misys_items: list):
+    job = _suggest_jobs[job_id]
+
+    def _progress(processed, total):
+        job["processed"] = processed
+        job["total"] = total
+
+    try:
+        stats = suggest_item_mappings(misys_items, progress=_progress)
+        result = {"status": "error", "error": stats["error"]} if "error" in stats else {"status": "done", "stats": stats}
+    except Exception as e:
+        print(f"[sage_gdrive] Mapping suggestion job {job_id} failed: {e}")
+        result = {"status": "error", "error": str(e)}
+    result["finished_at"] = datetime.now().isoformat()
+    job.update(result)
+
+
+def start_item_mapping_suggestions(misys_items: list) -> dict:
+    """
+    Run suggest_item_mappings in a background thread. Returns the job (poll get_suggestion_job with its job_id).
+    Only one job runs at a time: while one is running, that job is returned instead of starting another.
+    """
+    with _suggest_jobs_lock:
+        for job in _suggest_jobs.values():
+            if job["status"] == "running":
+                return dict(job)
+        job_id = f"suggest-{int(time.time() * 1000)}"
+        _suggest_jobs[job_id] = {
+            "job_id": job_id,
+            "status": "running",
+            "processed": 0,
+            "total": len(misys_items),
+            "stats": None,
+            "error": None,
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+        # Keep the most recent jobs only
+        for old in list(_suggest_jobs)[:-SUGGEST_JOBS_KEPT]:
+            del _suggest_jobs[old]
+        threading.Thread(target=_run_suggestion_job, args=(job_id, list(misys_items)), daemon=True,
+                         name="sage-mapping-suggest").start()
+        return dict(_suggest_jobs[job_id])
+
+
+def get_suggestion_job(job_id: str):
+    """Progress of a background suggestion job (processed/total/status/stats), or None for an unknown id."""
+    job = _suggest_jobs.get(job_id)
+    return dict(job) if job is not None else None
+
+
 def confirm_item_mapping(misys_item_id: str, sage_part_code: str, confirmed_by: str = "user") -> dict:
     """
     Confirm a specific item mapping. The user explicitly approves this match.
@@ -4,9 +4,15 @@ with Sage 50 entities to create a mapping table.
 
 SAGE 50 IS 100% READ-ONLY — NEVER WRITE TO SAGE.
 All Sage queries are SELECT-only. Mappings stored in portal PostgreSQL.
+
+Fuzzy matching goes through TrigramIndex: each query is narrowed to the CANDIDATE_LIMIT Sage keys sharing the most
+character trigrams with it, and only those are scored with SequenceMatcher.
 """
+import heapq
 from difflib import SequenceMatcher
 
+CANDIDATE_LIMIT = 40
+
 
 def _normalize(s):
     if not s:
@@ -18,6 +24,49 @@ def _fuzzy_score(a, b):
     return SequenceMatcher(None, _normalize(a), _normalize(b)).ratio()
 
 
+def _trigrams(s):
+    if not s:
+        return set()
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index of character trigrams over a list of (already normalized) keys."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._sizes = []
+        self._postings = {}
+        for i, key in enumerate(self.keys):
+            grams = _trigrams(key)
+            self._sizes.append(len(grams))
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+
+    def candidates(self, query, limit=CANDIDATE_LIMIT):
+        """Positions of up to limit keys most similar to query by trigram overlap (Dice), in key order."""
+        grams = _trigrams(query)
+        if not grams:
+            return []
+        shared = {}
+        for g in grams:
+            for i in self._postings.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+        n = len(grams)
+        top = heapq.nlargest(limit, shared.items(), key=lambda kv: (2 * kv[1] / (n + self._sizes[kv[0]]), -kv[0]))
+        return sorted(i for i, _ in top)
+
+    def best_match(self, query, limit=CANDIDATE_LIMIT):
+        """(position, SequenceMatcher ratio) of the best-scoring candidate, first position on ties; (None, 0) if none."""
+        best_score, best = 0, None
+        for i in self.candidates(query, limit):
+            score = _fuzzy_score(query, self.keys[i])
+            if score > best_score:
+                best_score, best = score, i
+        return best, best_score
+
+
 def match_customers(misys_data, sage_customers, threshold=0.75):
     """Match MISys customer names to Sage customers.
     misys_data: list of MO records with 'Customer' field.
@@ -38,6 +87,7 @@ def match_customers(misys_data, sage_customers, threshold=0.75):
         if sname:
             sage_lookup[_normalize(sname)] = {"name": sname, "id": sid}
 
+    index = TrigramIndex(sage_lookup)
     for mname in sorted(misys_names):
         norm_m = _normalize(mname)
         best_score = 0
@@ -47,11 +97,9 @@ def match_customers(misys_data, sage_customers, threshold=0.75):
             best_sage = sage_lookup[norm_m]
             best_score = 1.0
         else:
-            for norm_s, sinfo in sage_lookup.items():
-                score = _fuzzy_score(norm_m, norm_s)
-                if score > best_score:
-                    best_score = score
-                    best_sage = sinfo
+            pos, best_score = index.best_match(norm_m)
+            if pos is not None:
+                best_sage = sage_lookup[index.keys[pos]]
 
         if best_sage and best_score >= threshold:
             confidence = "exact" if best_score >= 0.98 else "fuzzy"
@@ -85,6 +133,7 @@ def match_items(misys_items, sage_inventory, threshold=0.9):
         if code:
             sage_parts[_normalize(code)] = {"part_code": code, "id": sid}
 
+    index = TrigramIndex(sage_parts)
     matches = []
     for item in (misys_items or []):
         ino = (item.get("Item No.") or item.get("item_no") or "").strip()
@@ -101,13 +150,8 @@ def match_items(misys_items, sage_inventory, threshold=0.9):
                 "score": 1.0,
             })
         else:
-            best_score = 0
-            best_sp = None
-            for norm_s, sp in sage_parts.items():
-                score = _fuzzy_score(norm_i, norm_s)
-                if score > best_score:
-                    best_score = score
-                    best_sp = sp
+            pos, best_score = index.best_match(norm_i)
+            best_sp = sage_parts[index.keys[pos]] if pos is not None else None
             if best_sp and best_score >= threshold:
                 matches.append({
                     "misys_key": ino,
@@ -139,6 +183,7 @@ def match_suppliers(misys_suppliers, sage_vendors, threshold=0.75):
         if sname:
             sage_lookup[_normalize(sname)] = {"name": sname, "id": sid}
 
+    index = TrigramIndex(sage_lookup)
     matches = []
     for supl in (misys_suppliers or []):
         name = (supl.get("Name") or supl.get("Supplier Name") or "").strip()
@@ -154,11 +199,9 @@ def match_suppliers(misys_suppliers, sage_vendors, threshold=0.75):
             best_sage = sage_lookup[norm_m]
             best_score = 1.0
         else:
-            for norm_s, sinfo in sage_lookup.items():
-                score = _fuzzy_score(norm_m, norm_s)
-                if score > best_score:
-                    best_score = score
-                    best_sage = sinfo
+            pos, best_score = index.best_match(norm_m)
+            if pos is not None:
+                best_sage = sage_lookup[index.keys[pos]]
 
         if best_sage and best_score >= threshold:
             confidence = "exact" if best_score >= 0.98 else "fuzzy"
@@ -23,12 +23,21 @@ If any code attempts INSERT/UPDATE/DELETE on Sage, it will:
   - Be blocked by ReadOnlyCursor with a PermissionError
   - Be blocked by MySQL READ ONLY transaction mode
   - Never be committed even if somehow executed
+
+PERFORMANCE: connections come from a small pool (SAGE_POOL_SIZE) whose sessions are set READ ONLY once when
+opened; the read transaction is rolled back when a connection goes back to the pool. Query results are cached
+for SAGE_CACHE_TTL_SECONDS keyed by normalized SQL + params, and a query answered from the cache never checks
+out a connection. invalidate_cache() drops entries; cache_stats() reports hits/misses and pool usage.
 """
 
 import pymysql
 import pymysql.cursors
 import os
 import re
+import time
+import queue
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 
@@ -37,6 +46,11 @@ SAGE_PORT = int(os.environ.get('SAGE_DB_PORT', '13540'))
 SAGE_USER = os.environ.get('SAGE_DB_USER', 'sysadmin')
 SAGE_PASSWORD = os.environ.get('SAGE_DB_PASSWORD', '')
 SAGE_DATABASE = os.environ.get('SAGE_DB_NAME', 'simply')
+SAGE_POOL_SIZE = int(os.environ.get('SAGE_POOL_SIZE', '4'))
+SAGE_POOL_IDLE_PING_SECONDS = 30
+SAGE_CACHE_TTL_SECONDS = float(os.environ.get('SAGE_CACHE_TTL_SECONDS', '60'))
+SAGE_CACHE_MAX_ENTRIES = int(os.environ.get('SAGE_CACHE_MAX_ENTRIES', '512'))
+SAGE_CACHE_MAX_ROWS = int(os.environ.get('SAGE_CACHE_MAX_ROWS', '50000'))
 
 _ALLOWED_SQL_PATTERN = re.compile(
     r'^\s*(SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|SET\s+SESSION\s+TRANSACTION\s+READ\s+ONLY)\b',
@@ -62,32 +76,289 @@ class ReadOnlyCursor:
         return getattr(self._cursor, name)
 
 
-@contextmanager
-def get_sage_connection():
-    """Context manager for READ-ONLY Sage 50 MySQL connections."""
-    conn = None
+def _connect():
+    """Open one Sage connection with a MySQL-enforced read-only session (Level 1)."""
+    conn = pymysql.connect(
+        host=SAGE_HOST,
+        port=SAGE_PORT,
+        user=SAGE_USER,
+        password=SAGE_PASSWORD,
+        database=SAGE_DATABASE,
+        connect_timeout=10,
+        read_timeout=30,
+        charset='utf8mb4',
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=False
+    )
     try:
-        conn = pymysql.connect(
-            host=SAGE_HOST,
-            port=SAGE_PORT,
-            user=SAGE_USER,
-            password=SAGE_PASSWORD,
-            database=SAGE_DATABASE,
-            connect_timeout=10,
-            read_timeout=30,
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=False
-        )
-        # Level 1: MySQL-enforced read-only session
         raw = conn.cursor()
         raw.execute("SET SESSION TRANSACTION READ ONLY")
         raw.close()
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+class _SagePool:
+    """Small pool of READ-ONLY connections. A connection that raised is closed, not returned."""
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.LifoQueue()  # (conn, returned_at)
+        self._slots = threading.BoundedSemaphore(size)
+        self.created = 0
+        self.in_use = 0
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, returned_at = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = _connect()
+                    self.created += 1
+                    break
+                if time.time() - returned_at < SAGE_POOL_IDLE_PING_SECONDS:
+                    break
+                try:
+                    conn.ping(reconnect=False)  # a reconnect would lose the READ ONLY session, so open a new one instead
+                    break
+                except Exception:
+                    _close_quietly(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        self.in_use += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        self.in_use -= 1
+        try:
+            if not broken:
+                try:
+                    conn.rollback()  # end the read transaction so the next user sees current data
+                except Exception:
+                    broken = True
+            if broken:
+                _close_quietly(conn)
+            else:
+                self._idle.put((conn, time.time()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _SagePool(SAGE_POOL_SIZE)
+        return _pool
+
+
+class _QueryCache:
+    """TTL + LRU cache of query results keyed by (normalized SQL, params)."""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> (stored_at, description, rows)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(query, args):
+        sql = ' '.join(query.split())
+        if isinstance(args, dict):
+            params = tuple(sorted(args.items()))
+        elif isinstance(args, (list, tuple)):
+            params = tuple(args)
+        else:
+            params = args
+        return sql, repr(params)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < SAGE_CACHE_TTL_SECONDS:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, description, rows):
+        if SAGE_CACHE_TTL_SECONDS <= 0 or len(rows) > SAGE_CACHE_MAX_ROWS:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), description, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > SAGE_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table=None):
+        """Drop every entry, or only those whose SQL mentions table. Returns the number dropped."""
+        with self._lock:
+            if table is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                needle = table.lower()
+                keys = [k for k in self._entries if needle in k[0].lower()]
+                for k in keys:
+                    del self._entries[k]
+                dropped = len(keys)
+            self.invalidations += 1
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'ttl_seconds': SAGE_CACHE_TTL_SECONDS,
+            }
+
+
+_query_cache = _QueryCache()
+
+
+class _PooledConnection:
+    """
+    What get_sage_connection() yields. cursor() returns a caching cursor; a pooled connection is checked out on the
+    first query that misses the cache and returned when the with-block ends.
+    """
+
+    def __init__(self, pool, use_cache):
+        self._pool = pool
+        self._conn = None
+        self.use_cache = use_cache
+        self.broken = False
+
+    def connection(self):
+        if self._conn is None:
+            self._conn = self._pool.acquire()
+        return self._conn
+
+    def cursor(self):
+        return _CachingCursor(self)
 
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn, broken=self.broken)
+
+    def __getattr__(self, name):
+        return getattr(self.connection(), name)
+
+
+class _CachingCursor:
+    """DictCursor stand-in that serves results from the query cache; misses run on the pooled connection."""
+
+    def __init__(self, owner):
+        self._owner = owner
+        self._rows = []
+        self._pos = 0
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, query, args=None):
+        cacheable = self._owner.use_cache and not query.lstrip().upper().startswith('SET')
+        key = _query_cache.key(query, args) if cacheable else None
+        entry = _query_cache.get(key) if cacheable else None
+        if entry is not None:
+            _, self.description, rows = entry
+        else:
+            cur = self._owner.connection().cursor()
+            try:
+                cur.execute(query, args)
+                rows = tuple(cur.fetchall() or ())
+                self.description = cur.description
+            except Exception:
+                self._owner.broken = True
+                raise
+            finally:
+                cur.close()
+            if cacheable:
+                _query_cache.put(key, self.description, rows)
+        self._rows = rows
+        self._pos = 0
+        self.rowcount = len(rows)
+        return self.rowcount
+
+    def _take(self, n):
+        # Callers may adjust returned dicts in place, so cached rows are handed out as copies
+        rows = self._rows[self._pos:self._pos + n] if n is not None else self._rows[self._pos:]
+        self._pos += len(rows)
+        return [dict(r) if isinstance(r, dict) else r for r in rows]
+
+    def fetchone(self):
+        rows = self._take(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=1):
+        return self._take(size)
+
+    def fetchall(self):
+        return self._take(None)
+
+    def close(self):
+        self._rows = []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+@contextmanager
+def get_sage_connection(use_cache=True):
+    """Context manager for READ-ONLY Sage 50 MySQL connections (pooled; results cached unless use_cache=False)."""
+    conn = _PooledConnection(_get_pool(), use_cache)
+    try:
         yield conn
     finally:
-        if conn:
-            conn.close()
+        conn.close()
+
+
+def invalidate_cache(table=None):
+    """Drop cached Sage query results (all, or only queries that mention table). Returns the number dropped."""
+    return _query_cache.invalidate(table)
+
+
+def cache_stats():
+    """Query cache hit/miss counters and connection pool usage."""
+    pool = _get_pool()
+    stats = _query_cache.stats()
+    stats['pool'] = {'size': pool.size, 'in_use': pool.in_use, 'idle': pool._idle.qsize(), 'created': pool.created}
+    return stats
 
 
 def _cursor(conn):
@@ -98,7 +369,7 @@ def _cursor(conn):
 def test_connection():
     """Test the Sage 50 database connection and return basic info."""
     try:
-        with get_sage_connection() as conn:
+        with get_sage_connection(use_cache=False) as conn:
             cursor = _cursor(conn)
             cursor.execute("SELECT sCompName, sCity, sProvStat, sPhone1 FROM tcompany LIMIT 1")
             company = cursor.fetchone()
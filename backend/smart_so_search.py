@@ -7,9 +7,11 @@ NO LIMITATIONS - DISCOVERS EVERYTHING DYNAMICALLY
 
 import os
 import re
-import glob
+import fnmatch
 from typing import List, Dict, Optional, Tuple
 from openai import OpenAI
+import so_parse_cache
+import so_file_index
 # Import will be done dynamically to avoid circular imports
 
 class SmartSOSearch:
@@ -62,7 +64,7 @@ class SmartSOSearch:
     def _contains_sales_orders(self, path: str) -> bool:
         """Check if a directory contains Sales Order files"""
         try:
-            for root, dirs, files in os.walk(path):
+            for root, dirs, files in so_file_index.get_index().walk(path):
                 for file in files:
                     if file.lower().startswith('salesorder') and file.lower().endswith(('.pdf', '.docx', '.doc')):
                         return True
@@ -79,7 +81,7 @@ class SmartSOSearch:
         Finds every single directory that contains Sales Order files
         """
         try:
-            for root, dirs, files in os.walk(base_path):
+            for root, dirs, files in so_file_index.get_index().walk(base_path):
                 # Check if this directory contains Sales Order files
                 has_so_files = False
                 for file in files:
@@ -112,10 +114,13 @@ class SmartSOSearch:
         
         # DYNAMIC DISCOVERY - NO HARDCODED LIMITS!
         all_directories = self.discover_all_so_directories()
+        so_index = so_file_index.get_index()
         
         for directory in all_directories:
-            if not os.path.exists(directory):
+            if not so_index.isdir(directory):
                 continue
+            # Folder listing from the SO file index (falls back to the drive outside the Sales Orders tree)
+            names = so_index.listdir(directory)
                 
             # Get meaningful folder name/path
             folder_name = os.path.basename(directory)
@@ -135,8 +140,7 @@ class SmartSOSearch:
             ]
             
             for pattern in patterns:
-                search_path = os.path.join(directory, pattern)
-                matches = glob.glob(search_path, recursive=False)
+                matches = [os.path.join(directory, name) for name in fnmatch.filter(names, pattern)]
                 
                 for match in matches:
                     if match.lower().endswith(('.pdf', '.docx', '.doc')):
@@ -189,7 +193,7 @@ class SmartSOSearch:
                 app_module = importlib.import_module('app')
                 
                 if file_path.lower().endswith('.pdf'):
-                    data = app_module.extract_so_data_from_pdf(file_path)
+                    data = so_parse_cache.parse(file_path, "app", app_module.extract_so_data_from_pdf)
                 elif file_path.lower().endswith(('.docx', '.doc')):
                     data = app_module.extract_so_data_from_docx(file_path)
                 else:
@@ -277,7 +281,7 @@ Return ONLY the numeric part, no text, no explanation. If no SO number found, re
             app_module = importlib.import_module('app')
             
             if file_path.lower().endswith('.pdf'):
-                data = app_module.extract_so_data_from_pdf(file_path)
+                data = so_parse_cache.parse(file_path, "app", app_module.extract_so_data_from_pdf)
             else:
                 data = app_module.extract_so_data_from_docx(file_path)
             
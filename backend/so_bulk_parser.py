@@ -0,0 +1,292 @@
+"""
+Bulk SO PDF parsing on a process pool (pdfplumber layout work is CPU-bound, so threads do not help).
+
+Each worker parses through so_parse_cache, so results are streamed into the persistent cache as each file finishes
+and already-cached content returns without parsing. A run given a checkpoint file (checkpoint_path(name), one per
+caller) records which paths are done or failed; a run that crashed or was stopped resumes from it (done paths are read
+back from the cache, failed ones are skipped unless retry_failed). A corrupt PDF - or a worker process that dies on
+one - only fails that file.
+
+Used by EnterpriseSO.incremental_parse, so_cache_builder and the /api/so-parse-cache/bulk endpoint.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import so_file_index
+import so_parse_cache
+
+WORKERS = int(os.environ.get("SO_PARSE_WORKERS", "0")) or (os.cpu_count() or 2)
+CHECKPOINT_DIR = os.path.dirname(so_parse_cache.DB_PATH)
+CHECKPOINT_EVERY = 25  # completions between checkpoint writes
+MAX_FAILURES_REPORTED = 50
+
+
+def checkpoint_path(name):
+    """Checkpoint file for one kind of run ('api', 'cache_builder', ...): runs of different callers never share one."""
+    return os.path.join(CHECKPOINT_DIR, f"so_bulk_parse_{name}.checkpoint.json")
+
+
+def _init_worker(parser):
+    # Import the parser (and its module-level setup) once per worker process, not once per file
+    so_parse_cache.parser_version(parser)
+
+
+def _parse_in_worker(path, parser):
+    """Runs in a worker process: (path, result or None, error or None, was_cached)."""
+    try:
+        result, cached = so_parse_cache.parse_with_status(path, parser)
+        if cached:
+            return path, result, None, True
+        if not result:
+            return path, None, "parser returned nothing", False
+        if isinstance(result, dict) and result.get("error") and not result.get("items"):
+            return path, result, str(result.get("error")), False
+        return path, result, None, False
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", False
+
+
+def find_so_pdfs(directory, name_filter="salesorder"):
+    """SO PDF paths under directory, sorted (listed from the SO file index when directory is in the Sales Orders tree)."""
+    paths = []
+    for root, _dirs, files in so_file_index.get_index().walk(directory):
+        for name in files:
+            if name.lower().endswith(".pdf") and (not name_filter or name_filter in name.lower()):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+class BulkParseRun:
+    """One bulk parse over a list of PDF paths. run() blocks; status() is safe to call from other threads."""
+
+    def __init__(self, paths, parser="app", workers=None, checkpoint_path=None, retry_failed=False):
+        self.paths = list(dict.fromkeys(paths))
+        self.parser = parser
+        self.workers = max(1, int(workers or WORKERS))
+        self.checkpoint_path = checkpoint_path
+        self.retry_failed = retry_failed
+        self.done = set()
+        self.failed = {}
+        self.counts = {"parsed": 0, "cached": 0, "resumed": 0, "failed": 0}
+        self.state = "pending"
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- Checkpoint ----------------------------------------------------------
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"[so_bulk_parser] Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return
+        if saved.get("parser") != self.parser or saved.get("finished"):
+            return
+        wanted = set(self.paths)
+        self.done = {p for p in saved.get("done", []) if p in wanted}
+        if not self.retry_failed:
+            self.failed = {p: err for p, err in saved.get("failed", {}).items() if p in wanted}
+            self.counts["failed"] = len(self.failed)
+        print(f"[so_bulk_parser] Resuming from checkpoint: {len(self.done)} done, {len(self.failed)} failed")
+
+    def _save_checkpoint(self, finished=False):
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            payload = {
+                "parser": self.parser,
+                "started_at": self.started_at,
+                "saved_at": datetime.now().isoformat(),
+                "finished": finished,
+                "done": sorted(self.done),
+                "failed": dict(self.failed),
+            }
+        tmp = f"{self.checkpoint_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.checkpoint_path)
+        except Exception as e:
+            print(f"[so_bulk_parser] Checkpoint write failed: {e}")
+
+    # --- Run -----------------------------------------------------------------
+
+    def stop(self):
+        """Stop submitting new files; in-flight files finish and are checkpointed."""
+        self._stop.set()
+
+    def _record(self, path, result, error, cached, on_result):
+        with self._lock:
+            if error:
+                self.failed[path] = error
+                self.counts["failed"] += 1
+            else:
+                self.done.add(path)
+                self.failed.pop(path, None)
+                self.counts["cached" if cached else "parsed"] += 1
+        if error:
+            print(f"[so_bulk_parser] Failed {os.path.basename(path)}: {error}")
+        if on_result is not None:
+            try:
+                on_result(path, None if error else result, error)
+            except Exception as e:
+                print(f"[so_bulk_parser] on_result failed for {os.path.basename(path)}: {e}")
+
+    def run(self, on_result=None):
+        """
+        Parse every path. on_result(path, result, error) is called in this thread as each file completes (result is
+        None when it failed), including paths resumed from the checkpoint. Returns status().
+        """
+        self.state = "running"
+        self.started_at = datetime.now().isoformat()
+        self._load_checkpoint()
+        for path in sorted(self.done):
+            result = None
+            try:
+                result = so_parse_cache.lookup(path, self.parser)
+            except Exception:
+                pass
+            if result is None:
+                self.done.discard(path)  # not in the cache after all (content changed / parser updated): parse it
+                continue
+            self.counts["resumed"] += 1
+            if on_result is not None:
+                on_result(path, result, None)
+        pending = [p for p in self.paths if p not in self.done and p not in self.failed]
+        print(f"[so_bulk_parser] {len(pending)} of {len(self.paths)} PDFs to parse on {self.workers} workers")
+        try:
+            self._run_pool(pending, on_result)
+            self.state = "stopped" if self._stop.is_set() else "done"
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+            print(f"[so_bulk_parser] Bulk parse failed: {e}")
+        self.finished_at = datetime.now().isoformat()
+        self._save_checkpoint(finished=self.state == "done")
+        print(f"[so_bulk_parser] {self.state}: {self.counts}")
+        return self.status()
+
+    def _run_pool(self, pending, on_result):
+        queue = list(reversed(pending))
+        # Files in flight when a worker process died are re-run one at a time, so only the PDF that kills a worker
+        # is failed and the others parse normally
+        suspects = []
+        since_checkpoint = 0
+        while (queue or suspects) and not self._stop.is_set():
+            in_flight = {}
+            isolated = None
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.parser,)) as pool:
+                    while (queue or suspects or in_flight) and not self._stop.is_set():
+                        if suspects:
+                            if not in_flight:
+                                isolated = suspects.pop()
+                                in_flight[pool.submit(_parse_in_worker, isolated, self.parser)] = isolated
+                        else:
+                            isolated = None
+                            # Bounded submission: a few files per worker in flight, so a stop/crash loses little
+                            while queue and len(in_flight) < self.workers * 2:
+                                path = queue.pop()
+                                in_flight[pool.submit(_parse_in_worker, path, self.parser)] = path
+                        finished, _ = wait(in_flight, timeout=5, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            outcome = future.result()
+                            del in_flight[future]
+                            self._record(*outcome, on_result)
+                            since_checkpoint += 1
+                        if since_checkpoint >= CHECKPOINT_EVERY:
+                            self._save_checkpoint()
+                            since_checkpoint = 0
+                    # Stopped: let the files already submitted finish
+                    for future in list(in_flight):
+                        outcome = future.result()
+                        del in_flight[future]
+                        self._record(*outcome, on_result)
+            except BrokenProcessPool:
+                if isolated is not None and list(in_flight.values()) == [isolated]:
+                    self._record(isolated, None, "worker process crashed while parsing this PDF", False, on_result)
+                    self._save_checkpoint()
+                else:
+                    suspects.extend(in_flight.values())
+                print(f"[so_bulk_parser] Worker pool broke; restarting ({len(suspects)} PDFs to re-run one at a time, "
+                      f"{len(queue)} queued)")
+
+    def status(self):
+        with self._lock:
+            processed = len(self.done) + len(self.failed)
+            return {
+                "state": self.state,
+                "parser": self.parser,
+                "workers": self.workers,
+                "total": len(self.paths),
+                "processed": processed,
+                "percent": round(processed * 100.0 / len(self.paths), 1) if self.paths else 100.0,
+                **self.counts,
+                "failures": dict(list(self.failed.items())[:MAX_FAILURES_REPORTED]),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "error": self.error,
+                "checkpoint": self.checkpoint_path,
+            }
+
+
+def parse_files(paths, parser="app", workers=None, on_result=None, checkpoint_path=None, retry_failed=False):
+    """Blocking bulk parse of paths (see BulkParseRun.run); no checkpoint unless one is given. Returns the final status."""
+    return BulkParseRun(paths, parser, workers, checkpoint_path, retry_failed).run(on_result)
+
+
+# --- Background run for the API ---------------------------------------------
+
+_current_run = None
+_current_thread = None
+_run_lock = threading.Lock()
+
+
+def start_background(directory, parser="app", workers=None, retry_failed=False):
+    """Start a bulk parse of every SO PDF under directory in a background thread. Returns its status."""
+    global _current_run, _current_thread
+    with _run_lock:
+        if _current_thread is not None and _current_thread.is_alive():
+            return _current_run.status()
+        run = BulkParseRun(find_so_pdfs(directory), parser, workers, checkpoint_path("api"), retry_failed)
+        _current_run = run
+        _current_thread = threading.Thread(target=run.run, daemon=True, name="so-bulk-parse")
+        _current_thread.start()
+        return run.status()
+
+
+def stop_background():
+    run = _current_run
+    if run is not None:
+        run.stop()
+    return get_status()
+
+
+def get_status():
+    """Progress of the current/last background run ({'state': 'idle'} when none was started)."""
+    run = _current_run
+    return run.status() if run is not None else {"state": "idle"}
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python so_bulk_parser.py <directory> [app|raw] [workers]")
+        sys.exit(1)
+    t0 = time.time()
+    status = parse_files(find_so_pdfs(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else "app",
+                         int(sys.argv[3]) if len(sys.argv) > 3 else None, checkpoint_path=checkpoint_path("cli"))
+    print(f"[so_bulk_parser] Finished in {time.time() - t0:.1f}s: {status}")
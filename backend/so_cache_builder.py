@@ -7,7 +7,8 @@ import os
 import json
 import sys
 from datetime import datetime
-from app import extract_so_data_from_pdf
+import so_bulk_parser
+import so_file_index
 
 # Add current directory to path
 sys.path.append('.')
@@ -30,23 +31,16 @@ def build_so_cache():
     item_index_file = os.path.join(cache_dir, "SOItemIndex.json")
     cache_status_file = os.path.join(cache_dir, "SOCacheStatus.json")
     
-    # Load existing cache to avoid re-parsing
-    existing_cache = {}
-    if os.path.exists(parsed_sos_file):
-        try:
-            with open(parsed_sos_file, 'r') as f:
-                existing_cache = {so['so_number']: so for so in json.load(f)}
-            print(f"📋 Loaded existing cache: {len(existing_cache)} SOs")
-        except:
-            print("⚠️ Could not load existing cache, starting fresh")
+    # Already-parsed PDFs come from the content-addressed parse cache (so_parse_cache): a PDF is only
+    # re-parsed when its content or the parser changed, whatever its SO number, folder or file name
     
     # Find all SO PDFs
     all_so_files = []
     print(f"🔍 Scanning for SO PDFs in: {sales_orders_base}")
-    print(f"   This may take 30-60 seconds for large folders...")
+    print(f"   Listing from the SO file index (only changed folders are re-read from the drive)")
     
     folder_count = 0
-    for root, dirs, files in os.walk(sales_orders_base):
+    for root, dirs, files in so_file_index.get_index().walk(sales_orders_base):
         folder_count += 1
         folder_name = os.path.basename(root)
         
@@ -69,80 +63,47 @@ def build_so_cache():
     print(f"\n✅ SCAN COMPLETE!")
     print(f"📄 Found {len(all_so_files)} SO PDF files in {folder_count} folders")
     
-    # Parse SOs (skip already cached ones)
+    # Parse SOs on the bulk process pool (already-parsed content comes straight from the parse cache;
+    # a crash resumes from the bulk parser's checkpoint)
     parsed_sos = []
     item_index = []
-    parsed_count = 0
-    skipped_count = 0
+    completed = 0
+    files_by_path = {so_file['file_path']: so_file for so_file in all_so_files}
     
-    for i, so_file in enumerate(all_so_files, 1):
+    def _on_result(path, parsed_data, error):
+        nonlocal completed
+        completed += 1
+        so_file = files_by_path[path]
         so_number = so_file['so_number']
-        
-        # Skip if already cached
-        if so_number in existing_cache:
-            parsed_sos.append(existing_cache[so_number])
-            # Add items to index
-            for item in existing_cache[so_number].get('items', []):
+        if error or not (parsed_data and parsed_data.get('items')):
+            print(f"    [FAIL] Failed to parse SO {so_number}: {error or 'no items found'}")
+        else:
+            # Add metadata
+            parsed_data['folder'] = so_file['folder']
+            parsed_data['file_name'] = so_file['file_name']
+            parsed_data['cached_at'] = datetime.now().isoformat()
+            
+            parsed_sos.append(parsed_data)
+            
+            # Add items to index for fast lookup
+            for item in parsed_data.get('items', []):
                 item_index.append({
                     'so_number': so_number,
                     'item_code': item.get('item_code', ''),
                     'item_description': item.get('description', ''),
                     'quantity': item.get('quantity', 0)
                 })
-            skipped_count += 1
-            if i % 10 == 0:
-                print(f"⏩ Skipped {skipped_count} cached SOs (up to #{i})")
-            continue
-        
-        # Progress indicator
-        print(f"\n📄 [{i}/{len(all_so_files)}] Parsing: {so_number}")
-        print(f"   Folder: {so_file['folder']}")
-        print(f"   Progress: {(i/len(all_so_files)*100):.1f}% complete")
         
-        try:
-            # Parse the PDF
-            parsed_data = extract_so_data_from_pdf(so_file['file_path'])
-            
-            if parsed_data and parsed_data.get('items'):
-                # Add metadata
-                parsed_data['folder'] = so_file['folder']
-                parsed_data['file_name'] = so_file['file_name']
-                parsed_data['cached_at'] = datetime.now().isoformat()
-                
-                parsed_sos.append(parsed_data)
-                
-                # Add items to index for fast lookup
-                for item in parsed_data.get('items', []):
-                    item_index.append({
-                        'so_number': so_number,
-                        'item_code': item.get('item_code', ''),
-                        'item_description': item.get('description', ''),
-                        'quantity': item.get('quantity', 0)
-                    })
-                
-                parsed_count += 1
-                print(f"   ✅ SUCCESS: {len(parsed_data.get('items', []))} items | Customer: {parsed_data.get('customer', 'N/A')}")
-                
-                # Show summary every 25 SOs
-                if parsed_count % 25 == 0:
-                    print(f"\n{'='*60}")
-                    print(f"   📊 PROGRESS SUMMARY")
-                    print(f"   Parsed so far: {parsed_count} SOs")
-                    print(f"   Items indexed: {len(item_index)}")
-                    print(f"   Time remaining: ~{int((len(all_so_files)-i)*1.5/60)} minutes")
-                    print(f"{'='*60}\n")
-                
-            else:
-                print(f"    ❌ Failed to parse or no items found")
-                
-        except Exception as e:
-            print(f"    ❌ Error parsing SO {so_number}: {e}")
-        
-        # Save progress every 10 SOs
-        if i % 10 == 0:
-            print(f"💾 Saving progress... ({i}/{len(all_so_files)})")
+        # Save progress every 100 SOs
+        if completed % 100 == 0:
+            print(f"[INFO] Saving progress... ({completed}/{len(all_so_files)}, {(completed/len(all_so_files)*100):.1f}% complete)")
             save_cache(parsed_sos, item_index, parsed_sos_file, item_index_file)
     
+    run_status = so_bulk_parser.parse_files(list(files_by_path), "app", on_result=_on_result,
+                                          checkpoint_path=so_bulk_parser.checkpoint_path("cache_builder"))
+    parsed_count = run_status['parsed']
+    skipped_count = run_status['cached'] + run_status['resumed']
+    
     # Final save
     save_cache(parsed_sos, item_index, parsed_sos_file, item_index_file)
     
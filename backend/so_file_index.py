@@ -0,0 +1,470 @@
+"""
+Shared, persistent index of the Sales Orders folder tree (G: drive), so callers stop re-walking the share.
+
+- The index keeps every directory's listing (sub-folders and file names, in scandir order) and a stat entry for every
+  SO document (.pdf/.docx/.doc): SO number, revision, status folder, mtime, ctime and size.
+- It is saved to SO_FILE_INDEX_PATH (default backend/cache/so_file_index.json) and loaded on startup, so a restart
+  only re-checks the tree instead of re-listing it.
+- refresh() stats each known directory and re-lists only the ones whose mtime changed (adding, removing or renaming
+  a file changes its folder's mtime). A folder that disappeared drops its subtree; one that cannot be read right now
+  keeps its last-seen listing. A full refresh (every FULL_SCAN_SECONDS) re-lists every folder, which catches files
+  edited in place.
+- The change feed is a polling thread (every POLL_SECONDS). If watchdog is installed, its events wake the poller
+  early and get the touched files re-stated.
+
+Queries: walk()/listdir()/isdir() mirror os.walk/os.listdir/os.path.isdir for paths under the base (other paths fall
+through to os). entry(path) returns a file's entry. entries()/find() search the SO documents. Used by app's SO
+index and loaders, logistics, smart SO search, the enterprise parser, so_cache_builder and SOPerformanceOptimizer.
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # polling alone still keeps the index current
+    Observer = None
+    FileSystemEventHandler = object
+
+SALES_ORDERS_BASE = os.environ.get(
+    "SO_FILE_INDEX_BASE", r"G:\Shared drives\Sales_CSR\Customer Orders\Sales Orders"
+)
+INDEX_PATH = os.environ.get(
+    "SO_FILE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "so_file_index.json"),
+)
+DOCUMENT_EXTENSIONS = (".pdf", ".docx", ".doc")
+SKIP_DIRS = {"$RECYCLE.BIN", "System Volume Information"}
+POLL_SECONDS = 30
+FULL_SCAN_SECONDS = 15 * 60
+INDEX_FORMAT = 1
+
+_SO_NUMBER_RE = re.compile(r"(?:salesorder|so)[_\s-]*(\d+)", re.IGNORECASE)
+_REVISION_RE = re.compile(r"_[Rr](\d+)")
+
+
+def parse_so_filename(name):
+    """(so_number or None, revision) from an SO file name, e.g. 'salesorder_3012_R2.pdf' -> ('3012', 2)."""
+    m = _SO_NUMBER_RE.search(name)
+    rev = _REVISION_RE.search(name)
+    return (m.group(1) if m else None), (int(rev.group(1)) if rev else 0)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        paths = [getattr(event, "src_path", None), getattr(event, "dest_path", None)]
+        self.index.notify_changed([p for p in paths if p])
+
+
+class SOFileIndex:
+    """The Sales Orders tree as last seen. Queries never touch the share; refresh() brings the index up to date."""
+
+    def __init__(self, base=SALES_ORDERS_BASE, index_path=INDEX_PATH):
+        self.base = os.path.normpath(base)
+        self.index_path = index_path
+        self._dirs = {}   # dir path -> {"mtime_ns", "names": [all entries], "dirs": [sub-folder names]}
+        self._files = {}  # document path -> entry dict (see _entry)
+        self._by_so = {}  # so_number -> [document paths]
+        self._lock = threading.Lock()          # swaps of the maps above
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._pending = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._poller = None
+        self._observer = None
+        self.version = 0
+        self.loaded_from_disk = False
+        self.last_refresh = None
+        self.last_full_refresh = None
+        self.last_refresh_stats = {}
+
+    # --- Paths -----------------------------------------------------------
+
+    def covers(self, path):
+        """True when path is the base folder or inside it."""
+        path = os.path.normcase(os.path.normpath(path))
+        base = os.path.normcase(self.base)
+        return path == base or path.startswith(base.rstrip(os.sep) + os.sep)
+
+    def _entry(self, path, st_or_saved):
+        if isinstance(st_or_saved, dict):
+            mtime_ns, mtime, ctime, size = (st_or_saved["mtime_ns"], st_or_saved["mtime"],
+                                            st_or_saved["ctime"], st_or_saved["size"])
+        else:
+            st = st_or_saved
+            mtime_ns, mtime, ctime, size = st.st_mtime_ns, st.st_mtime, st.st_ctime, st.st_size
+        folder = os.path.dirname(path)
+        rel = os.path.relpath(folder, self.base)
+        parts = [] if rel == os.curdir else rel.split(os.sep)
+        name = os.path.basename(path)
+        so_number, revision = parse_so_filename(name)
+        return {
+            "path": path,
+            "name": name,
+            "folder": folder,
+            "parts": parts,
+            "status": parts[0] if parts else "Root",
+            "so_number": so_number,
+            "revision": revision,
+            "mtime_ns": mtime_ns,
+            "mtime": mtime,
+            "ctime": ctime,
+            "size": size,
+        }
+
+    # --- Persistence -----------------------------------------------------
+
+    def load(self):
+        """Load the saved index (ignored when missing, unreadable, or saved for another base folder)."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"[so_file_index] Ignoring unreadable index {self.index_path}: {e}")
+            return False
+        if saved.get("format") != INDEX_FORMAT or os.path.normpath(saved.get("base", "")) != self.base:
+            return False
+        files = {p: self._entry(p, rec) for p, rec in saved.get("files", {}).items()}
+        with self._lock:
+            self._dirs = saved.get("dirs", {})
+            self._files = files
+            self._by_so = self._group_by_so(files)
+            self.version += 1
+        self.loaded_from_disk = True
+        print(f"[so_file_index] Loaded {len(files)} documents in {len(self._dirs)} folders from {self.index_path}")
+        return True
+
+    def save(self):
+        if not self.index_path:
+            return
+        with self._lock:
+            payload = {
+                "format": INDEX_FORMAT,
+                "base": self.base,
+                "saved_at": datetime.now().isoformat(),
+                "dirs": self._dirs,
+                "files": {p: {k: e[k] for k in ("mtime_ns", "mtime", "ctime", "size")} for p, e in self._files.items()},
+            }
+        tmp = self.index_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"[so_file_index] Index write failed: {e}")
+
+    # --- Refresh ---------------------------------------------------------
+
+    @staticmethod
+    def _group_by_so(files):
+        by_so = {}
+        for path, e in files.items():
+            if e["so_number"]:
+                by_so.setdefault(e["so_number"], []).append(path)
+        return by_so
+
+    def _list_dir(self, folder, mtime_ns, known, files, stats):
+        # Re-list one folder: its record, with the document entries in `files` updated in place
+        names, subdirs, seen = [], [], set()
+        with os.scandir(folder) as it:
+            for de in it:
+                names.append(de.name)
+                try:
+                    if de.is_dir():
+                        if de.name not in SKIP_DIRS:
+                            subdirs.append(de.name)
+                        continue
+                    if not de.name.lower().endswith(DOCUMENT_EXTENSIONS):
+                        continue
+                    st = de.stat()
+                except OSError:
+                    continue
+                path = os.path.join(folder, de.name)
+                seen.add(path)
+                old = files.get(path)
+                if old is None or old["mtime_ns"] != st.st_mtime_ns or old["size"] != st.st_size:
+                    files[path] = self._entry(path, st)
+                    stats["changed_files"] += 1
+        for name in (known or {}).get("names", ()):
+            path = os.path.join(folder, name)
+            if path not in seen and files.pop(path, None) is not None:
+                stats["removed_files"] += 1
+        stats["listed_dirs"] += 1
+        return {"mtime_ns": mtime_ns, "names": names, "dirs": subdirs}
+
+    def refresh(self, full=False):
+        """
+        Bring the index up to date. Incremental: only folders whose mtime changed are re-listed.
+        full=True re-lists every folder. Returns the refresh stats ({} when the base folder is unreachable).
+        """
+        if not os.path.isdir(self.base):
+            return {}
+        with self._refresh_lock:
+            started = time.time()
+            stats = {"full": full, "dirs": 0, "listed_dirs": 0, "changed_files": 0, "removed_files": 0, "errors": 0}
+            with self._lock:
+                old_dirs, files = self._dirs, dict(self._files)
+                pending, self._pending = self._pending, set()
+            # Files reported by watchdog: their folder's mtime may not change on an in-place edit
+            for path in pending:
+                e = files.get(path)
+                if e is None:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed: the folder re-list drops it
+                if e["mtime_ns"] != st.st_mtime_ns or e["size"] != st.st_size:
+                    files[path] = self._entry(path, st)
+                    stats["changed_files"] += 1
+            dirs = {}
+            stack = [self.base]
+            while stack:
+                folder = stack.pop()
+                try:
+                    mtime_ns = os.stat(folder).st_mtime_ns
+                    known = old_dirs.get(folder)
+                    if known is not None and not full and known["mtime_ns"] == mtime_ns:
+                        rec = known
+                    else:
+                        rec = self._list_dir(folder, mtime_ns, known, files, stats)
+                except OSError as e:
+                    # Usually a passing hiccup on the share (a folder really removed drops out of its parent's
+                    # re-listing instead): keep the folder as last seen so its subtree is not dropped from the index
+                    stats["errors"] += 1
+                    print(f"[so_file_index] Cannot read {folder}, keeping it as last seen: {e}")
+                    rec = old_dirs.get(folder)
+                    if rec is None:
+                        continue
+                dirs[folder] = rec
+                stack.extend(os.path.join(folder, name) for name in reversed(rec["dirs"]))
+            if set(dirs) != set(old_dirs):
+                # Documents in folders that are gone
+                for path in [p for p, e in files.items() if e["folder"] not in dirs]:
+                    del files[path]
+                    stats["removed_files"] += 1
+            stats["dirs"] = len(dirs)
+            # changed: what queries see differs (bumps version); dirty: anything to persist (also folder mtimes)
+            changed = bool(stats["changed_files"] or stats["removed_files"]) or set(dirs) != set(old_dirs) or any(
+                (rec["names"], rec["dirs"]) != (old_dirs[d]["names"], old_dirs[d]["dirs"])
+                for d, rec in dirs.items() if rec is not old_dirs.get(d))
+            dirty = changed or any(rec is not old_dirs.get(d) and rec != old_dirs.get(d) for d, rec in dirs.items())
+            with self._lock:
+                self._dirs = dirs
+                if changed:
+                    self._files = files
+                    self._by_so = self._group_by_so(files)
+                    self.version += 1
+            self.last_refresh = datetime.now().isoformat()
+            if full:
+                self.last_full_refresh = self.last_refresh
+            stats["documents"] = len(files)
+            stats["seconds"] = round(time.time() - started, 2)
+            self.last_refresh_stats = stats
+        if dirty:
+            self.save()
+        return stats
+
+    # --- Change feed -----------------------------------------------------
+
+    def notify_changed(self, paths):
+        """Mark paths as changed (watchdog events); the poller refreshes promptly."""
+        with self._lock:
+            self._pending.update(os.path.normpath(p) for p in paths)
+        self._wake.set()
+
+    def _poll(self):
+        last_full = time.time()
+        while not self._stop.is_set():
+            woken = self._wake.wait(POLL_SECONDS)
+            if self._stop.is_set():
+                break
+            if woken:
+                self._wake.clear()
+                time.sleep(1)  # let a burst of events (a copy, a save) settle into one refresh
+            full = time.time() - last_full >= FULL_SCAN_SECONDS
+            try:
+                self.refresh(full=full)
+                if full:
+                    last_full = time.time()
+            except Exception as e:
+                print(f"[so_file_index] Refresh failed: {e}")
+
+    def start(self):
+        """Start the polling thread (and the watchdog observer when available). Safe to call repeatedly."""
+        if self._poller is not None and self._poller.is_alive():
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._poll, daemon=True, name="so-file-index")
+        self._poller.start()
+        if Observer is not None and os.path.isdir(self.base):
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_ChangeHandler(self), self.base, recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                # Network drives do not always deliver events; polling covers them
+                print(f"[so_file_index] watchdog unavailable for {self.base}, polling only: {e}")
+                self._observer = None
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    # --- Queries ---------------------------------------------------------
+
+    def walk(self, top=None):
+        """os.walk(top) (top-down) from the index. Paths outside the base are walked on disk."""
+        top = os.path.normpath(top or self.base)
+        if not self.covers(top):
+            yield from os.walk(top)
+            return
+        dirs = self._dirs
+        stack = [top]
+        while stack:
+            folder = stack.pop()
+            rec = dirs.get(folder)
+            if rec is None:
+                continue
+            subdirs = list(rec["dirs"])
+            yield folder, subdirs, self._file_names(rec)
+            stack.extend(os.path.join(folder, name) for name in reversed(subdirs))  # caller may prune subdirs
+
+    def listdir(self, path):
+        """os.listdir(path) from the index. Raises FileNotFoundError for a folder the index does not have."""
+        path = os.path.normpath(path)
+        if not self.covers(path):
+            return os.listdir(path)
+        rec = self._dirs.get(path)
+        if rec is None:
+            raise FileNotFoundError(path)
+        return list(rec["names"])
+
+    def subdirs(self, path):
+        path = os.path.normpath(path)
+        if not self.covers(path):
+            return [n for n in os.listdir(path) if os.path.isdir(os.path.join(path, n))]
+        rec = self._dirs.get(path)
+        return list(rec["dirs"]) if rec else []
+
+    def filenames(self, path):
+        """Names of the files (not folders) directly in path."""
+        path = os.path.normpath(path)
+        if not self.covers(path):
+            return [n for n in os.listdir(path) if os.path.isfile(os.path.join(path, n))]
+        rec = self._dirs.get(path)
+        return self._file_names(rec) if rec else []
+
+    @staticmethod
+    def _file_names(rec):
+        subdirs = set(rec["dirs"])
+        return [n for n in rec["names"] if n not in subdirs and n not in SKIP_DIRS]
+
+    def isdir(self, path):
+        path = os.path.normpath(path)
+        return path in self._dirs if self.covers(path) else os.path.isdir(path)
+
+    def entry(self, path):
+        """The document entry for path, or None when it is not an indexed SO document."""
+        return self._files.get(os.path.normpath(path))
+
+    def entries(self, name_contains=None, extensions=(".pdf",), top=None):
+        """Document entries, optionally filtered by (case-insensitive) name substring, extension and folder."""
+        needle = name_contains.lower() if name_contains else None
+        top = os.path.normcase(os.path.normpath(top)) if top else None
+        out = []
+        for e in list(self._files.values()):
+            name = e["name"].lower()
+            if extensions and not name.endswith(tuple(extensions)):
+                continue
+            if needle and needle not in name:
+                continue
+            if top and not (os.path.normcase(e["folder"]) + os.sep).startswith(top.rstrip(os.sep) + os.sep):
+                continue
+            out.append(e)
+        return out
+
+    def find(self, so_number, extensions=DOCUMENT_EXTENSIONS, substring=False):
+        """
+        Entries for an SO number, newest revision first (then newest mtime). substring=True also returns any
+        document whose name merely contains the number (the old "so_number in filename" matching).
+        """
+        so_number = str(so_number).strip()
+        if substring:
+            found = [e for e in self.entries(extensions=extensions) if so_number in e["name"]]
+        else:
+            files = self._files
+            found = [files[p] for p in self._by_so.get(so_number, []) if p in files]
+            if extensions:
+                found = [e for e in found if e["name"].lower().endswith(tuple(extensions))]
+        return sorted(found, key=lambda e: (e["revision"], e["mtime"]), reverse=True)
+
+    def status_folders(self):
+        """Top-level folder names under the base (the SO status folders)."""
+        return self.subdirs(self.base)
+
+    def status(self):
+        return {
+            "base": self.base,
+            "index_path": self.index_path,
+            "available": os.path.isdir(self.base),
+            "folders": len(self._dirs),
+            "documents": len(self._files),
+            "so_numbers": len(self._by_so),
+            "version": self.version,
+            "loaded_from_disk": self.loaded_from_disk,
+            "last_refresh": self.last_refresh,
+            "last_full_refresh": self.last_full_refresh,
+            "last_refresh_stats": self.last_refresh_stats,
+            "watching": self._poller is not None and self._poller.is_alive(),
+            "watchdog": self._observer is not None,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The shared index: loaded from disk, refreshed once, then kept current in the background."""
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            index = SOFileIndex()
+            index.load()
+            try:
+                stats = index.refresh()
+                if stats:
+                    print(f"[so_file_index] Ready: {stats}")
+            except Exception as e:
+                print(f"[so_file_index] Initial refresh failed: {e}")
+            index.start()
+            _index = index
+    return _index
+
+
+if __name__ == "__main__":
+    import sys
+    idx = SOFileIndex(sys.argv[1]) if len(sys.argv) > 1 else SOFileIndex()
+    idx.load()
+    print(f"[so_file_index] {idx.refresh(full='--full' in sys.argv)}")
+    print(f"[so_file_index] {idx.status()}")
@@ -0,0 +1,300 @@
+"""
+Persistent parse cache for sales order PDFs, keyed by (PDF content hash, parser, parser version).
+
+- Content hash: sha256 of the file bytes, remembered per path by (size, mtime) so an unchanged file is not re-read.
+  A re-filed or moved PDF hashes to the same key and is never parsed again.
+- Parser version: sha256 of the parser's own source (see PARSERS), so editing raw_so_extractor invalidates only the
+  'raw' entries and editing app's SO parser only the 'app' entries. Old-version rows are ignored until prune().
+- Store: one SQLite file (SO_PARSE_CACHE_DB, default backend/cache/so_parse_cache.sqlite3), WAL mode, safe to share
+  between threads and worker processes.
+
+Only successful parses are stored (a dict with items, no 'error', and not the no-GPT fallback), so a failed, empty or
+degraded parse is retried next time.
+Used by logistics get_so_data_from_system, /api/proforma-invoice/parse-so, smart SO search, so_cache_builder and the
+enterprise incremental parse; warm_up(directory) pre-parses a folder tree.
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+DB_PATH = os.environ.get(
+    "SO_PARSE_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "so_parse_cache.sqlite3"),
+)
+SCHEMA_VERSION = 1  # bump to invalidate every parser's entries (e.g. when the stored result shape changes)
+
+# parser name -> (module, parse function, source that determines the result: module-level names or whole modules)
+PARSERS = {
+    "app": ("app", "extract_so_data_from_pdf",
+            ["app:extract_so_data_from_pdf", "app:extract_addresses_from_layout",
+             "app:extract_addresses_from_pdf_tables", "app:parse_address_with_gpt", "so_pdf_document"]),
+    "raw": ("raw_so_extractor", "extract_so_data_from_pdf", ["raw_so_extractor", "so_pdf_document"]),
+}
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_versions = {}
+_counters = {"hits": 0, "misses": 0, "stored": 0}
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "pid", None) == os.getpid():
+        return conn
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, content_hash TEXT NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS parses ("
+        " content_hash TEXT NOT NULL, parser TEXT NOT NULL, parser_version TEXT NOT NULL,"
+        " so_number TEXT, filename TEXT, result TEXT NOT NULL, parsed_at TEXT NOT NULL,"
+        " PRIMARY KEY (content_hash, parser, parser_version))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS parses_so_number ON parses (so_number)")
+    conn.commit()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def _module(name):
+    # app.py run as a script is __main__: use it rather than importing a second copy of the app
+    if name in sys.modules:
+        return sys.modules[name]
+    main = sys.modules.get("__main__")
+    if main is not None and os.path.splitext(os.path.basename(getattr(main, "__file__", "") or ""))[0] == name:
+        return main
+    return importlib.import_module(name)
+
+
+def parser_version(parser):
+    """Hash of the parser's source (plus SCHEMA_VERSION). Computed once per process."""
+    version = _versions.get(parser)
+    if version is not None:
+        return version
+    digest = hashlib.sha256(f"schema:{SCHEMA_VERSION}".encode())
+    for ref in PARSERS[parser][2]:
+        module_name, _, attr = ref.partition(":")
+        module = _module(module_name)
+        source = inspect.getsource(getattr(module, attr) if attr else module)
+        digest.update(ref.encode())
+        digest.update(source.encode("utf-8"))
+    version = digest.hexdigest()[:16]
+    _versions[parser] = version
+    return version
+
+
+def _current_versions():
+    # Versions of the parsers importable in this process (prune/stats must not fail, e.g. outside the Flask app)
+    versions = {}
+    for parser in PARSERS:
+        try:
+            versions[parser] = parser_version(parser)
+        except Exception as e:
+            print(f"[so_parse_cache] Parser '{parser}' not available here: {e}")
+    return versions
+
+
+def _parse_fn(parser):
+    module_name, fn_name, _ = PARSERS[parser]
+    return getattr(_module(module_name), fn_name)
+
+
+def content_hash(pdf_path):
+    """sha256 of the file, reusing the stored hash while the path's size and mtime are unchanged."""
+    st = os.stat(pdf_path)
+    path = os.path.abspath(pdf_path)
+    conn = _connect()
+    row = conn.execute("SELECT size, mtime_ns, content_hash FROM files WHERE path = ?", (path,)).fetchone()
+    if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+        return row[2]
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _write_lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, value),
+        )
+        conn.commit()
+    return value
+
+
+def _cacheable(result):
+    # The no-GPT fallback (structured False, 'Raw table fallback ...') is a stopgap: re-parse once GPT is back
+    return isinstance(result, dict) and bool(result.get("items")) and not result.get("error") \
+        and result.get("status") not in ("Error", "Parse Error") \
+        and result.get("structured") is not False \
+        and "fallback" not in str(result.get("data_source") or "").lower()
+
+
+def _rebind(result, pdf_path):
+    # A cached result may come from a copy of the file under another name: report the file actually asked for
+    filename = os.path.basename(pdf_path)
+    if isinstance(result.get("file_info"), dict):
+        result["file_info"]["filename"] = filename
+    if "filename" in result:
+        result["filename"] = filename
+    if "filepath" in result:
+        result["filepath"] = pdf_path
+    return result
+
+
+def lookup(pdf_path, parser="app"):
+    """Cached result for this file's content and the parser's current version, or None."""
+    key = content_hash(pdf_path)
+    row = _connect().execute(
+        "SELECT result FROM parses WHERE content_hash = ? AND parser = ? AND parser_version = ?",
+        (key, parser, parser_version(parser)),
+    ).fetchone()
+    if row is None:
+        return None
+    return _rebind(json.loads(row[0]), pdf_path)
+
+
+def store(pdf_path, result, parser="app"):
+    """Store a parse result for this file's content. Returns False (and stores nothing) for failed/empty parses."""
+    if not _cacheable(result):
+        return False
+    key = content_hash(pdf_path)
+    payload = json.dumps(result, default=str, ensure_ascii=False)
+    conn = _connect()
+    with _write_lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO parses (content_hash, parser, parser_version, so_number, filename, result, parsed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, parser, parser_version(parser), str(result.get("so_number") or "") or None,
+             os.path.basename(pdf_path), payload, datetime.now().isoformat()),
+        )
+        conn.commit()
+    _counters["stored"] += 1
+    return True
+
+
+def parse(pdf_path, parser="app", parse_fn=None):
+    """
+    Parsed SO for pdf_path: the cached result when this content was already parsed by the current parser version,
+    else parse_fn(pdf_path) (default: the registered parser function), stored when successful.
+    Cache errors never block parsing; the parser's own return value (or exception) is passed through.
+    """
+    return parse_with_status(pdf_path, parser, parse_fn)[0]
+
+
+def parse_with_status(pdf_path, parser="app", parse_fn=None):
+    """parse(), returning (result, True when it came from the cache)."""
+    try:
+        cached = lookup(pdf_path, parser)
+    except Exception as e:
+        print(f"[so_parse_cache] Lookup failed for {os.path.basename(pdf_path)}: {e}")
+        cached = None
+    if cached is not None:
+        _counters["hits"] += 1
+        print(f"[so_parse_cache] Hit for {os.path.basename(pdf_path)} ({parser})")
+        return cached, True
+    _counters["misses"] += 1
+    result = (parse_fn or _parse_fn(parser))(pdf_path)
+    try:
+        store(pdf_path, result, parser)
+    except Exception as e:
+        print(f"[so_parse_cache] Store failed for {os.path.basename(pdf_path)}: {e}")
+    return result, False
+
+
+def invalidate(so_number=None, pdf_path=None):
+    """Drop cached parses for an SO number and/or a file's content (forces the next lookup to re-parse)."""
+    conn = _connect()
+    key = content_hash(pdf_path) if pdf_path and os.path.exists(pdf_path) else None
+    removed = 0
+    with _write_lock:
+        if so_number:
+            removed += conn.execute("DELETE FROM parses WHERE so_number = ?", (str(so_number),)).rowcount
+        if key:
+            removed += conn.execute("DELETE FROM parses WHERE content_hash = ?", (key,)).rowcount
+        conn.commit()
+    return removed
+
+
+def prune():
+    """Delete rows written by parser versions other than the current ones, and hashes of files that no longer exist."""
+    conn = _connect()
+    versions = _current_versions()
+    removed = 0
+    with _write_lock:
+        for parser, version in versions.items():
+            removed += conn.execute(
+                "DELETE FROM parses WHERE parser = ? AND parser_version != ?", (parser, version)
+            ).rowcount
+        gone = [(p,) for (p,) in conn.execute("SELECT path FROM files").fetchall() if not os.path.exists(p)]
+        conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        conn.commit()
+    return {"parses_removed": removed, "files_removed": len(gone)}
+
+
+def warm_up(directory, parser="app", name_filter="salesorder"):
+    """Parse every SO PDF under directory into the cache (already-cached content is skipped). Returns counts."""
+    started = time.time()
+    counts = {"files": 0, "cached": 0, "parsed": 0, "failed": 0}
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if not name.lower().endswith(".pdf") or (name_filter and name_filter not in name.lower()):
+                continue
+            path = os.path.join(root, name)
+            counts["files"] += 1
+            try:
+                if lookup(path, parser) is not None:
+                    counts["cached"] += 1
+                    continue
+                result = _parse_fn(parser)(path)
+                if store(path, result, parser):
+                    counts["parsed"] += 1
+                else:
+                    counts["failed"] += 1
+            except Exception as e:
+                print(f"[so_parse_cache] Warm-up failed for {name}: {e}")
+                counts["failed"] += 1
+            if counts["files"] % 50 == 0:
+                print(f"[so_parse_cache] Warm-up: {counts}")
+    counts["seconds"] = round(time.time() - started, 1)
+    print(f"[so_parse_cache] Warm-up of {directory} done: {counts}")
+    return counts
+
+
+def stats():
+    conn = _connect()
+    versions = _current_versions()
+    by_parser = {}
+    for parser, version, count in conn.execute(
+        "SELECT parser, parser_version, COUNT(*) FROM parses GROUP BY parser, parser_version"
+    ).fetchall():
+        entry = by_parser.setdefault(parser, {"current": 0, "stale": 0, "unknown": 0})
+        if parser not in versions:
+            entry["unknown"] += count
+        else:
+            entry["current" if version == versions[parser] else "stale"] += count
+    return {
+        "db_path": DB_PATH,
+        "parsers": by_parser,
+        "files_hashed": conn.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+        **_counters,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python so_parse_cache.py <directory> [app|raw]")
+        sys.exit(1)
+    warm_up(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "app")
@@ -0,0 +1,73 @@
+"""
+Sales order PDF document model: opens the PDF once and walks its pages once, collecting words, plain text,
+layout-preserved text and tables per page. The SO parsers (app.extract_so_data_from_pdf and its address helpers,
+raw_so_extractor.extract_raw_from_pdf) read this object instead of each re-opening the file, so pdfplumber's
+character/layout analysis runs once per page rather than once per parser.
+"""
+import os
+
+import pdfplumber
+
+
+class SOPage:
+    """What the parsers need from one page. Rows/words are pdfplumber's own structures, unchanged."""
+
+    __slots__ = ("number", "words", "text", "layout_text", "tables")
+
+    def __init__(self, number, words, text, layout_text, tables):
+        self.number = number            # 1-based
+        self.words = words              # page.extract_words()
+        self.text = text                # page.extract_text() ('' when the page has none)
+        self.layout_text = layout_text  # page.extract_text(layout=True)
+        self.tables = tables            # page.extract_tables()
+
+
+class SODocument:
+    """One SO PDF, extracted in a single pass. Raises like pdfplumber.open if the file cannot be read."""
+
+    def __init__(self, pdf_path):
+        self.path = pdf_path
+        self.filename = os.path.basename(pdf_path)
+        self.size_bytes = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+        self.pages = []
+        with pdfplumber.open(pdf_path) as pdf:
+            for number, page in enumerate(pdf.pages, 1):
+                self.pages.append(SOPage(
+                    number,
+                    _safe_extract(page.extract_words, "words", self.filename, number),
+                    page.extract_text() or "",
+                    page.extract_text(layout=True) or "",
+                    _safe_extract(page.extract_tables, "tables", self.filename, number),
+                ))
+        # Same joins the parsers built themselves: pages without text are skipped, each page ends with a newline
+        self.full_text = "".join(p.text + "\n" for p in self.pages if p.text)
+        self.layout_text = "".join(p.layout_text + "\n" for p in self.pages if p.layout_text)
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def raw_tables(self):
+        """Non-empty tables as [{'page', 'table_num', 'data'}] (raw_so_extractor's raw_tables shape)."""
+        out = []
+        for page in self.pages:
+            for table_num, table in enumerate(page.tables, 1):
+                if table and len(table) > 0:
+                    out.append({'page': page.number, 'table_num': table_num, 'data': table})
+        return out
+
+
+def _safe_extract(fn, what, filename, number):
+    # Word/table extraction failures used to be contained by the address helpers; keep the text pass alive
+    try:
+        return fn() or []
+    except Exception as e:
+        print(f"[so_pdf_document] {what} extraction failed on {filename} page {number}: {e}")
+        return []
+
+
+def as_so_document(source):
+    """source as an SODocument: returned as-is when already one, else the PDF at that path is opened and extracted."""
+    if isinstance(source, SODocument):
+        return source
+    return SODocument(source)
@@ -2,6 +2,8 @@
 """
 SO Performance Optimizer - Ultra-fast local sales order loading
 Optimized for local file system access with intelligent caching
+Cache validation compares (size, mtime_ns, device, inode) stat keys through per-directory Merkle digests;
+file contents are only hashed when a file's stat key changed
 """
 
 import os
@@ -12,6 +14,13 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 import pickle
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import so_file_index
+
+VALIDATION_MODE = 'stat-merkle-v1'
+STAT_WORKERS = 16         # stat calls in flight (network share latency, not CPU)
+HASH_WORKERS = 4          # files read at once when content has to be hashed
+HASH_CHUNK_BYTES = 1 << 20
 
 class SOPerformanceOptimizer:
     """Ultra-fast SO loading with local file optimization"""
@@ -25,27 +34,103 @@ class SOPerformanceOptimizer:
         
         os.makedirs(self.cache_dir, exist_ok=True)
         
+        # Last known {path: {'stat', 'hash'}}; kept across clear_cache so a rescan only re-hashes changed files
+        self._file_records = {}
+        
         # Performance tracking
         self.load_times = []
         self.cache_hits = 0
         self.cache_misses = 0
         
     def get_file_hash(self, file_path: str) -> str:
-        """Get file hash for change detection"""
+        """Get file hash for change detection (read in chunks, so memory stays bounded on large PDFs)"""
         try:
+            digest = hashlib.md5()
             with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
         except:
             return ""
     
+    @staticmethod
+    def _stat_key(file_path: str) -> Optional[List[int]]:
+        """(size, mtime_ns, device, inode/file-id) - changes whenever the file is rewritten, replaced or moved"""
+        try:
+            st = os.stat(file_path)
+            return [st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino]
+        except OSError:
+            return None
+    
+    def _stat_files(self, paths: List[str]) -> Dict[str, Optional[List[int]]]:
+        """Stat keys for paths (None when the file is gone), stat calls spread over a small thread pool"""
+        with ThreadPoolExecutor(max_workers=STAT_WORKERS) as pool:
+            return dict(zip(paths, pool.map(self._stat_key, paths)))
+    
+    def _hash_files(self, paths: List[str]) -> Dict[str, str]:
+        """Content hashes for paths, at most HASH_WORKERS files read at a time"""
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            return dict(zip(paths, pool.map(self.get_file_hash, paths)))
+    
+    def _directory_digests(self, stat_keys: Dict[str, List[int]]) -> Dict[str, str]:
+        """
+        Merkle digest per directory: each folder hashes its SO files' names and stat keys plus its sub-folders'
+        digests, so the base folder's digest changes iff anything below it changed.
+        """
+        base = os.path.normpath(self.sales_orders_base)
+        lines = {}
+        for path, key in stat_keys.items():
+            lines.setdefault(os.path.dirname(path), []).append("F %s %s" % (os.path.basename(path), key))
+            folder = os.path.dirname(path)
+            while folder != base and len(folder) > len(base):
+                lines.setdefault(os.path.dirname(folder), [])
+                folder = os.path.dirname(folder)
+        digests = {}
+        for folder in sorted(lines, key=lambda d: d.count(os.sep), reverse=True):  # deepest first
+            parent = os.path.dirname(folder)
+            digests[folder] = hashlib.sha256("\n".join(sorted(lines[folder])).encode('utf-8')).hexdigest()
+            if folder != base and parent in lines:
+                lines[parent].append("D %s %s" % (os.path.basename(folder), digests[folder]))
+        return digests
+    
+    def _so_pdf_paths(self, so_index) -> List[str]:
+        """Every salesorder_*.pdf under the status folders, listed from the SO file index"""
+        paths = []
+        for status in so_index.subdirs(self.sales_orders_base):
+            if status == 'desktop.ini':
+                continue
+            for root, dirs, files in so_index.walk(os.path.join(self.sales_orders_base, status)):
+                paths.extend(os.path.join(root, file) for file in files
+                             if file.lower().endswith('.pdf') and 'salesorder_' in file.lower())
+        return paths
+    
+    def _load_metadata(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.metadata_file):
+            return None
+        with open(self.metadata_file, 'r') as f:
+            metadata = json.load(f)
+        if metadata.get('validation') != VALIDATION_MODE:
+            return None  # written by the old whole-file-MD5 validation: rescan once
+        self._file_records.update(metadata.get('files', {}))
+        return metadata
+    
+    def _save_metadata(self, metadata: Dict[str, Any]):
+        self._file_records = dict(metadata['files'])
+        with open(self.metadata_file, 'w') as f:
+            json.dump(metadata, f)
+    
     def is_cache_valid(self) -> bool:
-        """Check if cache is still valid (files haven't changed)"""
+        """
+        Check if cache is still valid (files haven't changed).
+        Compares stat keys through the per-directory Merkle digests; only files whose stat key changed are
+        re-hashed, and the cache stays valid when their content turns out identical (touched or copied back).
+        """
         try:
-            if not os.path.exists(self.metadata_file):
+            metadata = self._load_metadata()
+            if metadata is None:
                 return False
-                
-            with open(self.metadata_file, 'r') as f:
-                metadata = json.load(f)
             
             # Check if any SO files have changed since last scan
             last_scan_time = datetime.fromisoformat(metadata.get('last_scan', '1970-01-01'))
@@ -55,18 +140,43 @@ class SOPerformanceOptimizer:
             if (current_scan_time - last_scan_time).total_seconds() > 3600:
                 return False
             
-            # Check file modification times
-            for file_info in metadata.get('file_hashes', []):
-                file_path = file_info['path']
-                if os.path.exists(file_path):
-                    current_hash = self.get_file_hash(file_path)
-                    if current_hash != file_info['hash']:
-                        print(f"🔄 File changed: {os.path.basename(file_path)}")
-                        return False
-                else:
-                    print(f"🔄 File removed: {os.path.basename(file_path)}")
+            so_index = so_file_index.get_index()
+            so_index.refresh()
+            stat_keys = self._stat_files(self._so_pdf_paths(so_index))
+            for file_path in [p for p, key in stat_keys.items() if key is None]:
+                print(f"[INFO] File removed: {os.path.basename(file_path)}")
+                return False
+            digests = self._directory_digests(stat_keys)
+            saved_digests = metadata.get('dir_digests', {})
+            base = os.path.normpath(self.sales_orders_base)
+            if digests.get(base) == saved_digests.get(base):
+                return True
+            
+            # Merkle descent: only folders whose digest changed are compared file by file
+            saved_files = metadata.get('files', {})
+            changed_dirs = {d for d, digest in digests.items() if saved_digests.get(d) != digest}
+            changed_dirs |= {d for d in saved_digests if d not in digests}
+            current_in_changed = {p for p in stat_keys if os.path.dirname(p) in changed_dirs}
+            saved_in_changed = {p for p in saved_files if os.path.dirname(p) in changed_dirs}
+            for file_path in saved_in_changed - current_in_changed:
+                print(f"[INFO] File removed: {os.path.basename(file_path)}")
+                return False
+            for file_path in current_in_changed - saved_in_changed:
+                print(f"[INFO] File added: {os.path.basename(file_path)}")
+                return False
+            restated = [p for p in current_in_changed if stat_keys[p] != saved_files[p]['stat']]
+            hashes = self._hash_files(restated)
+            for file_path in restated:
+                if hashes[file_path] != saved_files[file_path]['hash']:
+                    print(f"[INFO] File changed: {os.path.basename(file_path)}")
                     return False
             
+            # Same content under new stat keys: record them so the next check is stat-only again
+            for file_path in restated:
+                saved_files[file_path] = {'stat': stat_keys[file_path], 'hash': hashes[file_path]}
+            metadata['files'] = saved_files
+            metadata['dir_digests'] = digests
+            self._save_metadata(metadata)
             return True
             
         except Exception as e:
@@ -83,17 +193,14 @@ class SOPerformanceOptimizer:
             print(f"❌ Sales Orders path not accessible: {self.sales_orders_base}")
             return {}
         
-        # Discover status folders
-        status_folders = []
-        for item in os.listdir(self.sales_orders_base):
-            item_path = os.path.join(self.sales_orders_base, item)
-            if os.path.isdir(item_path) and item != 'desktop.ini':
-                status_folders.append(item)
+        # Discover status folders (from the shared SO file index)
+        so_index = so_file_index.get_index()
+        status_folders = [item for item in so_index.subdirs(self.sales_orders_base) if item != 'desktop.ini']
         
         print(f"📁 Found {len(status_folders)} status folders: {status_folders}")
         
         all_orders = []
-        file_metadata = []
+        file_paths = []
         sales_data = {}
         
         # Fast recursive scan with metadata collection
@@ -101,11 +208,14 @@ class SOPerformanceOptimizer:
             folder_path = os.path.join(self.sales_orders_base, status)
             orders = []
             
-            # Use os.walk for efficient recursive scanning
-            for root, dirs, files in os.walk(folder_path):
+            # Walk the index instead of the drive; mtimes and sizes come from its entries
+            for root, dirs, files in so_index.walk(folder_path):
                 for file in files:
                     if file.lower().endswith('.pdf') and 'salesorder_' in file.lower():
                         file_path = os.path.join(root, file)
+                        entry = so_index.entry(file_path)
+                        if entry is None:
+                            continue
                         
                         # Extract SO number
                         so_number = file.replace('salesorder_', '').replace('.pdf', '')
@@ -117,19 +227,15 @@ class SOPerformanceOptimizer:
                             'File Name': file,
                             'Status': status,
                             'Folder': os.path.basename(root),
-                            'Modified': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat(),
-                            'Size': os.path.getsize(file_path)
+                            'Modified': datetime.fromtimestamp(entry['mtime']).isoformat(),
+                            'Size': entry['size']
                         }
                         
                         orders.append(order)
                         all_orders.append(order)
                         
-                        # Track file metadata for cache validation
-                        file_metadata.append({
-                            'path': file_path,
-                            'hash': self.get_file_hash(file_path),
-                            'modified': os.path.getmtime(file_path)
-                        })
+                        # Track file for cache validation
+                        file_paths.append(file_path)
             
             sales_data[status] = orders
             print(f"✅ {status}: {len(orders)} orders")
@@ -146,16 +252,27 @@ class SOPerformanceOptimizer:
         
         all_orders.sort(key=smart_sort, reverse=True)
         
-        # Save metadata for cache validation
+        # Save metadata for cache validation: stat keys, content hashes (only files whose stat key is new are
+        # read) and the per-directory digests
+        try:
+            self._load_metadata()
+        except Exception as e:
+            print(f"[WARN] Previous cache metadata unreadable: {e}")
+        stat_keys = {p: key for p, key in self._stat_files(file_paths).items() if key is not None}
+        known = self._file_records
+        to_hash = [p for p, key in stat_keys.items() if p not in known or known[p]['stat'] != key]
+        hashes = self._hash_files(to_hash)
+        print(f"[INFO] Hashed {len(to_hash)} new/changed files, reused {len(stat_keys) - len(to_hash)} hashes")
         metadata = {
             'last_scan': datetime.now().isoformat(),
             'total_orders': len(all_orders),
             'status_folders': status_folders,
-            'file_hashes': file_metadata
+            'validation': VALIDATION_MODE,
+            'files': {p: {'stat': key, 'hash': hashes[p] if p in hashes else known[p]['hash']}
+                      for p, key in stat_keys.items()},
+            'dir_digests': self._directory_digests(stat_keys),
         }
-        
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        self._save_metadata(metadata)
         
         scan_time = time.time() - start_time
         print(f"⚡ SCAN COMPLETE: {len(all_orders)} orders in {scan_time:.2f}s")
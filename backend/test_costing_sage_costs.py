@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+CHECK SAGE COST LOADING - costing_service._get_sage_costs against a stubbed sage_service
+get_inventory() returns {'inventory': [...], 'total': N}; costs must come from every page
+"""
+import sys
+import types
+sys.path.insert(0, '.')
+
+import costing_service
+
+INVENTORY = [
+    {"sPartCode": "MOV-EXTRA-0", "dLastCost": 12.5, "dCostOfStock": 11.0},
+    {"sPartCode": "MOV-LL-0", "dLastCost": 0, "dCostOfStock": 9.25},
+    {"sPartCode": "CC-PAIL", "dLastCost": 3.1, "dCostOfStock": 0},
+]
+calls = []
+
+
+def get_inventory(search=None, inactive=False, limit=500, offset=0):
+    calls.append(offset)
+    return {'inventory': INVENTORY[offset:offset + limit], 'total': len(INVENTORY), 'limit': limit, 'offset': offset}
+
+
+sys.modules['sage_service'] = types.SimpleNamespace(get_inventory=get_inventory)
+costing_service._SAGE_PAGE = 2  # force paging
+
+costs = costing_service._get_sage_costs()
+print(f"Pages requested at offsets: {calls}")
+print(f"Costs: {costs}")
+
+assert costs, "Sage costs came back empty"
+assert set(costs) == {"MOV-EXTRA-0", "MOV-LL-0", "CC-PAIL"}, "missing items from a page"
+assert costs["MOV-EXTRA-0"]["cost"] == 12.5
+assert costs["MOV-LL-0"]["cost"] == 9.25
+assert calls == [0, 2], "should stop paging once offset reaches total"
+print("PASS: Sage costs loaded from all inventory pages")
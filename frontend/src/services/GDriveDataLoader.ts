@@ -88,6 +88,10 @@ export class GDriveDataLoader {
     'PurchaseOrderDetailAdditionalCosts.json': [],
     loaded: false
   };
+  // Version (ETag) of the last /api/data payload per source - Sync asks /api/data/delta for changed tables only
+  private dataVersions: { [source: string]: string } = {};
+  // Full result.data of the last /api/data payload per source (tables plus SalesOrdersByStatus, events, ...) - deltas apply onto it
+  private dataSnapshots: { [source: string]: any } = {};
 
   private constructor() {
   }
@@ -172,9 +176,12 @@ export class GDriveDataLoader {
 
       // Pass refresh=true only on explicit user sync — not on every page load
       const refreshParam = forceRefresh ? '&refresh=true' : '';
-      const apiUrl = source === 'full_company_data'
-        ? getApiUrl(`/api/data?source=full_company_data${refreshParam}`)
-        : getApiUrl(`/api/data${forceRefresh ? '?refresh=true' : ''}`);
+      const previousVersion = this.loadedData.loaded && this.dataSnapshots[source] ? this.dataVersions[source] : undefined;
+      const apiUrl = previousVersion
+        ? getApiUrl(`/api/data/delta?since=${encodeURIComponent(previousVersion)}${source === 'full_company_data' ? '&source=full_company_data' : ''}${refreshParam}`)
+        : source === 'full_company_data'
+          ? getApiUrl(`/api/data?source=full_company_data${refreshParam}`)
+          : getApiUrl(`/api/data${forceRefresh ? '?refresh=true' : ''}`);
       console.log('📡 Loading data from backend:', {
         url: apiUrl,
         source,
@@ -233,6 +240,18 @@ export class GDriveDataLoader {
       }
       
       const result = await response.json();
+      if (result.delta === true && result.data) {
+        // Delta: backend sent only tables changed since our version - merge onto the full previous payload for this source
+        const merged: any = { ...this.dataSnapshots[source] };
+        (result.removed || []).forEach((key: string) => { delete merged[key]; });
+        Object.assign(merged, result.data);
+        console.log(`🔁 Delta sync: ${Object.keys(result.data).length} table(s) changed since ${result.since}`);
+        result.data = merged;
+      }
+      if (result.version && result.data) {
+        this.dataVersions[source] = result.version;
+        this.dataSnapshots[source] = result.data;
+      }
       const isFullCompanyDataRequest = source === 'full_company_data';
       const isLiveSqlRequest = source === 'live_sql';
       const fullCompanyDataReady = result.fullCompanyDataReady === true;
@@ -28,17 +28,18 @@ CORS(app)
 
 # In-memory cache — preloaded on startup, refreshed every 10 minutes
 _cache = {"data": None, "err": None, "loaded_at": None, "loading": False,
-          "response_bytes": None, "response_gzip": None}
+          "response_bytes": None, "response_gzip": None, "version": None}
 _CACHE_TTL_SECONDS = 600  # 10 minutes
 
 
-def _refresh_cache():
-    """Load all MISys data, pre-serialize and pre-compress response for instant serving."""
+def _refresh_cache(full=False):
+    """Load all MISys data, pre-serialize and pre-compress response for instant serving.
+    Scheduled refreshes fetch only new history rows; full=True (manual /api/refresh) re-reads every table."""
     import json as _json, gzip as _gzip, time as _time
     _cache["loading"] = True
     print(f"[bridge] Loading data from MISys SQL... {datetime.now().strftime('%H:%M:%S')}")
     t0 = _time.time()
-    data, err = misys_service.load_all_data()
+    data, err = misys_service.load_all_data(full=full)
     _cache["data"] = data
     _cache["err"] = err
     _cache["loaded_at"] = datetime.now()
@@ -68,6 +69,7 @@ def _refresh_cache():
         gzipped = _gzip.compress(raw, compresslevel=1)
         _cache["response_bytes"] = raw
         _cache["response_gzip"] = gzipped
+        _cache["version"] = _cache["loaded_at"].strftime("%Y%m%d%H%M%S%f")
         mb_raw = len(raw) / 1024 / 1024
         mb_gz = len(gzipped) / 1024 / 1024
         print(f"[bridge] Pre-serialized in {_time.time()-t1:.1f}s: {mb_raw:.1f}MB raw -> {mb_gz:.1f}MB gzip")
@@ -103,21 +105,32 @@ def get_data():
                         "message": _cache["err"] or "No data loaded yet"}), 500
 
     # Serve pre-built response — instant, no re-serialization
+    etag = f'"{_cache["version"]}"'
+    if _cache["version"] and _cache["version"] in _req.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': etag})
     accept_encoding = _req.headers.get('Accept-Encoding', '')
     if 'gzip' in accept_encoding and _cache["response_gzip"]:
         return Response(_cache["response_gzip"], mimetype='application/json',
-                        headers={'Content-Encoding': 'gzip',
+                        headers={'Content-Encoding': 'gzip', 'ETag': etag,
                                  'Content-Length': len(_cache["response_gzip"])})
     return Response(_cache["response_bytes"], mimetype='application/json',
-                    headers={'Content-Length': len(_cache["response_bytes"])})
+                    headers={'ETag': etag, 'Content-Length': len(_cache["response_bytes"])})
+
+
+@app.route('/api/version', methods=['GET'])
+def version():
+    """Version of the cached data (changes on every successful refresh) - lets the portal backend reuse its cached copy."""
+    _maybe_refresh()
+    return jsonify({"version": _cache["version"], "loading": _cache["loading"],
+                    "loaded_at": _cache["loaded_at"].isoformat() if _cache["loaded_at"] else None})
 
 
 @app.route('/api/refresh', methods=['POST'])
 def refresh():
-    """Force-refresh the cache from MISys SQL."""
+    """Force-refresh the cache from MISys SQL (full re-read, including history tables)."""
     if _cache["loading"]:
         return jsonify({"status": "already_loading"})
-    t = threading.Thread(target=_refresh_cache, daemon=True)
+    t = threading.Thread(target=_refresh_cache, kwargs={"full": True}, daemon=True)
     t.start()
     return jsonify({"status": "refresh_started"})
 
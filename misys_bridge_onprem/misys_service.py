@@ -16,9 +16,13 @@ Credentials from environment or defaults in MISYS_SQL_CONNECTION_DETAILS.txt
 
 import os
 import re
+import time
+import queue
+import threading
 from datetime import datetime, date
 from decimal import Decimal
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Try pyodbc first (works with TLS on this SQL Server), fall back to pymssql
 try:
@@ -44,6 +48,18 @@ MISYS_SQL_USER = os.environ.get('MISYS_SQL_USER', 'sa')
 MISYS_SQL_PASSWORD = os.environ.get('MISYS_SQL_PASSWORD', 'MISys_SBM1')
 MISYS_SQL_DATABASE = os.environ.get('MISYS_SQL_DATABASE', 'CANOILCA')
 
+# Extraction tuning: connections used in parallel, rows per fetchmany() batch
+MISYS_SQL_POOL_SIZE = max(1, int(os.environ.get('MISYS_SQL_POOL_SIZE', '4')))
+MISYS_SQL_FETCH_SIZE = max(100, int(os.environ.get('MISYS_SQL_FETCH_SIZE', '5000')))
+# Large history tables loaded incrementally (rowversion column if the table has one, else these date columns)
+_INCREMENTAL_TABLES = {
+    'MILOGH': ('tranDate', 'tranDt'),
+    'MIICST': ('transDate', 'transDt'),
+    'MISLTH': ('tranDate', 'tranDt'),
+}
+# Every Nth load re-reads incremental tables in full (picks up deleted/edited history rows)
+MISYS_INCREMENTAL_FULL_EVERY = max(1, int(os.environ.get('MISYS_INCREMENTAL_FULL_EVERY', '24')))
+
 # pyodbc driver preference order (first one found is used)
 _ODBC_DRIVERS = [
     'SQL Server Native Client 11.0',
@@ -283,43 +299,102 @@ def _get_skeleton():
     }
 
 
+def _connect():
+    """Open one READ-ONLY MISys SQL Server connection (pyodbc preferred, pymssql fallback)."""
+    if not PYODBC_AVAILABLE and not PYMSSQL_AVAILABLE:
+        raise RuntimeError("No SQL driver available. Run: pip install pyodbc")
+    if PYODBC_AVAILABLE:
+        driver = _get_odbc_driver()
+        if not driver:
+            raise RuntimeError("No ODBC SQL Server driver found on this machine.")
+        cs = (
+            f"DRIVER={{{driver}}};"
+            f"SERVER={MISYS_SQL_HOST};"
+            f"DATABASE={MISYS_SQL_DATABASE};"
+            f"UID={MISYS_SQL_USER};"
+            f"PWD={MISYS_SQL_PASSWORD};"
+            "TrustServerCertificate=yes;"
+            "Encrypt=no;"
+        )
+        return pyodbc.connect(cs, timeout=10)
+    return pymssql.connect(
+        server=MISYS_SQL_HOST,
+        user=MISYS_SQL_USER,
+        password=MISYS_SQL_PASSWORD,
+        database=MISYS_SQL_DATABASE,
+        login_timeout=10,
+    )
+
+
 @contextmanager
 def get_misys_connection():
     """Context manager for READ-ONLY MISys SQL Server connections.
     Uses pyodbc (SQL Server Native Client) — pymssql/FreeTDS fails TLS on this server.
     """
-    if not PYODBC_AVAILABLE and not PYMSSQL_AVAILABLE:
-        raise RuntimeError("No SQL driver available. Run: pip install pyodbc")
     conn = None
     try:
-        if PYODBC_AVAILABLE:
-            driver = _get_odbc_driver()
-            if not driver:
-                raise RuntimeError("No ODBC SQL Server driver found on this machine.")
-            cs = (
-                f"DRIVER={{{driver}}};"
-                f"SERVER={MISYS_SQL_HOST};"
-                f"DATABASE={MISYS_SQL_DATABASE};"
-                f"UID={MISYS_SQL_USER};"
-                f"PWD={MISYS_SQL_PASSWORD};"
-                "TrustServerCertificate=yes;"
-                "Encrypt=no;"
-            )
-            conn = pyodbc.connect(cs, timeout=10)
-        else:
-            conn = pymssql.connect(
-                server=MISYS_SQL_HOST,
-                user=MISYS_SQL_USER,
-                password=MISYS_SQL_PASSWORD,
-                database=MISYS_SQL_DATABASE,
-                login_timeout=10,
-            )
+        conn = _connect()
         yield conn
     finally:
         if conn:
             conn.close()
 
 
+class _ConnectionPool:
+    """Small pool of READ-ONLY connections reused across bridge refreshes. A connection that raised is closed, not returned."""
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = _connect()
+            yield conn
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _ConnectionPool(MISYS_SQL_POOL_SIZE)
+        return _pool
+
+
 def _execute_readonly(conn, query):
     """Execute SELECT only. Blocks any write operations."""
     if not _ALLOWED_SQL_PATTERN.match(query.strip()):
@@ -349,11 +424,171 @@ def test_connection():
         return False, str(e)
 
 
-def load_all_data():
+def _iso(v):
+    return v.isoformat() if v is not None else None
+
+
+def _decimal(v):
+    return float(v) if v is not None else None
+
+
+def _drop(v):
+    return None
+
+
+def _column_plan(description, column_map):
+    """Per cursor description (once per query, not per row): app key for each column and a converter where one is needed."""
+    keys = []
+    converters = []
+    for i, col in enumerate(description):
+        name = col[0]
+        app_key = column_map.get(name) if name in column_map else column_map.get(name.strip()) if name else None
+        keys.append(app_key or name)
+        type_code = col[1]
+        if isinstance(type_code, type):
+            if issubclass(type_code, (datetime, date)):
+                converters.append((i, _iso))
+            elif issubclass(type_code, Decimal):
+                converters.append((i, _decimal))
+            elif issubclass(type_code, (bytes, bytearray)):
+                converters.append((i, _drop))  # rowversion/timestamp columns — not needed by the app
+        else:
+            converters.append((i, _json_serial))  # driver without Python type codes (pymssql): convert per value
+    return keys, converters
+
+
+def _stream_table(conn, table_name, column_map, where="", params=(), watermark_col=None):
+    """
+    SELECT * FROM table (+ where) with fetchmany batches; rows are mapped to app keys as they arrive.
+    Returns (rows, max raw value of watermark_col or None).
+    """
+    query = f"SELECT * FROM {table_name}{where}"
+    if not _ALLOWED_SQL_PATTERN.match(query.strip()):
+        raise PermissionError("MISys SQL is READ-ONLY. Only SELECT queries allowed.")
+    cur = conn.cursor()
+    try:
+        cur.execute(query, params) if params else cur.execute(query)
+        if not cur.description:
+            return [], None
+        keys, converters = _column_plan(cur.description, column_map)
+        wm_idx = next((i for i, col in enumerate(cur.description) if col[0] == watermark_col), None) if watermark_col else None
+        watermark = None
+        out = []
+        while True:
+            batch = cur.fetchmany(MISYS_SQL_FETCH_SIZE)
+            if not batch:
+                break
+            for row in batch:
+                vals = list(row)
+                if wm_idx is not None and vals[wm_idx] is not None and (watermark is None or vals[wm_idx] > watermark):
+                    watermark = vals[wm_idx]
+                for i, conv in converters:
+                    vals[i] = conv(vals[i])
+                out.append(dict(zip(keys, vals)))
+        return out, watermark
+    finally:
+        cur.close()
+
+
+# Incremental state per history table: rows already loaded, watermark column/kind/value, loads since last full read
+_incremental = {}
+_incremental_lock = threading.Lock()
+
+
+def _watermark_column(conn, table_name):
+    """(column, 'rowversion'|'date') for an incremental table, or (None, None). Looked up once per table."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = " + ("?" if PYODBC_AVAILABLE else "%s"),
+            (table_name,),
+        )
+        cols = {str(r[0]): str(r[1]).lower() for r in cur.fetchall()}
+    finally:
+        cur.close()
+    for name, dtype in cols.items():
+        if dtype in ("timestamp", "rowversion"):
+            return name, "rowversion"
+    for name in _INCREMENTAL_TABLES.get(table_name, ()):
+        if name in cols:
+            return name, "date"
+    return None, None
+
+
+def _primary_key(conn, table_name):
+    """Primary key column names of a table in key order ([] when it has none). Looked up once per table."""
+    ph = "?" if PYODBC_AVAILABLE else "%s"
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT kcu.COLUMN_NAME FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc"
+            " JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu"
+            " ON kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME AND kcu.TABLE_NAME = tc.TABLE_NAME"
+            f" WHERE tc.TABLE_NAME = {ph} AND tc.CONSTRAINT_TYPE = 'PRIMARY KEY' ORDER BY kcu.ORDINAL_POSITION",
+            (table_name,),
+        )
+        return [str(r[0]) for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def _merge_by_key(kept, rows, key):
+    """kept rows whose key is not in rows (their old copies), then rows."""
+    fresh = {tuple(r.get(k) for k in key) for r in rows}
+    return [r for r in kept if tuple(r.get(k) for k in key) not in fresh] + rows
+
+
+def _load_table(table_name, column_map, full=False):
+    """Load one mapped table on a pooled connection. History tables listed in _INCREMENTAL_TABLES only fetch new rows."""
+    with _get_pool().connection() as conn:
+        if table_name not in _INCREMENTAL_TABLES:
+            rows, _ = _stream_table(conn, table_name, column_map)
+            return rows
+        with _incremental_lock:
+            state = _incremental.get(table_name)
+        if state is None:
+            col, kind = _watermark_column(conn, table_name)
+            # Changed rows come back with their primary key: without one they cannot replace their old copies
+            key = [column_map.get(c) or c for c in _primary_key(conn, table_name)] if col else []
+            if col and not key:
+                print(f"[misys_service] {table_name}: no primary key, loading in full every time")
+                col = kind = None
+            state = {"column": col, "kind": kind, "rows": None, "watermark": None, "loads": 0, "key": key}
+        col = state["column"]
+        if col is None:
+            with _incremental_lock:
+                _incremental[table_name] = state
+            rows, _ = _stream_table(conn, table_name, column_map)
+            return rows
+        incremental = not full and state["rows"] is not None and state["watermark"] is not None \
+            and state["loads"] % MISYS_INCREMENTAL_FULL_EVERY != 0
+        if not incremental:
+            merged, watermark = _stream_table(conn, table_name, column_map, watermark_col=col)
+        else:
+            op = ">" if state["kind"] == "rowversion" else ">="
+            ph = "?" if PYODBC_AVAILABLE else "%s"
+            rows, watermark = _stream_table(conn, table_name, column_map, where=f" WHERE {col} {op} {ph}",
+                                            params=(state["watermark"],), watermark_col=col)
+            # Updated rows (and, for dates, rows at the watermark date that were re-read) replace their old copies
+            merged = _merge_by_key(state["rows"], rows, state["key"]) if rows else state["rows"]
+            if watermark is None:
+                watermark = state["watermark"]  # nothing new since the last load
+            print(f"[misys_service] {table_name}: incremental since {col}={state['watermark']!r} -> {len(rows)} new/changed rows")
+        state["rows"] = merged
+        state["watermark"] = watermark
+        state["loads"] += 1
+        with _incremental_lock:
+            _incremental[table_name] = state
+        return list(merged)
+
+
+def load_all_data(full=False):
     """
     Load all MISys data from SQL Server into the app data format.
     Returns (data_dict, None) on success, (None, error_message) on failure.
     Same structure as full_company_data_converter.load_from_folder().
+    Tables are extracted in parallel over a small connection pool with fetchmany() streaming; MILOGH/MIICST/MISLTH
+    only fetch rows past their last watermark (full=True, or every MISYS_INCREMENTAL_FULL_EVERY loads, re-reads them).
     """
     if not PYMSSQL_AVAILABLE:
         return None, "pymssql not installed. Run: pip install pymssql"
@@ -361,28 +596,31 @@ def load_all_data():
     skeleton = _get_skeleton()
 
     try:
-        with get_misys_connection() as conn:
-            for table_name, (app_keys, column_map) in _MISYS_TABLE_MAPPINGS.items():
+        t0 = time.time()
+        # Fail fast (same as before) when the server is unreachable, instead of once per table
+        with _get_pool().connection():
+            pass
+        tables = list(_MISYS_TABLE_MAPPINGS.items())
+        # Largest history tables first so they overlap with the many small ones
+        tables.sort(key=lambda t: t[0] not in _INCREMENTAL_TABLES)
+        results = {}
+        with ThreadPoolExecutor(max_workers=MISYS_SQL_POOL_SIZE) as ex:
+            futures = {name: ex.submit(_load_table, name, column_map, full) for name, (_, column_map) in tables}
+            for name, future in futures.items():
                 try:
-                    # Use SELECT * - pymssql returns column names from result set
-                    query = f"SELECT * FROM {table_name}"
-                    rows = _execute_readonly(conn, query)
-                    if not rows:
-                        continue
-                    # Convert to list of dicts with app keys
-                    mapped = []
-                    for row in rows:
-                        d = _row_to_dict(row, column_map)
-                        if d:
-                            mapped.append(d)
-                    if mapped:
-                        for key in app_keys:
-                            if key in skeleton and isinstance(skeleton[key], list):
-                                skeleton[key] = list(mapped)
-                        print(f"[misys_service] loaded {table_name} -> {len(mapped)} rows -> {app_keys}")
+                    results[name] = future.result()
                 except Exception as e:
-                    print(f"[misys_service] skip {table_name}: {e}")
-                    continue
+                    print(f"[misys_service] skip {name}: {e}")
+        for table_name, (app_keys, column_map) in _MISYS_TABLE_MAPPINGS.items():
+            mapped = results.get(table_name)
+            if not mapped:
+                continue
+            for key in app_keys:
+                if key in skeleton and isinstance(skeleton[key], list):
+                    skeleton[key] = list(mapped)
+            print(f"[misys_service] loaded {table_name} -> {len(mapped)} rows -> {app_keys}")
+        print(f"[misys_service] extracted {len(results)} tables in {time.time() - t0:.1f}s "
+              f"({MISYS_SQL_POOL_SIZE} connections, fetchmany {MISYS_SQL_FETCH_SIZE})")
 
         # Add item totals (totQStk, totQWip, totQRes, totQOrd) from MIILOC aggregation if Items.json has data
         if skeleton.get("Items.json") and skeleton.get("MIILOC.json"):
@@ -8,6 +8,16 @@ picks up the latest folder on next data load.
 Every table from the CANOILCA database is exported as-is (raw SQL column
 names, no renaming). This gives the backend full access to everything.
 
+DELTA MODE (--delta):
+  Each sync also writes _delta_manifest.json with per-table state (row count,
+  server-side checksum, watermark). With --delta, a table whose checksum is
+  unchanged is not exported again - the manifest points at the folder that
+  already holds it. History tables (MILOGH, MIICST, MISLTH) only export rows
+  past their rowversion/date watermark into <TABLE>.delta.CSV. The backend
+  loaders (backend/full_company_delta.py) rebuild every table from the manifest.
+  A table is exported in full again when its columns change, older history rows
+  changed, or its delta chain reaches MAX_DELTA_CHAIN files.
+
 REQUIREMENTS:
   - Python 3.8+
   - pyodbc  (auto-installed)
@@ -18,6 +28,7 @@ USAGE:
   python sync_to_gdrive.py              # run now
   python sync_to_gdrive.py --dry-run    # test SQL connection only, no writes
   python sync_to_gdrive.py --tables MIITEM MIPOH   # specific tables only
+  python sync_to_gdrive.py --delta      # only changed tables / new history rows
 
 SCHEDULE (Windows Task Scheduler):
   Program:  python
@@ -30,6 +41,8 @@ import os
 import sys
 import csv
 import time
+import json
+import hashlib
 import argparse
 import shutil
 from datetime import datetime
@@ -78,6 +91,21 @@ KEEP_LAST_N_FOLDERS = 7
 # Tables to always skip (system/temp tables that have no useful data)
 SKIP_TABLES = set()
 
+# Rows per cursor.fetchmany() batch (tables are streamed to disk, never held in memory)
+FETCH_SIZE = int(os.environ.get('MISYS_SYNC_FETCH_SIZE', '5000'))
+
+# Delta mode: manifest read by backend/full_company_delta.py (keep the format in sync)
+DELTA_MANIFEST = "_delta_manifest.json"
+MANIFEST_VERSION = 1
+# Append-only history tables exported incrementally (rowversion column if present, else these date columns)
+APPEND_TABLES = {
+    'MILOGH': ('tranDate', 'tranDt'),
+    'MIICST': ('transDate', 'transDt'),
+    'MISLTH': ('tranDate', 'tranDt'),
+}
+# Re-export a history table in full once its chain (full file + deltas) reaches this many files
+MAX_DELTA_CHAIN = 6
+
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def get_connection_string() -> str:
@@ -142,31 +170,206 @@ def get_all_table_names(conn) -> list:
     return [row[0] for row in cursor.fetchall()]
 
 
+class _HashingWriter:
+    """File wrapper for csv.writer that hashes everything written (detects unchanged tables without a second read)."""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.blake2b(digest_size=16)
+
+    def write(self, s):
+        self.digest.update(s.encode('utf-8'))
+        return self.f.write(s)
+
+
+def export_table(conn, table_name: str, out_path: Path, where: str = "", params=(), watermark_col=None):
+    """
+    SELECT * from table_name (+ where) and stream it to out_path as UTF-8 CSV, FETCH_SIZE rows at a time.
+    No file is written when the result is empty. Returns a dict:
+      rows, columns, hash (of the CSV text), max (largest watermark_col value), at_max (rows holding that value).
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM [{table_name}]{where}", *params)
+    columns = [col[0] for col in cursor.description]
+    wm_idx = columns.index(watermark_col) if watermark_col in columns else None
+    result = {"rows": 0, "columns": columns, "hash": None, "max": None, "at_max": 0}
+    f = writer = hashing = None
+    try:
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            if f is None:
+                f = open(out_path, 'w', newline='', encoding='utf-8-sig')
+                hashing = _HashingWriter(f)
+                writer = csv.writer(hashing)
+                writer.writerow(columns)
+            for row in batch:
+                writer.writerow([_fmt(v) for v in row])
+                if wm_idx is not None and row[wm_idx] is not None:
+                    v = row[wm_idx]
+                    if result["max"] is None or v > result["max"]:
+                        result["max"], result["at_max"] = v, 1
+                    elif v == result["max"]:
+                        result["at_max"] += 1
+            result["rows"] += len(batch)
+    finally:
+        if f is not None:
+            f.close()
+        cursor.close()
+    if hashing is not None:
+        result["hash"] = hashing.digest.hexdigest()
+    return result
+
+
 def dump_table_to_csv(conn, table_name: str, out_path: Path) -> int:
     """
     SELECT * from table_name and write to out_path as UTF-8 CSV.
     Returns row count. Returns 0 if table is empty or an error occurs.
     """
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM [{table_name}]")
-        columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
-        if not rows:
-            return 0
-
-        with open(out_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(columns)
-            for row in rows:
-                writer.writerow([_fmt(v) for v in row])
-
-        return len(rows)
+        return export_table(conn, table_name, out_path)["rows"]
     except Exception as e:
         print(f"    [warn] {table_name}: {e}")
         return -1  # error indicator
 
 
+# ── Delta sync ────────────────────────────────────────────────────────────────
+
+def get_table_columns(conn) -> dict:
+    """{table: {column: data_type}} for every base table (one INFORMATION_SCHEMA query)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE
+        FROM INFORMATION_SCHEMA.COLUMNS c
+        JOIN INFORMATION_SCHEMA.TABLES t ON t.TABLE_NAME = c.TABLE_NAME AND t.TABLE_TYPE = 'BASE TABLE'
+        ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+    """)
+    out = {}
+    for table, column, dtype in cursor.fetchall():
+        out.setdefault(table.upper(), {})[column] = str(dtype).lower()
+    return out
+
+
+def table_checksum(conn, table_name: str):
+    """[row count, CHECKSUM_AGG(BINARY_CHECKSUM(*))] computed on the server, or None if the table does not support it."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM [{table_name}]")
+        count, checksum = cursor.fetchone()
+        return [int(count), None if checksum is None else int(checksum)]
+    except Exception:
+        return None
+
+
+def watermark_column(table_name: str, columns: dict):
+    """(column, 'rowversion'|'date') for an append-only history table, else (None, None)."""
+    if table_name not in APPEND_TABLES:
+        return None, None
+    for name, dtype in columns.items():
+        if dtype in ('timestamp', 'rowversion'):
+            return name, 'rowversion'
+    for name in APPEND_TABLES[table_name]:
+        if name in columns:
+            return name, 'date'
+    return None, None
+
+
+def _wm_text(value, kind):
+    """Watermark as stored in the manifest: hex for rowversion, CSV text (str()) for dates."""
+    return value.hex() if kind == 'rowversion' else str(value)
+
+
+def _wm_param(text, kind):
+    return bytes.fromhex(text) if kind == 'rowversion' else datetime.fromisoformat(text)
+
+
+def find_previous_manifest(base: Path, exclude: str = None):
+    """Manifest of the newest dated export folder (by mtime) that has one, or None."""
+    folders = [f for f in base.iterdir() if f.is_dir() and _is_dated(f.name) and f.name != exclude]
+    for folder in sorted(folders, key=lambda f: f.stat().st_mtime, reverse=True):
+        path = folder / DELTA_MANIFEST
+        if not path.is_file():
+            return None  # newest export predates delta manifests: start over with a full sync
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+    return None
+
+
+def _parts_exist(base: Path, entry: dict) -> bool:
+    return all((base / p["folder"] / p["file"]).is_file() for p in entry.get("parts") or [])
+
+
+def sync_table(conn, table_name: str, out_folder: Path, columns: dict, prev: dict = None):
+    """
+    Export one table into out_folder. With prev (its entry from the last manifest) only what changed is written.
+    Returns (entry, status, rows_written) where status is 'full', 'append', 'unchanged' or 'empty'.
+    """
+    base = out_folder.parent
+    checksum = table_checksum(conn, table_name)
+    col_names = list(columns)
+    wm_col, wm_kind = watermark_column(table_name, columns)
+    usable = prev is not None and prev.get("columns") == col_names and _parts_exist(base, prev)
+
+    if usable and checksum is not None and prev.get("checksum") == checksum:
+        return dict(prev), ('unchanged' if prev.get("parts") else 'empty'), 0
+
+    wm = prev.get("watermark") if usable else None
+    if wm and wm.get("column") == wm_col and len(prev.get("parts") or []) < MAX_DELTA_CHAIN:
+        # History rows before the watermark must be exactly those already exported, else re-export in full
+        cond = f"[{wm_col}] <= ?" if wm_kind == 'rowversion' else f"([{wm_col}] < ? OR [{wm_col}] IS NULL)"
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM [{table_name}] WHERE {cond}", _wm_param(wm["value"], wm_kind))
+        if int(cursor.fetchone()[0]) == wm["base_rows"]:
+            op = ">" if wm_kind == 'rowversion' else ">="
+            fname = f"{table_name}.delta.CSV"
+            res = export_table(conn, table_name, out_folder / fname, where=f" WHERE [{wm_col}] {op} ?",
+                               params=(_wm_param(wm["value"], wm_kind),), watermark_col=wm_col)
+            if res["rows"] or wm_kind == 'rowversion':
+                entry = dict(prev, checksum=checksum, content_hash=None)
+                if res["rows"]:
+                    part = {"folder": out_folder.name, "file": fname}
+                    if wm_kind == 'date':
+                        part["replace_from"] = {"column": wm_col, "value": wm["value"]}
+                    entry["parts"] = list(prev["parts"]) + [part]
+                    entry["rows"] = wm["base_rows"] + res["rows"]
+                    base_rows = entry["rows"] - res["at_max"] if wm_kind == 'date' else entry["rows"]
+                    entry["watermark"] = {"column": wm_col, "kind": wm_kind,
+                                          "value": _wm_text(res["max"], wm_kind), "base_rows": base_rows}
+                return entry, ('append' if res["rows"] else 'unchanged'), res["rows"]
+            # Boundary rows disappeared: fall through to a full export
+
+    fname = f"{table_name}.CSV"
+    res = export_table(conn, table_name, out_folder / fname, watermark_col=wm_col)
+    entry = {"columns": res["columns"] or col_names, "rows": res["rows"], "checksum": checksum,
+             "content_hash": res["hash"], "parts": [], "watermark": None}
+    if not res["rows"]:
+        return entry, 'empty', 0
+    if usable and res["hash"] and prev.get("content_hash") == res["hash"] and len(prev.get("parts") or []) == 1:
+        # Same content (server checksum unavailable or changed without a data change): keep the earlier file
+        (out_folder / fname).unlink()
+        return dict(prev, checksum=checksum), 'unchanged', 0
+    entry["parts"] = [{"folder": out_folder.name, "file": fname}]
+    if wm_col and res["max"] is not None:
+        base_rows = res["rows"] - res["at_max"] if wm_kind == 'date' else res["rows"]
+        entry["watermark"] = {"column": wm_col, "kind": wm_kind, "value": _wm_text(res["max"], wm_kind), "base_rows": base_rows}
+    return entry, 'full', res["rows"]
+
+
+def write_delta_manifest(folder: Path, tables: dict, ts: datetime, mode: str):
+    """Write _delta_manifest.json (per-table parts + sync state) into the export folder."""
+    manifest = {"version": MANIFEST_VERSION, "folder": folder.name, "mode": mode, "synced_at": ts.isoformat(),
+                "database": MISYS_SQL_DATABASE, "tables": tables}
+    tmp = folder / (DELTA_MANIFEST + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, folder / DELTA_MANIFEST)
+
+
 def _fmt(val):
     """Format a value for CSV output."""
     if val is None:
@@ -191,13 +394,14 @@ def _is_dated(name: str) -> bool:
     return bool(re.match(r'^(January|February|March|April|May|June|July|August|September|October|November|December|\d{4})', name))
 
 
-def cleanup_old_folders(base: Path, keep: int):
-    """Delete oldest dated folders, keeping only the last N."""
+def cleanup_old_folders(base: Path, keep: int, protect=()):
+    """Delete oldest dated folders, keeping only the last N (and any folder the latest delta manifest still uses)."""
     folders = sorted(
         [f for f in base.iterdir() if f.is_dir() and _is_dated(f.name)],
+        key=lambda f: f.stat().st_mtime,
         reverse=True  # newest first
     )
-    to_delete = folders[keep:]
+    to_delete = [f for f in folders[keep:] if f.name not in protect]
     for folder in to_delete:
         try:
             shutil.rmtree(folder)
@@ -206,7 +410,8 @@ def cleanup_old_folders(base: Path, keep: int):
             print(f"  [cleanup] Could not delete {folder.name}: {e}")
 
 
-def _write_manifest(folder: Path, tables_written: list, tables_empty: list, tables_error: list, ts: datetime):
+def _write_manifest(folder: Path, tables_written: list, tables_empty: list, tables_error: list, ts: datetime,
+                    tables_unchanged: list = ()):
     """Write a summary file into the synced folder."""
     total_rows = sum(r for _, r in tables_written)
     with open(folder / "_sync_manifest.txt", 'w', encoding='utf-8') as f:
@@ -216,6 +421,8 @@ def _write_manifest(folder: Path, tables_written: list, tables_empty: list, tabl
         f.write(f"Tables written: {len(tables_written)}\n")
         f.write(f"Tables empty:   {len(tables_empty)}\n")
         f.write(f"Tables error:   {len(tables_error)}\n")
+        if tables_unchanged:
+            f.write(f"Tables unchanged (in earlier folders): {len(tables_unchanged)}\n")
         f.write(f"Total rows:     {total_rows:,}\n")
         f.write("\n--- Written tables (name: rows) ---\n")
         for name, rows in sorted(tables_written):
@@ -240,10 +447,12 @@ def main():
                         help='Only sync specific tables (e.g. --tables MIITEM MIPOH)')
     parser.add_argument('--output', type=str, default=None,
                         help='Override output base folder path')
+    parser.add_argument('--delta', action='store_true',
+                        help='Only export changed tables / new history rows (see DELTA MODE above)')
     args = parser.parse_args()
 
     print("=" * 60)
-    print("  MISys -> Google Drive CSV Sync  (ALL TABLES)")
+    print(f"  MISys -> Google Drive CSV Sync  ({'DELTA' if args.delta else 'ALL TABLES'})")
     print(f"  {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
 
@@ -291,30 +500,60 @@ def main():
     tables_written = []   # [(name, row_count), ...]
     tables_empty   = []   # [name, ...]
     tables_error   = []   # [name, ...]
+    tables_unchanged = []  # [name, ...] (delta mode: still served from an earlier folder)
+
+    prev_manifest = find_previous_manifest(base, exclude=folder_name) if args.delta else None
+    if args.delta and prev_manifest is None:
+        print("  [delta] No previous delta manifest - exporting every table in full this time.")
+    prev_tables = (prev_manifest or {}).get("tables", {})
+    table_columns = get_table_columns(conn)
+    manifest_tables = {}
+    if args.tables and prev_manifest:
+        # Tables not selected this run keep their previous state
+        manifest_tables.update({k: v for k, v in prev_tables.items() if k not in all_tables})
 
     for i, table_name in enumerate(all_tables, 1):
-        csv_path = out_folder / f"{table_name}.CSV"
-        row_count = dump_table_to_csv(conn, table_name, csv_path)
+        try:
+            entry, status, row_count = sync_table(conn, table_name, out_folder, table_columns.get(table_name.upper(), {}),
+                                                  prev_tables.get(table_name) if args.delta else None)
+        except Exception as e:
+            print(f"    [warn] {table_name}: {e}")
+            tables_error.append(table_name)
+            if table_name in prev_tables and args.delta:
+                manifest_tables[table_name] = prev_tables[table_name]  # keep serving the last good export
+            continue
+        manifest_tables[table_name] = entry
 
-        if row_count > 0:
+        if status == 'full':
             tables_written.append((table_name, row_count))
             print(f"  [{i:3d}/{len(all_tables)}] {table_name:<20} {row_count:>8,} rows")
-        elif row_count == 0:
+        elif status == 'append':
+            tables_written.append((table_name, row_count))
+            print(f"  [{i:3d}/{len(all_tables)}] {table_name:<20} {row_count:>8,} new rows (delta, {len(entry['parts'])} files)")
+        elif status == 'unchanged':
+            tables_unchanged.append(table_name)
+            print(f"  [{i:3d}/{len(all_tables)}] {table_name:<20}   (unchanged)")
+        else:
             tables_empty.append(table_name)
             print(f"  [{i:3d}/{len(all_tables)}] {table_name:<20}   (empty)")
-        else:
-            tables_error.append(table_name)
-            # warning already printed by dump_table_to_csv
 
     conn.close()
 
-    # 5. Write manifest
+    if args.delta and prev_manifest is not None and not tables_written and manifest_tables == prev_tables:
+        shutil.rmtree(out_folder, ignore_errors=True)
+        print(f"\nDONE: No changes since the last sync ({time.time() - t0:.1f}s) - no folder written.\n")
+        return
+
+    # 5. Write manifests
     now = datetime.now()
-    _write_manifest(out_folder, tables_written, tables_empty, tables_error, now)
+    _write_manifest(out_folder, tables_written, tables_empty, tables_error, now, tables_unchanged)
+    write_delta_manifest(out_folder, manifest_tables, now, 'delta' if args.delta else 'full')
 
     elapsed = time.time() - t0
     total_rows = sum(r for _, r in tables_written)
     print(f"\n  Written : {len(tables_written)} tables / {total_rows:,} rows")
+    if tables_unchanged:
+        print(f"  Unchanged: {len(tables_unchanged)} tables (kept in earlier folders)")
     print(f"  Empty   : {len(tables_empty)} tables")
     if tables_error:
         print(f"  Errors  : {len(tables_error)} tables")
@@ -322,7 +561,8 @@ def main():
 
     # 6. Cleanup old folders
     print(f"\n[4/4] Cleaning up old folders (keeping last {KEEP_LAST_N_FOLDERS}) ...")
-    cleanup_old_folders(base, KEEP_LAST_N_FOLDERS)
+    in_use = {p["folder"] for entry in manifest_tables.values() for p in entry.get("parts") or []}
+    cleanup_old_folders(base, KEEP_LAST_N_FOLDERS, protect=in_use)
 
     print(f"\nDONE: Sync complete.")
     print(f"  Folder: {folder_name}")